@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Campaign, EmailTracking, CampaignStats, CampaignRecipient, SendingSettings
+from .models import Campaign, EmailTracking, CampaignStats, CampaignRecipient, SendingSettings, CampaignCounters, DailyEngagementStats, ExportTask
 
 @admin.register(Campaign)
 class CampaignAdmin(admin.ModelAdmin):
@@ -15,6 +15,25 @@ class EmailTrackingAdmin(admin.ModelAdmin):
     list_filter = ('sent_at', 'delivered_at', 'opened_at', 'clicked_at')
     search_fields = ('campaign__name', 'contact__email')
 
+@admin.register(CampaignCounters)
+class CampaignCountersAdmin(admin.ModelAdmin):
+    list_display = ('campaign', 'sent', 'delivered', 'opened', 'clicked', 'bounced', 'unsubscribed', 'updated_at')
+    search_fields = ('campaign__name',)
+    readonly_fields = ('updated_at',)
+
+@admin.register(DailyEngagementStats)
+class DailyEngagementStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'day', 'sent', 'opened', 'clicked', 'bounced', 'new_subscribers', 'updated_at')
+    list_filter = ('day',)
+    search_fields = ('user__email',)
+
+@admin.register(ExportTask)
+class ExportTaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'kind', 'status', 'processed_rows', 'total_rows', 'created_at', 'completed_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('user__email', 'filename')
+    readonly_fields = ('created_at', 'started_at', 'completed_at')
+
 @admin.register(CampaignStats)
 class CampaignStatsAdmin(admin.ModelAdmin):
     list_display = ('campaign', 'contact_list', 'emails_sent', 'opens_count', 'clicks_count', 'bounces_count')
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0012_campaign_failure_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CampaignCounters',
+            fields=[
+                ('campaign', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='counters', serialize=False, to='campaigns.campaign')),
+                ('sent', models.IntegerField(default=0)),
+                ('delivered', models.IntegerField(default=0)),
+                ('opened', models.IntegerField(default=0)),
+                ('clicked', models.IntegerField(default=0)),
+                ('bounced', models.IntegerField(default=0)),
+                ('unsubscribed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Счётчики кампании',
+                'verbose_name_plural': 'Счётчики кампаний',
+            },
+        ),
+    ]
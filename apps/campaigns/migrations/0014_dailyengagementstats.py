@@ -0,0 +1,36 @@
+# Generated by Django 5.2.1 on 2026-10-19 15:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0013_campaigncounters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyEngagementStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('sent', models.IntegerField(default=0)),
+                ('opened', models.IntegerField(default=0)),
+                ('clicked', models.IntegerField(default=0)),
+                ('bounced', models.IntegerField(default=0)),
+                ('new_subscribers', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_engagement_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Дневная статистика',
+                'verbose_name_plural': 'Дневная статистика',
+                'ordering': ['-day'],
+                'unique_together': {('user', 'day')},
+            },
+        ),
+    ]
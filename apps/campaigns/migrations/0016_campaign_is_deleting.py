@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('campaigns', '0015_exporttask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='campaign',
+            name='is_deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,7 +1,8 @@
 # core/apps/campaigns/models.py
 
 import uuid
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import Count, F, Q
 from django.conf import settings
 from django.utils import timezone
 
@@ -44,6 +45,8 @@ class Campaign(models.Model):
     auto_send_at = models.DateTimeField(null=True, blank=True)  # Время автоматической отправки, если не одобрено
     celery_task_id = models.CharField(max_length=255, blank=True, null=True, help_text='ID задачи Celery для отслеживания')
     failure_reason = models.TextField(null=True, blank=True)
+    # Кампания удаляется фоновой задачей (mailer.PurgeJob) и уже скрыта от пользователя
+    is_deleting = models.BooleanField(default=False)
 
     def save(self, *args, **kwargs):
         if not self.pk:  # Новый объект
@@ -61,50 +64,56 @@ class Campaign(models.Model):
         """Возвращает русское название статуса"""
         return dict(self.STATUS_CHOICES).get(self.status, self.status)
 
+    def get_counters(self):
+        """Денормализованные счётчики кампании (создаются по требованию)."""
+        try:
+            return self.counters
+        except CampaignCounters.DoesNotExist:
+            counters = CampaignCounters.rebuild(self.id)
+            self.counters = counters
+            return counters
+
     @property
     def emails_sent(self):
         """Общее количество отправленных писем"""
-        return EmailTracking.objects.filter(campaign=self).count()
+        return self.get_counters().sent
 
     @property
     def open_rate(self):
         """Процент открытий"""
-        total_sent = self.emails_sent
-        if total_sent == 0:
+        counters = self.get_counters()
+        if counters.sent == 0:
             return 0
-        total_opens = EmailTracking.objects.filter(campaign=self, opened_at__isnull=False).count()
-        return (total_opens / total_sent * 100)
+        return (counters.opened / counters.sent * 100)
 
     @property
     def click_rate(self):
         """Процент кликов"""
-        total_sent = self.emails_sent
-        if total_sent == 0:
+        counters = self.get_counters()
+        if counters.sent == 0:
             return 0
-        total_clicks = EmailTracking.objects.filter(campaign=self, clicked_at__isnull=False).count()
-        return (total_clicks / total_sent * 100)
+        return (counters.clicked / counters.sent * 100)
 
     @property
     def bounce_rate(self):
         """Процент отказов"""
-        total_sent = self.emails_sent
-        if total_sent == 0:
+        counters = self.get_counters()
+        if counters.sent == 0:
             return 0
-        total_bounces = EmailTracking.objects.filter(campaign=self, bounced_at__isnull=False).count()
-        return (total_bounces / total_sent * 100)
+        return (counters.bounced / counters.sent * 100)
 
     @property
     def delivered_emails(self):
         """Количество успешно доставленных писем"""
-        return EmailTracking.objects.filter(campaign=self, delivered_at__isnull=False).count()
+        return self.get_counters().delivered
 
     @property
     def delivery_rate(self):
         """Процент доставленных писем"""
-        total_sent = self.emails_sent
-        if total_sent == 0:
+        counters = self.get_counters()
+        if counters.sent == 0:
             return 0
-        return (self.delivered_emails / total_sent * 100)
+        return (counters.delivered / counters.sent * 100)
 
     class Meta:
         ordering = ['-created_at']
@@ -140,16 +149,19 @@ class EmailTracking(models.Model):
             self.ip_address = ip_address
             self.user_agent = user_agent
             self.save()
+            CampaignCounters.increment(self.campaign_id, opened=1)
 
     def mark_as_clicked(self, ip_address=None, user_agent=None):
         """Отметить письмо как открытое по клику"""
         if not self.clicked_at:
             self.clicked_at = timezone.now()
-            if not self.opened_at:
+            newly_opened = not self.opened_at
+            if newly_opened:
                 self.opened_at = self.clicked_at
             self.ip_address = ip_address
             self.user_agent = user_agent
             self.save()
+            CampaignCounters.increment(self.campaign_id, clicked=1, opened=1 if newly_opened else 0)
 
     def mark_as_bounced(self, reason=''):
         """Отметить письмо как отказ"""
@@ -157,12 +169,259 @@ class EmailTracking(models.Model):
             self.bounced_at = timezone.now()
             self.bounce_reason = reason
             self.save()
+            CampaignCounters.increment(self.campaign_id, bounced=1)
 
     def mark_as_delivered(self):
         """Отметить письмо как успешно доставленное"""
         if not self.delivered_at:
             self.delivered_at = timezone.now()
             self.save()
+            CampaignCounters.increment(self.campaign_id, delivered=1)
+
+
+class CampaignCounters(models.Model):
+    """
+    Денормализованные счётчики кампании (одна строка на кампанию).
+
+    Обновляются пайплайнами доставки и трекинга через increment(),
+    периодически сверяются с EmailTracking задачей reconcile_campaign_counters.
+    Сериализаторы и списки читают статистику отсюда, а не COUNT по EmailTracking.
+    """
+    FIELDS = ('sent', 'delivered', 'opened', 'clicked', 'bounced', 'unsubscribed')
+
+    campaign = models.OneToOneField(Campaign, on_delete=models.CASCADE, primary_key=True, related_name='counters')
+    sent = models.IntegerField(default=0)
+    delivered = models.IntegerField(default=0)
+    opened = models.IntegerField(default=0)
+    clicked = models.IntegerField(default=0)
+    bounced = models.IntegerField(default=0)
+    unsubscribed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Счётчики кампании'
+        verbose_name_plural = 'Счётчики кампаний'
+
+    def __str__(self):
+        return f"Counters for {self.campaign_id}"
+
+    @staticmethod
+    def aggregate_for(campaign_id) -> dict:
+        """Точные значения счётчиков одним запросом по EmailTracking."""
+        from apps.mailer.models import Contact
+        return EmailTracking.objects.filter(campaign_id=campaign_id).order_by().aggregate(
+            sent=Count('id'),
+            delivered=Count('id', filter=Q(delivered_at__isnull=False)),
+            opened=Count('id', filter=Q(opened_at__isnull=False)),
+            clicked=Count('id', filter=Q(clicked_at__isnull=False)),
+            bounced=Count('id', filter=Q(bounced_at__isnull=False)),
+            unsubscribed=Count('id', filter=Q(contact__status=Contact.BLACKLIST)),
+        )
+
+    @classmethod
+    def rebuild(cls, campaign_id):
+        """Пересчитывает счётчики кампании по EmailTracking и сохраняет их."""
+        values = cls.aggregate_for(campaign_id)
+        try:
+            with transaction.atomic():
+                counters, _ = cls.objects.update_or_create(campaign_id=campaign_id, defaults=values)
+        except IntegrityError:
+            # Строку параллельно создал другой воркер — просто перезаписываем значения
+            cls.objects.filter(campaign_id=campaign_id).update(updated_at=timezone.now(), **values)
+            counters = cls.objects.get(campaign_id=campaign_id)
+        return counters
+
+    @classmethod
+    def increment(cls, campaign_id, **deltas):
+        """
+        Атомарно увеличивает счётчики кампании через F()-выражения.
+        Если строки ещё нет (старая кампания) — пересчитывает её целиком.
+        """
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        updated = cls.objects.filter(campaign_id=campaign_id).update(
+            updated_at=timezone.now(),
+            **{field: F(field) + value for field, value in deltas.items()}
+        )
+        if not updated:
+            cls.rebuild(campaign_id)
+
+
+class DailyEngagementStats(models.Model):
+    """
+    Дневная сводка по пользователю: письма (по дате отправки) и новые подписчики.
+    Поддерживается задачей rollup_daily_engagement, используется в CampaignViewSet.stats.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='daily_engagement_stats')
+    day = models.DateField()
+    sent = models.IntegerField(default=0)
+    opened = models.IntegerField(default=0)
+    clicked = models.IntegerField(default=0)
+    bounced = models.IntegerField(default=0)
+    new_subscribers = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('user', 'day')
+        ordering = ['-day']
+        verbose_name = 'Дневная статистика'
+        verbose_name_plural = 'Дневная статистика'
+
+    def __str__(self):
+        return f"Daily stats for {self.user_id} on {self.day}"
+
+    @classmethod
+    def live_for_day(cls, user, day) -> dict:
+        """Точные значения за один день (используется для текущего дня)."""
+        from datetime import datetime, time, timedelta
+        from apps.mailer.models import Contact
+
+        start = timezone.make_aware(datetime.combine(day, time.min))
+        end = start + timedelta(days=1)
+        values = EmailTracking.objects.filter(
+            campaign__user=user, sent_at__gte=start, sent_at__lt=end
+        ).order_by().aggregate(
+            sent=Count('id'),
+            opened=Count('id', filter=Q(opened_at__isnull=False)),
+            clicked=Count('id', filter=Q(clicked_at__isnull=False)),
+            bounced=Count('id', filter=Q(bounced_at__isnull=False)),
+        )
+        values['new_subscribers'] = Contact.objects.filter(
+            contact_list__owner=user, added_date__gte=start, added_date__lt=end
+        ).count()
+        return values
+
+    @classmethod
+    def rebuild_range(cls, start_day, end_day) -> int:
+        """
+        Пересчитывает сводки всех пользователей за дни [start_day, end_day]
+        двумя группирующими запросами и записывает только изменившиеся строки:
+        новые и изменённые — одним upsert по (user, day), опустевшие — удаляются.
+        Параллельные запуски (частый и суточный) не конфликтуют по unique (user, day).
+        Возвращает число записанных и удалённых строк.
+        """
+        from datetime import datetime, time, timedelta
+        from django.db.models.functions import TruncDate
+        from apps.mailer.models import Contact
+
+        start = timezone.make_aware(datetime.combine(start_day, time.min))
+        end = timezone.make_aware(datetime.combine(end_day + timedelta(days=1), time.min))
+
+        rows = {}
+        tracking = (
+            EmailTracking.objects.filter(sent_at__gte=start, sent_at__lt=end, campaign__user__isnull=False)
+            .order_by()
+            .annotate(day=TruncDate('sent_at'))
+            .values('campaign__user_id', 'day')
+            .annotate(
+                sent=Count('id'),
+                opened=Count('id', filter=Q(opened_at__isnull=False)),
+                clicked=Count('id', filter=Q(clicked_at__isnull=False)),
+                bounced=Count('id', filter=Q(bounced_at__isnull=False)),
+            )
+        )
+        for row in tracking:
+            rows[(row['campaign__user_id'], row['day'])] = cls(
+                user_id=row['campaign__user_id'], day=row['day'],
+                sent=row['sent'], opened=row['opened'], clicked=row['clicked'], bounced=row['bounced'],
+            )
+
+        subscribers = (
+            Contact.objects.filter(added_date__gte=start, added_date__lt=end)
+            .order_by()
+            .annotate(day=TruncDate('added_date'))
+            .values('contact_list__owner_id', 'day')
+            .annotate(new_subscribers=Count('id'))
+        )
+        for row in subscribers:
+            key = (row['contact_list__owner_id'], row['day'])
+            if key not in rows:
+                rows[key] = cls(user_id=key[0], day=key[1])
+            rows[key].new_subscribers = row['new_subscribers']
+
+        fields = ('sent', 'opened', 'clicked', 'bounced', 'new_subscribers')
+        existing = {
+            (row['user_id'], row['day']): row
+            for row in cls.objects.filter(day__gte=start_day, day__lte=end_day).values('id', 'user_id', 'day', *fields)
+        }
+        changed = [
+            row for key, row in rows.items()
+            if key not in existing or any(existing[key][field] != getattr(row, field) for field in fields)
+        ]
+        stale_ids = [row['id'] for key, row in existing.items() if key not in rows]
+
+        with transaction.atomic():
+            if changed:
+                cls.objects.bulk_create(
+                    changed, batch_size=1000,
+                    update_conflicts=True, unique_fields=['user', 'day'], update_fields=[*fields, 'updated_at'],
+                )
+            if stale_ids:
+                cls.objects.filter(id__in=stale_ids).delete()
+        return len(changed) + len(stale_ids)
+
+
+class ExportTask(models.Model):
+    """
+    Фоновая задача генерации отчёта (по аналогии с mailer.ImportTask).
+    Готовый файл сохраняется в хранилище, UI опрашивает статус и получает ссылку на скачивание.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (PROCESSING, 'Обрабатывается'),
+        (COMPLETED, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    KIND_CAMPAIGN_REPORT = 'campaign_report'
+    KIND_CAMPAIGNS_SUMMARY = 'campaigns_summary'
+    KIND_CHOICES = (
+        (KIND_CAMPAIGN_REPORT, 'Отчёт по кампании'),
+        (KIND_CAMPAIGNS_SUMMARY, 'Сводка по кампаниям'),
+    )
+
+    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='campaign_export_tasks')
+    kind = models.CharField(max_length=32, choices=KIND_CHOICES, default=KIND_CAMPAIGN_REPORT)
+    campaign = models.ForeignKey(Campaign, on_delete=models.CASCADE, related_name='export_tasks', null=True, blank=True)
+    params = models.JSONField(default=dict, blank=True)  # campaign_ids / statuses для сводки
+    format = models.CharField(max_length=10, default='xlsx')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports/%Y/%m/', blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    error_message = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Export {self.id} - {self.filename or self.kind}"
+
+    @property
+    def progress_percentage(self):
+        if self.status == self.COMPLETED:
+            return 100
+        if self.total_rows == 0:
+            return 0
+        return min(100, int((self.processed_rows / self.total_rows) * 100))
+
+    @property
+    def duration(self):
+        if not self.started_at:
+            return None
+        end_time = self.completed_at or timezone.now()
+        return (end_time - self.started_at).total_seconds()
 
 
 class CampaignStats(models.Model):
@@ -181,40 +440,64 @@ class CampaignStats(models.Model):
     def __str__(self):
         return f"Stats for {self.campaign.name} - {self.contact_list.name}"
 
+    LIST_METRICS = ('emails_sent', 'opens_count', 'clicks_count', 'bounces_count')
+    LIST_STATS_CACHE_TIMEOUT = 3600
+
+    @classmethod
+    def aggregate_by_list(cls, campaign_id) -> dict:
+        """
+        Метрики кампании по всем спискам контактов одним запросом:
+        {contact_list_id: {'emails_sent': ..., 'opens_count': ..., 'clicks_count': ..., 'bounces_count': ...}}.
+        Результат кэшируется до следующего изменения счётчиков кампании (CampaignCounters.updated_at).
+        """
+        from django.core.cache import cache
+
+        version = CampaignCounters.objects.filter(campaign_id=campaign_id).values_list('updated_at', flat=True).first()
+        cache_key = f"campaign_list_stats_{campaign_id}_{version.timestamp() if version else 0}"
+        result = cache.get(cache_key)
+        if result is not None:
+            return result
+
+        rows = (
+            EmailTracking.objects.filter(campaign_id=campaign_id)
+            .order_by()
+            .values('contact__contact_list_id')
+            .annotate(
+                emails_sent=Count('id'),
+                opens_count=Count('id', filter=Q(opened_at__isnull=False)),
+                clicks_count=Count('id', filter=Q(clicked_at__isnull=False)),
+                bounces_count=Count('id', filter=Q(bounced_at__isnull=False)),
+            )
+        )
+        result = {
+            row['contact__contact_list_id']: {metric: row[metric] for metric in cls.LIST_METRICS}
+            for row in rows
+        }
+        cache.set(cache_key, result, cls.LIST_STATS_CACHE_TIMEOUT)
+        return result
+
+    def _metric(self, name):
+        return self.aggregate_by_list(self.campaign_id).get(self.contact_list_id, {}).get(name, 0)
+
     @property
     def emails_sent(self):
         """Количество отправленных писем"""
-        return EmailTracking.objects.filter(
-            campaign=self.campaign,
-            contact__in=self.contact_list.contacts.all()
-        ).count()
+        return self._metric('emails_sent')
 
     @property
     def opens_count(self):
         """Количество открытий"""
-        return EmailTracking.objects.filter(
-            campaign=self.campaign,
-            contact__in=self.contact_list.contacts.all(),
-            opened_at__isnull=False
-        ).count()
+        return self._metric('opens_count')
 
     @property
     def clicks_count(self):
         """Количество кликов"""
-        return EmailTracking.objects.filter(
-            campaign=self.campaign,
-            contact__in=self.contact_list.contacts.all(),
-            clicked_at__isnull=False
-        ).count()
+        return self._metric('clicks_count')
 
     @property
     def bounces_count(self):
         """Количество отказов"""
-        return EmailTracking.objects.filter(
-            campaign=self.campaign,
-            contact__in=self.contact_list.contacts.all(),
-            bounced_at__isnull=False
-        ).count()
+        return self._metric('bounces_count')
 
 
 class CampaignRecipient(models.Model):
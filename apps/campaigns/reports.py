@@ -0,0 +1,269 @@
+# apps/campaigns/reports.py
+
+"""
+Построение отчётов по кампаниям для экспорта.
+
+Строки получателей читаются из базы порциями (server-side cursor на PostgreSQL),
+выбираются только нужные колонки, признак отписки вычисляется join'ом
+со статусом контакта — без загрузки всех получателей в память.
+"""
+
+import csv
+
+from django.db.models import Count, Q
+from django.http import StreamingHttpResponse
+
+from .models import CampaignCounters, EmailTracking
+
+
+REPORT_CHUNK_SIZE = 2000
+
+RECIPIENT_HEADERS = ['Email', 'Отправитель', 'Отправлено', 'Доставлено', 'Открыто', 'Клик', 'Отписан']
+RECIPIENT_WIDTHS = [40, 36, 14, 14, 12, 12, 12]
+
+SUMMARY_HEADERS = ['ID', 'Кампания', 'Тема', 'Отправитель', 'Отправлено', 'Открыли', 'Кликнули', 'Отписались', 'Дата отправки']
+SUMMARY_WIDTHS = [38, 30, 40, 40, 14, 12, 12, 14, 28]
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает записанную строку вместо буферизации."""
+
+    def write(self, value):
+        return value
+
+
+def unsubscribed_status():
+    from apps.mailer.models import Contact as MailerContact
+    return getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
+
+
+def sender_mailbox_for(campaign) -> str:
+    return campaign.sender_email.email if campaign.sender_email else ''
+
+
+def report_summary(campaign) -> dict:
+    """Общая статистика кампании одним агрегирующим запросом."""
+    return CampaignCounters.aggregate_for(campaign.id)
+
+
+def iter_recipient_rows(campaign, chunk_size: int = REPORT_CHUNK_SIZE):
+    """
+    Строки таблицы получателей: [email, отправитель, отправлено, доставлено, открыто, клик, отписан].
+    Без сортировки по умолчанию и без загрузки моделей целиком.
+    """
+    sender_mailbox = sender_mailbox_for(campaign)
+    unsubscribed = unsubscribed_status()
+    rows = (
+        EmailTracking.objects.filter(campaign=campaign)
+        .order_by()
+        .values_list('contact__email', 'sent_at', 'delivered_at', 'opened_at', 'clicked_at', 'contact__status')
+        .iterator(chunk_size=chunk_size)
+    )
+    for email, sent_at, delivered_at, opened_at, clicked_at, contact_status in rows:
+        yield [
+            email,
+            sender_mailbox,
+            1 if sent_at else 0,
+            1 if delivered_at else 0,
+            1 if opened_at else 0,
+            1 if clicked_at else 0,
+            1 if contact_status == unsubscribed else 0,
+        ]
+
+
+def iter_campaign_report_csv(campaign):
+    """Генератор строк CSV-отчёта: шапка кампании, общая статистика, получатели."""
+    writer = csv.writer(Echo())
+    summary = report_summary(campaign)
+    sender_mailbox = sender_mailbox_for(campaign)
+
+    yield writer.writerow(['Кампания', campaign.name or str(campaign.id)])
+    yield writer.writerow(['Тема', campaign.subject or ''])
+    yield writer.writerow(['Отправитель', f"{campaign.sender_name} <{sender_mailbox}>"])
+    yield writer.writerow([])
+    yield writer.writerow(['Всего отправлено', summary['sent']])
+    yield writer.writerow(['Доставлено', summary['delivered']])
+    yield writer.writerow(['Открыли (кол-во)', summary['opened']])
+    yield writer.writerow(['Кликнули (кол-во)', summary['clicked']])
+    yield writer.writerow(['Отписались (кол-во)', summary['unsubscribed']])
+    yield writer.writerow([])
+    yield writer.writerow(RECIPIENT_HEADERS)
+
+    for row in iter_recipient_rows(campaign):
+        yield writer.writerow(row)
+
+
+def stream_campaign_report_csv(campaign):
+    """StreamingHttpResponse с CSV-отчётом: память не зависит от числа получателей."""
+    response = StreamingHttpResponse(iter_campaign_report_csv(campaign), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.csv"'
+    return response
+
+
+def annotate_campaign_summary(campaigns):
+    """
+    Сводные метрики по кампаниям одним запросом: условные COUNT по EmailTracking,
+    сгруппированные по кампании, отправитель подтягивается через select_related.
+    """
+    return campaigns.select_related('sender_email').annotate(
+        report_total_sent=Count('email_tracking'),
+        report_opens=Count('email_tracking', filter=Q(email_tracking__opened_at__isnull=False)),
+        report_clicks=Count('email_tracking', filter=Q(email_tracking__clicked_at__isnull=False)),
+        report_unsubscribed=Count('email_tracking', filter=Q(email_tracking__contact__status=unsubscribed_status())),
+    )
+
+
+def iter_campaign_summary_items(campaigns, chunk_size: int = REPORT_CHUNK_SIZE):
+    """Сводные строки по кампаниям для экспорта (campaign_reports.*), порциями из одного запроса."""
+    for c in annotate_campaign_summary(campaigns).iterator(chunk_size=chunk_size):
+        yield {
+            'id': str(c.id),
+            'name': c.name,
+            'subject': c.subject,
+            'sender': f"{c.sender_name} <{c.sender_email.email if c.sender_email else ''}>",
+            'created_at': c.created_at.isoformat(),
+            'sent_at': c.sent_at.isoformat() if c.sent_at else None,
+            'total_sent': c.report_total_sent,
+            'opens': c.report_opens,
+            'clicks': c.report_clicks,
+            'unsubscribed': c.report_unsubscribed,
+        }
+
+
+def summary_item_text(it):
+    return (
+        f"Кампания: {it['name'] or it['id']}\nТема: {it['subject'] or ''}\nОтправитель: {it['sender']}\n"
+        f"Отправлено: {it['total_sent']}\nОткрыли: {it['opens']}\nКликнули: {it['clicks']}\n"
+        f"Отписались: {it['unsubscribed']}\nДата отправки: {it['sent_at'] or ''}\n---"
+    )
+
+
+def iter_campaigns_summary_csv(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(SUMMARY_HEADERS)
+    for it in items:
+        yield writer.writerow(summary_item_row(it))
+
+
+def iter_campaigns_summary_txt(items):
+    for index, it in enumerate(items):
+        yield ("\n\n" if index else "") + summary_item_text(it)
+
+
+def iter_campaigns_summary_json(items):
+    """JSON-массив по одному элементу за раз (тот же вид, что json.dumps(items, indent=2))."""
+    import json
+    import textwrap
+
+    yield "["
+    has_items = False
+    for it in items:
+        yield ("," if has_items else "") + "\n" + textwrap.indent(json.dumps(it, ensure_ascii=False, indent=2), '  ')
+        has_items = True
+    yield "\n]" if has_items else "]"
+
+
+def summary_item_row(it):
+    return [
+        it['id'], it['name'], it['subject'], it['sender'],
+        it['total_sent'], it['opens'], it['clicks'], it['unsubscribed'], it['sent_at'] or ''
+    ]
+
+
+def _new_sheet(title, widths):
+    """
+    Книга openpyxl в режиме write_only: строки пишутся потоком, без хранения ячеек в памяти.
+    Ширины колонок задаются заранее — без повторного прохода по данным.
+    """
+    from openpyxl import Workbook
+    from openpyxl.utils import get_column_letter
+
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+    for col_idx, width in enumerate(widths, start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+    return wb, ws
+
+
+def _styled_row(ws, values, font=None, fill=None):
+    from openpyxl.cell import WriteOnlyCell
+
+    row = []
+    for value in values:
+        cell = WriteOnlyCell(ws, value=value)
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        row.append(cell)
+    return row
+
+
+def _header_style():
+    from openpyxl.styles import Font, PatternFill
+    return Font(bold=True, color='1E40AF'), PatternFill(start_color='EEF2FF', end_color='EEF2FF', fill_type='solid')
+
+
+def write_campaign_report_xlsx(campaign, fileobj, progress=None, progress_every: int = REPORT_CHUNK_SIZE):
+    """
+    Пишет XLSX-отчёт по кампании в fileobj: шапка, общая статистика, получатели.
+    progress(processed_rows) вызывается каждые progress_every строк.
+    Возвращает количество строк получателей.
+    """
+    from openpyxl.styles import Font
+
+    summary = report_summary(campaign)
+    sender_mailbox = sender_mailbox_for(campaign)
+    bold = Font(bold=True)
+    header_font, header_fill = _header_style()
+
+    wb, ws = _new_sheet('Campaign report', RECIPIENT_WIDTHS)
+    preamble = [
+        ['Кампания', campaign.name or str(campaign.id)],
+        ['Тема', campaign.subject or ''],
+        ['Отправитель', f"{campaign.sender_name or ''} <{sender_mailbox}>"],
+        [],
+        ['Общая статистика'],
+        ['Всего отправлено', summary['sent']],
+        ['Доставлено', summary['delivered']],
+        ['Открыто (кол-во)', summary['opened']],
+        ['Клики (кол-во)', summary['clicked']],
+        ['Отписались (кол-во)', summary['unsubscribed']],
+        [],
+    ]
+    # Закрепляем строку с шапкой таблицы получателей
+    ws.freeze_panes = f"A{len(preamble) + 2}"
+    for values in preamble:
+        ws.append(_styled_row(ws, values[:1], font=bold) + values[1:] if values else [])
+    ws.append(_styled_row(ws, RECIPIENT_HEADERS, font=header_font, fill=header_fill))
+
+    processed = 0
+    for row_data in iter_recipient_rows(campaign):
+        ws.append(row_data)
+        processed += 1
+        if progress and processed % progress_every == 0:
+            progress(processed)
+
+    wb.save(fileobj)
+    return processed
+
+
+def write_campaigns_summary_xlsx(items, fileobj, progress=None, progress_every: int = REPORT_CHUNK_SIZE):
+    """
+    Пишет XLSX-сводку по кампаниям (одна строка на кампанию) в fileobj.
+    progress(processed_rows) вызывается каждые progress_every строк. Возвращает число строк.
+    """
+    header_font, header_fill = _header_style()
+    wb, ws = _new_sheet('Reports', SUMMARY_WIDTHS)
+    ws.freeze_panes = 'A2'
+    ws.append(_styled_row(ws, SUMMARY_HEADERS, font=header_font, fill=header_fill))
+    count = 0
+    for it in items:
+        ws.append(summary_item_row(it))
+        count += 1
+        if progress and count % progress_every == 0:
+            progress(count)
+    wb.save(fileobj)
+    return count
@@ -4,7 +4,7 @@ from rest_framework import serializers
 from apps.mailer.models import Contact, ContactList
 from apps.emails.models import SenderEmail
 from apps.mail_templates.models import EmailTemplate
-from apps.campaigns.models import Campaign, CampaignStats, EmailTracking, CampaignRecipient
+from apps.campaigns.models import Campaign, CampaignStats, CampaignRecipient
 from apps.campaigns.models import Campaign as CampaignModel
 
 class ContactSerializer(serializers.ModelSerializer):
@@ -68,7 +68,7 @@ class CampaignSerializer(serializers.ModelSerializer):
     template = serializers.PrimaryKeyRelatedField(queryset=EmailTemplate.objects.all(), required=False, allow_null=True)
     sender_email = serializers.PrimaryKeyRelatedField(queryset=SenderEmail.objects.all(), required=False, allow_null=True)
     sender_email_detail = SenderEmailSerializer(source='sender_email', read_only=True)
-    contact_lists = serializers.PrimaryKeyRelatedField(queryset=ContactList.objects.all(), many=True, required=False)
+    contact_lists = serializers.PrimaryKeyRelatedField(queryset=ContactList.objects.filter(is_deleting=False), many=True, required=False)
     contact_lists_detail = serializers.SerializerMethodField()
     template_detail = EmailTemplateSerializer(source='template', read_only=True)
     recipients = ContactSerializer(many=True, read_only=True)
@@ -95,62 +95,25 @@ class CampaignSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'updated_at', 'sent_at']
 
     def get_contact_lists_detail(self, obj):
-        obj.refresh_from_db()
         return [
             {
                 'id': str(cl.id),
                 'name': cl.name,
-                'contacts_count': cl.contacts.count(),
-                'valid_contacts_count': cl.contacts.filter(status=Contact.VALID).count()
+                'contacts_count': cl.total_contacts,
+                'valid_contacts_count': cl.valid_count
             }
             for cl in obj.contact_lists.all()
         ]
 
-    def get_emails_sent(self, obj):
-        return EmailTracking.objects.filter(campaign=obj).count()
-
-    def get_delivered_emails(self, obj):
-        return EmailTracking.objects.filter(campaign=obj, delivered_at__isnull=False).count()
-
-    def get_open_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        total_opens = EmailTracking.objects.filter(campaign=obj, opened_at__isnull=False).count()
-        return (total_opens / total_sent * 100)
-
-    def get_click_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        total_clicks = EmailTracking.objects.filter(campaign=obj, clicked_at__isnull=False).count()
-        return (total_clicks / total_sent * 100)
-
-    def get_bounce_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        total_bounces = EmailTracking.objects.filter(campaign=obj, bounced_at__isnull=False).count()
-        return (total_bounces / total_sent * 100)
-
-    def get_delivery_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        delivered = self.get_delivered_emails(obj)
-        return (delivered / total_sent * 100)
-
     def get_opens_count(self, obj):
-        return EmailTracking.objects.filter(campaign=obj, opened_at__isnull=False).count()
+        return obj.get_counters().opened
 
     def get_clicks_count(self, obj):
-        return EmailTracking.objects.filter(campaign=obj, clicked_at__isnull=False).count()
+        return obj.get_counters().clicked
 
     def get_unsubscribed_count(self, obj):
         # Количество контактов, ушедших в blacklist среди получивших эту кампанию
-        from apps.mailer.models import Contact as MailerContact
-        contact_ids = EmailTracking.objects.filter(campaign=obj).values_list('contact_id', flat=True)
-        return MailerContact.objects.filter(id__in=contact_ids, status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))).count()
+        return obj.get_counters().unsubscribed
 
 class CampaignListSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source='user.email')
@@ -174,58 +137,22 @@ class CampaignListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'user', 'created_at', 'sent_at']
 
     def get_contact_lists_detail(self, obj):
-        obj.refresh_from_db()
         return [
             {
                 'id': str(cl.id),
                 'name': cl.name,
-                'contacts_count': cl.contacts.count(),
-                'valid_contacts_count': cl.contacts.filter(status=Contact.VALID).count()
+                'contacts_count': cl.total_contacts,
+                'valid_contacts_count': cl.valid_count
             }
             for cl in obj.contact_lists.all()
         ]
 
-    def get_emails_sent(self, obj):
-        return EmailTracking.objects.filter(campaign=obj).count()
-
-    def get_delivered_emails(self, obj):
-        return EmailTracking.objects.filter(campaign=obj, delivered_at__isnull=False).count()
-
-    def get_open_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        total_opens = EmailTracking.objects.filter(campaign=obj, opened_at__isnull=False).count()
-        return (total_opens / total_sent * 100)
-
-    def get_click_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        total_clicks = EmailTracking.objects.filter(campaign=obj, clicked_at__isnull=False).count()
-        return (total_clicks / total_sent * 100)
-
-    def get_bounce_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        total_bounces = EmailTracking.objects.filter(campaign=obj, bounced_at__isnull=False).count()
-        return (total_bounces / total_sent * 100)
-
-    def get_delivery_rate(self, obj):
-        total_sent = self.get_emails_sent(obj)
-        if total_sent == 0:
-            return 0
-        delivered = self.get_delivered_emails(obj)
-        return (delivered / total_sent * 100)
-
     def get_opens_count(self, obj):
-        return EmailTracking.objects.filter(campaign=obj, opened_at__isnull=False).count()
+        return obj.get_counters().opened
 
     def get_clicks_count(self, obj):
-        return EmailTracking.objects.filter(campaign=obj, clicked_at__isnull=False).count()
+        return obj.get_counters().clicked
 
     def get_unsubscribed_count(self, obj):
-        from apps.mailer.models import Contact as MailerContact
-        contact_ids = EmailTracking.objects.filter(campaign=obj).values_list('contact_id', flat=True)
-        return MailerContact.objects.filter(id__in=contact_ids, status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))).count()
+        # Количество контактов, ушедших в blacklist среди получивших эту кампанию
+        return obj.get_counters().unsubscribed
@@ -17,7 +17,7 @@ from django.utils import timezone
 from django.db import transaction
 from django.core.cache import cache
 
-from .models import Campaign, EmailTracking, CampaignRecipient
+from .models import Campaign, EmailTracking, CampaignRecipient, CampaignCounters
 from apps.mailer.models import Contact
 from apps.mail_templates.models import EmailTemplate
 from apps.emails.models import SenderEmail
@@ -106,15 +106,41 @@ def finalize_campaign_if_complete(campaign_id: str) -> None:
         print(f"finalize_campaign_if_complete({campaign_id}) failed: {exc}")
 
 
+def reset_undelivered_recipients(campaign_id: str) -> int:
+    """
+    Подготовка возобновления отправки (retry mode=resume): получатели без доставленного
+    письма снова считаются неотправленными, отметки отказа у их EmailTracking снимаются.
+    Доставленные письма, жёсткие отказы (контакт уже не VALID) и сами строки EmailTracking
+    (учёт отправленных по тарифу) сохраняются. Возвращает число возвращённых в очередь
+    получателей.
+    """
+    from django.db.models import Exists, OuterRef
+
+    delivered = EmailTracking.objects.filter(
+        campaign_id=campaign_id,
+        contact_id=OuterRef('contact_id'),
+        delivered_at__isnull=False,
+    )
+    with transaction.atomic():
+        reopened = CampaignRecipient.objects.filter(
+            campaign_id=campaign_id, is_sent=True, contact__status=Contact.VALID,
+        ).exclude(Exists(delivered)).update(is_sent=False, sent_at=None)
+        EmailTracking.objects.filter(
+            campaign_id=campaign_id, delivered_at__isnull=True, bounced_at__isnull=False,
+            contact__status=Contact.VALID,
+        ).update(bounced_at=None, bounce_reason='')
+        CampaignCounters.rebuild(campaign_id)
+    return reopened
+
+
 def mark_contact_as_invalid(contact, reason: str = ''):
     """
     Переводит контакт в статус INVALID, чтобы больше не пытаться отправлять на него письма.
     """
     try:
+        from apps.mailer.counters import set_contact_status
         from apps.mailer.models import Contact as MailerContact
-        if contact.status != MailerContact.INVALID:
-            contact.status = MailerContact.INVALID
-            contact.save(update_fields=['status'])
+        if set_contact_status(contact, MailerContact.INVALID):
             if getattr(settings, 'EMAIL_DEBUG', False):
                 print(f"Contact {contact.email} marked as INVALID. Reason: {reason}")
     except Exception as exc:
@@ -561,8 +587,12 @@ def send_campaign(self, campaign_id: str, skip_moderation: bool = False) -> Dict
             # Дедупликация контактов по ID (устойчиво к разным queryset/инстансам)
             contact_ids_set = set()
             from apps.mailer.models import Contact as MailerContact
-            for contact_list in campaign.contact_lists.all():
-                list_contacts = contact_list.contacts.filter(status=MailerContact.VALID).values_list('id', flat=True)
+            from apps.mailer.suppression import suppression_filter
+            for contact_list in campaign.contact_lists.filter(is_deleting=False):
+                # Подавленные адреса пользователя (отписки из любых списков) исключаются в SQL
+                list_contacts = contact_list.contacts.filter(
+                    suppression_filter(campaign.user_id), status=MailerContact.VALID
+                ).values_list('id', flat=True)
                 count = list_contacts.count()
                 print(f"Found {count} contacts in list {contact_list.name}")
                 contact_ids_set.update(list(list_contacts))
@@ -588,10 +618,20 @@ def send_campaign(self, campaign_id: str, skip_moderation: bool = False) -> Dict
             campaign.save(update_fields=['status', 'failure_reason', 'celery_task_id'])
             raise self.retry(countdown=60, max_retries=2)
         
-        existing_sent = CampaignRecipient.objects.filter(
-            campaign_id=campaign_id,
-            is_sent=True
-        ).count()
+        # Уже обработанные получатели (в т.ч. при возобновлении) повторно не планируются;
+        # тариф проверяется только на «хвост» без записи EmailTracking — строки, уже
+        # учтённые в отправленных, при повторной попытке используются те же
+        done_ids = set(
+            CampaignRecipient.objects.filter(campaign_id=campaign_id, is_sent=True)
+            .values_list('contact_id', flat=True)
+        )
+        tracked_ids = set(
+            EmailTracking.objects.filter(campaign_id=campaign_id).values_list('contact_id', flat=True)
+        )
+        contacts_list = [c_id for c_id in contacts_list if c_id not in done_ids]
+        billable_contacts = sum(1 for c_id in contacts_list if c_id not in tracked_ids)
+        existing_sent = total_contacts - len(contacts_list)
+        print(f"Pending contacts: {len(contacts_list)} (already processed: {existing_sent}, billable: {billable_contacts})")
         update_campaign_progress_cache(
             campaign_id,
             total=total_contacts,
@@ -605,7 +645,7 @@ def send_campaign(self, campaign_id: str, skip_moderation: bool = False) -> Dict
             
             if plan_info['has_plan'] and plan_info['plan_type'] == 'Letters':
                 # Для тарифов с письмами проверяем остаток
-                if not can_user_send_emails(user, total_contacts):
+                if not can_user_send_emails(user, billable_contacts):
                     if campaign.status != Campaign.STATUS_SENT:
                         campaign.status = Campaign.STATUS_FAILED
                     campaign.failure_reason = campaign.failure_reason or 'recipients exceed plan limits'
@@ -663,15 +703,19 @@ def send_campaign(self, campaign_id: str, skip_moderation: bool = False) -> Dict
 
         # Разбиваем на батчи для больших объемов
         # Для больших кампаний разбиваем на батчи по 1000 контактов для лучшей обработки
-        if total_contacts > 1000:
+        if len(contacts_list) > 1000:
             batch_size = 1000
             batches = [contacts_list[i:i + batch_size] for i in range(0, len(contacts_list), batch_size)]
-            print(f"Кампания {campaign.name}: {total_contacts} писем разбито на {len(batches)} батчей по {batch_size} контактов")
-        else:
+            print(f"Кампания {campaign.name}: {len(contacts_list)} писем разбито на {len(batches)} батчей по {batch_size} контактов")
+        elif contacts_list:
             # Для небольших кампаний отправляем все сразу
             batch_size = len(contacts_list)
             batches = [contacts_list]
-            print(f"Кампания {campaign.name}: {total_contacts} писем, {len(batches)} батчей")
+            print(f"Кампания {campaign.name}: {len(contacts_list)} писем, {len(batches)} батчей")
+        else:
+            # Все получатели уже обработаны (возобновление завершённой отправки)
+            batches = []
+            finalize_campaign_if_complete(campaign_id)
         
         # Отправляем письма напрямую через send_email_batch
         batch_tasks = []
@@ -780,14 +824,16 @@ def send_email_batch(self, campaign_id: str, contact_ids: List[int],
         print(f"Starting send_email_batch for campaign {campaign_id}, batch {batch_number}/{total_batches}")
 
         try:
-            Campaign.objects.get(id=campaign_id)
+            campaign = Campaign.objects.only('id', 'user_id').get(id=campaign_id)
         except Campaign.DoesNotExist:
             print(f"Campaign {campaign_id} not found - batch skipped")
             return {'success': False, 'skipped': True, 'reason': 'campaign_deleted', 'campaign_id': str(campaign_id)}
 
-        # Отправляем только валидным контактам
+        # Отправляем только валидным и не подавленным контактам
         from apps.mailer.models import Contact as MailerContact
+        from apps.mailer.suppression import suppression_filter
         contacts_qs = Contact.objects.filter(
+            suppression_filter(campaign.user_id),
             id__in=contact_ids,
             status=MailerContact.VALID
         ).only('id').order_by('id')
@@ -927,9 +973,13 @@ def send_single_email(self, campaign_id: str, contact_id: int) -> Dict[str, Any]
                         }
                     )
                     if not tracking_created:
+                        newly_bounced = tracking.bounced_at is None
                         tracking.bounced_at = timezone.now()
                         tracking.bounce_reason = reason
                         tracking.save(update_fields=['bounced_at', 'bounce_reason'])
+                        CampaignCounters.increment(campaign.id, bounced=1 if newly_bounced else 0)
+                    else:
+                        CampaignCounters.increment(campaign.id, sent=1, bounced=1)
                 
                 # Обновляем прогресс кампании: увеличиваем счётчик "sent",
                 # чтобы такие контакты учитывались как обработанные.
@@ -1182,6 +1232,19 @@ def send_single_email(self, campaign_id: str, contact_id: int) -> Dict[str, Any]
         domain_name = from_email.split('@')[1] if '@' in from_email else 'vashsender.ru'
         msg = sign_email_with_dkim(msg, domain_name)
         
+        # Адрес могли подавить (отписка из другого списка), пока письмо ждало в очереди
+        from apps.mailer.suppression import is_suppressed
+        if is_suppressed(campaign.user_id, contact.email):
+            smtp_pool.return_connection(smtp_connection)
+            decrement_campaign_total_if_needed(campaign_id)
+            finalize_campaign_if_complete(campaign_id)
+            return {
+                'success': False,
+                'skipped': True,
+                'reason': 'suppressed',
+                'email': contact.email
+            }
+
         # Отправляем письмо (SMTP DATA)
         data_start = time.time()
         print(f"[SMTP] sendmail (DATA) start to {contact.email}")
@@ -1223,8 +1286,12 @@ def send_single_email(self, campaign_id: str, contact_id: int) -> Dict[str, Any]
             
             if not tracking_created:
                 # Если запись уже существует, обновляем время доставки
+                newly_delivered = tracking.delivered_at is None
                 tracking.delivered_at = timezone.now()
                 tracking.save(update_fields=['delivered_at'])
+                CampaignCounters.increment(campaign.id, delivered=1 if newly_delivered else 0)
+            else:
+                CampaignCounters.increment(campaign.id, sent=1, delivered=1)
         db_duration = time.time() - db_start
         print(f"[DB] update end for campaign_id={campaign_id}, contact_id={contact_id} duration={db_duration:.3f}s")
         
@@ -1746,4 +1813,179 @@ def cleanup_smtp_connections(self):
         return {
             'error': str(e),
             'timestamp': timezone.now().isoformat()
-        } 
+        }
+
+
+@shared_task(bind=True, time_limit=600, soft_time_limit=540)
+def reconcile_campaign_counters(self, days: int = 30):
+    """
+    Сверка денормализованных счётчиков кампаний с EmailTracking.
+    Пересчитывает счётчики активных кампаний и кампаний, отправленных за последние `days` дней
+    (открытия и клики продолжают приходить после завершения рассылки).
+    Запускается каждый час через Celery Beat.
+    """
+    from datetime import timedelta
+    from django.db.models import Q
+
+    print(f"[{timezone.now()}] Starting campaign counters reconciliation...")
+
+    since = timezone.now() - timedelta(days=days)
+    campaign_ids = Campaign.objects.filter(
+        Q(status=Campaign.STATUS_SENDING) | Q(sent_at__gte=since) | Q(updated_at__gte=since)
+    ).values_list('id', flat=True)
+
+    reconciled_count = 0
+    drifted_count = 0
+    for campaign_id in campaign_ids.iterator():
+        try:
+            before = CampaignCounters.objects.filter(campaign_id=campaign_id).values(*CampaignCounters.FIELDS).first()
+            after = CampaignCounters.rebuild(campaign_id)
+            if before != {field: getattr(after, field) for field in CampaignCounters.FIELDS}:
+                drifted_count += 1
+            reconciled_count += 1
+        except Exception as e:
+            print(f"Error reconciling counters for campaign {campaign_id}: {e}")
+            continue
+
+    print(f"[{timezone.now()}] Counters reconciliation completed: {reconciled_count} campaigns, {drifted_count} corrected")
+    return {
+        'reconciled_campaigns': reconciled_count,
+        'corrected_campaigns': drifted_count,
+        'timestamp': timezone.now().isoformat()
+    }
+
+
+@shared_task(bind=True, time_limit=900, soft_time_limit=840)
+def rollup_daily_engagement(self, days: int = 2):
+    """
+    Пересчёт дневных сводок DailyEngagementStats за последние `days` дней (включая сегодня).
+    Часто запускается с days=2 и раз в сутки с days=31: открытия и клики
+    относятся к дню отправки и продолжают приходить после неё.
+    """
+    from datetime import timedelta
+    from .models import DailyEngagementStats
+
+    # Первый запуск после деплоя — сразу заполняем окно дашборда целиком
+    if not DailyEngagementStats.objects.exists():
+        days = max(days, 31)
+
+    end_day = timezone.localdate()
+    start_day = end_day - timedelta(days=days - 1)
+    print(f"[{timezone.now()}] Starting daily engagement rollup for {start_day}..{end_day}...")
+
+    rows = DailyEngagementStats.rebuild_range(start_day, end_day)
+
+    print(f"[{timezone.now()}] Daily engagement rollup completed: {rows} rows changed")
+    return {
+        'rows': rows,
+        'start_day': start_day.isoformat(),
+        'end_day': end_day.isoformat(),
+        'timestamp': timezone.now().isoformat()
+    }
+
+
+@shared_task(bind=True, time_limit=3600, soft_time_limit=3540, queue=CAMPAIGN_QUEUE)
+def generate_export_report(self, task_id: str):
+    """
+    Фоновая генерация отчёта (ExportTask): XLSX в режиме write_only во временный файл,
+    затем сохранение в хранилище. Прогресс пишется в ExportTask.processed_rows.
+    """
+    import tempfile
+    from django.core.files import File
+    from .models import ExportTask
+    from .reports import write_campaign_report_xlsx, write_campaigns_summary_xlsx, iter_campaign_summary_items
+
+    task = ExportTask.objects.select_related('campaign', 'user').get(id=task_id)
+    task.status = ExportTask.PROCESSING
+    task.started_at = timezone.now()
+    task.save(update_fields=['status', 'started_at'])
+
+    def progress(processed):
+        ExportTask.objects.filter(id=task.id).update(processed_rows=processed)
+
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            if task.kind == ExportTask.KIND_CAMPAIGN_REPORT:
+                campaign = task.campaign
+                task.total_rows = EmailTracking.objects.filter(campaign=campaign).count()
+                task.filename = f"campaign_report_{campaign.id}.xlsx"
+                task.save(update_fields=['total_rows', 'filename'])
+                processed = write_campaign_report_xlsx(campaign, tmp, progress=progress)
+            else:
+                # Кампании, удаляемые в фоне (is_deleting), уже скрыты из API — в выгрузку они тоже не попадают
+                campaigns = Campaign.objects.filter(user=task.user, is_deleting=False).order_by('-created_at')
+                campaign_ids = task.params.get('campaign_ids') or []
+                statuses = task.params.get('statuses') or []
+                if campaign_ids:
+                    campaigns = campaigns.filter(id__in=campaign_ids)
+                elif statuses:
+                    campaigns = campaigns.filter(status__in=statuses)
+                task.total_rows = campaigns.count()
+                task.filename = 'campaign_reports.xlsx'
+                task.save(update_fields=['total_rows', 'filename'])
+                processed = write_campaigns_summary_xlsx(iter_campaign_summary_items(campaigns), tmp, progress=progress)
+
+            tmp.seek(0)
+            task.file.save(task.filename, File(tmp), save=False)
+
+        task.processed_rows = processed
+        task.status = ExportTask.COMPLETED
+        task.completed_at = timezone.now()
+        task.save(update_fields=['file', 'processed_rows', 'status', 'completed_at'])
+        print(f"Export task {task.id} completed: {processed} rows")
+        return {'task_id': str(task.id), 'rows': processed}
+
+    except Exception as e:
+        print(f"Export task {task.id} failed: {e}")
+        task.status = ExportTask.FAILED
+        task.error_message = str(e)
+        task.completed_at = timezone.now()
+        task.save(update_fields=['status', 'error_message', 'completed_at'])
+        raise
+
+
+# Хранение готовых отчётов и зависшие задачи экспорта
+EXPORT_TASK_RETENTION_HOURS = getattr(settings, 'EXPORT_TASK_RETENTION_HOURS', 72)
+EXPORT_TASK_STALE_MINUTES = getattr(settings, 'EXPORT_TASK_STALE_MINUTES', 90)  # больше time_limit генерации
+
+
+@shared_task
+def cleanup_export_tasks():
+    """
+    Обслуживание ExportTask:
+    - PROCESSING/PENDING дольше EXPORT_TASK_STALE_MINUTES (воркер убит по time_limit или упал,
+      сообщение потеряно) помечаются как FAILED, чтобы UI перестал опрашивать статус;
+    - завершённые задачи старше EXPORT_TASK_RETENTION_HOURS удаляются вместе с файлом.
+    """
+    from django.db.models import Q
+    from .models import ExportTask
+
+    now = timezone.now()
+    stale_before = now - timedelta(minutes=EXPORT_TASK_STALE_MINUTES)
+    failed = ExportTask.objects.filter(
+        status__in=(ExportTask.PENDING, ExportTask.PROCESSING), created_at__lt=stale_before
+    ).filter(
+        Q(started_at__isnull=True) | Q(started_at__lt=stale_before)
+    ).update(
+        status=ExportTask.FAILED,
+        error_message='Генерация отчёта прервана: превышено время ожидания',
+        completed_at=now,
+    )
+
+    removed = 0
+    expired = ExportTask.objects.filter(
+        status__in=(ExportTask.COMPLETED, ExportTask.FAILED),
+        completed_at__lt=now - timedelta(hours=EXPORT_TASK_RETENTION_HOURS),
+    )
+    for task in expired.iterator():
+        if task.file:
+            try:
+                task.file.delete(save=False)
+            except Exception as e:
+                print(f"Could not remove export file {task.file.name}: {e}")
+                continue
+        task.delete()
+        removed += 1
+
+    print(f"[{timezone.now()}] Export tasks cleanup: {failed} stale marked as failed, {removed} expired removed")
+    return {'failed': failed, 'removed': removed}
@@ -1,3 +1,436 @@
+import json
+from unittest import mock
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import User
+from apps.emails.models import Domain, SenderEmail
+from apps.mailer.models import Contact, ContactList
+from .models import Campaign, CampaignCounters, CampaignRecipient, EmailTracking
+from .tasks import reset_undelivered_recipients
+
+
+class ExportReportsQueryCountTests(TestCase):
+    """Экспорт сводки по кампаниям не должен делать запросов на каждую кампанию."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        domain = Domain.objects.create(owner=self.user, domain_name='example.com')
+        self.sender = SenderEmail.objects.create(owner=self.user, domain=domain, email='news@example.com', sender_name='News')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(self.user)
+
+    def create_campaigns(self, count):
+        for i in range(count):
+            campaign = Campaign.objects.create(
+                user=self.user, name=f'Кампания {i}', subject='Тема', sender_email=self.sender, sender_name='News'
+            )
+            for j in range(3):
+                contact, _ = Contact.objects.get_or_create(
+                    contact_list=self.contact_list,
+                    email=f'user{j}@example.org',
+                    defaults={'status': Contact.BLACKLIST if j == 0 else Contact.VALID},
+                )
+                EmailTracking.objects.create(
+                    campaign=campaign, contact=contact, tracking_id=f'{campaign.id}_{j}', user_agent='',
+                    opened_at=campaign.created_at if j == 1 else None,
+                )
+
+    def export(self, export_format):
+        response = self.client.post('/campaigns/api/campaigns/export/', {'format': export_format}, format='json')
+        self.assertEqual(response.status_code, 200)
+        if response.streaming:
+            return b''.join(response.streaming_content)
+        return response.content
+
+    def test_export_reports_uses_single_query(self):
+        self.create_campaigns(5)
+        for export_format in ('csv', 'json', 'txt', 'xlsx'):
+            with self.subTest(export_format=export_format), self.assertNumQueries(1):
+                self.export(export_format)
+
+    def test_export_reports_aggregates(self):
+        self.create_campaigns(2)
+        items = json.loads(self.export('json'))
+        self.assertEqual(len(items), 2)
+        for item in items:
+            self.assertEqual(item['total_sent'], 3)
+            self.assertEqual(item['opens'], 1)
+            self.assertEqual(item['clicks'], 0)
+            self.assertEqual(item['unsubscribed'], 1)
+            self.assertEqual(item['sender'], 'News <news@example.com>')
+
+
+class ResumeRetryTests(TestCase):
+    """Возобновление отправки возвращает в очередь только недоставленных получателей."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        self.campaign = Campaign.objects.create(user=self.user, name='Кампания', status=Campaign.STATUS_FAILED)
+        now = timezone.now()
+        rows = {
+            'delivered': (Contact.VALID, {'delivered_at': now}),
+            'deferred': (Contact.VALID, {'bounced_at': now, 'bounce_reason': '421 try later'}),
+            'hard': (Contact.INVALID, {'bounced_at': now, 'bounce_reason': '550 no such user'}),
+        }
+        self.contacts = {}
+        for name, (contact_status, tracking) in rows.items():
+            contact = Contact.objects.create(contact_list=contact_list, email=f'{name}@example.org', status=contact_status)
+            CampaignRecipient.objects.create(campaign=self.campaign, contact=contact, is_sent=True, sent_at=now)
+            EmailTracking.objects.create(campaign=self.campaign, contact=contact, tracking_id=name, **tracking)
+            self.contacts[name] = contact
+
+    def test_reopens_only_undelivered_valid_recipients(self):
+        self.assertEqual(reset_undelivered_recipients(str(self.campaign.id)), 1)
+
+        pending = CampaignRecipient.objects.filter(campaign=self.campaign, is_sent=False)
+        self.assertEqual([r.contact_id for r in pending], [self.contacts['deferred'].id])
+        # Строки EmailTracking (учёт по тарифу) сохраняются, снимается только отметка отказа
+        self.assertEqual(EmailTracking.objects.filter(campaign=self.campaign).count(), 3)
+        counters = CampaignCounters.objects.get(campaign=self.campaign)
+        self.assertEqual((counters.sent, counters.delivered, counters.bounced), (3, 1, 1))
+
+
+class CampaignCountersTests(TestCase):
+    """Счётчики кампании меняются вместе с EmailTracking и совпадают с пересчётом."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        self.campaign = Campaign.objects.create(user=self.user, name='Кампания')
+        self.trackings = [
+            EmailTracking.objects.create(
+                campaign=self.campaign, tracking_id=f't{i}',
+                contact=Contact.objects.create(contact_list=contact_list, email=f'user{i}@example.org'),
+            )
+            for i in range(3)
+        ]
+
+    def counters(self):
+        return CampaignCounters.objects.filter(campaign=self.campaign).values(*CampaignCounters.FIELDS).get()
+
+    def test_missing_row_is_rebuilt_on_first_read(self):
+        self.assertFalse(CampaignCounters.objects.filter(campaign=self.campaign).exists())
+        self.assertEqual(self.campaign.emails_sent, 3)
+        self.assertEqual(self.counters()['sent'], 3)
+
+    def test_transitions_increment_once(self):
+        CampaignCounters.rebuild(self.campaign.id)
+        first, second, third = self.trackings
+
+        for _ in range(2):
+            first.mark_as_delivered()
+            first.mark_as_opened(user_agent='Mail/1.0')
+            second.mark_as_clicked(user_agent='Mail/1.0')
+            third.mark_as_bounced('550 no such user')
+        # Клик по неоткрытому письму засчитывается и как открытие
+        second.mark_as_opened(user_agent='Mail/1.0')
+
+        expected = {'sent': 3, 'delivered': 1, 'opened': 2, 'clicked': 1, 'bounced': 1, 'unsubscribed': 0}
+        self.assertEqual(self.counters(), expected)
+        self.assertEqual(CampaignCounters.aggregate_for(self.campaign.id), expected)
+
+    def test_increment_uses_f_expressions(self):
+        CampaignCounters.rebuild(self.campaign.id)
+        stale = CampaignCounters.objects.get(campaign=self.campaign)
+        CampaignCounters.increment(self.campaign.id, delivered=2, opened=0)
+        CampaignCounters.increment(self.campaign.id, delivered=1)
+        stale.refresh_from_db()
+        self.assertEqual((stale.sent, stale.delivered, stale.opened), (3, 3, 0))
+
+    def test_reconcile_fixes_drift(self):
+        from .tasks import reconcile_campaign_counters
+
+        CampaignCounters.rebuild(self.campaign.id)
+        CampaignCounters.objects.filter(campaign=self.campaign).update(sent=100, opened=7)
+        reconcile_campaign_counters.apply()
+        self.assertEqual(self.counters()['sent'], 3)
+        self.assertEqual(self.counters()['opened'], 0)
+
+
+class ListStatsTests(TestCase):
+    """Статистика по спискам считается одним GROUP BY и кэшируется до изменения счётчиков."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.first = ContactList.objects.create(owner=self.user, name='Первый')
+        self.second = ContactList.objects.create(owner=self.user, name='Второй')
+        self.empty = ContactList.objects.create(owner=self.user, name='Пустой')
+        self.campaign = Campaign.objects.create(user=self.user, name='Кампания')
+        self.campaign.contact_lists.set([self.first, self.second, self.empty])
+        now = timezone.now()
+        rows = [
+            (self.first, {'opened_at': now, 'clicked_at': now}),
+            (self.first, {'opened_at': now}),
+            (self.first, {}),
+            (self.second, {'bounced_at': now}),
+        ]
+        self.trackings = [
+            EmailTracking.objects.create(
+                campaign=self.campaign, tracking_id=f't{i}', user_agent='',
+                contact=Contact.objects.create(contact_list=contact_list, email=f'user{i}@example.org'),
+                **tracking,
+            )
+            for i, (contact_list, tracking) in enumerate(rows)
+        ]
+        CampaignCounters.rebuild(self.campaign.id)
+
+    def test_grouped_metrics_and_cache(self):
+        from .models import CampaignStats
+
+        with self.assertNumQueries(2):
+            by_list = CampaignStats.aggregate_by_list(self.campaign.id)
+        self.assertEqual(by_list, {
+            self.first.id: {'emails_sent': 3, 'opens_count': 2, 'clicks_count': 1, 'bounces_count': 0},
+            self.second.id: {'emails_sent': 1, 'opens_count': 0, 'clicks_count': 0, 'bounces_count': 1},
+        })
+        # Пока счётчики не менялись, повторный вызов читает только их версию
+        with self.assertNumQueries(1):
+            self.assertEqual(CampaignStats.aggregate_by_list(self.campaign.id), by_list)
+
+        self.trackings[2].mark_as_opened(user_agent='Mail/1.0')
+        self.assertEqual(CampaignStats.aggregate_by_list(self.campaign.id)[self.first.id]['opens_count'], 3)
+
+        stats = CampaignStats.objects.create(campaign=self.campaign, contact_list=self.second)
+        self.assertEqual((stats.emails_sent, stats.bounces_count, stats.opens_count), (1, 1, 0))
+
+    def test_list_stats_endpoint(self):
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.user)
+        response = client.get(f'/campaigns/api/campaigns/{self.campaign.id}/list-stats/')
+        self.assertEqual(response.status_code, 200)
+        results = {row['contact_list_name']: row for row in response.json()['results']}
+        self.assertEqual(set(results), {'Первый', 'Второй', 'Пустой'})
+        self.assertEqual((results['Первый']['emails_sent'], results['Первый']['clicks_count']), (3, 1))
+        self.assertEqual(results['Пустой']['emails_sent'], 0)
+
+
+class CampaignReportCSVTests(TestCase):
+    """CSV-отчёт по кампании отдаётся потоком и совпадает с прежним форматом."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        domain = Domain.objects.create(owner=self.user, domain_name='example.com')
+        sender = SenderEmail.objects.create(owner=self.user, domain=domain, email='news@example.com', sender_name='News')
+        contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        self.campaign = Campaign.objects.create(
+            user=self.user, name='Кампания', subject='Тема', sender_email=sender, sender_name='News',
+        )
+        now = timezone.now()
+        rows = [
+            ('a@example.org', Contact.VALID, {'delivered_at': now, 'opened_at': now, 'clicked_at': now}),
+            ('b@example.org', Contact.BLACKLIST, {'delivered_at': now}),
+            ('c@example.org', Contact.VALID, {}),
+        ]
+        for i, (email, contact_status, tracking) in enumerate(rows):
+            contact = Contact.objects.create(contact_list=contact_list, email=email, status=contact_status)
+            EmailTracking.objects.create(
+                campaign=self.campaign, contact=contact, tracking_id=f't{i}', user_agent='', **tracking
+            )
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_login(self.user)
+
+    def test_csv_is_streamed(self):
+        from .reports import stream_campaign_report_csv
+
+        # Запросы выполняются только при чтении ответа
+        with self.assertNumQueries(0):
+            response = stream_campaign_report_csv(self.campaign)
+        self.assertTrue(response.streaming)
+
+        for url in (
+            f'/campaigns/api/campaigns/{self.campaign.id}/export-report/',
+            f'/campaigns/api/campaigns/{self.campaign.id}/export-report/?format=csv',
+        ):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.streaming)
+            self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+            lines = b''.join(response.streaming_content).decode('utf-8').split('\r\n')
+            self.assertEqual(lines[:11], [
+                'Кампания,Кампания', 'Тема,Тема', 'Отправитель,News <news@example.com>', '',
+                'Всего отправлено,3', 'Доставлено,2', 'Открыли (кол-во),1', 'Кликнули (кол-во),1',
+                'Отписались (кол-во),1', '', 'Email,Отправитель,Отправлено,Доставлено,Открыто,Клик,Отписан',
+            ])
+            self.assertEqual(sorted(lines[11:-1]), [
+                'a@example.org,news@example.com,1,1,1,1,0',
+                'b@example.org,news@example.com,1,1,0,0,1',
+                'c@example.org,news@example.com,1,0,0,0,0',
+            ])
+
+    def test_recipient_rows_are_read_in_chunks(self):
+        from .reports import iter_recipient_rows
+
+        rows = list(iter_recipient_rows(self.campaign, chunk_size=1))
+        self.assertEqual(sorted(row[0] for row in rows), ['a@example.org', 'b@example.org', 'c@example.org'])
+
+
+class UnsubscribeViewTests(TestCase):
+    """Переход по ссылке отписки: контакт в черный список, счётчики меняются один раз."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        self.contact = Contact.objects.create(contact_list=self.contact_list, email='reader@example.org')
+        self.campaign = Campaign.objects.create(user=self.user, name='Кампания')
+        EmailTracking.objects.create(campaign=self.campaign, contact=self.contact, tracking_id='t1')
+        CampaignCounters.rebuild(self.campaign.id)
+
+    def test_unsubscribe_is_counted_once(self):
+        from apps.mailer.suppression import is_suppressed
+
+        url = f'/campaigns/{self.campaign.id}/unsubscribe/?tracking_id=t1'
+        for _ in range(2):
+            response = self.client.get(url, HTTP_HOST='localhost')
+            self.assertEqual(response.status_code, 200)
+
+        self.contact.refresh_from_db()
+        self.assertEqual(self.contact.status, Contact.BLACKLIST)
+        self.contact_list.refresh_from_db()
+        self.assertEqual((self.contact_list.valid_count, self.contact_list.blacklisted_count), (0, 1))
+        self.assertEqual(CampaignCounters.objects.get(campaign=self.campaign).unsubscribed, 1)
+        self.assertTrue(is_suppressed(self.user.id, 'reader@example.org'))
+
+    def test_unknown_tracking_id(self):
+        response = self.client.get(f'/campaigns/{self.campaign.id}/unsubscribe/?tracking_id=missing', HTTP_HOST='localhost')
+        self.assertEqual(response.status_code, 404)
+
+
+class DailyEngagementRollupTests(TestCase):
+    """Пересчёт дневных сводок записывает только изменившиеся строки."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        campaign = Campaign.objects.create(user=self.user, name='Кампания')
+        self.trackings = [
+            EmailTracking.objects.create(
+                campaign=campaign, tracking_id=f't{i}',
+                contact=Contact.objects.create(contact_list=contact_list, email=f'user{i}@example.org'),
+            )
+            for i in range(3)
+        ]
+        self.today = timezone.localdate()
+
+    def rebuild(self):
+        from .models import DailyEngagementStats
+
+        return DailyEngagementStats.rebuild_range(self.today, self.today)
+
+    def test_rebuild_upserts_only_changes(self):
+        from .models import DailyEngagementStats
+
+        self.assertEqual(self.rebuild(), 1)
+        row = DailyEngagementStats.objects.get(user=self.user, day=self.today)
+        self.assertEqual((row.sent, row.opened, row.new_subscribers), (3, 0, 3))
+
+        # Повторный запуск без изменений ничего не пишет, строка не пересоздаётся
+        self.assertEqual(self.rebuild(), 0)
+        EmailTracking.objects.filter(id=self.trackings[0].id).update(opened_at=timezone.now())
+        self.assertEqual(self.rebuild(), 1)
+        updated = DailyEngagementStats.objects.get(user=self.user, day=self.today)
+        self.assertEqual((updated.id, updated.opened), (row.id, 1))
+
+    def test_emptied_day_is_removed(self):
+        from .models import DailyEngagementStats
+
+        self.rebuild()
+        EmailTracking.objects.all().delete()
+        Contact.objects.all().delete()
+        self.assertEqual(self.rebuild(), 1)
+        self.assertFalse(DailyEngagementStats.objects.exists())
+
+
+class ExportTaskTests(TestCase):
+    """Фоновый экспорт отчёта: запуск, статус, скачивание и очистка устаревших задач."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from django.test import override_settings
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create(email='owner@example.com')
+        contact_list = ContactList.objects.create(owner=self.user, name='Основной')
+        self.campaign = Campaign.objects.create(user=self.user, name='Кампания')
+        for i in range(3):
+            contact = Contact.objects.create(contact_list=contact_list, email=f'user{i}@example.org')
+            EmailTracking.objects.create(campaign=self.campaign, contact=contact, tracking_id=f't{i}')
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(self.user)
+
+    def start_export(self, body=None):
+        from .tasks import generate_export_report
+
+        def delay(task_id):
+            generate_export_report.apply(args=[task_id])
+            return mock.Mock(id='celery-id')
+
+        with mock.patch.object(generate_export_report, 'delay', delay):
+            response = self.client.post(
+                '/campaigns/api/campaigns/export-tasks/', body or {'campaign_id': str(self.campaign.id)}, format='json'
+            )
+        self.assertEqual(response.status_code, 202)
+        return response.json()
+
+    def test_start_status_download(self):
+        data = self.start_export()
+        self.assertEqual(data['status'], 'completed')
+        self.assertEqual(data['processed_rows'], 3)
+
+        status_response = self.client.get(f"/campaigns/api/campaigns/export-tasks/{data['id']}/")
+        self.assertEqual(status_response.json()['download_url'], data['download_url'])
+        self.assertEqual(data['download_url'], f"/campaigns/api/campaigns/export-tasks/{data['id']}/download/")
+        download = self.client.get(data['download_url'])
+        self.assertEqual(download.status_code, 200)
+        self.assertTrue(b''.join(download.streaming_content).startswith(b'PK'))
+
+        other = User.objects.create(email='other@example.com')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f"/campaigns/api/campaigns/export-tasks/{data['id']}/").status_code, 404)
+
+    def test_summary_skips_campaigns_being_deleted(self):
+        from openpyxl import load_workbook
+        from . import reports
+        from .models import ExportTask
+
+        Campaign.objects.create(user=self.user, name='Удаляется', is_deleting=True)
+        with mock.patch.object(
+            reports, 'write_campaigns_summary_xlsx', wraps=reports.write_campaigns_summary_xlsx,
+        ) as write:
+            data = self.start_export({'campaign_ids': []})
+        self.assertEqual((data['status'], data['total_rows'], data['processed_rows']), ('completed', 1, 1))
+        self.assertIn('progress', write.call_args.kwargs)
+
+        task = ExportTask.objects.get(id=data['id'])
+        with task.file.open('rb') as f:
+            names = [row[1] for row in load_workbook(f, read_only=True).active.iter_rows(min_row=2, values_only=True)]
+        self.assertEqual(names, ['Кампания'])
+
+    def test_cleanup_expires_files_and_fails_stale_tasks(self):
+        import os
+        from datetime import timedelta
+        from .models import ExportTask
+        from .tasks import cleanup_export_tasks
+
+        data = self.start_export()
+        task = ExportTask.objects.get(id=data['id'])
+        path = task.file.path
+        long_ago = timezone.now() - timedelta(days=30)
+        ExportTask.objects.filter(id=task.id).update(completed_at=long_ago)
+        stale = ExportTask.objects.create(user=self.user, campaign=self.campaign, status=ExportTask.PROCESSING)
+        ExportTask.objects.filter(id=stale.id).update(created_at=long_ago, started_at=long_ago)
 
-# Create your tests here.
+        self.assertEqual(cleanup_export_tasks(), {'failed': 1, 'removed': 1})
+        self.assertFalse(ExportTask.objects.filter(id=task.id).exists())
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(ExportTask.objects.get(id=stale.id).status, ExportTask.FAILED)
@@ -8,16 +8,25 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.utils import timezone
 from django.core.mail import EmailMultiAlternatives
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import HttpResponse, HttpResponseRedirect, FileResponse, StreamingHttpResponse
+from django.core.exceptions import ValidationError
 import csv
 from django.views.decorators.http import require_GET
 from django.http import Http404
+import os
 import uuid
 from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
 
-from .models import Campaign, CampaignStats, EmailTracking, CampaignRecipient
+from .models import Campaign, CampaignStats, EmailTracking, CampaignRecipient, CampaignCounters, ExportTask
 from .serializers import CampaignSerializer, CampaignListSerializer
+from .reports import (
+    stream_campaign_report_csv, write_campaign_report_xlsx, write_campaigns_summary_xlsx, XLSX_CONTENT_TYPE,
+    iter_campaign_summary_items, iter_campaigns_summary_csv, iter_campaigns_summary_txt, iter_campaigns_summary_json,
+)
 from apps.billing.models import Plan
+from core.utils.pagination import paginate, InvalidCursor
 from apps.campaigns.tasks import send_campaign, CAMPAIGN_QUEUE
 from django.conf import settings
 
@@ -32,7 +41,7 @@ class CampaignViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         if not self.request.user.is_authenticated:
             return Campaign.objects.none()
-        return Campaign.objects.filter(user=self.request.user).order_by('-created_at')
+        return Campaign.objects.filter(user=self.request.user, is_deleting=False).select_related('counters').order_by('-created_at')
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -40,22 +49,17 @@ class CampaignViewSet(viewsets.ModelViewSet):
         return CampaignSerializer
 
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        # Пагинация через page/page_size
-        page = int(request.query_params.get('page', 1))
-        page_size = int(request.query_params.get('page_size', 10))
-        total = queryset.count()
-        num_pages = (total + page_size - 1) // page_size
-        start = (page - 1) * page_size
-        end = start + page_size
-        page_qs = queryset[start:end]
-        serializer = self.get_serializer(page_qs, many=True)
-        return Response({
-            'results': serializer.data,
-            'count': total,
-            'page': page,
-            'num_pages': num_pages,
-        })
+        queryset = self.get_queryset().prefetch_related('contact_lists')
+        # Пагинация через page/page_size или курсор (?cursor=, next_cursor в ответе)
+        try:
+            return Response(paginate(
+                request, queryset, ('-created_at', '-id'),
+                serialize=lambda rows: self.get_serializer(rows, many=True).data,
+                default_page_size=10,
+                count_cache_key=f"campaigns:{request.user.id}",
+            ))
+        except InvalidCursor as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -113,8 +117,28 @@ class CampaignViewSet(viewsets.ModelViewSet):
                     'detail': 'Нельзя удалить кампанию, которая сейчас отправляется. '
                              f'Статус задачи: {task_result.state}'
                 }, status=status.HTTP_400_BAD_REQUEST)
-        
-        return super().destroy(request, *args, **kwargs)
+
+        # Кампания сразу скрывается, записи об отправке удаляются в фоне порциями
+        from apps.mailer.models import PurgeJob
+        from apps.mailer.purge import create_purge_job, purge_job_data
+        from apps.mailer.tasks import start_purge
+
+        job = create_purge_job(request.user, PurgeJob.CAMPAIGN, instance.id)
+        Campaign.objects.filter(id=instance.id).update(is_deleting=True)
+        start_purge(job)
+        job.refresh_from_db()
+        return Response(purge_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path='purge-jobs/(?P<job_id>[^/.]+)')
+    def purge_job_status(self, request, job_id=None):
+        """Прогресс фонового удаления кампании или очистки перед повторной отправкой"""
+        from apps.mailer.models import PurgeJob
+        from apps.mailer.purge import purge_job_data
+
+        job = PurgeJob.objects.filter(id=job_id, user=request.user).first()
+        if job is None:
+            raise Http404
+        return Response(purge_job_data(job))
 
     @action(detail=True, methods=['post'], url_path='cancel')
     def cancel(self, request, pk=None):
@@ -182,11 +206,12 @@ class CampaignViewSet(viewsets.ModelViewSet):
         # Используем правильные функции из billing.utils
         from apps.billing.utils import can_user_send_emails, get_user_plan_info
         from apps.mailer.models import Contact as MailerContact
+        from apps.mailer.suppression import suppression_filter
         
-        # Сколько писем будет отправлено в этой кампании (считаем только VALID контакты)
+        # Сколько писем будет отправлено в этой кампании (считаем только VALID и не подавленные контакты)
         recipients_count = 0
-        for cl in campaign.contact_lists.all():
-            recipients_count += cl.contacts.filter(status=MailerContact.VALID).count()
+        for cl in campaign.contact_lists.filter(is_deleting=False):
+            recipients_count += cl.contacts.filter(suppression_filter(user.id), status=MailerContact.VALID).count()
         
         print(f"Recipients count: {recipients_count}")
         
@@ -369,6 +394,26 @@ class CampaignViewSet(viewsets.ModelViewSet):
             'progress': progress_data
         })
 
+    @action(detail=True, methods=['get'], url_path='list-stats')
+    def list_stats(self, request, pk=None):
+        """Статистика кампании в разрезе списков контактов (один агрегирующий запрос)"""
+        campaign = self.get_object()
+        by_list = CampaignStats.aggregate_by_list(campaign.id)
+
+        results = []
+        for contact_list in campaign.contact_lists.all():
+            metrics = by_list.get(contact_list.id, {})
+            results.append({
+                'contact_list_id': str(contact_list.id),
+                'contact_list_name': contact_list.name,
+                **{metric: metrics.get(metric, 0) for metric in CampaignStats.LIST_METRICS}
+            })
+
+        return Response({
+            'campaign_id': str(campaign.id),
+            'results': results
+        })
+
     @action(detail=True, methods=['post'])
     def track_open(self, request, pk=None):
         """Отслеживание открытия письма"""
@@ -430,34 +475,42 @@ class CampaignViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        """Получение статистики по кампаниям (корректные подсчёты по EmailTracking).
+        """Получение статистики по кампаниям.
 
         Возвращаем агрегаты за последние 30 дней, чтобы согласовать с billing/dashboard.
+        Читает дневные сводки DailyEngagementStats (~30 строк), текущий день досчитывается вживую.
         """
-        from .models import EmailTracking
-        from apps.mailer.models import Contact
+        from datetime import timedelta
+        from .models import DailyEngagementStats
 
         user = request.user
-        now = timezone.now()
-        last_30_days = now - timezone.timedelta(days=30)
-        last_7_days = now - timezone.timedelta(days=7)
-        prev_7_days = last_7_days - timezone.timedelta(days=7)
-
-        # Базовый queryset трекинга по пользователю
-        tracking_qs = EmailTracking.objects.filter(campaign__user=user)
-
-        # Агрегаты за 30 дней
-        sent_30 = tracking_qs.filter(sent_at__gte=last_30_days).count()
-        opened_30 = tracking_qs.filter(sent_at__gte=last_30_days, opened_at__isnull=False).count()
-        clicked_30 = tracking_qs.filter(sent_at__gte=last_30_days, clicked_at__isnull=False).count()
+        today = timezone.localdate()
+        metrics = ('sent', 'opened', 'clicked', 'new_subscribers')
+
+        # Дни до сегодняшнего берём из дневных сводок, текущий день считаем вживую
+        daily = {day: dict.fromkeys(metrics, 0) for day in (today - timedelta(days=i) for i in range(30))}
+        for row in DailyEngagementStats.objects.filter(
+            user=user, day__gte=today - timedelta(days=29), day__lt=today
+        ).values('day', *metrics):
+            daily[row['day']] = row
+        live = DailyEngagementStats.live_for_day(user, today)
+        daily[today] = {metric: live[metric] for metric in metrics}
+
+        def window_sum(metric, start, end):
+            """Сумма метрики за дни (today - start, today - end]"""
+            return sum(daily[today - timedelta(days=i)][metric] for i in range(end, start))
+
+        sent_30 = window_sum('sent', 30, 0)
+        opened_30 = window_sum('opened', 30, 0)
+        clicked_30 = window_sum('clicked', 30, 0)
 
         # Тренды: сравниваем последние 7 дней и предыдущие 7 дней
-        sent_7 = tracking_qs.filter(sent_at__gte=last_7_days).count()
-        sent_prev_7 = tracking_qs.filter(sent_at__gte=prev_7_days, sent_at__lt=last_7_days).count()
-        opened_7 = tracking_qs.filter(sent_at__gte=last_7_days, opened_at__isnull=False).count()
-        opened_prev_7 = tracking_qs.filter(sent_at__gte=prev_7_days, sent_at__lt=last_7_days, opened_at__isnull=False).count()
-        clicked_7 = tracking_qs.filter(sent_at__gte=last_7_days, clicked_at__isnull=False).count()
-        clicked_prev_7 = tracking_qs.filter(sent_at__gte=prev_7_days, sent_at__lt=last_7_days, clicked_at__isnull=False).count()
+        sent_7 = window_sum('sent', 7, 0)
+        sent_prev_7 = window_sum('sent', 14, 7)
+        opened_7 = window_sum('opened', 7, 0)
+        opened_prev_7 = window_sum('opened', 14, 7)
+        clicked_7 = window_sum('clicked', 7, 0)
+        clicked_prev_7 = window_sum('clicked', 14, 7)
 
         def calculate_trend(current, previous):
             if previous == 0:
@@ -465,20 +518,9 @@ class CampaignViewSet(viewsets.ModelViewSet):
             return round(((current - previous) / previous) * 100, 1)
 
         # Новые подписчики (контакты) за 30 дней
-        new_subscribers_30 = Contact.objects.filter(
-            contact_list__owner=user,
-            added_date__gte=last_30_days
-        ).count()
-
-        new_subscribers_7 = Contact.objects.filter(
-            contact_list__owner=user,
-            added_date__gte=last_7_days
-        ).count()
-        new_subscribers_prev_7 = Contact.objects.filter(
-            contact_list__owner=user,
-            added_date__gte=prev_7_days,
-            added_date__lt=last_7_days
-        ).count()
+        new_subscribers_30 = window_sum('new_subscribers', 30, 0)
+        new_subscribers_7 = window_sum('new_subscribers', 7, 0)
+        new_subscribers_prev_7 = window_sum('new_subscribers', 14, 7)
 
         return Response({
             'sent': sent_30,
@@ -493,8 +535,19 @@ class CampaignViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def retry(self, request, pk=None):
-        """Повторная попытка отправки кампании"""
+        """
+        Повторная попытка отправки кампании.
+        mode=full (по умолчанию) — результаты прошлой отправки удаляются, кампания
+        отправляется заново; mode=resume — письма отправляются только получателям без
+        доставленного письма, уже доставленные и учтённые в тарифе не трогаются.
+        """
         campaign = self.get_object()
+        mode = request.data.get('mode') or request.query_params.get('mode') or 'full'
+        if mode not in ('full', 'resume'):
+            return Response(
+                {'detail': 'mode: full или resume'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
         # Проверяем, что кампания действительно в статусе ошибки
         if campaign.status != Campaign.STATUS_FAILED:
@@ -542,24 +595,42 @@ class CampaignViewSet(viewsets.ModelViewSet):
             )
 
         try:
-            # Очищаем предыдущие записи об отправке
-            EmailTracking.objects.filter(campaign=campaign).delete()
-            CampaignRecipient.objects.filter(campaign=campaign).delete()
-
-            # Обновляем статус и запускаем отправку
+            from apps.mailer.models import PurgeJob
+            from apps.mailer.purge import create_purge_job
+            from apps.mailer.tasks import start_purge
+            from apps.campaigns.tasks import reset_undelivered_recipients
+
+            # Обновляем статус; id задачи отправки известен заранее, чтобы send_campaign
+            # не принял кампанию за уже отправляемую другой задачей
+            send_task_id = str(uuid.uuid4())
             campaign.status = Campaign.STATUS_SENDING
-            campaign.save(update_fields=['status'])
-            
-            # Запускаем отправку через Celery
-            from apps.campaigns.tasks import send_campaign
-            task = send_campaign.delay(str(campaign.id))
-            campaign.celery_task_id = task.id
-            campaign.save(update_fields=['celery_task_id'])
+            campaign.celery_task_id = send_task_id
+            campaign.save(update_fields=['status', 'celery_task_id'])
+
+            if mode == 'resume':
+                # Недоставленные получатели возвращаются в очередь, send_campaign
+                # планирует только их
+                reopened = reset_undelivered_recipients(str(campaign.id))
+                send_campaign.apply_async(args=[str(campaign.id)], task_id=send_task_id)
+                return Response({
+                    'detail': 'Отправка кампании возобновлена.',
+                    'status': 'sending',
+                    'status_display': campaign.get_status_display(),
+                    'mode': mode,
+                    'reopened': reopened,
+                })
+
+            # Предыдущие записи об отправке удаляются в фоне порциями,
+            # отправка запускается следующей задачей цепочки
+            job = create_purge_job(request.user, PurgeJob.CAMPAIGN_SENDS, campaign.id)
+            start_purge(job, link=send_campaign.si(str(campaign.id)).set(task_id=send_task_id))
 
             return Response({
                 'detail': 'Кампания запущена повторно.',
                 'status': 'sending',
-                'status_display': campaign.get_status_display()
+                'status_display': campaign.get_status_display(),
+                'mode': mode,
+                'purge_job_id': str(job.id),
             })
 
         except Exception as e:
@@ -686,110 +757,37 @@ class CampaignViewSet(viewsets.ModelViewSet):
         elif statuses:
             qs = qs.filter(status__in=statuses)
 
-        # Собираем агрегированные данные
-        from apps.mailer.models import Contact as MailerContact
-        items = []
-        for c in qs:
-            total_sent = EmailTracking.objects.filter(campaign=c).count()
-            opens = EmailTracking.objects.filter(campaign=c, opened_at__isnull=False).count()
-            clicks = EmailTracking.objects.filter(campaign=c, clicked_at__isnull=False).count()
-            unsubscribed = MailerContact.objects.filter(
-                id__in=EmailTracking.objects.filter(campaign=c).values_list('contact_id', flat=True),
-                status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
-            ).count()
-            items.append({
-                'id': str(c.id),
-                'name': c.name,
-                'subject': c.subject,
-                'sender': f"{c.sender_name} <{c.sender_email.email if c.sender_email else ''}>",
-                'created_at': c.created_at.isoformat(),
-                'sent_at': c.sent_at.isoformat() if c.sent_at else None,
-                'total_sent': total_sent,
-                'opens': opens,
-                'clicks': clicks,
-                'unsubscribed': unsubscribed,
-            })
+        # Все метрики считаются одним аннотированным запросом и отдаются потоком
+        items = iter_campaign_summary_items(qs)
 
         # Форматы
         if export_format == 'json':
-            import json as _json
-            response = HttpResponse(_json.dumps(items, ensure_ascii=False, indent=2), content_type='application/json; charset=utf-8')
+            response = StreamingHttpResponse(iter_campaigns_summary_json(items), content_type='application/json; charset=utf-8')
             response['Content-Disposition'] = 'attachment; filename="campaign_reports.json"'
             return response
 
         if export_format == 'txt':
-            lines = []
-            for it in items:
-                lines.append(f"Кампания: {it['name'] or it['id']}\nТема: {it['subject'] or ''}\nОтправитель: {it['sender']}\nОтправлено: {it['total_sent']}\nОткрыли: {it['opens']}\nКликнули: {it['clicks']}\nОтписались: {it['unsubscribed']}\nДата отправки: {it['sent_at'] or ''}\n---")
-            body = "\n\n".join(lines)
-            response = HttpResponse(body, content_type='text/plain; charset=utf-8')
+            response = StreamingHttpResponse(iter_campaigns_summary_txt(items), content_type='text/plain; charset=utf-8')
             response['Content-Disposition'] = 'attachment; filename="campaign_reports.txt"'
             return response
 
         if export_format == 'xlsx':
             try:
-                from openpyxl import Workbook
-                from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                wb = Workbook()
-                ws = wb.active
-                ws.title = 'Reports'
-                headers = ['ID', 'Кампания', 'Тема', 'Отправитель', 'Отправлено', 'Открыли', 'Кликнули', 'Отписались', 'Дата отправки']
-                ws.append(headers)
-                # Header style
-                header_fill = PatternFill(start_color='EEF2FF', end_color='EEF2FF', fill_type='solid')
-                header_font = Font(bold=True, color='1E40AF')
-                thin = Side(border_style='thin', color='E5E7EB')
-                for col_idx, _ in enumerate(headers, start=1):
-                    cell = ws.cell(row=1, column=col_idx)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-                for it in items:
-                    ws.append([
-                        it['id'], it['name'], it['subject'], it['sender'],
-                        it['total_sent'], it['opens'], it['clicks'], it['unsubscribed'], it['sent_at'] or ''
-                    ])
-                # Zebra striping and borders
-                stripe_fill = PatternFill(start_color='F9FAFB', end_color='F9FAFB', fill_type='solid')
-                for r in range(2, ws.max_row + 1):
-                    if r % 2 == 0:
-                        for c in range(1, ws.max_column + 1):
-                            ws.cell(row=r, column=c).fill = stripe_fill
-                    for c in range(1, ws.max_column + 1):
-                        cell = ws.cell(row=r, column=c)
-                        cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-                        if c in (5,6,7,8):
-                            cell.alignment = Alignment(horizontal='center')
-                # Auto column widths
-                for column_cells in ws.columns:
-                    length = max(len(str(column_cells[0].value or '')), *(len(str(cell.value or '')) for cell in column_cells))
-                    adjusted = min(max(12, length + 2), 50)
-                    ws.column_dimensions[column_cells[0].column_letter].width = adjusted
-                # Freeze header
-                ws.freeze_panes = 'A2'
                 from io import BytesIO
                 buf = BytesIO()
-                wb.save(buf)
-                buf.seek(0)
-                response = HttpResponse(buf.getvalue(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+                write_campaigns_summary_xlsx(items, buf)
+                response = HttpResponse(buf.getvalue(), content_type=XLSX_CONTENT_TYPE)
                 response['Content-Disposition'] = 'attachment; filename="campaign_reports.xlsx"'
                 return response
-            except Exception:
+            except ImportError:
                 # Фолбэк в CSV, если нет openpyxl
-                export_format = 'csv'
+                items = iter_campaign_summary_items(qs)
 
         # CSV по умолчанию
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
+        response = StreamingHttpResponse(iter_campaigns_summary_csv(items), content_type='text/csv; charset=utf-8')
         response['Content-Disposition'] = 'attachment; filename="campaign_reports.csv"'
-        writer = csv.writer(response)
-        writer.writerow(['ID', 'Кампания', 'Тема', 'Отправитель', 'Отправлено', 'Открыли', 'Кликнули', 'Отписались', 'Дата отправки'])
-        for it in items:
-            writer.writerow([
-                it['id'], it['name'], it['subject'], it['sender'],
-                it['total_sent'], it['opens'], it['clicks'], it['unsubscribed'], it['sent_at'] or ''
-            ])
         return response
+
     @action(detail=True, methods=['get'], url_path='export-report')
     def export_report(self, request, pk=None):
         """
@@ -806,154 +804,112 @@ class CampaignViewSet(viewsets.ModelViewSet):
             return HttpResponse(status=404)
         export_format = (request.query_params.get('format') or 'csv').lower()
 
-        # Собираем агрегаты
-        total_sent = EmailTracking.objects.filter(campaign=campaign).count()
-        delivered = EmailTracking.objects.filter(campaign=campaign, delivered_at__isnull=False).count()
-        opens = EmailTracking.objects.filter(campaign=campaign, opened_at__isnull=False).count()
-        clicks = EmailTracking.objects.filter(campaign=campaign, clicked_at__isnull=False).count()
-        from apps.mailer.models import Contact as MailerContact
-        base_tracking_qs = EmailTracking.objects.filter(campaign=campaign)
-        unsubscribed = MailerContact.objects.filter(
-            id__in=base_tracking_qs.values_list('contact_id', flat=True),
-            status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
-        ).count()
-
-        # По каждому получателю
-        trackings = base_tracking_qs.select_related('contact')
-        unsubscribed_ids = set(
-            MailerContact.objects.filter(
-                id__in=trackings.values_list('contact_id', flat=True),
-                status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
-            ).values_list('id', flat=True)
-        )
-        sender_mailbox = campaign.sender_email.email if campaign.sender_email else ''
+        # CSV отдаём потоком: строки читаются порциями, память не растёт с числом получателей
+        if export_format != 'xlsx':
+            return stream_campaign_report_csv(campaign)
 
-        if export_format == 'xlsx':
-            # Экспорт в Excel
-            try:
-                from openpyxl import Workbook
-                from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-                from io import BytesIO
-            except ImportError:
-                # Если нет openpyxl — фолбэк в CSV
-                export_format = 'csv'
-            else:
-                wb = Workbook()
-                ws = wb.active
-                ws.title = 'Campaign report'
-
-                thin = Side(border_style='thin', color='E5E7EB')
-
-                # Заголовок кампании
-                ws.append(['Кампания', campaign.name or str(campaign.id)])
-                ws.append(['Тема', campaign.subject or ''])
-                ws.append(['Отправитель', f"{campaign.sender_name} <{sender_mailbox}>"])
-                ws.append([])
-
-                # Общая статистика
-                ws.append(['Общая статистика'])
-                ws.append(['Всего отправлено', total_sent])
-                ws.append(['Доставлено', delivered])
-                ws.append(['Открыто (кол-во)', opens])
-                ws.append(['Клики (кол-во)', clicks])
-                ws.append(['Отписались (кол-во)', unsubscribed])
-                ws.append([])
-
-                # Шапка таблицы получателей
-                header_row_idx = ws.max_row + 1
-                headers = [
-                    'Email',
-                    'Отправитель',
-                    'Отправлено',
-                    'Доставлено',
-                    'Открыто',
-                    'Клик',
-                    'Отписан',
-                ]
-                ws.append(headers)
-
-                header_fill = PatternFill(start_color='EEF2FF', end_color='EEF2FF', fill_type='solid')
-                header_font = Font(bold=True, color='1E40AF')
-                for col_idx, _ in enumerate(headers, start=1):
-                    cell = ws.cell(row=header_row_idx, column=col_idx)
-                    cell.fill = header_fill
-                    cell.font = header_font
-                    cell.alignment = Alignment(horizontal='center', vertical='center')
-                    cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-
-                # Данные по каждому получателю
-                for t in trackings:
-                    ws.append([
-                        t.contact.email,
-                        sender_mailbox,
-                        1 if t.sent_at else 0,
-                        1 if t.delivered_at else 0,
-                        1 if t.opened_at else 0,
-                        1 if t.clicked_at else 0,
-                        1 if t.contact_id in unsubscribed_ids else 0,
-                    ])
-
-                # Стили строк (зебра + границы)
-                stripe_fill = PatternFill(start_color='F9FAFB', end_color='F9FAFB', fill_type='solid')
-                for r in range(header_row_idx + 1, ws.max_row + 1):
-                    if r % 2 == 0:
-                        for c in range(1, ws.max_column + 1):
-                            ws.cell(row=r, column=c).fill = stripe_fill
-                    for c in range(1, ws.max_column + 1):
-                        cell = ws.cell(row=r, column=c)
-                        cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-                        if c >= 3:
-                            cell.alignment = Alignment(horizontal='center')
-
-                # Авто-ширина колонок
-                for column_cells in ws.columns:
-                    length = max(len(str(column_cells[0].value or '')), *(len(str(cell.value or '')) for cell in column_cells))
-                    adjusted = min(max(12, length + 2), 60)
-                    ws.column_dimensions[column_cells[0].column_letter].width = adjusted
-
-                # Заморозка шапки получателей
-                ws.freeze_panes = f"A{header_row_idx + 1}"
+        # XLSX пишется в режиме write_only; для больших отчётов UI использует фоновый ExportTask
+        try:
+            from io import BytesIO
+            buf = BytesIO()
+            write_campaign_report_xlsx(campaign, buf)
+        except ImportError:
+            pass
+        else:
+            response = HttpResponse(buf.getvalue(), content_type=XLSX_CONTENT_TYPE)
+            response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.xlsx"'
+            return response
 
-                buf = BytesIO()
-                wb.save(buf)
-                buf.seek(0)
-                response = HttpResponse(
-                    buf.getvalue(),
-                    content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-                )
-                response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.xlsx"'
-                return response
+        # Фолбэк без openpyxl — потоковый CSV
+        return stream_campaign_report_csv(campaign)
+
+
+    def _export_task_data(self, task):
+        return {
+            'id': str(task.id),
+            'kind': task.kind,
+            'format': task.format,
+            'status': task.status,
+            'total_rows': task.total_rows,
+            'processed_rows': task.processed_rows,
+            'progress_percentage': task.progress_percentage,
+            'filename': task.filename,
+            'error_message': task.error_message,
+            'download_url': reverse('campaign-download-export-task', kwargs={'task_id': str(task.id)})
+            if task.status == ExportTask.COMPLETED and task.file else None,
+            'started_at': task.started_at.isoformat() if task.started_at else None,
+            'completed_at': task.completed_at.isoformat() if task.completed_at else None,
+            'duration': task.duration,
+            'created_at': task.created_at.isoformat(),
+        }
+
+    @action(detail=False, methods=['post'], url_path='export-tasks')
+    def start_export_task(self, request):
+        """
+        Запуск фоновой генерации XLSX-отчёта.
+        Body: { "campaign_id": "..." } — отчёт по кампании,
+              { "campaign_ids": [...], "statuses": [...] } — сводка по кампаниям.
+        """
+        data = request.data or {}
+        campaign_id = data.get('campaign_id')
 
-        # CSV по умолчанию
-        response = HttpResponse(content_type='text/csv; charset=utf-8')
-        response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.csv"'
-
-        writer = csv.writer(response)
-        writer.writerow(['Кампания', campaign.name or str(campaign.id)])
-        writer.writerow(['Тема', campaign.subject or ''])
-        writer.writerow(['Отправитель', f"{campaign.sender_name} <{sender_mailbox}>"])
-        writer.writerow([])
-        writer.writerow(['Всего отправлено', total_sent])
-        writer.writerow(['Доставлено', delivered])
-        writer.writerow(['Открыли (кол-во)', opens])
-        writer.writerow(['Кликнули (кол-во)', clicks])
-        writer.writerow(['Отписались (кол-во)', unsubscribed])
-        writer.writerow([])
-        writer.writerow(['Email', 'Отправитель', 'Отправлено', 'Доставлено', 'Открыто', 'Кликов', 'Отписан'])
-
-        for t in trackings:
-            writer.writerow([
-                t.contact.email,
-                sender_mailbox,
-                1 if t.sent_at else 0,
-                1 if t.delivered_at else 0,
-                1 if t.opened_at else 0,
-                1 if t.clicked_at else 0,
-                1 if t.contact_id in unsubscribed_ids else 0,
-            ])
+        if campaign_id:
+            try:
+                campaign = self.get_queryset().get(pk=campaign_id)
+            except (Campaign.DoesNotExist, ValueError, ValidationError):
+                return Response({'detail': 'Кампания не найдена'}, status=status.HTTP_404_NOT_FOUND)
+            export_task = ExportTask.objects.create(
+                user=request.user,
+                kind=ExportTask.KIND_CAMPAIGN_REPORT,
+                campaign=campaign,
+            )
+        else:
+            export_task = ExportTask.objects.create(
+                user=request.user,
+                kind=ExportTask.KIND_CAMPAIGNS_SUMMARY,
+                params={
+                    'campaign_ids': [str(cid) for cid in (data.get('campaign_ids') or [])],
+                    'statuses': data.get('statuses') or [],
+                },
+            )
 
-        return response
+        from apps.campaigns.tasks import generate_export_report
+        try:
+            celery_task = generate_export_report.delay(str(export_task.id))
+            ExportTask.objects.filter(id=export_task.id).update(celery_task_id=celery_task.id)
+            export_task.refresh_from_db()
+        except Exception as e:
+            # Если брокер недоступен — выполняем синхронно
+            print(f"Failed to start export task via Celery: {e}, executing synchronously")
+            generate_export_report.apply(args=[str(export_task.id)])
+            export_task.refresh_from_db()
 
+        return Response(self._export_task_data(export_task), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path=r'export-tasks/(?P<task_id>[^/.]+)')
+    def export_task_status(self, request, task_id=None):
+        """Статус фонового экспорта (для опроса из UI)"""
+        try:
+            export_task = ExportTask.objects.get(id=task_id, user=request.user)
+        except ExportTask.DoesNotExist:
+            return Response({'detail': 'Задача экспорта не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self._export_task_data(export_task))
+
+    @action(detail=False, methods=['get'], url_path=r'export-tasks/(?P<task_id>[^/.]+)/download')
+    def download_export_task(self, request, task_id=None):
+        """Скачивание готового файла экспорта"""
+        try:
+            export_task = ExportTask.objects.get(id=task_id, user=request.user)
+        except ExportTask.DoesNotExist:
+            raise Http404("Задача экспорта не найдена")
+        if export_task.status != ExportTask.COMPLETED or not export_task.file:
+            return Response({'detail': 'Файл ещё не готов'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            export_task.file.open('rb'),
+            as_attachment=True,
+            filename=export_task.filename or os.path.basename(export_task.file.name),
+            content_type=XLSX_CONTENT_TYPE,
+        )
 
 class CampaignListView(LoginRequiredMixin, TemplateView):
     """
@@ -1091,9 +1047,18 @@ def unsubscribe(request, campaign_id):
         )
         contact = tracking.contact
         # Помечаем контакт как черный список (или отписанный, если статус будет добавлен)
+        from apps.mailer.counters import set_contact_status
         from apps.mailer.models import Contact as MailerContact
-        contact.status = getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
-        contact.save(update_fields=['status'])
+        from apps.mailer.suppression import suppress_email
+        # Адрес больше не получает писем этого пользователя ни из одного списка
+        suppress_email(tracking.campaign.user_id, contact.email)
+        unsubscribed_status = getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
+        # Условный UPDATE: повторный переход по ссылке не учитывается дважды
+        if set_contact_status(contact, unsubscribed_status):
+            # Отписка учитывается во всех кампаниях, которые получил этот контакт
+            CampaignCounters.objects.filter(
+                campaign__email_tracking__contact=contact
+            ).update(unsubscribed=F('unsubscribed') + 1, updated_at=timezone.now())
         # Возвращаем простую страницу подтверждения
         return HttpResponse("Вы успешно отписались от рассылки.")
     except EmailTracking.DoesNotExist:
@@ -1119,172 +1084,21 @@ def export_campaign_report(request, campaign_id):
     
     export_format = (request.GET.get('format') or 'csv').lower()
 
-    # Собираем агрегаты
-    total_sent = EmailTracking.objects.filter(campaign=campaign).count()
-    delivered = EmailTracking.objects.filter(campaign=campaign, delivered_at__isnull=False).count()
-    opens = EmailTracking.objects.filter(campaign=campaign, opened_at__isnull=False).count()
-    clicks = EmailTracking.objects.filter(campaign=campaign, clicked_at__isnull=False).count()
-    from apps.mailer.models import Contact as MailerContact
-    base_tracking_qs = EmailTracking.objects.filter(campaign=campaign)
-    unsubscribed = MailerContact.objects.filter(
-        id__in=base_tracking_qs.values_list('contact_id', flat=True),
-        status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
-    ).count()
-
-    # По каждому получателю
-    trackings = base_tracking_qs.select_related('contact')
-    unsubscribed_ids = set(
-        MailerContact.objects.filter(
-            id__in=trackings.values_list('contact_id', flat=True),
-            status=getattr(MailerContact, 'UNSUBSCRIBED', getattr(MailerContact, 'BLACKLIST', 'blacklist'))
-        ).values_list('id', flat=True)
-    )
-    sender_mailbox = campaign.sender_email.email if campaign.sender_email else ''
-
-    if export_format == 'xlsx':
-        # Экспорт в Excel
-        try:
-            from openpyxl import Workbook
-            from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-            from io import BytesIO
-        except ImportError:
-            # Если нет openpyxl — фолбэк в CSV
-            export_format = 'csv'
-        else:
-            wb = Workbook()
-            ws = wb.active
-            ws.title = 'Campaign report'
-
-            thin = Side(border_style='thin', color='E5E7EB')
-            header_fill = PatternFill(start_color='EEF2FF', end_color='EEF2FF', fill_type='solid')
-            header_font = Font(bold=True, color='1E40AF', size=12)
-            title_font = Font(bold=True, size=14)
-
-            # Заголовок: информация о кампании
-            row_idx = 1
-            ws.merge_cells(f'A{row_idx}:H{row_idx}')
-            title_cell = ws.cell(row=row_idx, column=1, value='Отчет по рассылке')
-            title_cell.font = title_font
-            title_cell.alignment = Alignment(horizontal='center', vertical='center')
-            row_idx += 2
-
-            # Информация о кампании
-            info_rows = [
-                ['Кампания:', campaign.name or str(campaign.id)],
-                ['Тема:', campaign.subject or ''],
-                ['Отправитель:', f"{campaign.sender_name or ''} <{sender_mailbox}>"],
-            ]
-            for label, value in info_rows:
-                ws.cell(row=row_idx, column=1, value=label).font = Font(bold=True)
-                ws.cell(row=row_idx, column=2, value=value)
-                row_idx += 1
-
-            row_idx += 1
-
-            # Общая статистика
-            stats_rows = [
-                ['Всего отправлено', total_sent],
-                ['Доставлено', delivered],
-                ['Открыто (кол-во)', opens],
-                ['Клики (кол-во)', clicks],
-                ['Отписались (кол-во)', unsubscribed],
-            ]
-            ws.cell(row=row_idx, column=1, value='Общая статистика').font = Font(bold=True, size=12)
-            row_idx += 1
-            for label, value in stats_rows:
-                ws.cell(row=row_idx, column=1, value=label).font = Font(bold=True)
-                ws.cell(row=row_idx, column=2, value=value)
-                row_idx += 1
-
-            row_idx += 2
-
-            # Таблица получателей
-            header_row_idx = row_idx
-            headers = ['Email', 'Отправитель', 'Отправлено', 'Доставлено', 'Открыто', 'Клик', 'Отписан']
-            for col_idx, header in enumerate(headers, start=1):
-                cell = ws.cell(row=row_idx, column=col_idx, value=header)
-                cell.fill = header_fill
-                cell.font = header_font
-                cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-            row_idx += 1
-
-            # Данные по получателям
-            stripe_fill = PatternFill(start_color='F9FAFB', end_color='F9FAFB', fill_type='solid')
-            for t in trackings:
-                is_unsubscribed = 1 if t.contact_id in unsubscribed_ids else 0
-                row_data = [
-                    t.contact.email,
-                    sender_mailbox,
-                    1 if t.sent_at else 0,
-                    1 if t.delivered_at else 0,
-                    1 if t.opened_at else 0,
-                    1 if t.clicked_at else 0,
-                    is_unsubscribed,
-                ]
-                for col_idx, value in enumerate(row_data, start=1):
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.border = Border(top=thin, left=thin, right=thin, bottom=thin)
-                    if col_idx > 2:  # Числовые колонки
-                        cell.alignment = Alignment(horizontal='center')
-                    if row_idx % 2 == 0:
-                        cell.fill = stripe_fill
-                row_idx += 1
-
-            # Автоподбор ширины колонок
-            from openpyxl.utils import get_column_letter
-            max_col = ws.max_column
-            for col_idx in range(1, max_col + 1):
-                max_length = 0
-                for row in ws.iter_rows(min_col=col_idx, max_col=col_idx):
-                    for cell in row:
-                        if cell.value:
-                            cell_length = len(str(cell.value))
-                            if cell_length > max_length:
-                                max_length = cell_length
-                adjusted = min(max(12, max_length + 2), 60)
-                col_letter = get_column_letter(col_idx)
-                ws.column_dimensions[col_letter].width = adjusted
-
-            # Заморозка шапки получателей
-            ws.freeze_panes = f"A{header_row_idx + 1}"
+    # CSV отдаём потоком: строки читаются порциями, память не растёт с числом получателей
+    if export_format != 'xlsx':
+        return stream_campaign_report_csv(campaign)
 
-            buf = BytesIO()
-            wb.save(buf)
-            buf.seek(0)
-            response = HttpResponse(
-                buf.getvalue(),
-                content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            )
-            response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.xlsx"'
-            return response
+    # XLSX пишется в режиме write_only; для больших отчётов UI использует фоновый ExportTask
+    try:
+        from io import BytesIO
+        buf = BytesIO()
+        write_campaign_report_xlsx(campaign, buf)
+    except ImportError:
+        pass
+    else:
+        response = HttpResponse(buf.getvalue(), content_type=XLSX_CONTENT_TYPE)
+        response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.xlsx"'
+        return response
 
-    # CSV по умолчанию
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="campaign_report_{campaign.id}.csv"'
-
-    writer = csv.writer(response)
-    writer.writerow(['Кампания', campaign.name or str(campaign.id)])
-    writer.writerow(['Тема', campaign.subject or ''])
-    writer.writerow(['Отправитель', f"{campaign.sender_name} <{sender_mailbox}>"])
-    writer.writerow([])
-    writer.writerow(['Всего отправлено', total_sent])
-    writer.writerow(['Доставлено', delivered])
-    writer.writerow(['Открыли (кол-во)', opens])
-    writer.writerow(['Кликнули (кол-во)', clicks])
-    writer.writerow(['Отписались (кол-во)', unsubscribed])
-    writer.writerow([])
-    writer.writerow(['Email', 'Отправитель', 'Отправлено', 'Доставлено', 'Открыто', 'Клик', 'Отписан'])
-
-    for t in trackings:
-        writer.writerow([
-            t.contact.email,
-            sender_mailbox,
-            1 if t.sent_at else 0,
-            1 if t.delivered_at else 0,
-            1 if t.opened_at else 0,
-            1 if t.clicked_at else 0,
-            1 if t.contact_id in unsubscribed_ids else 0
-        ])
-
-    return response
+    # Фолбэк без openpyxl — потоковый CSV
+    return stream_campaign_report_csv(campaign)
@@ -1,16 +1,15 @@
 # emails/utils.py
-import dns.resolver
 import re
 from django.conf import settings
 
-def has_spf(domain_name):
+from core.utils.dns_resolver import get_txt_records
+
+def has_spf(domain_name, use_cache=True):
     """
     Проверяет наличие валидной SPF записи у домена
     """
     try:
-        answers = dns.resolver.resolve(domain_name, 'TXT')
-        for r in answers:
-            txt = b''.join(r.strings).decode('utf-8', errors='ignore').strip('"')
+        for txt in get_txt_records(domain_name, use_cache=use_cache):
             print(f"Checking TXT record: {txt}")  # Отладка
             
             # Проверяем, что это SPF запись
@@ -65,7 +64,7 @@ def validate_spf_record(spf_record):
     
     return True
 
-def has_dkim(domain_name, selector=None):
+def has_dkim(domain_name, selector=None, use_cache=True):
     """
     Проверяет наличие DKIM записи
     """
@@ -74,9 +73,7 @@ def has_dkim(domain_name, selector=None):
             selector = getattr(settings, 'DKIM_SELECTOR', 'vashsender')
         # например для {selector}._domainkey.domain.com
         name = f'{selector}._domainkey.{domain_name}'
-        answers = dns.resolver.resolve(name, 'TXT')
-        for r in answers:
-            txt = b''.join(r.strings).decode('utf-8', errors='ignore').strip('"')
+        for txt in get_txt_records(name, use_cache=use_cache):
             print(f"DKIM record for {name}: {txt}")  # Отладка
             if txt.startswith('v=DKIM1'):
                 print(f"Valid DKIM record found: {txt}")  # Отладка
@@ -86,15 +83,13 @@ def has_dkim(domain_name, selector=None):
         print(f"Error checking DKIM for {domain_name}: {e}")  # Отладка
         return False
 
-def has_dmarc(domain_name):
+def has_dmarc(domain_name, use_cache=True):
     """
     Проверяет наличие DMARC записи
     """
     try:
         name = f'_dmarc.{domain_name}'
-        answers = dns.resolver.resolve(name, 'TXT')
-        for r in answers:
-            txt = b''.join(r.strings).decode('utf-8', errors='ignore').strip('"')
+        for txt in get_txt_records(name, use_cache=use_cache):
             print(f"DMARC record for {name}: {txt}")  # Отладка
             if txt.startswith('v=DMARC1'):
                 print(f"Valid DMARC record found: {txt}")  # Отладка
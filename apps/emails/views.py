@@ -86,15 +86,16 @@ class DomainViewSet(viewsets.ModelViewSet):
     def verify(self, request, pk=None):
         domain = self.get_object()
         
+        # Явная проверка пользователем — идём в DNS мимо кэша (свежий ответ обновит кэш)
         # SPF проверка с использованием утилиты
-        spf_ok = has_spf(domain.domain_name)
+        spf_ok = has_spf(domain.domain_name, use_cache=False)
         
         # DKIM проверка с использованием утилиты
         from django.conf import settings as dj_settings
-        dkim_ok = has_dkim(domain.domain_name, selector=getattr(dj_settings, 'DKIM_SELECTOR', 'vashsender'))
+        dkim_ok = has_dkim(domain.domain_name, selector=getattr(dj_settings, 'DKIM_SELECTOR', 'vashsender'), use_cache=False)
         
         # DMARC проверка с использованием утилиты
-        dmarc_ok = has_dmarc(domain.domain_name)
+        dmarc_ok = has_dmarc(domain.domain_name, use_cache=False)
         
         print(f"Domain {domain.domain_name}: SPF={spf_ok}, DKIM={dkim_ok}, DMARC={dmarc_ok}")  # Отладка
         
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MailerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.mailer'
+
+    def ready(self):
+        import apps.mailer.signals
@@ -0,0 +1,180 @@
+# apps/mailer/counters.py
+
+"""
+Денормализованные счётчики контактов.
+
+- ContactList.total_contacts / valid_count / invalid_count / blacklisted_count —
+  для страницы списков и сериализаторов кампаний;
+- UserContactCount — число контактов во всех списках пользователя для проверки квоты.
+
+Массовые операции (ingest_contacts, пакетная смена статусов, удаление списка) меняют
+счётчики одним UPDATE с F()-дельтами на порцию, одиночные create/save/delete — через
+сигналы. Расхождения (падение процесса, удаление в обход ORM) исправляет сверка:
+reconcile_list_counters / reconcile_contact_counts и команда repair_contact_counters.
+"""
+
+import threading
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+
+from .models import Contact, ContactList, UserContactCount
+
+# Статус контакта -> поле счётчика в ContactList
+STATUS_COUNTER_FIELDS = {
+    Contact.VALID: 'valid_count',
+    Contact.INVALID: 'invalid_count',
+    Contact.BLACKLIST: 'blacklisted_count',
+}
+
+_state = threading.local()
+
+
+@contextmanager
+def suspend_contact_counters():
+    """
+    Отключает обновление счётчиков из сигналов в текущем потоке.
+    Код внутри блока сам применяет итоговую разницу.
+    """
+    _state.depth = getattr(_state, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _state.depth -= 1
+
+
+def counters_suspended():
+    return getattr(_state, 'depth', 0) > 0
+
+
+def adjust_user_contact_count(user_id, delta):
+    """Изменяет счётчик пользователя на delta. Если счётчика ещё нет — его посчитают при чтении."""
+    if not delta or user_id is None:
+        return
+    UserContactCount.objects.filter(user_id=user_id).update(total=F('total') + delta)
+
+
+def adjust_list_counters(contact_list_id, by_status):
+    """
+    Применяет дельты по статусам ({статус: +/-n}) к счётчикам списка
+    и изменение общего числа — к счётчику владельца.
+    """
+    deltas = {field: 0 for field in STATUS_COUNTER_FIELDS.values()}
+    for status, delta in by_status.items():
+        if status in STATUS_COUNTER_FIELDS:
+            deltas[STATUS_COUNTER_FIELDS[status]] += delta
+    total = sum(by_status.values())
+
+    updates = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    if total:
+        updates['total_contacts'] = F('total_contacts') + total
+    if updates:
+        ContactList.objects.filter(pk=contact_list_id).update(**updates)
+    if total:
+        UserContactCount.objects.filter(user__contact_lists__id=contact_list_id).update(total=F('total') + total)
+
+
+def status_change_deltas(changes):
+    """Дельты по статусам для набора переходов [(старый, новый), ...]."""
+    deltas = Counter()
+    for old_status, new_status in changes:
+        if old_status != new_status:
+            deltas[old_status] -= 1
+            deltas[new_status] += 1
+    return deltas
+
+
+def set_contact_status(contact, new_status):
+    """
+    Меняет статус контакта условным UPDATE (только если статус не изменился параллельно)
+    и корректирует счётчики. Возвращает True, если статус изменён этим вызовом.
+    """
+    old_status = contact.status
+    if old_status == new_status:
+        return False
+    with transaction.atomic():
+        changed = Contact.objects.filter(pk=contact.pk, status=old_status).update(status=new_status)
+        if changed:
+            adjust_list_counters(contact.contact_list_id, status_change_deltas([(old_status, new_status)]))
+    if changed:
+        contact.status = contact._loaded_status = new_status
+    return bool(changed)
+
+
+def _exact_count(user_id):
+    return Contact.objects.filter(contact_list__owner_id=user_id).count()
+
+
+def get_user_contact_count(user):
+    """Текущее число контактов пользователя (O(1); при первом обращении — точный подсчёт)."""
+    total = UserContactCount.objects.filter(user_id=user.pk).values_list('total', flat=True).first()
+    if total is not None:
+        return max(total, 0)
+
+    total = _exact_count(user.pk)
+    try:
+        with transaction.atomic():
+            UserContactCount.objects.create(user_id=user.pk, total=total)
+    except IntegrityError:
+        # Счётчик параллельно создал другой процесс
+        total = UserContactCount.objects.filter(user_id=user.pk).values_list('total', flat=True).first()
+    return max(total or 0, 0)
+
+
+def reconcile_contact_counts():
+    """
+    Сверяет счётчики пользователей с фактическим числом контактов (один GROUP BY по контактам).
+    Возвращает число исправленных счётчиков.
+    """
+    actual = dict(
+        Contact.objects.order_by()
+        .values_list('contact_list__owner_id')
+        .annotate(total=Count('id'))
+    )
+    fixed = 0
+    for counter in UserContactCount.objects.all().iterator():
+        total = actual.get(counter.user_id, 0)
+        if counter.total != total:
+            fixed += UserContactCount.objects.filter(
+                user_id=counter.user_id, total=counter.total
+            ).update(total=total)
+    return fixed
+
+
+def reconcile_list_counters(contact_lists=None, dry_run=False):
+    """
+    Сверяет счётчики списков с таблицей контактов (один GROUP BY).
+    contact_lists — queryset списков (по умолчанию все).
+    Возвращает [(список, {поле: (было, стало)}), ...] для расходящихся списков.
+    """
+    if contact_lists is None:
+        contact_lists = ContactList.objects.all()
+
+    aggregates = {
+        field: Count('id', filter=Q(status=status)) for status, field in STATUS_COUNTER_FIELDS.items()
+    }
+    actual = {
+        row.pop('contact_list_id'): row
+        for row in Contact.objects.filter(contact_list__in=contact_lists).order_by()
+        .values('contact_list_id').annotate(total_contacts=Count('id'), **aggregates)
+    }
+
+    drifted = []
+    for contact_list in contact_lists.order_by('pk').iterator():
+        expected = actual.get(contact_list.pk) or dict.fromkeys(ContactList.COUNTER_FIELDS, 0)
+        diff = {
+            field: (getattr(contact_list, field), expected[field])
+            for field in ContactList.COUNTER_FIELDS
+            if getattr(contact_list, field) != expected[field]
+        }
+        if not diff:
+            continue
+        drifted.append((contact_list, diff))
+        if not dry_run:
+            # Условный UPDATE: если счётчики успели измениться, список проверится при следующей сверке
+            ContactList.objects.filter(
+                pk=contact_list.pk, **{field: old for field, (old, _) in diff.items()}
+            ).update(**{field: new for field, (_, new) in diff.items()})
+    return drifted
@@ -0,0 +1,10 @@
+import hashlib
+
+
+def email_hash(email):
+    """
+    64-битный хэш нормализованного адреса (signed, помещается в BIGINT).
+    Используется для сравнения адресов между списками без JOIN по varchar.
+    """
+    normalized = (email or '').strip().lower().encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(normalized, digest_size=8).digest(), 'big', signed=True)
@@ -0,0 +1,157 @@
+# apps/mailer/ingest.py
+
+"""
+Массовая запись контактов в список.
+
+На PostgreSQL строки копируются (COPY) во временную таблицу и переносятся в контакты
+одним INSERT … SELECT … ON CONFLICT (contact_list_id, email) DO NOTHING RETURNING —
+без предварительных запросов на существование и без хранения всех адресов списка в памяти.
+На остальных СУБД (SQLite в разработке) — через ORM.
+"""
+
+import io
+from collections import Counter
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .counters import adjust_list_counters
+from .hashing import email_hash
+from .models import Contact
+
+
+INGEST_BATCH_SIZE = 5000      # адресов на одну вставку при импорте без валидации
+INGEST_ORM_CHUNK_SIZE = 500  # лимит переменных SQLite на один запрос
+
+
+def _copy_value(value):
+    """Экранирование значения для текстового формата COPY."""
+    return (
+        str(value)
+        .replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+
+def _empty_result(received):
+    return {
+        'received': received,     # строк передано (после удаления дубликатов внутри порции)
+        'inserted': 0,            # создано контактов
+        'by_status': Counter(),   # созданные контакты по статусам
+        'existing': 0,            # уже были в списке
+        'limit_reached': False,   # часть новых адресов не записана из-за лимита
+    }
+
+
+def _dedupe(rows):
+    unique = {}
+    for email, status in rows:
+        if email and email not in unique:
+            unique[email] = status
+    return unique
+
+
+def _ingest_postgresql(contact_list_id, unique, limit, added_date):
+    result = _empty_result(len(unique))
+    table = connection.ops.quote_name(Contact._meta.db_table)
+    list_col = connection.ops.quote_name(Contact._meta.get_field('contact_list').column)
+
+    buf = io.StringIO()
+    for position, (email, status) in enumerate(unique.items()):
+        buf.write(f"{position}\t{_copy_value(email)}\t{email_hash(email)}\t{_copy_value(status)}\n")
+    buf.seek(0)
+
+    limit_sql = 'LIMIT %s' if limit is not None else ''
+    limit_params = [max(0, limit)] if limit is not None else []
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMP TABLE contact_ingest_staging "
+            "(position integer, email varchar(254), email_hash bigint, status varchar(20)) ON COMMIT DROP"
+        )
+        cursor.cursor.copy_expert(
+            "COPY contact_ingest_staging (position, email, email_hash, status) FROM STDIN", buf
+        )
+        # Убираем адреса, которые уже есть в списке (по индексу contact_list_id + email)
+        cursor.execute(
+            f"DELETE FROM contact_ingest_staging s USING {table} c "
+            f"WHERE c.{list_col} = %s AND c.email = s.email",
+            [contact_list_id],
+        )
+        result['existing'] = cursor.rowcount
+        # Порядок файла сохраняется: при лимите записываются первые новые адреса.
+        # ON CONFLICT защищает от параллельной записи тех же адресов.
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({list_col}, email, email_hash, status, added_date)
+            SELECT %s, s.email, s.email_hash, s.status, %s
+            FROM (
+                SELECT position, email, email_hash, status FROM contact_ingest_staging
+                ORDER BY position {limit_sql}
+            ) s
+            ON CONFLICT ({list_col}, email) DO NOTHING
+            RETURNING status
+            """,
+            [contact_list_id, added_date] + limit_params,
+        )
+        for (status,) in cursor.fetchall():
+            result['by_status'][status] += 1
+        result['inserted'] = sum(result['by_status'].values())
+        # Счётчики списка и квоты меняются в той же транзакции, что и контакты
+        adjust_list_counters(contact_list_id, result['by_status'])
+
+    result['limit_reached'] = limit is not None and result['received'] - result['existing'] > limit
+    return result
+
+
+def _ingest_orm(contact_list_id, unique, limit, added_date):
+    result = _empty_result(len(unique))
+    emails = list(unique)
+    existing = set()
+    for start in range(0, len(emails), INGEST_ORM_CHUNK_SIZE):
+        existing.update(Contact.objects.filter(
+            contact_list_id=contact_list_id, email__in=emails[start:start + INGEST_ORM_CHUNK_SIZE]
+        ).values_list('email', flat=True))
+    result['existing'] = len(existing)
+
+    new_rows = [(email, status) for email, status in unique.items() if email not in existing]
+    if limit is not None and len(new_rows) > limit:
+        new_rows = new_rows[:max(0, limit)]
+        result['limit_reached'] = True
+
+    with transaction.atomic():
+        Contact.objects.bulk_create(
+            [
+                Contact(
+                    contact_list_id=contact_list_id, email=email, email_hash=email_hash(email),
+                    status=status, added_date=added_date,
+                )
+                for email, status in new_rows
+            ],
+            batch_size=INGEST_ORM_CHUNK_SIZE,
+            ignore_conflicts=True,
+        )
+        adjust_list_counters(contact_list_id, Counter(status for _, status in new_rows))
+    for _, status in new_rows:
+        result['by_status'][status] += 1
+    result['inserted'] = len(new_rows)
+    return result
+
+
+def ingest_contacts(contact_list_id, rows, limit=None, added_date=None) -> dict:
+    """
+    Записывает контакты в список, пропуская уже существующие адреса.
+
+    rows — итерируемое (email, status) с нормализованными адресами;
+    limit — максимум новых контактов (остаток квоты), None — без ограничения.
+    Возвращает счётчики: received, inserted, by_status, existing, limit_reached.
+    """
+    unique = _dedupe(rows)
+    if not unique:
+        return _empty_result(0)
+    added_date = added_date or timezone.now()
+    if connection.vendor == 'postgresql':
+        return _ingest_postgresql(contact_list_id, unique, limit, added_date)
+    return _ingest_orm(contact_list_id, unique, limit, added_date)
@@ -0,0 +1,270 @@
+# apps/mailer/list_operations.py
+
+"""
+Операции над списками контактов целиком в SQL, без выгрузки и повторного импорта.
+
+- union        — в целевой список добавляются контакты всех исходных списков;
+- difference   — контакты первого списка, которых нет ни в одном из остальных;
+- intersection — контакты первого списка, которые есть во всех остальных;
+- copy / move  — контакты одного списка по фильтру (статусы, подстрока email);
+  при move скопированные (или уже имевшиеся в целевом) адреса удаляются из исходного;
+- dedupe       — из целевого списка удаляются адреса, которые есть в исходных списках.
+
+Исходный список читается порциями по LIST_OPERATION_BATCH_SIZE id. На порцию —
+один INSERT … SELECT … ON CONFLICT (contact_list_id, email) DO NOTHING RETURNING status
+(адреса, уже имеющиеся в целевом списке, отсекаются NOT EXISTS до LIMIT остатка квоты) и
+в той же транзакции — дельты счётчиков списка и пользователя. Статус, email_hash и
+вердикты валидации копируются как есть: повторная проверка адресов не нужна.
+Запросы одинаковы для PostgreSQL и SQLite (3.35+).
+"""
+
+import logging
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .counters import adjust_list_counters
+from .models import Contact, ContactList, ContactListOperation
+from .utils import get_contact_quota
+
+logger = logging.getLogger(__name__)
+
+LIST_OPERATION_BATCH_SIZE = getattr(settings, 'LIST_OPERATION_BATCH_SIZE', 10000)
+
+# Операции, добавляющие контакты (для них действует квота тарифа)
+ADDING_OPERATIONS = (
+    ContactListOperation.UNION, ContactListOperation.DIFFERENCE,
+    ContactListOperation.INTERSECTION, ContactListOperation.COPY,
+)
+
+
+def _names():
+    quote = connection.ops.quote_name
+    return quote(Contact._meta.db_table), quote(Contact._meta.get_field('contact_list').column)
+
+
+def _filter_sql(filters):
+    """Условия фильтра copy / move по строке c."""
+    sql, params = '', []
+    statuses = [value for value in filters.get('status') or [] if value in dict(Contact.STATUS_CHOICES)]
+    if statuses:
+        sql += f" AND c.status IN ({', '.join(['%s'] * len(statuses))})"
+        params += statuses
+    search = (filters.get('search') or '').strip().lower()
+    if search:
+        # Как у lookup contains: %, _ и \ в поисковой строке — обычные символы
+        sql += " AND LOWER(c.email) LIKE %s ESCAPE '\\'"
+        params.append('%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+    return sql, params
+
+
+def _membership_sql(operation, other_list_ids):
+    """Условия принадлежности адреса строки c остальным спискам."""
+    table, list_col = _names()
+    if not other_list_ids:
+        return '', []
+    if operation == ContactListOperation.INTERSECTION:
+        sql = ''.join(
+            f" AND EXISTS (SELECT 1 FROM {table} o WHERE o.{list_col} = %s AND o.email = c.email)"
+            for _ in other_list_ids
+        )
+        return sql, list(other_list_ids)
+    placeholders = ', '.join(['%s'] * len(other_list_ids))
+    exists = f"EXISTS (SELECT 1 FROM {table} o WHERE o.{list_col} IN ({placeholders}) AND o.email = c.email)"
+    if operation == ContactListOperation.DIFFERENCE:
+        return f" AND NOT {exists}", list(other_list_ids)
+    if operation == ContactListOperation.DEDUPE:
+        return f" AND {exists}", list(other_list_ids)
+    return '', []
+
+
+def _candidates_sql(operation, base_list_id, after_id, upper_id, other_list_ids, filters):
+    """FROM/WHERE строк порции исходного списка, подходящих под операцию."""
+    table, list_col = _names()
+    sql = f"FROM {table} c WHERE c.{list_col} = %s AND c.id > %s AND c.id <= %s"
+    params = [base_list_id, after_id, upper_id]
+    for extra_sql, extra_params in (
+        _filter_sql(filters),
+        _membership_sql(operation, other_list_ids),
+    ):
+        sql += extra_sql
+        params += extra_params
+    return sql, params
+
+
+def _insert_batch(target_list_id, candidates_sql, candidates_params, limit, added_date):
+    """Копирует подходящие строки в целевой список. Возвращает Counter статусов вставленных."""
+    table, list_col = _names()
+    limit_sql = 'LIMIT %s' if limit is not None else ''
+    limit_params = [limit] if limit is not None else []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} ({list_col}, email, email_hash, status, added_date)
+            SELECT %s, s.email, s.email_hash, s.status, %s
+            FROM (
+                SELECT c.id, c.email, c.email_hash, c.status {candidates_sql}
+                AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{list_col} = %s AND t.email = c.email)
+                ORDER BY c.id {limit_sql}
+            ) s
+            WHERE true
+            ON CONFLICT ({list_col}, email) DO NOTHING
+            RETURNING status
+            """,
+            [target_list_id, connection.ops.adapt_datetimefield_value(added_date)]
+            + candidates_params + [target_list_id] + limit_params,
+        )
+        return Counter(status for (status,) in cursor.fetchall())
+
+
+def _has_more_candidates(target_list_id, candidates_sql, candidates_params):
+    table, list_col = _names()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT 1 {candidates_sql} "
+            f"AND NOT EXISTS (SELECT 1 FROM {table} t WHERE t.{list_col} = %s AND t.email = c.email) LIMIT 1",
+            candidates_params + [target_list_id],
+        )
+        return cursor.fetchone() is not None
+
+
+def _delete_batch(condition_sql, condition_params):
+    """Удаляет строки, подходящие под условие. Возвращает Counter статусов удалённых."""
+    table, _ = _names()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT c.id {condition_sql}) RETURNING status",
+            condition_params,
+        )
+        return Counter(status for (status,) in cursor.fetchall())
+
+
+def _base_lists(operation):
+    """Списки, которые просматриваются по порциям, и остальные списки операции."""
+    sources = [int(value) for value in operation.source_list_ids]
+    if operation.operation == ContactListOperation.UNION:
+        return sources, []
+    if operation.operation == ContactListOperation.DEDUPE:
+        return [operation.target_list_id], sources
+    return sources[:1], sources[1:]
+
+
+def _next_ids(list_id, after_id, batch_size):
+    return list(
+        Contact.objects.filter(contact_list_id=list_id, id__gt=after_id)
+        .order_by('id').values_list('id', flat=True)[:batch_size]
+    )
+
+
+def _process_batch(operation, base_list_id, others, after_id, upper_id):
+    """Одна порция: возвращает (вставлено, удалено, достигнут лимит)."""
+    kind = operation.operation
+    target_id = operation.target_list_id
+
+    if kind == ContactListOperation.DEDUPE:
+        # Удаляем из целевого списка адреса, которые есть хотя бы в одном исходном
+        sql, params = _candidates_sql(kind, base_list_id, after_id, upper_id, others, {})
+        removed = _delete_batch(sql, params)
+        adjust_list_counters(target_id, {status: -count for status, count in removed.items()})
+        return 0, sum(removed.values()), False
+
+    candidates_sql, candidates_params = _candidates_sql(
+        kind, base_list_id, after_id, upper_id, others, operation.filters or {},
+    )
+    limit = None
+    if kind in ADDING_OPERATIONS:
+        limit = get_contact_quota(operation.user)['remaining']
+        if limit == 0:
+            return 0, 0, _has_more_candidates(target_id, candidates_sql, candidates_params)
+
+    inserted = _insert_batch(target_id, candidates_sql, candidates_params, limit, timezone.now())
+    adjust_list_counters(target_id, inserted)
+    inserted_count = sum(inserted.values())
+    limit_reached = (
+        limit is not None and inserted_count >= limit
+        and _has_more_candidates(target_id, candidates_sql, candidates_params)
+    )
+
+    removed_count = 0
+    if kind == ContactListOperation.MOVE:
+        table, list_col = _names()
+        removed = _delete_batch(
+            f"{candidates_sql} AND EXISTS (SELECT 1 FROM {table} t WHERE t.{list_col} = %s AND t.email = c.email)",
+            candidates_params + [target_id],
+        )
+        adjust_list_counters(base_list_id, {status: -count for status, count in removed.items()})
+        removed_count = sum(removed.values())
+    return inserted_count, removed_count, limit_reached
+
+
+def operation_total(operation):
+    """Число контактов в просматриваемых списках (по счётчикам) — для индикатора прогресса."""
+    base, _ = _base_lists(operation)
+    return sum(ContactList.objects.filter(id__in=base).values_list('total_contacts', flat=True))
+
+
+def run_list_operation(operation_id, batch_size=LIST_OPERATION_BATCH_SIZE):
+    """
+    Выполняет операцию с сохранённой позиции до конца (или до исчерпания квоты).
+    Позиция, счётчики и heartbeat сохраняются в транзакции порции, поэтому прерванная
+    операция продолжается без повторов (см. tasks.resume_stale_list_operations).
+    """
+    operation = ContactListOperation.objects.select_related('user').get(id=operation_id)
+    if operation.status in (ContactListOperation.COMPLETED, ContactListOperation.FAILED):
+        return operation
+
+    ContactListOperation.objects.filter(id=operation.id).update(
+        status=ContactListOperation.RUNNING,
+        started_at=operation.started_at or timezone.now(),
+        heartbeat_at=timezone.now(),
+        total=operation_total(operation),
+    )
+
+    base_lists, others = _base_lists(operation)
+    limit_reached = False
+    while operation.source_index < len(base_lists) and not limit_reached:
+        base_list_id = base_lists[operation.source_index]
+        if base_list_id == operation.target_list_id and operation.operation != ContactListOperation.DEDUPE:
+            operation.source_index += 1
+            operation.last_contact_id = 0
+            continue
+
+        ids = _next_ids(base_list_id, operation.last_contact_id, batch_size)
+        if not ids:
+            operation.source_index += 1
+            operation.last_contact_id = 0
+            ContactListOperation.objects.filter(id=operation.id).update(
+                source_index=operation.source_index, last_contact_id=0, heartbeat_at=timezone.now(),
+            )
+            continue
+
+        with transaction.atomic():
+            inserted, removed, limit_reached = _process_batch(
+                operation, base_list_id, others, operation.last_contact_id, ids[-1],
+            )
+            operation.last_contact_id = ids[-1]
+            operation.processed += len(ids)
+            operation.inserted += inserted
+            operation.removed += removed
+            ContactListOperation.objects.filter(id=operation.id).update(
+                source_index=operation.source_index,
+                last_contact_id=operation.last_contact_id,
+                processed=operation.processed,
+                inserted=operation.inserted,
+                removed=operation.removed,
+                heartbeat_at=timezone.now(),
+            )
+
+    ContactListOperation.objects.filter(id=operation.id).update(
+        status=ContactListOperation.COMPLETED,
+        limit_reached=limit_reached,
+        completed_at=timezone.now(),
+    )
+    logger.info(
+        f"List operation {operation.id} ({operation.operation}) completed: "
+        f"inserted={operation.inserted}, removed={operation.removed}, limit_reached={limit_reached}"
+    )
+    operation.refresh_from_db()
+    return operation
@@ -1,8 +1,14 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from apps.mailer.counters import adjust_list_counters, status_change_deltas
+from apps.mailer.ingest import ingest_contacts
 from apps.mailer.models import ContactList, ImportTask, Contact
+from apps.mailer.tasks import schedule_recheck
 from apps.mailer.utils import (
-    parse_emails,
-    validate_email_production,
+    iter_email_batches,
+    count_import_rows,
+    validate_emails_batch,
+    import_status,
     get_contact_quota,
     format_quota_error,
 )
@@ -62,114 +68,77 @@ class Command(BaseCommand):
             task.started_at = timezone.now()
             task.save()
 
-            # Читаем файл
-            with open(file_path, 'rb') as f:
-                emails = parse_emails(f, task.filename)
-
-            task.total_emails = len(emails)
+            # Оценка объёма по числу строк; сам файл читается потоково
+            task.total_emails = count_import_rows(file_path, task.filename)
             task.save()
 
-            # Обрабатываем email адреса
-            contacts_to_create = []
-            contacts_to_update = []
+            # Обрабатываем email адреса порциями
             processed = 0
-
             limit_reached = False
+            domain_verdicts = {}
 
-            for email in emails:
-                try:
-                    processed += 1
-                    
-                    # Обновляем прогресс каждые 50 email
-                    if processed % 50 == 0:
-                        task.processed_emails = processed
-                        task.save()
-
-                    # Валидируем email
-                    validation_result = validate_email_production(email)
-                    
-                    if limit and remaining_slots is not None and remaining_slots <= 0:
-                        limit_reached = True
-                        break
-
-                    if validation_result['is_valid']:
-                        status_code = validation_result['status']
-                        
-                        # Проверяем, существует ли уже контакт
-                        try:
-                            existing_contact = Contact.objects.get(
-                                contact_list=task.contact_list,
-                                email=email
-                            )
-                            # Обновляем статус если нужно
-                            if existing_contact.status != status_code:
-                                existing_contact.status = status_code
-                                contacts_to_update.append(existing_contact)
-                        except Contact.DoesNotExist:
-                            # Создаем новый контакт
-                            new_contact = Contact(
-                                contact_list=task.contact_list,
-                                email=email,
-                                status=status_code
-                            )
-                            contacts_to_create.append(new_contact)
-                            task.imported_count += 1
-                            if remaining_slots is not None:
-                                remaining_slots -= 1
-                            if status_code == Contact.BLACKLIST:
-                                task.blacklisted_count += 1
-                    else:
-                        # Добавляем невалидные email как INVALID
-                        try:
-                            existing_contact = Contact.objects.get(
-                                contact_list=task.contact_list,
-                                email=email
-                            )
-                        except Contact.DoesNotExist:
-                            new_contact = Contact(
-                                contact_list=task.contact_list,
-                                email=email,
-                                status=Contact.INVALID
-                            )
-                            contacts_to_create.append(new_contact)
-                            task.invalid_count += 1
-                            if remaining_slots is not None:
-                                remaining_slots -= 1
-                    
-                    # Батчинг: сохраняем каждые 50 контактов
-                    if len(contacts_to_create) >= 50:
-                        try:
-                            Contact.objects.bulk_create(contacts_to_create, ignore_conflicts=True)
-                            contacts_to_create = []
-                        except Exception:
-                            task.error_count += len(contacts_to_create)
-                            contacts_to_create = []
-                    
-                    # Обновляем существующие контакты
-                    if len(contacts_to_update) >= 50:
+            with open(file_path, 'rb') as f:
+                for batch in iter_email_batches(f, task.filename, batch_size=1000):
+                    processed += len(batch)
+                    emails = list(dict.fromkeys(email for email in batch if email))
+
+                    try:
+                        # Валидируем порцию: каждый домен проверяется один раз за импорт
+                        results = validate_emails_batch(emails, domain_verdicts=domain_verdicts)
+                    except Exception:
+                        task.error_count += len(emails)
+                        continue
+
+                    statuses = {email: import_status(result) for email, result in results.items()}
+                    unresolved = {email for email, result in results.items() if result['temporary']}
+
+                    # Обновляем статус уже существующих контактов, если он изменился
+                    existing = list(Contact.objects.filter(
+                        contact_list=task.contact_list,
+                        email__in=emails
+                    ))
+                    contacts_to_update = []
+                    for contact in existing:
+                        new_status = statuses.get(contact.email)
+                        # Временная ошибка проверки статус существующего контакта не меняет
+                        if contact.email in unresolved:
+                            continue
+                        if new_status and contact.status != new_status:
+                            contact.status = new_status
+                            contacts_to_update.append(contact)
+                    if contacts_to_update:
                         try:
-                            Contact.objects.bulk_update(contacts_to_update, ['status'])
-                            contacts_to_update = []
+                            with transaction.atomic():
+                                Contact.objects.bulk_update(contacts_to_update, ['status'])
+                                adjust_list_counters(task.contact_list_id, status_change_deltas(
+                                    (contact._loaded_status, contact.status) for contact in contacts_to_update
+                                ))
                         except Exception:
                             task.error_count += len(contacts_to_update)
-                            contacts_to_update = []
-                            
-                except Exception:
-                    task.error_count += 1
-                    continue
-
-            # Сохраняем оставшиеся контакты
-            if contacts_to_create:
-                try:
-                    Contact.objects.bulk_create(contacts_to_create, ignore_conflicts=True)
-                except Exception:
-                    task.error_count += len(contacts_to_create)
-
-            if contacts_to_update:
-                try:
-                    Contact.objects.bulk_update(contacts_to_update, ['status'])
-                except Exception:
-                    task.error_count += len(contacts_to_update)
+
+                    # Новые контакты — одной вставкой, существующие пропускаются в БД
+                    existing_emails = {contact.email for contact in existing}
+                    rows = [(email, status_code) for email, status_code in statuses.items() if email not in existing_emails]
+                    try:
+                        ingested = ingest_contacts(task.contact_list_id, rows, limit=remaining_slots)
+                    except Exception:
+                        task.error_count += len(rows)
+                    else:
+                        task.imported_count += ingested['inserted'] - ingested['by_status'][Contact.INVALID]
+                        task.invalid_count += ingested['by_status'][Contact.INVALID]
+                        task.blacklisted_count += ingested['by_status'][Contact.BLACKLIST]
+                        if remaining_slots is not None:
+                            remaining_slots -= ingested['inserted']
+                        if ingested['limit_reached']:
+                            limit_reached = True
+                        if unresolved:
+                            schedule_recheck(task.contact_list_id, unresolved - existing_emails)
+
+                    task.processed_emails = processed
+                    task.save()
+
+                    if limit_reached:
+                        break
 
             # Завершаем задачу
             task.status = ImportTask.COMPLETED
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apps.mailer.counters import reconcile_contact_counts, reconcile_list_counters
+from apps.mailer.models import ContactList
+
+
+class Command(BaseCommand):
+    help = 'Сверяет счётчики контактов списков и пользователей с фактическими данными и исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--list-id', type=int, help='Проверить только указанный список')
+        parser.add_argument('--user-email', type=str, help='Проверить только списки пользователя')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать расхождения')
+
+    def handle(self, *args, **options):
+        contact_lists = ContactList.objects.all()
+        if options['list_id']:
+            contact_lists = contact_lists.filter(pk=options['list_id'])
+        if options['user_email']:
+            contact_lists = contact_lists.filter(owner__email=options['user_email'])
+
+        drifted = reconcile_list_counters(contact_lists, dry_run=options['dry_run'])
+        for contact_list, diff in drifted:
+            changes = ', '.join(f'{field}: {old} -> {new}' for field, (old, new) in diff.items())
+            self.stdout.write(f'Список {contact_list.pk} ({contact_list.name}): {changes}')
+
+        if options['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Расхождений в списках: {len(drifted)} (ничего не изменено)'))
+            return
+
+        fixed_users = reconcile_contact_counts()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено списков: {len(drifted)}, счётчиков пользователей: {fixed_users}'
+        ))
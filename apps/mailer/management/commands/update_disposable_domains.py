@@ -0,0 +1,88 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.mailer.utils import DISPOSABLE_DOMAINS_FILE, read_domain_list, is_allowlist_domain
+
+
+# Снимок берётся из поддерживаемого списка disposable-email-domains (CC0)
+DISPOSABLE_DOMAINS_URL = getattr(
+    settings, 'DISPOSABLE_DOMAINS_URL',
+    'https://raw.githubusercontent.com/disposable-email-domains/disposable-email-domains/main/disposable_email_blocklist.conf',
+)
+DOWNLOAD_TIMEOUT = 30  # секунд
+
+
+class Command(BaseCommand):
+    help = (
+        'Обновляет снимок disposable-доменов: скачивает upstream-список (по умолчанию '
+        'DISPOSABLE_DOMAINS_URL) или читает локальный файл. Рабочие процессы сеть не используют.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default=None,
+                            help='Файл или URL со списком доменов (по умолчанию — DISPOSABLE_DOMAINS_URL)')
+        parser.add_argument('--merge', action='store_true', help='Добавить к текущему снимку, а не заменить его')
+        parser.add_argument('--snapshot-version', dest='snapshot_version', type=str, default=None,
+                            help='Версия снимка (по умолчанию — сегодняшняя дата)')
+
+    def handle(self, *args, **options):
+        source = options['source'] or DISPOSABLE_DOMAINS_URL
+        if source.startswith(('http://', 'https://')):
+            domains = set(self.download(source))
+        elif os.path.exists(source):
+            domains = set(read_domain_list(source))
+        else:
+            raise CommandError(f'Файл не найден: {source}')
+
+        if options['merge'] and os.path.exists(DISPOSABLE_DOMAINS_FILE):
+            domains |= read_domain_list(DISPOSABLE_DOMAINS_FILE)
+
+        # Домены из allowlist никогда не попадают в снимок
+        skipped = {domain for domain in domains if is_allowlist_domain(domain)}
+        domains -= skipped
+        if not domains:
+            raise CommandError('Список доменов пуст')
+
+        version = options['snapshot_version'] or timezone.now().date().isoformat()
+        target_dir = os.path.dirname(DISPOSABLE_DOMAINS_FILE)
+        fd, tmp_path = tempfile.mkstemp(dir=target_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write('# Список disposable (одноразовых) email-доменов\n')
+                f.write(f'# source: {source}\n')
+                f.write(f'# version: {version}\n')
+                f.write('# Обновление: python manage.py update_disposable_domains [<файл или URL>]\n')
+                for domain in sorted(domains):
+                    f.write(domain + '\n')
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, DISPOSABLE_DOMAINS_FILE)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if skipped:
+            self.stdout.write(f'Пропущено доменов из allowlist: {len(skipped)}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Снимок обновлён: {len(domains)} доменов, версия {version}. Перезапустите воркеры, чтобы применить.'
+        ))
+
+    def download(self, url):
+        import requests
+
+        try:
+            response = requests.get(url, timeout=DOWNLOAD_TIMEOUT)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            raise CommandError(f'Не удалось скачать список доменов {url}: {e}')
+
+        domains = set()
+        for line in response.text.splitlines():
+            line = line.strip().lower()
+            if line and not line.startswith('#'):
+                domains.add(line.rstrip('.'))
+        return domains
@@ -1,95 +1,87 @@
-from django.core.management.base import BaseCommand
-from apps.mailer.models import Contact, ContactList
-from apps.mailer.utils import validate_email_production
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.mailer.models import Contact, ContactList, RevalidationJob
+from apps.mailer.revalidation import run_revalidation_job
+from apps.mailer.tasks import start_revalidation
+
 
 class Command(BaseCommand):
-    help = 'Validate contacts in background'
+    help = 'Перевалидация существующих контактов (список, пользователь или вся база)'
 
     def add_arguments(self, parser):
-        parser.add_argument('--list-id', type=str, help='Contact list ID to validate')
-        parser.add_argument('--batch-size', type=int, default=100, help='Batch size for processing')
-        parser.add_argument('--status', type=str, default='valid', help='Status to validate (valid, invalid, all)')
+        scope = parser.add_mutually_exclusive_group()
+        scope.add_argument('--list-id', type=int, help='ID списка контактов')
+        scope.add_argument('--user-email', type=str, help='Email владельца: все его списки')
+        scope.add_argument('--all', action='store_true', help='Все контакты')
+        scope.add_argument('--resume', type=int, metavar='JOB_ID', help='Продолжить незавершённое задание')
+        parser.add_argument('--status', type=str, default='valid',
+                            help='Статусы для проверки: valid, invalid или all')
+        parser.add_argument('--smtp', action='store_true', help='Проверять адреса через SMTP (RCPT TO)')
+        parser.add_argument('--workers', type=int, default=16, help='Одновременных DNS/SMTP проверок')
+        parser.add_argument('--batch-size', type=int, default=None, help='Контактов в порции')
+        parser.add_argument('--async', dest='run_async', action='store_true',
+                            help='Поставить задание в очередь Celery вместо выполнения в команде')
 
     def handle(self, *args, **options):
-        list_id = options.get('list_id')
-        batch_size = options.get('batch_size')
-        status_filter = options.get('status')
-
-        if list_id:
-            try:
-                contact_list = ContactList.objects.get(id=list_id)
-                self.stdout.write(f'Validating contacts in list: {contact_list.name}')
-            except ContactList.DoesNotExist:
-                self.stdout.write(self.style.ERROR(f'Contact list with ID {list_id} not found'))
-                return
+        if options['resume']:
+            job = RevalidationJob.objects.filter(id=options['resume']).first()
+            if job is None:
+                raise CommandError(f'Задание {options["resume"]} не найдено')
+            if job.status not in (RevalidationJob.PENDING, RevalidationJob.RUNNING):
+                raise CommandError(f'Задание {job.id} уже в статусе {job.status}')
         else:
-            self.stdout.write('Validating all contacts in all lists')
-            contact_list = None
+            job = self._create_job(options)
 
-        # Определяем фильтр по статусу
-        if status_filter == 'valid':
-            status_filter = Contact.VALID
-        elif status_filter == 'invalid':
-            status_filter = Contact.INVALID
-        else:
-            status_filter = None
-        
-        # Получаем контакты для валидации
-        if contact_list:
-            if status_filter:
-                contacts = Contact.objects.filter(contact_list=contact_list, status=status_filter)
-            else:
-                contacts = Contact.objects.filter(contact_list=contact_list)
-        else:
-            if status_filter:
-                contacts = Contact.objects.filter(status=status_filter)
-        else:
-            contacts = Contact.objects.all()
-        
-        total_contacts = contacts.count()
-        self.stdout.write(f'Found {total_contacts} contacts to validate')
-        
-        if total_contacts == 0:
-            self.stdout.write('No contacts to validate')
+        if options['run_async']:
+            start_revalidation(job)
+            self.stdout.write(self.style.SUCCESS(f'Задание {job.id} поставлено в очередь'))
             return
-        
-        # Валидируем контакты батчами
-        processed = 0
-        updated = 0
-        errors = 0
 
-        for i in range(0, total_contacts, batch_size):
-            batch = contacts[i:i + batch_size]
-            
-            for contact in batch:
-                try:
-                    processed += 1
-                    
-                    if processed % 100 == 0:
-                        self.stdout.write(f'Processed {processed}/{total_contacts} contacts')
-            
-            # Валидируем email
-            validation_result = validate_email_production(contact.email)
-            
-                    # Обновляем статус если нужно
-                    if validation_result['is_valid']:
-            new_status = validation_result['status']
-                        if contact.status != new_status:
-                    contact.status = new_status
-                    contact.save(update_fields=['status'])
-                            updated += 1
-            else:
-                        if contact.status != Contact.INVALID:
-                            contact.status = Contact.INVALID
-                            contact.save(update_fields=['status'])
-                            updated += 1
-                            
-                except Exception as e:
-                    self.stdout.write(self.style.ERROR(f'Error validating contact {contact.email}: {e}'))
-                    errors += 1
-                    continue
+        self.stdout.write(f'Задание {job.id}: перевалидация ({job.get_scope_display()})')
+        domain_verdicts = {}
+        while not run_revalidation_job(job.id, slice_seconds=60, domain_verdicts=domain_verdicts):
+            job.refresh_from_db()
+            self.stdout.write(f'Проверено {job.processed}, изменено {job.changed}')
+
+        job.refresh_from_db()
+        self.stdout.write(self.style.SUCCESS(
+            f'Задание {job.id} ({job.status}): проверено {job.processed}, изменено {job.changed} '
+            f'(valid: {job.became_valid}, invalid: {job.became_invalid}, blacklist: {job.became_blacklisted}), '
+            f'без изменений из-за временных ошибок: {job.unknown}'
+        ))
 
-        self.stdout.write(self.style.SUCCESS(f'Validation completed!'))
-        self.stdout.write(f'Total processed: {processed}')
-        self.stdout.write(f'Updated: {updated}')
-        self.stdout.write(f'Errors: {errors}') 
\ No newline at end of file
+    def _create_job(self, options):
+        status = options['status']
+        if status == 'all':
+            statuses = f'{Contact.VALID},{Contact.INVALID}'
+        elif status in (Contact.VALID, Contact.INVALID):
+            statuses = status
+        else:
+            raise CommandError('--status: valid, invalid или all')
+
+        job = RevalidationJob(
+            statuses=statuses,
+            smtp_check=options['smtp'],
+            max_workers=max(1, options['workers']),
+            batch_size=options['batch_size'],
+        )
+        if options['list_id']:
+            contact_list = ContactList.objects.filter(id=options['list_id']).first()
+            if contact_list is None:
+                raise CommandError(f'Список {options["list_id"]} не найден')
+            job.scope = RevalidationJob.SCOPE_LIST
+            job.contact_list = contact_list
+            job.user_id = contact_list.owner_id
+        elif options['user_email']:
+            user = get_user_model().objects.filter(email=options['user_email']).first()
+            if user is None:
+                raise CommandError(f'Пользователь {options["user_email"]} не найден')
+            job.scope = RevalidationJob.SCOPE_USER
+            job.user = user
+        elif options['all']:
+            job.scope = RevalidationJob.SCOPE_ALL
+        else:
+            raise CommandError('Укажите --list-id, --user-email, --all или --resume')
+        job.save()
+        return job
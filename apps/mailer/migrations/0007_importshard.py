@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0006_alter_importtask_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importtask',
+            name='quota_remaining',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importtask',
+            name='shard_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ImportShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('start_offset', models.BigIntegerField()),
+                ('end_offset', models.BigIntegerField()),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('processing', 'Обрабатывается'), ('completed', 'Завершено'), ('failed', 'Ошибка')], default='pending', max_length=20)),
+                ('processed_emails', models.IntegerField(default=0)),
+                ('imported_count', models.IntegerField(default=0)),
+                ('invalid_count', models.IntegerField(default=0)),
+                ('blacklisted_count', models.IntegerField(default=0)),
+                ('skipped_count', models.IntegerField(default=0)),
+                ('error_count', models.IntegerField(default=0)),
+                ('limit_reached', models.BooleanField(default=False)),
+                ('error_message', models.TextField(blank=True)),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('import_task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='mailer.importtask')),
+            ],
+            options={
+                'ordering': ['import_task', 'index'],
+                'unique_together': {('import_task', 'index')},
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0007_importshard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importtask',
+            name='checkpoint_offset',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importtask',
+            name='file_path',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='importtask',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importtask',
+            name='resume_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:28
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_alter_user_current_plan_remove_purchasedplan_plan_and_more'),
+        ('mailer', '0009_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserContactCount',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='contact_count', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
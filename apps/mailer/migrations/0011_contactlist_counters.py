@@ -0,0 +1,50 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:30
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def fill_contact_list_counters(apps, schema_editor):
+    ContactList = apps.get_model('mailer', 'ContactList')
+    Contact = apps.get_model('mailer', 'Contact')
+    rows = (
+        Contact.objects.order_by().values('contact_list_id').annotate(
+            total_contacts=Count('id'),
+            valid_count=Count('id', filter=Q(status='valid')),
+            invalid_count=Count('id', filter=Q(status='invalid')),
+            blacklisted_count=Count('id', filter=Q(status='blacklist')),
+        )
+    )
+    for row in rows.iterator():
+        ContactList.objects.filter(pk=row.pop('contact_list_id')).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0010_usercontactcount'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactlist',
+            name='blacklisted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contactlist',
+            name='invalid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contactlist',
+            name='total_contacts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='contactlist',
+            name='valid_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_contact_list_counters, reverse_code=migrations.RunPython.noop),
+    ]
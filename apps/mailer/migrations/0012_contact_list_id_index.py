@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0011_contactlist_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contact',
+            index=models.Index(fields=['contact_list', '-id'], name='mailer_contact_list_id_desc'),
+        ),
+    ]
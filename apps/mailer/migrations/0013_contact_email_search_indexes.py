@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+# Индексы для поиска контактов (apps/mailer/search.py). Только PostgreSQL:
+# создаются CONCURRENTLY, без блокировки записи в таблицу контактов.
+SEARCH_INDEXES = (
+    (
+        'mailer_contact_email_trgm',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS mailer_contact_email_trgm '
+        'ON mailer_contact USING gin (lower(email) gin_trgm_ops)',
+    ),
+    (
+        'mailer_contact_email_prefix',
+        'CREATE INDEX CONCURRENTLY IF NOT EXISTS mailer_contact_email_prefix '
+        'ON mailer_contact (contact_list_id, lower(email) text_pattern_ops)',
+    ),
+)
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for _, sql in SEARCH_INDEXES:
+        schema_editor.execute(sql)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('mailer', '0012_contact_list_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, reverse_code=drop_search_indexes),
+    ]
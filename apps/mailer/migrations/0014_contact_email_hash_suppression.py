@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:37
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0013_contact_email_search_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contact',
+            name='email_hash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='SuppressedEmail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('email_hash', models.BigIntegerField()),
+                ('email', models.EmailField(max_length=254)),
+                ('reason', models.CharField(choices=[('unsubscribe', 'Отписка'), ('bounce', 'Недоставка'), ('complaint', 'Жалоба'), ('manual', 'Вручную')], default='unsubscribe', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='suppressed_emails', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'email_hash')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:42
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0014_contact_email_hash_suppression'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevalidationJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('list', 'Список'), ('user', 'Пользователь'), ('all', 'Все контакты')], max_length=10)),
+                ('statuses', models.CharField(default='valid', max_length=50)),
+                ('smtp_check', models.BooleanField(default=False)),
+                ('max_workers', models.PositiveSmallIntegerField(default=16)),
+                ('batch_size', models.PositiveIntegerField(blank=True, null=True)),
+                ('deadline_at', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('completed', 'Завершено'), ('failed', 'Ошибка'), ('cancelled', 'Отменено')], default='pending', max_length=20)),
+                ('current_list_id', models.BigIntegerField(default=0)),
+                ('last_contact_id', models.BigIntegerField(default=0)),
+                ('end_contact_id', models.BigIntegerField(blank=True, null=True)),
+                ('processed', models.BigIntegerField(default=0)),
+                ('changed', models.BigIntegerField(default=0)),
+                ('became_valid', models.BigIntegerField(default=0)),
+                ('became_invalid', models.BigIntegerField(default=0)),
+                ('became_blacklisted', models.BigIntegerField(default=0)),
+                ('unknown', models.BigIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('contact_list', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='revalidation_jobs', to='mailer.contactlist')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='revalidation_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
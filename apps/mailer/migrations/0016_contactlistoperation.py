@@ -0,0 +1,44 @@
+# Generated by Django 5.2.1 on 2026-10-19 16:45
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0015_revalidationjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContactListOperation',
+            fields=[
+                ('id', models.CharField(default=uuid.uuid4, editable=False, max_length=36, primary_key=True, serialize=False)),
+                ('operation', models.CharField(choices=[('union', 'Объединение'), ('difference', 'Разность'), ('intersection', 'Пересечение'), ('copy', 'Копирование'), ('move', 'Перенос'), ('dedupe', 'Удаление дубликатов')], max_length=20)),
+                ('source_list_ids', models.JSONField(default=list)),
+                ('filters', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('completed', 'Завершено'), ('failed', 'Ошибка')], default='pending', max_length=20)),
+                ('total', models.BigIntegerField(default=0)),
+                ('processed', models.BigIntegerField(default=0)),
+                ('inserted', models.BigIntegerField(default=0)),
+                ('removed', models.BigIntegerField(default=0)),
+                ('limit_reached', models.BooleanField(default=False)),
+                ('source_index', models.IntegerField(default=0)),
+                ('last_contact_id', models.BigIntegerField(default=0)),
+                ('error_message', models.TextField(blank=True)),
+                ('celery_task_id', models.CharField(blank=True, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('target_list', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='operations', to='mailer.contactlist')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='list_operations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0018_purgejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importshard',
+            name='checkpoint_offset',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='importshard',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importshard',
+            name='resume_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0019_importshard_checkpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importshard',
+            name='quota_reserved',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations, transaction
+
+from apps.mailer.hashing import email_hash
+
+
+# Заполнение Contact.email_hash для существующих контактов (поле добавлено в 0014).
+# Миграция не атомарная: каждая порция — своя короткая транзакция, поэтому
+# таблица контактов не блокируется на всё время заполнения, а прерванный
+# запуск продолжается с контактов, у которых хэша ещё нет.
+BATCH_SIZE = 5000
+
+
+def fill_email_hashes(apps, schema_editor):
+    Contact = apps.get_model('mailer', 'Contact')
+    last_id = 0
+    while True:
+        batch = list(
+            Contact.objects.filter(id__gt=last_id, email_hash__isnull=True)
+            .order_by('id').only('id', 'email')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        for contact in batch:
+            contact.email_hash = email_hash(contact.email)
+        with transaction.atomic():
+            Contact.objects.bulk_update(batch, ['email_hash'], batch_size=1000)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('mailer', '0020_importshard_quota_reserved'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_email_hashes, reverse_code=migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+from django.db import migrations
+
+
+# Поиск подстроки всегда идёт в пределах одного списка (contact_list_id = … AND
+# lower(email) LIKE '%…%'). Триграммный индекс без contact_list_id находил совпадения
+# во всех списках, и фильтр по списку применялся уже к строкам таблицы. Составной GIN
+# (btree_gin для contact_list_id) сужает выборку до списка в самом индексе.
+# Только PostgreSQL, CONCURRENTLY — как в 0013.
+CREATE_COMPOSITE = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS mailer_contact_list_email_trgm '
+    'ON mailer_contact USING gin (contact_list_id, lower(email) gin_trgm_ops)'
+)
+CREATE_SINGLE = (
+    'CREATE INDEX CONCURRENTLY IF NOT EXISTS mailer_contact_email_trgm '
+    'ON mailer_contact USING gin (lower(email) gin_trgm_ops)'
+)
+
+
+def replace_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gin')
+    schema_editor.execute(CREATE_COMPOSITE)
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS mailer_contact_email_trgm')
+
+
+def restore_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(CREATE_SINGLE)
+    schema_editor.execute('DROP INDEX CONCURRENTLY IF EXISTS mailer_contact_list_email_trgm')
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ('mailer', '0021_contact_email_hash_backfill'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_trigram_index, reverse_code=restore_trigram_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-19 17:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mailer', '0022_contact_list_email_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contactlistoperation',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='contactlistoperation',
+            name='resume_count',
+            field=models.IntegerField(default=0),
+        ),
+    ]
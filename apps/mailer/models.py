@@ -4,36 +4,63 @@ from django.conf import settings
 from django.utils import timezone
 from django.db.models import Count, Q
 
+from .hashing import email_hash
+
 class ContactList(models.Model):
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='contact_lists')
     name = models.CharField(max_length=255)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Счётчики контактов по статусам (денормализация, см. counters.py)
+    total_contacts = models.IntegerField(default=0)
+    valid_count = models.IntegerField(default=0)
+    invalid_count = models.IntegerField(default=0)
+    blacklisted_count = models.IntegerField(default=0)
+    # Список удаляется фоновой задачей (PurgeJob) и уже скрыт от пользователя
+    is_deleting = models.BooleanField(default=False)
+
     class Meta:
         unique_together = ('owner','name')
         ordering = ['-updated_at']
 
+    COUNTER_FIELDS = ('total_contacts', 'valid_count', 'invalid_count', 'blacklisted_count')
+
     def __str__(self):
         return self.name
 
-    @property
-    def total_contacts(self):
-        return self.contacts.count()
+    def save(self, *args, **kwargs):
+        # Счётчики меняются только F()-дельтами: обычное сохранение списка
+        # (переименование и т.п.) не должно перезаписывать их устаревшими значениями
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
-    @property
-    def valid_count(self):
-        return self.contacts.filter(status=Contact.VALID).count()
+    def delete(self, *args, **kwargs):
+        # Каскадное удаление контактов не обновляет счётчик владельца по одному —
+        # он уменьшается один раз на число удалённых контактов
+        from .counters import suspend_contact_counters, adjust_user_contact_count
 
-    @property
-    def invalid_count(self):
-        return self.contacts.filter(status=Contact.INVALID).count()
-
-    @property
-    def blacklisted_count(self):
-        return self.contacts.filter(status=Contact.BLACKLIST).count()
+        with suspend_contact_counters():
+            removed = self.contacts.count()
+            result = super().delete(*args, **kwargs)
+        adjust_user_contact_count(self.owner_id, -removed)
+        return result
 
     def counts(self):
+        """Счётчики контактов из полей списка, без запросов к контактам."""
+        return {
+            'total': self.total_contacts,
+            'valid': self.valid_count,
+            'invalid': self.invalid_count,
+            'blacklisted': self.blacklisted_count,
+        }
+
+    def actual_counts(self):
+        """Фактические счётчики по таблице контактов (для сверки)."""
         agg = self.contacts.aggregate(
             total=Count('id'),
             valid=Count('id', filter=Q(status=Contact.VALID)),
@@ -54,16 +81,83 @@ class Contact(models.Model):
 
     contact_list = models.ForeignKey(ContactList, on_delete=models.CASCADE, related_name='contacts')
     email = models.EmailField()
+    # Хэш нормализованного email (hashing.email_hash) — для сверки с SuppressedEmail
+    email_hash = models.BigIntegerField(null=True, blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=VALID)
     added_date = models.DateTimeField(default=timezone.now)
 
     class Meta:
         unique_together = ('contact_list', 'email')
         ordering = ['email']
+        indexes = [
+            # Курсорная пагинация контактов списка: WHERE contact_list_id = … AND id < … ORDER BY id DESC
+            models.Index(fields=['contact_list', '-id'], name='mailer_contact_list_id_desc'),
+        ]
 
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        self.email_hash = email_hash(self.email)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'email_hash'}
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Статус на момент загрузки: по нему сигналы считают изменение счётчиков
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+
+class SuppressedEmail(models.Model):
+    """
+    Адрес, на который пользователю запрещено отправлять письма (во всех его списках).
+    Хранится хэш нормализованного адреса; зеркалируется в Redis (см. suppression.py).
+    """
+    UNSUBSCRIBE = 'unsubscribe'
+    BOUNCE = 'bounce'
+    COMPLAINT = 'complaint'
+    MANUAL = 'manual'
+    REASON_CHOICES = (
+        (UNSUBSCRIBE, 'Отписка'),
+        (BOUNCE, 'Недоставка'),
+        (COMPLAINT, 'Жалоба'),
+        (MANUAL, 'Вручную'),
+    )
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='suppressed_emails')
+    email_hash = models.BigIntegerField()
+    email = models.EmailField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, default=UNSUBSCRIBE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'email_hash')
+
+    def __str__(self):
+        return f"{self.email} ({self.get_reason_display()})"
+
+    def save(self, *args, **kwargs):
+        self.email = (self.email or '').strip().lower()
+        self.email_hash = email_hash(self.email)
+        super().save(*args, **kwargs)
+
+class UserContactCount(models.Model):
+    """
+    Число контактов во всех списках пользователя (денормализация для проверки квоты).
+    Обновляется инкрементально при записи/удалении контактов и периодически сверяется.
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                                primary_key=True, related_name='contact_count')
+    total = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.total}"
+
 class ImportTask(models.Model):
     """
     Модель для отслеживания фоновых задач импорта
@@ -92,6 +186,15 @@ class ImportTask(models.Model):
     error_count = models.IntegerField(default=0)
     error_message = models.TextField(blank=True)
     celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    # Параллельный импорт: число частей файла и общий для них остаток квоты (None — без лимита)
+    shard_count = models.IntegerField(default=0)
+    quota_remaining = models.IntegerField(null=True, blank=True)
+    # Возобновление после падения воркера: файл, чекпоинт после последней записанной порции
+    # (байтовое смещение; для XLSX — число прочитанных адресов) и heartbeat
+    file_path = models.CharField(max_length=500, blank=True)
+    checkpoint_offset = models.BigIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    resume_count = models.IntegerField(default=0)
     started_at = models.DateTimeField(null=True, blank=True)
     completed_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -114,3 +217,332 @@ class ImportTask(models.Model):
             return None
         end_time = self.completed_at or timezone.now()
         return (end_time - self.started_at).total_seconds()
+
+
+class ImportShard(models.Model):
+    """
+    Часть файла импорта (диапазон байт), обрабатываемая отдельной задачей.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (PROCESSING, 'Обрабатывается'),
+        (COMPLETED, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    import_task = models.ForeignKey(ImportTask, on_delete=models.CASCADE, related_name='shards')
+    index = models.IntegerField()
+    start_offset = models.BigIntegerField()
+    end_offset = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    processed_emails = models.IntegerField(default=0)
+    imported_count = models.IntegerField(default=0)
+    invalid_count = models.IntegerField(default=0)
+    blacklisted_count = models.IntegerField(default=0)
+    skipped_count = models.IntegerField(default=0)
+    error_count = models.IntegerField(default=0)
+    limit_reached = models.BooleanField(default=False)
+    # Слоты квоты, взятые из ImportTask.quota_remaining под текущую порцию
+    quota_reserved = models.IntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    # Возобновление после падения воркера: смещение после последней записанной порции и heartbeat
+    checkpoint_offset = models.BigIntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    resume_count = models.IntegerField(default=0)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['import_task', 'index']
+        unique_together = ('import_task', 'index')
+
+    def __str__(self):
+        return f"Shard {self.index} of import {self.import_task_id}"
+
+
+class ChunkedUpload(models.Model):
+    """
+    Загрузка большого файла импорта частями: init → PUT частей по смещениям → complete.
+    Части пишутся сразу в каталог импорта (IMPORT_STAGING_DIR), каждая проверяется по sha256;
+    прерванную загрузку можно продолжить с received_bytes.
+    """
+    UPLOADING = 'uploading'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (UPLOADING, 'Загружается'),
+        (COMPLETED, 'Загружен'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='chunked_uploads')
+    contact_list = models.ForeignKey(ContactList, on_delete=models.CASCADE, related_name='chunked_uploads')
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    received_bytes = models.BigIntegerField(default=0)
+    file_path = models.CharField(max_length=500)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADING)
+    import_task = models.ForeignKey(ImportTask, on_delete=models.SET_NULL, null=True, blank=True, related_name='uploads')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Upload {self.id} - {self.filename}"
+
+    @property
+    def progress_percentage(self):
+        if not self.total_size:
+            return 0
+        return min(100, int(self.received_bytes * 100 / self.total_size))
+
+
+class RevalidationJob(models.Model):
+    """
+    Перевалидация существующих контактов (список, пользователь или вся база).
+    Контакты читаются по возрастанию id порциями, позиция хранится в current_list_id /
+    last_contact_id, поэтому задача может прерываться и продолжаться (см. revalidation.py).
+    """
+    SCOPE_LIST = 'list'
+    SCOPE_USER = 'user'
+    SCOPE_ALL = 'all'
+    SCOPE_CHOICES = (
+        (SCOPE_LIST, 'Список'),
+        (SCOPE_USER, 'Пользователь'),
+        (SCOPE_ALL, 'Все контакты'),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (COMPLETED, 'Завершено'),
+        (FAILED, 'Ошибка'),
+        (CANCELLED, 'Отменено'),
+    )
+
+    scope = models.CharField(max_length=10, choices=SCOPE_CHOICES)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True,
+                             related_name='revalidation_jobs')
+    contact_list = models.ForeignKey(ContactList, on_delete=models.CASCADE, null=True, blank=True,
+                                     related_name='revalidation_jobs')
+    statuses = models.CharField(max_length=50, default=Contact.VALID)  # через запятую
+    smtp_check = models.BooleanField(default=False)
+    max_workers = models.PositiveSmallIntegerField(default=16)
+    batch_size = models.PositiveIntegerField(null=True, blank=True)  # None — REVALIDATION_BATCH_SIZE
+    deadline_at = models.DateTimeField(null=True, blank=True)  # конец окна обслуживания
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    current_list_id = models.BigIntegerField(default=0)
+    last_contact_id = models.BigIntegerField(default=0)
+    end_contact_id = models.BigIntegerField(null=True, blank=True)  # граница диапазона id для scope=all
+    processed = models.BigIntegerField(default=0)
+    changed = models.BigIntegerField(default=0)
+    became_valid = models.BigIntegerField(default=0)
+    became_invalid = models.BigIntegerField(default=0)
+    became_blacklisted = models.BigIntegerField(default=0)
+    unknown = models.BigIntegerField(default=0)  # статус оставлен из-за временной ошибки DNS/SMTP
+    error_message = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Revalidation {self.id} ({self.scope}) - {self.status}"
+
+    def status_list(self):
+        return [value.strip() for value in self.statuses.split(',') if value.strip()]
+
+
+class ContactListOperation(models.Model):
+    """
+    Операция над списками на стороне БД: объединение, разность, пересечение,
+    копирование/перенос контактов по фильтру и удаление дубликатов (см. list_operations.py).
+    Выполняется в фоне порциями по id исходного списка; позиция и счётчики обновляются после каждой порции.
+    """
+    UNION = 'union'
+    DIFFERENCE = 'difference'
+    INTERSECTION = 'intersection'
+    COPY = 'copy'
+    MOVE = 'move'
+    DEDUPE = 'dedupe'
+    OPERATION_CHOICES = (
+        (UNION, 'Объединение'),
+        (DIFFERENCE, 'Разность'),
+        (INTERSECTION, 'Пересечение'),
+        (COPY, 'Копирование'),
+        (MOVE, 'Перенос'),
+        (DEDUPE, 'Удаление дубликатов'),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (COMPLETED, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='list_operations')
+    operation = models.CharField(max_length=20, choices=OPERATION_CHOICES)
+    target_list = models.ForeignKey(ContactList, on_delete=models.CASCADE, related_name='operations')
+    # Порядок важен: для difference / intersection первый список — базовый
+    source_list_ids = models.JSONField(default=list)
+    filters = models.JSONField(default=dict, blank=True)  # copy / move: {'status': [...], 'search': '...'}
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+
+    total = models.BigIntegerField(default=0)      # контактов в просматриваемых списках
+    processed = models.BigIntegerField(default=0)
+    inserted = models.BigIntegerField(default=0)
+    removed = models.BigIntegerField(default=0)    # удалено из исходного списка (move) или из целевого (dedupe)
+    limit_reached = models.BooleanField(default=False)
+    source_index = models.IntegerField(default=0)
+    last_contact_id = models.BigIntegerField(default=0)
+    error_message = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    # Возобновление после падения воркера (см. tasks.resume_stale_list_operations)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    resume_count = models.IntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.operation} -> {self.target_list_id} - {self.status}"
+
+    @property
+    def progress_percentage(self):
+        if self.status == self.COMPLETED:
+            return 100
+        if not self.total:
+            return 0
+        return min(100, int(self.processed * 100 / self.total))
+
+
+class ContactExportTask(models.Model):
+    """
+    Фоновая выгрузка большого списка в ZIP (по аналогии с campaigns.ExportTask).
+    Архив пишется потоком во временный файл и сохраняется в хранилище, UI опрашивает статус.
+    """
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (PROCESSING, 'Обрабатывается'),
+        (COMPLETED, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='contact_export_tasks')
+    contact_list = models.ForeignKey(ContactList, on_delete=models.CASCADE, related_name='export_tasks')
+    format = models.CharField(max_length=10, default='txt')
+    types = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    file = models.FileField(upload_to='exports/contacts/%Y/%m/', blank=True)
+    filename = models.CharField(max_length=255, blank=True)
+    error_message = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Contact export {self.id} - {self.filename or self.contact_list_id}"
+
+    @property
+    def progress_percentage(self):
+        if self.status == self.COMPLETED:
+            return 100
+        if self.total_rows == 0:
+            return 0
+        return min(100, int((self.processed_rows / self.total_rows) * 100))
+
+
+class PurgeJob(models.Model):
+    """
+    Фоновое удаление большого списка контактов или кампании порциями (см. purge.py).
+    Объект помечается is_deleting и сразу скрывается, зависимые строки удаляются
+    ограниченными порциями, сам объект — последним.
+    """
+    CONTACT_LIST = 'contact_list'
+    CAMPAIGN = 'campaign'
+    CAMPAIGN_SENDS = 'campaign_sends'  # только записи об отправке (повторная отправка кампании)
+    KIND_CHOICES = (
+        (CONTACT_LIST, 'Список контактов'),
+        (CAMPAIGN, 'Кампания'),
+        (CAMPAIGN_SENDS, 'Отправки кампании'),
+    )
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (COMPLETED, 'Завершено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    id = models.CharField(primary_key=True, max_length=36, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='purge_jobs')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    target_id = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    total_rows = models.BigIntegerField(default=0)      # основных строк (контакты списка / отправки кампании)
+    processed_rows = models.BigIntegerField(default=0)
+    deleted_rows = models.BigIntegerField(default=0)    # всего удалено строк во всех таблицах
+    error_message = models.TextField(blank=True)
+    celery_task_id = models.CharField(max_length=255, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Purge {self.kind} {self.target_id} - {self.status}"
+
+    @property
+    def progress_percentage(self):
+        if self.status == self.COMPLETED:
+            return 100
+        if not self.total_rows:
+            return 0
+        return min(99, int(self.processed_rows * 100 / self.total_rows))
@@ -0,0 +1,216 @@
+# apps/mailer/purge.py
+
+"""
+Фоновое удаление больших списков контактов и кампаний (PurgeJob).
+
+Вместо каскадного Collector внутри запроса объект помечается is_deleting (и сразу
+скрывается из API), а зависимые строки удаляются задачей порциями по PURGE_CHUNK_SIZE:
+для каждой порции id сначала удаляются строки, которые на неё ссылаются (рекурсивно,
+по тем же правилам on_delete, что и у Collector), затем сама порция одним
+DELETE FROM … WHERE id IN (…). Каждая порция — своя короткая транзакция, прогресс и
+heartbeat сохраняются после неё, поэтому прерванное задание продолжается с того же места.
+
+Порции берутся по id (keyset), если у дочерней таблицы есть индекс (fk, id) — как
+mailer_contact_list_id_desc у контактов; иначе — первые PURGE_CHUNK_SIZE строк по
+индексу внешнего ключа (уже удалённые строки из выборки выпадают).
+
+Сигналы post_delete при таком удалении не срабатывают, поэтому счётчик контактов
+пользователя уменьшается явно — дельтой на порцию. Сам объект удаляется последним
+обычным delete(), когда ссылающихся на него строк уже нет.
+"""
+
+import logging
+from collections import Counter
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models.deletion import get_candidate_relations_to_delete
+from django.utils import timezone
+
+from .counters import adjust_user_contact_count
+from .models import PurgeJob
+
+logger = logging.getLogger(__name__)
+
+PURGE_CHUNK_SIZE = getattr(settings, 'PURGE_CHUNK_SIZE', 1000)
+PURGE_HEARTBEAT_TIMEOUT = getattr(settings, 'PURGE_HEARTBEAT_TIMEOUT', 15 * 60)
+
+# Удаляемый объект и строки, по которым считается прогресс
+PURGE_TARGETS = {
+    PurgeJob.CONTACT_LIST: ('mailer.ContactList', 'mailer.Contact'),
+    PurgeJob.CAMPAIGN: ('campaigns.Campaign', 'campaigns.EmailTracking'),
+    PurgeJob.CAMPAIGN_SENDS: ('campaigns.Campaign', 'campaigns.EmailTracking'),
+}
+
+# Для повторной отправки удаляются только записи об отправке, кампания остаётся
+CAMPAIGN_SENDS_MODELS = ('campaigns.EmailTracking', 'campaigns.CampaignRecipient')
+
+
+def _relations(model):
+    """Связи, по которым удаление model затрагивает другие таблицы (как у Collector)."""
+    return [
+        rel for rel in get_candidate_relations_to_delete(model._meta)
+        if rel.field.remote_field.on_delete is not models.DO_NOTHING
+    ]
+
+
+def _keyset_ordered(model, fk_name):
+    """Есть ли у модели индекс (fk, id), по которому порции можно брать по возрастанию id."""
+    pk_name = model._meta.pk.name
+    for index in model._meta.indexes:
+        fields = [name.lstrip('-') for name in index.fields]
+        if fields[:2] == [fk_name, pk_name] or fields[:2] == [fk_name, 'id']:
+            return True
+    return False
+
+
+def _child_chunks(rel, parent_ids, chunk_size):
+    """Порции id строк, ссылающихся по rel на parent_ids."""
+    child = rel.related_model
+    fk_name = rel.field.name
+    rows = child._base_manager.filter(**{f'{fk_name}__in': parent_ids}).values_list('pk', flat=True)
+    if _keyset_ordered(child, fk_name):
+        last_id = None
+        while True:
+            batch = rows if last_id is None else rows.filter(pk__gt=last_id)
+            ids = list(batch.order_by('pk')[:chunk_size])
+            if not ids:
+                return
+            yield ids
+            last_id = ids[-1]
+    else:
+        # Порция удаляется до запроса следующей, поэтому выборка каждый раз с начала
+        while True:
+            ids = list(rows.order_by()[:chunk_size])
+            if not ids:
+                return
+            yield ids
+
+
+def _raw_delete(model, ids):
+    quote = connection.ops.quote_name
+    pk = model._meta.pk
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(pk.column)} IN ({placeholders})",
+            [pk.get_db_prep_value(value, connection) for value in ids],
+        )
+        return cursor.rowcount
+
+
+def _purge_related(rel, parent_ids, deleted, chunk_size):
+    """Обрабатывает строки, ссылающиеся по rel на parent_ids, по правилу on_delete."""
+    on_delete = rel.field.remote_field.on_delete
+    child = rel.related_model
+    if on_delete is models.CASCADE:
+        for ids in _child_chunks(rel, parent_ids, chunk_size):
+            _purge_rows(child, ids, deleted, chunk_size)
+    elif on_delete is models.SET_NULL:
+        child._base_manager.filter(**{f'{rel.field.name}__in': parent_ids}).update(**{rel.field.name: None})
+    else:
+        raise RuntimeError(
+            f'{child._meta.label}.{rel.field.name}: on_delete={on_delete.__name__} '
+            f'не поддерживается фоновым удалением'
+        )
+
+
+def _purge_rows(model, ids, deleted, chunk_size):
+    """Удаляет строки model с id из ids вместе с зависимыми. deleted — Counter по моделям."""
+    for rel in _relations(model):
+        _purge_related(rel, ids, deleted, chunk_size)
+    deleted[model._meta.label] += _raw_delete(model, ids)
+
+
+def _job_relations(job, model):
+    relations = _relations(model)
+    if job.kind == PurgeJob.CAMPAIGN_SENDS:
+        relations = [rel for rel in relations if rel.related_model._meta.label in CAMPAIGN_SENDS_MODELS]
+    return relations
+
+
+def _progress_total(job, model, target_pk):
+    progress_label = PURGE_TARGETS[job.kind][1]
+    return sum(
+        rel.related_model._base_manager.filter(**{rel.field.name: target_pk}).count()
+        for rel in _relations(model)
+        if rel.related_model._meta.label == progress_label
+    )
+
+
+def _save_chunk(job, deleted):
+    """Счётчики после порции: прогресс задания и счётчик контактов пользователя."""
+    contacts = deleted['mailer.Contact']
+    if contacts:
+        adjust_user_contact_count(job.user_id, -contacts)
+    job.processed_rows += deleted[PURGE_TARGETS[job.kind][1]]
+    job.deleted_rows += sum(deleted.values())
+    PurgeJob.objects.filter(id=job.id).update(
+        processed_rows=job.processed_rows,
+        deleted_rows=job.deleted_rows,
+        heartbeat_at=timezone.now(),
+    )
+
+
+def run_purge_job(job_id, chunk_size=PURGE_CHUNK_SIZE):
+    """Выполняет задание до конца. Повторный запуск продолжает удаление с оставшихся строк."""
+    job = PurgeJob.objects.get(id=job_id)
+    if job.status in (PurgeJob.COMPLETED, PurgeJob.FAILED):
+        return job
+
+    model = apps.get_model(PURGE_TARGETS[job.kind][0])
+    target_pk = model._meta.pk.to_python(job.target_id)
+    now = timezone.now()
+    started = {'status': PurgeJob.RUNNING, 'heartbeat_at': now}
+    if not job.started_at:
+        job.total_rows = _progress_total(job, model, target_pk)
+        started.update(started_at=now, total_rows=job.total_rows)
+    PurgeJob.objects.filter(id=job.id).update(**started)
+
+    for rel in _job_relations(job, model):
+        if rel.field.remote_field.on_delete is models.CASCADE:
+            chunks = _child_chunks(rel, [target_pk], chunk_size)
+            while True:
+                with transaction.atomic():
+                    ids = next(chunks, None)
+                    if ids is None:
+                        break
+                    deleted = Counter()
+                    _purge_rows(rel.related_model, ids, deleted, chunk_size)
+                    _save_chunk(job, deleted)
+        else:
+            with transaction.atomic():
+                _purge_related(rel, [target_pk], Counter(), chunk_size)
+
+    if job.kind == PurgeJob.CAMPAIGN_SENDS:
+        # Записей об отправке не осталось — счётчики кампании обнуляются пересчётом
+        apps.get_model('campaigns.CampaignCounters').rebuild(target_pk)
+    else:
+        # Зависимых строк не осталось: Collector удаляет только сам объект
+        model._base_manager.filter(pk=target_pk).delete()
+
+    PurgeJob.objects.filter(id=job.id).update(status=PurgeJob.COMPLETED, completed_at=timezone.now())
+    logger.info(f"Purge job {job.id} ({job.kind} {job.target_id}) completed: {job.deleted_rows} rows deleted")
+    job.refresh_from_db()
+    return job
+
+
+def create_purge_job(user, kind, target_id):
+    return PurgeJob.objects.create(user=user, kind=kind, target_id=str(target_id))
+
+
+def purge_job_data(job):
+    return {
+        'id': str(job.id),
+        'kind': job.kind,
+        'target_id': job.target_id,
+        'status': job.status,
+        'total_rows': job.total_rows,
+        'processed_rows': job.processed_rows,
+        'deleted_rows': job.deleted_rows,
+        'progress': job.progress_percentage,
+        'error_message': job.error_message,
+        'created_at': job.created_at,
+        'completed_at': job.completed_at,
+    }
@@ -0,0 +1,257 @@
+# apps/mailer/revalidation.py
+
+"""
+Перевалидация существующих контактов.
+
+Контакты читаются порциями по REVALIDATION_BATCH_SIZE по возрастанию id (keyset, без OFFSET):
+для заданий по списку и по пользователю — список за списком по индексу
+(contact_list_id, id), для всей базы — по первичному ключу (ночная перевалидация делит
+диапазон id на несколько заданий, end_contact_id — граница диапазона). Позиция сохраняется в
+RevalidationJob после каждой порции, поэтому задание выполняется отрезками по
+REVALIDATION_SLICE_SECONDS и продолжается с того же места после перезапуска воркера.
+
+Порция проверяется как при импорте: адреса группируются по домену, вердикт домена
+(disposable / MX / catch-all) считается один раз через общий кэширующий резолвер и
+сохраняется на всё задание, SMTP-проверка — только если она включена в задании.
+Временные ошибки (таймаут DNS, 4xx, обрыв SMTP-сессии) статус не меняют.
+
+Изменившиеся статусы записываются через bulk_update(fields=['status']) порциями
+по REVALIDATION_UPDATE_CHUNK, счётчики списков — одной дельтой на список.
+Контакты в статусе blacklist (отписки, жалобы) не перевалидируются.
+"""
+
+import logging
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .counters import adjust_list_counters, status_change_deltas
+from .models import Contact, ContactList, RevalidationJob
+from .utils import (
+    _apply_domain_verdict, _apply_smtp_result, _validation_result,
+    get_domain_verdict, is_syntax_valid,
+)
+
+logger = logging.getLogger(__name__)
+
+REVALIDATION_BATCH_SIZE = getattr(settings, 'REVALIDATION_BATCH_SIZE', 5000)
+REVALIDATION_UPDATE_CHUNK = getattr(settings, 'REVALIDATION_UPDATE_CHUNK', 1000)
+REVALIDATION_SLICE_SECONDS = getattr(settings, 'REVALIDATION_SLICE_SECONDS', 600)
+
+REVALIDATION_STATUSES = (Contact.VALID, Contact.INVALID)
+
+
+def domain_verdict(domain):
+    """
+    Вердикт домена для перевалидации. Если MX не проверен из-за таймаута или ошибки DNS
+    (а не NXDOMAIN / пустого ответа), вердикт помечен transient — статус не меняется.
+    """
+    return get_domain_verdict(domain)
+
+
+def revalidate_contacts(contacts, domain_verdicts, max_workers, smtp_check=False):
+    """
+    Проверяет порцию контактов. Возвращает (изменения [(contact, новый статус)], число
+    контактов, оставленных без изменений из-за временных ошибок).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    results = {}
+    by_domain = defaultdict(list)
+    for contact in contacts:
+        email = contact.email.strip().lower()
+        if email in results:
+            continue
+        result = _validation_result(email)
+        results[email] = result
+        if not is_syntax_valid(email):
+            result['errors'].append('Неверный синтаксис email адреса')
+            continue
+        by_domain[email.split('@', 1)[1]].append(email)
+
+    new_domains = [domain for domain in by_domain if domain not in domain_verdicts]
+    if new_domains:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            for domain, verdict in zip(new_domains, executor.map(domain_verdict, new_domains)):
+                domain_verdicts[domain] = verdict
+
+    transient = set()
+    smtp_queue = []
+    for domain, emails in by_domain.items():
+        verdict = domain_verdicts[domain]
+        if verdict['transient']:
+            transient.update(emails)
+            continue
+        for email in emails:
+            if _apply_domain_verdict(results[email], verdict):
+                smtp_queue.append(email)
+
+    if smtp_queue:
+        if smtp_check:
+            from .smtp_verifier import verify_emails
+
+            smtp_results = verify_emails(smtp_queue, max_workers=max(1, max_workers))
+            for email in smtp_queue:
+                if smtp_results[email].get('temporary'):
+                    transient.add(email)
+                else:
+                    _apply_smtp_result(results[email], smtp_results[email])
+        else:
+            # Без SMTP домен с MX-записями считается достаточным признаком
+            for email in smtp_queue:
+                results[email]['is_valid'] = True
+                results[email]['status'] = Contact.VALID
+
+    changes = []
+    unknown = 0
+    for contact in contacts:
+        email = contact.email.strip().lower()
+        if email in transient:
+            unknown += 1
+            continue
+        new_status = results[email]['status']
+        if new_status != contact.status:
+            changes.append((contact, new_status))
+    return changes, unknown
+
+
+def apply_status_changes(changes, chunk_size=REVALIDATION_UPDATE_CHUNK):
+    """
+    Записывает новые статусы через bulk_update(fields=['status']) порциями.
+    Контакты, статус которых успел измениться (например, отписка во время проверки),
+    пропускаются. Возвращает Counter переходов {(старый, новый): n}.
+    """
+    applied = Counter()
+    for start in range(0, len(changes), chunk_size):
+        chunk = changes[start:start + chunk_size]
+        with transaction.atomic():
+            current = dict(
+                Contact.objects.select_for_update()
+                .filter(id__in=[contact.id for contact, _ in chunk])
+                .values_list('id', 'status')
+            )
+            to_update = []
+            transitions = defaultdict(list)
+            for contact, new_status in chunk:
+                old_status = contact.status
+                if current.get(contact.id) != old_status:
+                    continue
+                contact.status = new_status
+                to_update.append(contact)
+                transitions[contact.contact_list_id].append((old_status, new_status))
+                applied[(old_status, new_status)] += 1
+            if to_update:
+                Contact.objects.bulk_update(to_update, ['status'])
+                for contact_list_id, list_changes in transitions.items():
+                    adjust_list_counters(contact_list_id, status_change_deltas(list_changes))
+    return applied
+
+
+def _job_contacts(job):
+    statuses = [status for status in job.status_list() if status in REVALIDATION_STATUSES]
+    return Contact.objects.filter(status__in=statuses).only('id', 'email', 'status', 'contact_list_id')
+
+
+def _job_list_ids(job):
+    if job.scope == RevalidationJob.SCOPE_LIST:
+        return [job.contact_list_id]
+    return list(
+        ContactList.objects.filter(owner_id=job.user_id, id__gte=job.current_list_id)
+        .order_by('id').values_list('id', flat=True)
+    )
+
+
+def _next_batch(job, list_ids, batch_size):
+    """Следующая порция по позиции задания (сдвигает current_list_id при переходе к новому списку)."""
+    contacts = _job_contacts(job)
+    if job.scope == RevalidationJob.SCOPE_ALL:
+        contacts = contacts.filter(id__gt=job.last_contact_id)
+        if job.end_contact_id is not None:
+            contacts = contacts.filter(id__lte=job.end_contact_id)
+        return list(contacts.order_by('id')[:batch_size])
+
+    while list_ids:
+        if list_ids[0] != job.current_list_id:
+            job.current_list_id = list_ids[0]
+            job.last_contact_id = 0
+        batch = list(
+            contacts.filter(contact_list_id=job.current_list_id, id__gt=job.last_contact_id)
+            .order_by('id')[:batch_size]
+        )
+        if batch:
+            return batch
+        list_ids.pop(0)
+    return []
+
+
+def _save_progress(job, processed, applied, unknown, fields):
+    """Сохраняет позицию и прибавляет счётчики порции (F()-выражения, без гонок с отменой)."""
+    changed = sum(applied.values())
+    by_new = Counter()
+    for (_, new_status), count in applied.items():
+        by_new[new_status] += count
+    updates = {
+        'current_list_id': job.current_list_id,
+        'last_contact_id': job.last_contact_id,
+        'processed': F('processed') + processed,
+        'changed': F('changed') + changed,
+        'became_valid': F('became_valid') + by_new[Contact.VALID],
+        'became_invalid': F('became_invalid') + by_new[Contact.INVALID],
+        'became_blacklisted': F('became_blacklisted') + by_new[Contact.BLACKLIST],
+        'unknown': F('unknown') + unknown,
+        'heartbeat_at': timezone.now(),
+    }
+    updates.update(fields)
+    RevalidationJob.objects.filter(id=job.id).update(**updates)
+
+
+def run_revalidation_job(job_id, slice_seconds=REVALIDATION_SLICE_SECONDS, domain_verdicts=None):
+    """
+    Выполняет задание отрезком не дольше slice_seconds (None — до конца).
+    Возвращает False, если задание нужно продолжить следующим отрезком; True — если оно
+    завершено, отменено или остановлено по концу окна (тогда статус снова pending).
+    """
+    job = RevalidationJob.objects.get(id=job_id)
+    if job.status in (RevalidationJob.COMPLETED, RevalidationJob.FAILED, RevalidationJob.CANCELLED):
+        return True
+
+    now = timezone.now()
+    started = {'status': RevalidationJob.RUNNING, 'heartbeat_at': now}
+    if not job.started_at:
+        started['started_at'] = now
+    RevalidationJob.objects.filter(id=job.id).update(**started)
+
+    if domain_verdicts is None:
+        domain_verdicts = {}
+    batch_size = job.batch_size or REVALIDATION_BATCH_SIZE
+    list_ids = None if job.scope == RevalidationJob.SCOPE_ALL else _job_list_ids(job)
+    slice_started = time.monotonic()
+
+    while True:
+        batch = _next_batch(job, list_ids, batch_size)
+        if not batch:
+            _save_progress(job, 0, Counter(), 0, {
+                'status': RevalidationJob.COMPLETED, 'completed_at': timezone.now(),
+            })
+            logger.info(f"Revalidation job {job.id} completed")
+            return True
+
+        changes, unknown = revalidate_contacts(batch, domain_verdicts, job.max_workers, job.smtp_check)
+        applied = apply_status_changes(changes)
+        job.last_contact_id = batch[-1].id
+        _save_progress(job, len(batch), applied, unknown, {})
+
+        # Отмена из админки/API и конец окна обслуживания проверяются между порциями
+        state = RevalidationJob.objects.filter(id=job.id).values_list('status', 'deadline_at').first()
+        if state is None or state[0] == RevalidationJob.CANCELLED:
+            return True
+        if state[1] and timezone.now() >= state[1]:
+            RevalidationJob.objects.filter(id=job.id).update(status=RevalidationJob.PENDING)
+            logger.info(f"Revalidation job {job.id} paused at the end of the maintenance window")
+            return True
+        if slice_seconds is not None and time.monotonic() - slice_started >= slice_seconds:
+            return False
@@ -0,0 +1,73 @@
+# apps/mailer/search.py
+
+"""
+Поиск контактов по email.
+
+Фильтр строится по lower(email), чтобы на PostgreSQL использовались индексы из миграций
+0013_contact_email_search_indexes и 0022_contact_list_email_trgm:
+- GIN (contact_list_id, lower(email) gin_trgm_ops) — поиск подстроки (LIKE '%…%') внутри
+  списка через pg_trgm и btree_gin;
+- (contact_list_id, lower(email) text_pattern_ops) — поиск по началу адреса (LIKE '…%').
+
+Триграммный индекс полезен только для строк от трёх символов, поэтому более короткие
+запросы выполняются в режиме prefix. На других СУБД запросы те же, но без индексов.
+
+Страницы результатов кэшируются на CONTACT_SEARCH_CACHE_TTL секунд: поле поиска в SPA
+отправляет запрос на каждое нажатие, и повтор того же запроса не должен идти в БД.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.functions import Lower
+
+CONTACT_SEARCH_CACHE_TTL = getattr(settings, 'CONTACT_SEARCH_CACHE_TTL', 30)
+
+SEARCH_CONTAINS = 'contains'
+SEARCH_PREFIX = 'prefix'
+SEARCH_MODES = (SEARCH_CONTAINS, SEARCH_PREFIX)
+
+TRIGRAM_MIN_LENGTH = 3
+
+
+def normalize_search(term, mode=None):
+    """Очищенная строка поиска и режим (короткие строки — всегда prefix)."""
+    term = (term or '').strip().lower()
+    if mode not in SEARCH_MODES:
+        mode = SEARCH_CONTAINS
+    if len(term) < TRIGRAM_MIN_LENGTH:
+        mode = SEARCH_PREFIX
+    return term, mode
+
+
+def search_contacts(queryset, term, mode=SEARCH_CONTAINS):
+    """Фильтрует контакты по email; term и mode — результат normalize_search."""
+    if not term:
+        return queryset
+    lookup = 'email_lower__startswith' if mode == SEARCH_PREFIX else 'email_lower__contains'
+    return queryset.annotate(email_lower=Lower('email')).filter(**{lookup: term})
+
+
+def search_cache_key(contact_list, term, mode, params):
+    """
+    Ключ кэша страницы результатов. В ключ входят счётчики списка, поэтому
+    добавление, удаление или смена статуса контактов делают старые записи недостижимыми.
+    """
+    version = ':'.join(str(value) for value in contact_list.counts().values())
+    raw = f"{contact_list.id}:{version}:{mode}:{term}:{sorted(params.items())}"
+    return 'contact_search:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def get_cached_page(key):
+    try:
+        return cache.get(key)
+    except Exception:
+        return None
+
+
+def set_cached_page(key, data):
+    try:
+        cache.set(key, data, timeout=CONTACT_SEARCH_CACHE_TTL)
+    except Exception:
+        pass
@@ -0,0 +1,23 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .counters import counters_suspended, adjust_list_counters, status_change_deltas
+from .models import Contact
+
+
+@receiver(post_save, sender=Contact)
+def count_saved_contact(sender, instance, created, **kwargs):
+    old_status = getattr(instance, '_loaded_status', None)
+    instance._loaded_status = instance.status
+    if counters_suspended():
+        return
+    if created:
+        adjust_list_counters(instance.contact_list_id, {instance.status: 1})
+    elif old_status is not None and old_status != instance.status:
+        adjust_list_counters(instance.contact_list_id, status_change_deltas([(old_status, instance.status)]))
+
+
+@receiver(post_delete, sender=Contact)
+def count_deleted_contact(sender, instance, **kwargs):
+    if not counters_suspended():
+        adjust_list_counters(instance.contact_list_id, {getattr(instance, '_loaded_status', instance.status): -1})
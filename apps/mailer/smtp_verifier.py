@@ -0,0 +1,350 @@
+# apps/mailer/smtp_verifier.py
+
+"""
+Проверка существования адресов через SMTP (RCPT TO).
+
+Адреса группируются по MX-хосту: на каждый хост открывается одна SMTP-сессия,
+EHLO и MAIL FROM отправляются один раз на порцию, между порциями — RSET.
+Для каждого домена в той же сессии делается одна проба случайным адресом:
+если сервер принимает заведомо несуществующий адрес, домен помечается
+как catch-all и поадресные RCPT для него не отправляются.
+
+Число одновременных сессий и частота команд к одному MX ограничены для всех
+воркеров сразу (через общий кэш), окончательные ответы сервера кэшируются по адресу.
+"""
+
+import logging
+import smtplib
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+
+from core.utils import dns_resolver
+
+logger = logging.getLogger(__name__)
+
+
+SMTP_VERIFY_PORT = getattr(settings, 'SMTP_VERIFY_PORT', 25)
+SMTP_VERIFY_TIMEOUT = getattr(settings, 'SMTP_VERIFY_TIMEOUT', 10)
+SMTP_VERIFY_HELO = getattr(settings, 'SMTP_VERIFY_HELO', 'test.com')
+SMTP_VERIFY_MAIL_FROM = getattr(settings, 'SMTP_VERIFY_MAIL_FROM', 'test@test.com')
+SMTP_VERIFY_RCPT_BATCH = getattr(settings, 'SMTP_VERIFY_RCPT_BATCH', 50)        # RCPT TO между RSET
+SMTP_VERIFY_SESSIONS_PER_MX = getattr(settings, 'SMTP_VERIFY_SESSIONS_PER_MX', 2)  # одновременных сессий на MX
+SMTP_VERIFY_RATE_PER_MX = getattr(settings, 'SMTP_VERIFY_RATE_PER_MX', 5)      # команд RCPT в секунду на MX
+SMTP_VERIFY_WORKERS = getattr(settings, 'SMTP_VERIFY_WORKERS', 8)              # MX-хостов параллельно
+SMTP_VERIFY_CACHE_TTL = getattr(settings, 'SMTP_VERIFY_CACHE_TTL', 3 * 24 * 3600)
+SMTP_CATCH_ALL_CACHE_TTL = getattr(settings, 'SMTP_CATCH_ALL_CACHE_TTL', 24 * 3600)
+SMTP_VERIFY_SESSION_LEASE = getattr(settings, 'SMTP_VERIFY_SESSION_LEASE', 60)  # секунд аренды слота сессии без RCPT
+SMTP_VERIFY_SLOT_POLL = 0.2  # секунд между попытками занять слот сессии
+
+
+class _MXLimiter:
+    """
+    Ограничение сессий и частоты RCPT для одного MX-хоста, общее для всех воркеров.
+
+    Сессии — SMTP_VERIFY_SESSIONS_PER_MX слотов-аренд в общем кэше (cache.add с TTL):
+    аренда продлевается каждой командой RCPT, а слот упавшего воркера освобождается,
+    когда истекает SMTP_VERIFY_SESSION_LEASE. Частота — ведро токенов в кэше,
+    наполняемое раз в секунду до SMTP_VERIFY_RATE_PER_MX. Если кэш недоступен,
+    ограничения действуют в пределах процесса.
+    """
+
+    def __init__(self, host, sessions, rate):
+        self.host = host
+        self.slots = max(1, sessions)
+        self.rate = rate
+        self._local = threading.BoundedSemaphore(self.slots)
+
+    def _slot_key(self, index):
+        return f"smtp_mx_session:{self.host}:{index}"
+
+    @contextmanager
+    def session(self):
+        """Слот сессии на время блока; возвращает ключ аренды (None — локальный слот)."""
+        token = uuid.uuid4().hex
+        lease = self._acquire(token)
+        try:
+            yield lease
+        finally:
+            self._release(lease, token)
+
+    def _acquire(self, token):
+        while True:
+            try:
+                for index in range(self.slots):
+                    key = self._slot_key(index)
+                    if cache.add(key, token, timeout=SMTP_VERIFY_SESSION_LEASE):
+                        return key
+            except Exception as e:
+                logger.warning(f"SMTP session limiter for {self.host} fell back to process-local: {e}")
+                self._local.acquire()
+                return None
+            time.sleep(SMTP_VERIFY_SLOT_POLL)
+
+    def _release(self, lease, token):
+        if lease is None:
+            self._local.release()
+            return
+        try:
+            if cache.get(lease) == token:
+                cache.delete(lease)
+        except Exception:
+            pass  # аренда истечёт сама
+
+    def throttle(self, lease=None):
+        """Ждёт токен на одну команду RCPT и продлевает аренду сессии."""
+        if lease is not None:
+            try:
+                cache.touch(lease, SMTP_VERIFY_SESSION_LEASE)
+            except Exception:
+                pass
+        if not self.rate:
+            return
+        while True:
+            now = time.time()
+            window = int(now)
+            key = f"smtp_mx_rate:{self.host}:{window}"
+            try:
+                cache.add(key, 0, timeout=2)
+                used = cache.incr(key)
+            except ValueError:
+                continue  # окно истекло между add и incr
+            except Exception:
+                time.sleep(1.0 / self.rate)
+                return
+            if used <= self.rate:
+                return
+            time.sleep(window + 1 - now)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _limiter_for(host):
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _MXLimiter(host, SMTP_VERIFY_SESSIONS_PER_MX, SMTP_VERIFY_RATE_PER_MX)
+            _limiters[host] = limiter
+        return limiter
+
+
+def _result_cache_key(email):
+    return f"smtp_verify:{email.lower()}"
+
+
+def _catch_all_cache_key(domain):
+    return f"smtp_catch_all:{domain.lower()}"
+
+
+def get_cached_catch_all(domain):
+    """True/False — известно ли, что домен catch-all; None — ещё не проверяли."""
+    try:
+        return cache.get(_catch_all_cache_key(domain))
+    except Exception:
+        return None
+
+
+def _cache_set(key, value, ttl):
+    try:
+        cache.set(key, value, timeout=ttl)
+    except Exception as e:
+        logger.warning(f"SMTP verify cache write failed for {key}: {e}")
+
+
+def _rcpt_result(code, message=b''):
+    """Ответ на RCPT TO -> (результат, окончательный ли ответ)."""
+    if code in (250, 251):
+        return {'valid': True, 'error': None}, True
+    if code == 550:
+        return {'valid': False, 'error': 'Email адрес не существует'}, True
+    if code in (551, 553):
+        return {'valid': False, 'error': 'Email адрес недопустим'}, True
+    if code == 554:
+        return {'valid': False, 'error': 'Email адрес отклонен сервером'}, True
+    if code == 421:
+        return {'valid': False, 'error': 'SMTP сервер временно недоступен'}, False
+    if code == 450:
+        return {'valid': False, 'error': 'Временная ошибка SMTP сервера'}, False
+    if code == 452:
+        return {'valid': False, 'error': 'SMTP сервер перегружен'}, False
+    if 500 <= code < 600:
+        return {'valid': False, 'error': 'Email адрес отклонен сервером'}, True
+    # Неизвестный ответ - считаем валидным для безопасности
+    text = message.decode('utf-8', errors='ignore') if isinstance(message, bytes) else str(message)
+    return {'valid': True, 'error': None, 'warning': f'Неизвестный ответ SMTP: {code} {text[:100]}'}, False
+
+
+class _Session:
+    """Одна SMTP-сессия с MX-хостом: EHLO один раз, MAIL FROM на порцию, RSET между порциями."""
+
+    def __init__(self, host, limiter, lease=None):
+        self.host = host
+        self.limiter = limiter
+        self.lease = lease
+        self.smtp = None
+        self.in_transaction = False
+        self.rcpt_count = 0
+
+    def open(self):
+        self.smtp = smtplib.SMTP(timeout=SMTP_VERIFY_TIMEOUT)
+        code, _ = self.smtp.connect(self.host, SMTP_VERIFY_PORT)
+        if code != 220:
+            raise smtplib.SMTPConnectError(code, 'SMTP сервер недоступен')
+        code, _ = self.smtp.ehlo(SMTP_VERIFY_HELO)
+        if code != 250:
+            code, _ = self.smtp.helo(SMTP_VERIFY_HELO)
+            if code != 250:
+                raise smtplib.SMTPHeloError(code, 'SMTP сервер недоступен')
+
+    def rcpt(self, email):
+        if self.in_transaction and self.rcpt_count >= SMTP_VERIFY_RCPT_BATCH:
+            self.reset()
+        if not self.in_transaction:
+            code, msg = self.smtp.mail(SMTP_VERIFY_MAIL_FROM)
+            if code != 250:
+                raise smtplib.SMTPSenderRefused(code, msg, SMTP_VERIFY_MAIL_FROM)
+            self.in_transaction = True
+            self.rcpt_count = 0
+        self.limiter.throttle(self.lease)
+        code, msg = self.smtp.rcpt(email)
+        self.rcpt_count += 1
+        if code == 452 and self.rcpt_count > 1:
+            # Лимит получателей в транзакции — начинаем новую и повторяем
+            self.reset()
+            return self.rcpt(email)
+        return code, msg
+
+    def reset(self):
+        if self.in_transaction:
+            self.smtp.rset()
+        self.in_transaction = False
+        self.rcpt_count = 0
+
+    def close(self):
+        if self.smtp is None:
+            return
+        try:
+            self.smtp.quit()
+        except Exception:
+            try:
+                self.smtp.close()
+            except Exception:
+                pass
+
+
+def _session_error(exc):
+    if isinstance(exc, (socket.timeout, TimeoutError)):
+        return 'Таймаут подключения к SMTP серверу'
+    if isinstance(exc, ConnectionRefusedError):
+        return 'SMTP сервер отказал в подключении'
+    if isinstance(exc, smtplib.SMTPSenderRefused):
+        return 'SMTP сервер отклоняет отправителей'
+    if isinstance(exc, (smtplib.SMTPConnectError, smtplib.SMTPHeloError)):
+        return 'SMTP сервер недоступен'
+    if isinstance(exc, smtplib.SMTPServerDisconnected):
+        return 'SMTP сервер разорвал соединение'
+    return f'Ошибка SMTP проверки: {str(exc)}'
+
+
+def _verify_on_host(host, emails_by_domain):
+    """Проверяет адреса нескольких доменов с общим MX в одной сессии."""
+    results = {}
+    limiter = _limiter_for(host)
+    pending = [email for emails in emails_by_domain.values() for email in emails]
+
+    with limiter.session() as lease:
+        session = _Session(host, limiter, lease)
+        try:
+            session.open()
+            for domain, emails in emails_by_domain.items():
+                catch_all = get_cached_catch_all(domain)
+                if catch_all is None:
+                    # Одна проба на домен: случайный адрес, которого точно нет
+                    code, _ = session.rcpt(f"probe-{uuid.uuid4().hex[:16]}@{domain}")
+                    catch_all = code in (250, 251)
+                    if 200 <= code < 300 or 500 <= code < 600:
+                        _cache_set(_catch_all_cache_key(domain), catch_all, SMTP_CATCH_ALL_CACHE_TTL)
+
+                for email in emails:
+                    if catch_all:
+                        results[email] = {'valid': True, 'error': None, 'catch_all': True}
+                        continue
+                    code, msg = session.rcpt(email)
+                    result, final = _rcpt_result(code, msg)
+                    if final:
+                        _cache_set(_result_cache_key(email), result, SMTP_VERIFY_CACHE_TTL)
+                    elif not result['valid']:
+                        result['temporary'] = True
+                    results[email] = result
+                # Домены не смешиваем в одной транзакции
+                session.reset()
+        except Exception as e:
+            error = _session_error(e)
+            logger.info(f"SMTP session with {host} failed: {error}")
+            for email in pending:
+                results.setdefault(email, {'valid': False, 'error': error, 'temporary': True})
+        finally:
+            session.close()
+    return results
+
+
+def verify_emails(emails, max_workers=SMTP_VERIFY_WORKERS, use_cache=True):
+    """
+    Проверяет адреса через SMTP. Возвращает {email: {'valid': bool, 'error': str|None, ...}};
+    для доменов catch-all в результате 'catch_all': True, для неокончательных отказов
+    (4xx, обрыв сессии, таймаут DNS) — 'temporary': True.
+    """
+    results = {}
+    by_domain = {}
+    for email in dict.fromkeys(emails):
+        if use_cache:
+            try:
+                cached = cache.get(_result_cache_key(email))
+            except Exception:
+                cached = None
+            if cached is not None:
+                results[email] = cached
+                continue
+        domain = email.split('@', 1)[1].lower()
+        by_domain.setdefault(domain, []).append(email)
+
+    # Домены, уже известные как catch-all, не требуют сессии
+    for domain in list(by_domain):
+        if get_cached_catch_all(domain) is True:
+            for email in by_domain.pop(domain):
+                results[email] = {'valid': True, 'error': None, 'catch_all': True}
+
+    if not by_domain:
+        return results
+
+    # Группируем домены по основному MX-хосту
+    by_host = {}
+    mx_answers = dns_resolver.resolve_many(by_domain.keys(), 'MX')
+    for domain, emails in by_domain.items():
+        answer = mx_answers.get(domain)
+        if answer is None or not answer['records']:
+            if answer is not None and answer['status'] == dns_resolver.NXDOMAIN:
+                error = 'Домен не существует'
+            elif answer is not None and answer['status'] == dns_resolver.TIMEOUT:
+                error = 'Таймаут DNS запроса'
+            else:
+                error = 'Домен не имеет MX записей'
+            temporary = answer is None or answer['status'] not in dns_resolver.NEGATIVE_STATUSES
+            for email in emails:
+                results[email] = {'valid': False, 'error': error, 'temporary': temporary}
+            continue
+        by_host.setdefault(answer['records'][0], {})[domain] = emails
+
+    workers = max(1, min(max_workers, len(by_host) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for host_results in executor.map(lambda item: _verify_on_host(*item), by_host.items()):
+            results.update(host_results)
+    return results
@@ -0,0 +1,113 @@
+# apps/mailer/suppression.py
+
+"""
+Глобальный (по пользователю) список подавления отправки.
+
+Источник истины — таблица SuppressedEmail (user, email_hash). Для проверки при отправке
+она зеркалируется в Redis-множество хэшей на пользователя: множество загружается из БД
+при первой проверке и живёт SUPPRESSION_REDIS_TTL секунд, новые записи добавляются в него
+сразу. Если Redis недоступен, проверка идёт индексным запросом к таблице.
+
+Отбор аудитории кампании исключает подавленные адреса в SQL:
+Contact.email_hash NOT IN (SELECT email_hash FROM suppressed WHERE user_id = …).
+"""
+
+import logging
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+
+from .hashing import email_hash
+from .models import SuppressedEmail
+
+logger = logging.getLogger(__name__)
+
+SUPPRESSION_REDIS_TTL = getattr(settings, 'SUPPRESSION_REDIS_TTL', 24 * 3600)
+SUPPRESSION_LOAD_CHUNK = 10000
+
+
+def _redis():
+    """Клиент Redis кэша по умолчанию или None, если кэш не на django_redis."""
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except Exception:
+        return None
+
+
+def _set_key(user_id):
+    return f"vashsender:suppressed:{user_id}"
+
+
+def _loaded_key(user_id):
+    return f"vashsender:suppressed_loaded:{user_id}"
+
+
+def _load_set(client, user_id):
+    """Заполняет множество пользователя из БД и ставит метку загрузки."""
+    key = _set_key(user_id)
+    hashes = SuppressedEmail.objects.filter(user_id=user_id).values_list('email_hash', flat=True)
+    chunk = []
+    pipe = client.pipeline()
+    for value in hashes.iterator(chunk_size=SUPPRESSION_LOAD_CHUNK):
+        chunk.append(value)
+        if len(chunk) >= SUPPRESSION_LOAD_CHUNK:
+            pipe.sadd(key, *chunk)
+            chunk = []
+    if chunk:
+        pipe.sadd(key, *chunk)
+    pipe.expire(key, SUPPRESSION_REDIS_TTL)
+    pipe.set(_loaded_key(user_id), 1, ex=SUPPRESSION_REDIS_TTL)
+    pipe.execute()
+
+
+def suppression_filter(user_id):
+    """Q для исключения подавленных адресов пользователя из queryset контактов."""
+    return ~Q(email_hash__in=SuppressedEmail.objects.filter(user_id=user_id).values('email_hash'))
+
+
+def is_suppressed(user_id, email):
+    """O(1)-проверка адреса перед отправкой."""
+    value = email_hash(email)
+    client = _redis()
+    if client is not None:
+        try:
+            if not client.exists(_loaded_key(user_id)):
+                _load_set(client, user_id)
+            return bool(client.sismember(_set_key(user_id), value))
+        except Exception as e:
+            logger.warning(f"Suppression set check failed for user {user_id}: {e}")
+    return SuppressedEmail.objects.filter(user_id=user_id, email_hash=value).exists()
+
+
+def suppress_email(user_id, email, reason=SuppressedEmail.UNSUBSCRIBE):
+    """Добавляет адрес в список подавления пользователя. Возвращает True, если запись новая."""
+    try:
+        with transaction.atomic():
+            SuppressedEmail.objects.create(user_id=user_id, email=email, reason=reason)
+        created = True
+    except IntegrityError:
+        created = False
+
+    client = _redis()
+    if client is not None:
+        try:
+            # Добавляем и до загрузки множества: загрузка только дополняет его
+            client.sadd(_set_key(user_id), email_hash(email))
+        except Exception as e:
+            logger.warning(f"Suppression set update failed for user {user_id}: {e}")
+    return created
+
+
+def unsuppress_email(user_id, email):
+    """Убирает адрес из списка подавления пользователя."""
+    value = email_hash(email)
+    deleted, _ = SuppressedEmail.objects.filter(user_id=user_id, email_hash=value).delete()
+    client = _redis()
+    if client is not None:
+        try:
+            client.srem(_set_key(user_id), value)
+        except Exception as e:
+            logger.warning(f"Suppression set update failed for user {user_id}: {e}")
+    return bool(deleted)
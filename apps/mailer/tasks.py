@@ -4,17 +4,117 @@ from celery import shared_task
 from django.utils import timezone
 from django.core.files.storage import default_storage
 from django.core.files.base import ContentFile
+from django.conf import settings
 from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
 
-from .models import ContactList, Contact, ImportTask
-from .utils import parse_emails, validate_email_production, get_contact_quota, format_quota_error
+from .ingest import ingest_contacts
+from .models import ContactList, Contact, ImportTask, ImportShard, ChunkedUpload, RevalidationJob, ContactListOperation, ContactExportTask, PurgeJob
+from .utils import (
+    count_import_rows, validate_emails_batch, import_status, get_contact_quota, format_quota_error,
+    detect_import_layout, split_import_file, iter_email_batches_in_range, iter_import_batches,
+)
+
+
+IMPORT_BATCH_SIZE = 1000  # адресов читается из файла, проверяется и создаётся за раз
+# Через сколько секунд перепроверяются адреса, не проверенные из-за временной ошибки
+IMPORT_RECHECK_DELAY = getattr(settings, 'IMPORT_RECHECK_DELAY', 600)
+
+
+def schedule_recheck(contact_list_id, emails, logger=None):
+    """
+    Ставит в очередь повторную проверку адресов, записанных без проверки из-за
+    временной ошибки (DNS, 4xx, обрыв SMTP). Возвращает число таких контактов.
+    """
+    contact_ids = list(Contact.objects.filter(
+        contact_list_id=contact_list_id, email__in=emails
+    ).values_list('id', flat=True))
+    if contact_ids:
+        try:
+            validate_contact_batch.apply_async(args=[contact_ids], countdown=IMPORT_RECHECK_DELAY)
+        except Exception as e:
+            if logger:
+                logger.warning(f"Failed to schedule recheck of {len(contact_ids)} contacts: {e}")
+    return len(contact_ids)
+
+
+def import_email_batch(contact_list_id, batch, domain_verdicts, limit=None, logger=None):
+    """
+    Обрабатывает порцию адресов импорта: дедупликация, пропуск уже существующих,
+    пакетная валидация и запись одной вставкой.
+    limit — сколько новых контактов можно создать (None — без ограничения).
+    Возвращает счётчики порции.
+    """
+    stats = {
+        'processed': len(batch), 'added': 0, 'skipped': 0, 'invalid': 0,
+        'blacklisted': 0, 'errors': 0, 'unresolved': 0, 'limit_reached': False,
+    }
+
+    # Убираем дубликаты внутри порции, сохраняя порядок
+    candidates = list(dict.fromkeys(email for email in batch if email))
+    stats['skipped'] += len(batch) - len(candidates)
+
+    # Уже существующие адреса не валидируем повторно (DNS/SMTP дороже индексного запроса)
+    existing_emails = set(Contact.objects.filter(
+        contact_list_id=contact_list_id,
+        email__in=candidates
+    ).values_list('email', flat=True))
+    to_validate = [email for email in candidates if email not in existing_emails]
+    stats['skipped'] += len(candidates) - len(to_validate)
+
+    if limit is not None and len(to_validate) > limit:
+        to_validate = to_validate[:max(0, limit)]
+        stats['limit_reached'] = True
+    if not to_validate:
+        return stats
+
+    try:
+        # Полная валидация порции: каждый домен проверяется один раз за импорт
+        validation_results = validate_emails_batch(to_validate, domain_verdicts=domain_verdicts)
+    except Exception as e:
+        stats['errors'] += len(to_validate)
+        if logger:
+            logger.warning(f"Error validating batch of {len(to_validate)} emails: {e}")
+        return stats
+
+    rows = []
+    unresolved = []
+    for email in to_validate:
+        validation_result = validation_results.get(email)
+        if validation_result is None:
+            continue
+        # Невалидные email добавляем как INVALID, непроверенные — до перепроверки как VALID
+        rows.append((email, import_status(validation_result)))
+        if validation_result['temporary']:
+            unresolved.append(email)
+
+    try:
+        # Одна вставка на порцию; адреса, добавленные параллельно, пропускаются в БД
+        ingested = ingest_contacts(contact_list_id, rows, limit=limit)
+    except Exception as e:
+        stats['errors'] += len(rows)
+        if logger:
+            logger.error(f"Error in batch create: {e}", exc_info=True)
+        return stats
+
+    stats['added'] = ingested['inserted']
+    stats['skipped'] += ingested['existing']
+    stats['invalid'] = ingested['by_status'][Contact.INVALID]
+    stats['blacklisted'] = ingested['by_status'][Contact.BLACKLIST]
+    stats['limit_reached'] = stats['limit_reached'] or ingested['limit_reached']
+    if unresolved:
+        stats['unresolved'] = schedule_recheck(contact_list_id, unresolved, logger)
+    return stats
 
 
 @shared_task(bind=True)
-def import_contacts_async(self, task_id, file_path):
+def import_contacts_async(self, task_id, file_path, resume=False):
     """
     Асинхронная задача для импорта контактов с полной валидацией
-    Может выполняться как через Celery (bind=True), так и синхронно
+    Может выполняться как через Celery (bind=True), так и синхронно.
+    После каждой записанной порции сохраняются счётчики и чекпоинт (ImportTask.checkpoint_offset);
+    resume=True продолжает импорт с чекпоинта (см. resume_stale_imports).
     """
     import logging
     logger = logging.getLogger(__name__)
@@ -36,11 +136,12 @@ def import_contacts_async(self, task_id, file_path):
         if limit and (remaining_slots is None or remaining_slots <= 0):
             message = format_quota_error(quota)
             task.status = ImportTask.COMPLETED
-            task.processed_emails = 0
-            task.imported_count = 0
-            task.invalid_count = 0
-            task.blacklisted_count = 0
-            task.error_count = 0
+            if not resume:
+                task.processed_emails = 0
+                task.imported_count = 0
+                task.invalid_count = 0
+                task.blacklisted_count = 0
+                task.error_count = 0
             task.error_message = message
             task.completed_at = timezone.now()
             task.save()
@@ -49,9 +150,13 @@ def import_contacts_async(self, task_id, file_path):
         
         # Обновляем статус на "обрабатывается"
         task.status = ImportTask.PROCESSING
-        task.started_at = timezone.now()
+        task.file_path = file_path
+        task.heartbeat_at = timezone.now()
+        if not resume:
+            task.started_at = task.heartbeat_at
+            task.checkpoint_offset = 0
         task.save()
-        logger.info(f"Task status updated to PROCESSING")
+        logger.info(f"Task status updated to PROCESSING" + (f" (resumed from {task.checkpoint_offset})" if resume else ""))
         
         # Проверяем, что файл существует
         if not os.path.exists(file_path):
@@ -65,190 +170,81 @@ def import_contacts_async(self, task_id, file_path):
         
         logger.info(f"File exists: {file_path}, size: {os.path.getsize(file_path)} bytes")
         
-        # Читаем email адреса из файла
-        with open(file_path, 'rb') as f:
-            emails = parse_emails(f, task.filename)
-        
-        total_emails = len(emails)
-        logger.info(f"Parsed {total_emails} emails from file")
-        task.total_emails = total_emails
-        task.save()
-        
-        if total_emails == 0:
-            logger.warning("No emails found in file")
-            task.status = ImportTask.COMPLETED
-            task.processed_emails = 0
-            task.imported_count = 0
-            task.completed_at = timezone.now()
-            task.save()
-            return True
+        # Быстрая оценка объёма по числу строк — сами адреса читаются потоково, порциями
+        if not resume or not task.total_emails:
+            task.total_emails = count_import_rows(file_path, task.filename)
+            task.save(update_fields=['total_emails'])
+        logger.info(f"Estimated {task.total_emails} rows in file")
+        layout = detect_import_layout(file_path, task.filename)
         
-        # Получаем все существующие email для быстрой проверки
-        existing_emails = set(Contact.objects.filter(
-            contact_list=task.contact_list
-        ).values_list('email', flat=True))
-        logger.info(f"Found {len(existing_emails)} existing emails in contact list")
-        
-        # Счетчики
-        added = 0
-        invalid_count = 0
-        blacklisted_count = 0
-        error_count = 0
-        processed = 0
+        # Счетчики (при возобновлении — с сохранённых значений)
+        added = task.imported_count if resume else 0
+        invalid_count = task.invalid_count if resume else 0
+        blacklisted_count = task.blacklisted_count if resume else 0
+        error_count = task.error_count if resume else 0
+        processed = task.processed_emails if resume else 0
         skipped_count = 0
         limit_reached = False
+        checkpoint_offset = task.checkpoint_offset
         
-        # Батчинг для оптимизации
-        contacts_to_create = []
-        batch_size = 100  # Размер батча для создания контактов
-        
-        logger.info(f"Starting to process {total_emails} emails")
+        # Вердикты по доменам (reserved/disposable/MX/catch-all) общие для всех порций импорта
+        domain_verdicts = {}
         
-        # Обрабатываем email адреса
-        for i, email in enumerate(emails):
-            try:
-                processed += 1
-                
-                # Нормализуем email (lower, strip)
-                email = email.lower().strip() if email else ''
-                if not email:
-                    skipped_count += 1
-                    continue
-                
-                # Обновляем прогресс каждые 100 email
-                if processed % 100 == 0:
-                    task.processed_emails = processed
-                    task.save()
-                    
-                    # Обновляем прогресс Celery задачи (если выполняется через Celery)
-                    if is_celery_task:
-                        try:
-                            self.update_state(
-                                state='PROGRESS',
-                                meta={
-                                    'current': processed,
-                                    'total': total_emails,
-                                    'status': f'Обработано {processed} из {total_emails} email адресов'
-                                }
-                            )
-                        except Exception:
-                            pass  # Игнорируем ошибки обновления состояния
-                
-                # Быстрая проверка существования
-                if email in existing_emails:
-                    skipped_count += 1
-                    continue
-                
-                if limit and remaining_slots is not None and remaining_slots <= 0:
+        with open(file_path, 'rb') as f:
+            batches = iter_import_batches(
+                f, layout, checkpoint=task.checkpoint_offset, filename=task.filename, batch_size=IMPORT_BATCH_SIZE
+            )
+            for batch, checkpoint_offset in batches:
+                stats = import_email_batch(
+                    task.contact_list_id, batch, domain_verdicts, limit=remaining_slots, logger=logger
+                )
+                processed += stats['processed']
+                added += stats['added']
+                skipped_count += stats['skipped']
+                invalid_count += stats['invalid']
+                blacklisted_count += stats['blacklisted']
+                error_count += stats['errors']
+                if remaining_slots is not None:
+                    remaining_slots -= stats['added']
+                if stats['limit_reached']:
                     limit_reached = True
-                    break
-
-                # Полная валидация email
-                validation_result = validate_email_production(email)
-                
-                if validation_result['is_valid']:
-                    status_code = validation_result['status']
-                    
-                    # Создаем новый контакт
-                    new_contact = Contact(
-                        contact_list=task.contact_list,
-                        email=email,
-                        status=status_code
-                    )
-                    contacts_to_create.append(new_contact)
-                    # Добавляем email в existing_emails, чтобы избежать дубликатов в батче
-                    existing_emails.add(email)
-                    if remaining_slots is not None:
-                        remaining_slots -= 1
-                    
-                    if status_code == Contact.BLACKLIST:
-                        blacklisted_count += 1
-                else:
-                    # Добавляем невалидные email как INVALID
-                    new_contact = Contact(
-                        contact_list=task.contact_list,
-                        email=email,
-                        status=Contact.INVALID
-                    )
-                    contacts_to_create.append(new_contact)
-                    # Добавляем email в existing_emails, чтобы избежать дубликатов в батче
-                    existing_emails.add(email)
-                    if remaining_slots is not None:
-                        remaining_slots -= 1
-                    invalid_count += 1
+                if stats['added']:
+                    logger.info(f"Created batch of {stats['added']} contacts (total added: {added})")
                 
-                # Батчинг: сохраняем каждые batch_size контактов
-                if len(contacts_to_create) >= batch_size:
+                # Порция записана — сохраняем счётчики, чекпоинт и heartbeat
+                ImportTask.objects.filter(id=task.id).update(
+                    processed_emails=processed,
+                    imported_count=added,
+                    invalid_count=invalid_count,
+                    blacklisted_count=blacklisted_count,
+                    error_count=error_count,
+                    checkpoint_offset=checkpoint_offset,
+                    heartbeat_at=timezone.now(),
+                )
+                if is_celery_task:
                     try:
-                        with transaction.atomic():
-                            # Получаем email из батча для проверки
-                            batch_emails = [c.email for c in contacts_to_create]
-                            
-                            # Проверяем, какие email уже существуют в базе
-                            existing_in_batch = set(Contact.objects.filter(
-                                contact_list=task.contact_list,
-                                email__in=batch_emails
-                            ).values_list('email', flat=True))
-                            
-                            # Фильтруем контакты, которые еще не существуют
-                            new_contacts = [c for c in contacts_to_create if c.email not in existing_in_batch]
-                            
-                            if new_contacts:
-                                # Используем bulk_create только для новых контактов
-                                Contact.objects.bulk_create(new_contacts, ignore_conflicts=True)
-                                added += len(new_contacts)
-                                logger.info(f"Created batch of {len(new_contacts)} contacts (total added: {added})")
-                            else:
-                                logger.warning(f"All {len(contacts_to_create)} contacts in batch already exist")
-                            
-                            # Обновляем existing_emails с новыми email из батча
-                            for c in contacts_to_create:
-                                existing_emails.add(c.email)
-                        
-                        contacts_to_create = []
-                    except Exception as e:
-                        error_count += len(contacts_to_create)
-                        # Удаляем email из existing_emails, если батч не был создан
-                        for c in contacts_to_create:
-                            existing_emails.discard(c.email)
-                        contacts_to_create = []
-                        logger.error(f"Error in batch create: {e}", exc_info=True)
-                        
-            except Exception as e:
-                error_count += 1
-                print(f"Error processing email {email if 'email' in locals() else 'unknown'}: {e}")
-                continue
+                        self.update_state(
+                            state='PROGRESS',
+                            meta={
+                                'current': processed,
+                                'total': task.total_emails,
+                                'status': f'Обработано {processed} из {task.total_emails} email адресов'
+                            }
+                        )
+                    except Exception:
+                        pass  # Игнорируем ошибки обновления состояния
+                
+                if limit_reached:
+                    break
         
-        # Сохраняем оставшиеся контакты
-        if contacts_to_create:
-            try:
-                with transaction.atomic():
-                    # Получаем email из батча для проверки
-                    batch_emails = [c.email for c in contacts_to_create]
-                    
-                    # Проверяем, какие email уже существуют в базе
-                    existing_in_batch = set(Contact.objects.filter(
-                        contact_list=task.contact_list,
-                        email__in=batch_emails
-                    ).values_list('email', flat=True))
-                    
-                    # Фильтруем контакты, которые еще не существуют
-                    new_contacts = [c for c in contacts_to_create if c.email not in existing_in_batch]
-                    
-                    if new_contacts:
-                        # Используем bulk_create только для новых контактов
-                        Contact.objects.bulk_create(new_contacts, ignore_conflicts=True)
-                        added += len(new_contacts)
-                        logger.info(f"Created final batch of {len(new_contacts)} contacts (total added: {added})")
-                    else:
-                        logger.warning(f"All {len(contacts_to_create)} contacts in final batch already exist")
-            except Exception as e:
-                error_count += len(contacts_to_create)
-                logger.error(f"Error in final batch create: {e}", exc_info=True)
+        # Оценка по строкам могла включать заголовки и пустые строки
+        task.total_emails = processed
         
         # Завершаем задачу
         logger.info(f"Import completed: processed={processed}, added={added}, invalid={invalid_count}, blacklisted={blacklisted_count}, errors={error_count}")
         task.status = ImportTask.COMPLETED
+        task.checkpoint_offset = checkpoint_offset
+        task.heartbeat_at = timezone.now()
         task.processed_emails = processed
         task.imported_count = added
         task.invalid_count = invalid_count
@@ -295,23 +291,858 @@ def import_contacts_async(self, task_id, file_path):
         return False
 
 
+# Параллельный импорт больших файлов частями (шардами) по диапазонам байт
+IMPORT_SHARD_MIN_BYTES = getattr(settings, 'IMPORT_SHARD_MIN_BYTES', 16 * 1024 * 1024)
+IMPORT_SHARD_BYTES = getattr(settings, 'IMPORT_SHARD_BYTES', 8 * 1024 * 1024)
+IMPORT_MAX_SHARDS = getattr(settings, 'IMPORT_MAX_SHARDS', 64)
+IMPORT_MAX_RUNNING_SHARDS_PER_USER = getattr(settings, 'IMPORT_MAX_RUNNING_SHARDS_PER_USER', 4)
+IMPORT_SHARD_RETRY_DELAY = 10  # секунд ожидания свободного слота
+IMPORT_QUOTA_WAIT = getattr(settings, 'IMPORT_QUOTA_WAIT', 2)  # секунд ожидания чужих резервов квоты
+IMPORT_QUOTA_WAIT_ATTEMPTS = getattr(settings, 'IMPORT_QUOTA_WAIT_ATTEMPTS', 30)
+
+
+def start_contact_import(task, file_path):
+    """
+    Запускает импорт: большие текстовые файлы делятся на части и обрабатываются
+    параллельно (chord: шарды + итоговая задача), остальные — одной задачей.
+    Возвращает AsyncResult запущенной задачи.
+    """
+    from celery import chord
+
+    layout = detect_import_layout(file_path, task.filename)
+    size = os.path.getsize(file_path)
+    if layout['format'] == 'xlsx' or size < IMPORT_SHARD_MIN_BYTES:
+        return import_contacts_async.delay(str(task.id), file_path)
+
+    parts = min(IMPORT_MAX_SHARDS, -(-size // IMPORT_SHARD_BYTES))
+    ranges = split_import_file(file_path, parts, quoted=layout['format'] in ('csv', 'tsv'))
+
+    quota = get_contact_quota(task.contact_list.owner)
+    limit = quota.get('limit') or 0
+    task.quota_remaining = max(0, quota.get('remaining') or 0) if limit else None
+    task.shard_count = len(ranges)
+    task.total_emails = count_import_rows(file_path, task.filename)
+    task.status = ImportTask.PROCESSING
+    task.file_path = file_path
+    task.started_at = timezone.now()
+    task.save(update_fields=['quota_remaining', 'shard_count', 'total_emails', 'status', 'file_path', 'started_at'])
+
+    ImportShard.objects.bulk_create([
+        ImportShard(import_task=task, index=index, start_offset=start, end_offset=end)
+        for index, (start, end) in enumerate(ranges)
+    ])
+    shard_ids = list(ImportShard.objects.filter(import_task=task).order_by('index').values_list('id', flat=True))
+    header = [import_contact_shard.s(str(task.id), shard_id, file_path, layout) for shard_id in shard_ids]
+    try:
+        return chord(header)(finalize_sharded_import.s(str(task.id), file_path))
+    except Exception:
+        # Брокер недоступен — откатываем разбиение, вызывающий код выполнит импорт одной задачей
+        ImportShard.objects.filter(import_task=task).delete()
+        task.shard_count = 0
+        task.quota_remaining = None
+        task.status = ImportTask.PENDING
+        task.save(update_fields=['shard_count', 'quota_remaining', 'status'])
+        raise
+
+
+def _reserve_import_quota(task_id, shard_id, wanted):
+    """Атомарно забирает из общего остатка квоты импорта до wanted слотов в резерв шарда."""
+    with transaction.atomic():
+        task = ImportTask.objects.select_for_update().only('quota_remaining').get(id=task_id)
+        if task.quota_remaining is None:
+            return None
+        granted = max(0, min(wanted, task.quota_remaining))
+        if granted:
+            ImportTask.objects.filter(id=task_id).update(quota_remaining=F('quota_remaining') - granted)
+            ImportShard.objects.filter(id=shard_id).update(quota_reserved=F('quota_reserved') + granted)
+        return granted
+
+
+def _release_import_quota(task_id, shard_id, granted, used):
+    """Снимает резерв шарда; неиспользованные слоты возвращаются в общий остаток."""
+    if not granted:
+        return
+    with transaction.atomic():
+        if granted - used:
+            ImportTask.objects.filter(id=task_id, quota_remaining__isnull=False).update(
+                quota_remaining=F('quota_remaining') + (granted - used)
+            )
+        ImportShard.objects.filter(id=shard_id).update(quota_reserved=F('quota_reserved') - granted)
+
+
+def _live_shards():
+    """Шарды, которые сейчас обрабатываются: статус PROCESSING и heartbeat не старше IMPORT_HEARTBEAT_TIMEOUT."""
+    from datetime import timedelta
+
+    since = timezone.now() - timedelta(seconds=IMPORT_HEARTBEAT_TIMEOUT)
+    return ImportShard.objects.filter(status=ImportShard.PROCESSING, heartbeat_at__gte=since)
+
+
+def _resync_import_quota(task_id):
+    """
+    Пересчитывает общий остаток квоты по фактическому числу контактов пользователя
+    за вычетом резервов работающих шардов (резерв упавшего шарда при этом освобождается).
+    """
+    from django.db.models import Sum
+
+    with transaction.atomic():
+        task = ImportTask.objects.select_for_update().select_related('contact_list__owner').get(id=task_id)
+        if task.quota_remaining is None:
+            return
+        reserved = _live_shards().filter(import_task_id=task_id).aggregate(total=Sum('quota_reserved'))['total'] or 0
+        remaining = get_contact_quota(task.contact_list.owner).get('remaining') or 0
+        ImportTask.objects.filter(id=task_id).update(quota_remaining=max(0, remaining - reserved))
+
+
+def _acquire_import_quota(task_id, shard_id, wanted):
+    """
+    Квота на порцию шарда. Если общего остатка не хватает, а другие шарды держат резерв
+    (неиспользованная часть вернётся после их порций), шард отдаёт свой резерв и ждёт —
+    так ожидающие шарды ничего не удерживают и не блокируют друг друга. Когда чужих
+    резервов не осталось, остаток пересчитывается по фактическому числу контактов;
+    только после этого нехватка квоты считается исчерпанием лимита.
+    """
+    granted = _reserve_import_quota(task_id, shard_id, wanted)
+    attempts = 0
+    while granted is not None and granted < wanted:
+        others = _live_shards().filter(import_task_id=task_id, quota_reserved__gt=0).exclude(id=shard_id)
+        if not others.exists():
+            _resync_import_quota(task_id)
+            return granted + _reserve_import_quota(task_id, shard_id, wanted - granted)
+        if attempts >= IMPORT_QUOTA_WAIT_ATTEMPTS:
+            return granted
+        _release_import_quota(task_id, shard_id, granted, 0)
+        ImportShard.objects.filter(id=shard_id).update(heartbeat_at=timezone.now())
+        attempts += 1
+        time.sleep(IMPORT_QUOTA_WAIT)
+        granted = _reserve_import_quota(task_id, shard_id, wanted)
+    return granted
+
+
+def _lease_shard_slot(shard_id, user_id, celery_task_id):
+    """
+    Захватывает шард под слот параллельной обработки пользователя.
+    Слот — аренда, а не счётчик: занятыми считаются шарды пользователя в статусе PROCESSING
+    со свежим heartbeat, поэтому слот шарда упавшего воркера освобождается сам, когда
+    heartbeat устаревает. Возвращает (был ли свободный слот, захвачен ли шард этой задачей).
+    """
+    from django.contrib.auth import get_user_model
+
+    with transaction.atomic():
+        # Блокировка строки пользователя сериализует подсчёт занятых слотов
+        list(get_user_model().objects.select_for_update().filter(id=user_id).values_list('id', flat=True))
+        running = _live_shards().filter(import_task__contact_list__owner_id=user_id).exclude(id=shard_id)
+        if running.count() >= IMPORT_MAX_RUNNING_SHARDS_PER_USER:
+            return False, False
+        # Условный UPDATE: устаревшее сообщение Celery (часть уже перезапущена
+        # другой задачей) не обрабатывает её второй раз
+        now = timezone.now()
+        claimed = ImportShard.objects.filter(id=shard_id).filter(
+            Q(status=ImportShard.PENDING) | Q(status=ImportShard.PROCESSING, celery_task_id=celery_task_id)
+        ).update(
+            status=ImportShard.PROCESSING,
+            celery_task_id=celery_task_id,
+            started_at=Coalesce('started_at', Value(now)),
+            heartbeat_at=now,
+        )
+    return True, bool(claimed)
+
+
+@shared_task(bind=True, max_retries=None)
+def import_contact_shard(self, task_id, shard_id, file_path, layout, finalize=False):
+    """
+    Обрабатывает одну часть файла импорта: разбор диапазона байт, валидация, запись.
+    Квота берётся из общего остатка ImportTask.quota_remaining порциями.
+    После каждой порции сохраняются счётчики, чекпоинт и heartbeat шарда; повторный запуск
+    продолжает часть с чекпоинта. finalize=True — шард перезапущен вне chord
+    (resume_stale_imports), и итог импорта подводит последний завершившийся шард.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    shard = ImportShard.objects.select_related('import_task__contact_list').get(id=shard_id)
+    if shard.status in (ImportShard.COMPLETED, ImportShard.FAILED):
+        return shard.status
+    task = shard.import_task
+    user_id = task.contact_list.owner_id
+
+    # Не больше N одновременно работающих шардов на пользователя
+    has_slot, claimed = _lease_shard_slot(shard_id, user_id, self.request.id)
+    if not has_slot:
+        # Ожидание слота — не зависание: heartbeat не даёт перезапустить шард
+        ImportShard.objects.filter(id=shard_id).update(heartbeat_at=timezone.now())
+        raise self.retry(countdown=IMPORT_SHARD_RETRY_DELAY)
+    if not claimed:
+        logger.info(f"Import shard {shard_id} is already taken by another task")
+        return shard.status
+    shard.refresh_from_db()
+
+    try:
+        domain_verdicts = {}
+        with open(file_path, 'rb') as f:
+            batches = iter_email_batches_in_range(
+                f, max(shard.start_offset, shard.checkpoint_offset), shard.end_offset, layout,
+                batch_size=IMPORT_BATCH_SIZE,
+            )
+            for batch, checkpoint_offset in batches:
+                granted = _acquire_import_quota(task_id, shard_id, len(batch))
+                stats = import_email_batch(
+                    task.contact_list_id, batch, domain_verdicts, limit=granted, logger=logger
+                )
+                if granted is not None:
+                    _release_import_quota(task_id, shard_id, granted, stats['added'])
+                if stats['limit_reached']:
+                    shard.limit_reached = True
+
+                # Порция записана — сохраняем счётчики, чекпоинт и heartbeat
+                shard.processed_emails += stats['processed']
+                shard.imported_count += stats['added']
+                shard.invalid_count += stats['invalid']
+                shard.blacklisted_count += stats['blacklisted']
+                shard.skipped_count += stats['skipped']
+                shard.error_count += stats['errors']
+                shard.checkpoint_offset = checkpoint_offset
+                shard.heartbeat_at = timezone.now()
+                shard.save(update_fields=[
+                    'processed_emails', 'imported_count', 'invalid_count', 'blacklisted_count',
+                    'skipped_count', 'error_count', 'limit_reached', 'checkpoint_offset', 'heartbeat_at',
+                ])
+                ImportTask.objects.filter(id=task_id).update(
+                    processed_emails=F('processed_emails') + stats['processed']
+                )
+                if shard.limit_reached:
+                    break
+
+        shard.status = ImportShard.COMPLETED
+    except Exception as e:
+        logger.error(f"Import shard {shard_id} of task {task_id} failed: {e}", exc_info=True)
+        shard.status = ImportShard.FAILED
+        shard.error_message = f"{str(e)}: {type(e).__name__}"
+
+    shard.completed_at = timezone.now()
+    shard.save(update_fields=['status', 'error_message', 'completed_at'])
+    if finalize:
+        finalize_sharded_import(None, task_id, file_path)
+    # Ошибка шарда не должна срывать chord — итоговая задача учтёт статус
+    return shard.status
+
+
+@shared_task
+def finalize_sharded_import(shard_statuses, task_id, file_path):
+    """
+    Итог параллельного импорта: суммирует счётчики шардов в ImportTask.
+    Пока не все части завершены (шард перезапущен после падения воркера), ничего не делает —
+    итог подведёт перезапущенный шард или resume_stale_imports.
+    """
+    from django.db.models import Sum
+
+    task = ImportTask.objects.select_related('contact_list').get(id=task_id)
+    shards = ImportShard.objects.filter(import_task=task)
+    if task.status != ImportTask.PROCESSING or shards.filter(
+        status__in=(ImportShard.PENDING, ImportShard.PROCESSING)
+    ).exists():
+        return task.status
+    totals = shards.aggregate(
+        processed=Sum('processed_emails'),
+        imported=Sum('imported_count'),
+        invalid=Sum('invalid_count'),
+        blacklisted=Sum('blacklisted_count'),
+        errors=Sum('error_count'),
+    )
+    failed = list(shards.filter(status=ImportShard.FAILED).values_list('index', 'error_message'))
+
+    task.processed_emails = totals['processed'] or 0
+    task.total_emails = task.processed_emails
+    task.imported_count = totals['imported'] or 0
+    task.invalid_count = totals['invalid'] or 0
+    task.blacklisted_count = totals['blacklisted'] or 0
+    task.error_count = totals['errors'] or 0
+    task.status = ImportTask.FAILED if failed and len(failed) == task.shard_count else ImportTask.COMPLETED
+    messages = []
+    if shards.filter(limit_reached=True).exists():
+        messages.append(format_quota_error(get_contact_quota(task.contact_list.owner)))
+    if failed:
+        messages.append('; '.join(f"Часть {index + 1}: {error}" for index, error in failed))
+    task.error_message = '\n'.join(messages)
+    task.completed_at = timezone.now()
+    task.save()
+
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+    return task.status
+
+
+# Возобновление прерванных импортов
+IMPORT_HEARTBEAT_TIMEOUT = getattr(settings, 'IMPORT_HEARTBEAT_TIMEOUT', 15 * 60)  # секунд без heartbeat
+IMPORT_MAX_RESUMES = getattr(settings, 'IMPORT_MAX_RESUMES', 5)
+
+
+def _resume_stale_shards(now, stale_before, logger):
+    """
+    Перезапускает части параллельных импортов без heartbeat дольше IMPORT_HEARTBEAT_TIMEOUT
+    и подводит итог импортов, у которых все части завершены, а chord так и не сработал.
+    """
+    from django.db.models import Max
+
+    stale = ImportShard.objects.filter(
+        import_task__status=ImportTask.PROCESSING,
+        status__in=(ImportShard.PENDING, ImportShard.PROCESSING),
+    ).filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, import_task__started_at__lt=stale_before)
+    ).select_related('import_task')
+
+    resumed = 0
+    layouts = {}
+    for shard in stale:
+        task = shard.import_task
+        # Захватываем часть условным UPDATE; PENDING без celery_task_id забирает новая задача
+        claimed = ImportShard.objects.filter(
+            id=shard.id, status=shard.status, heartbeat_at=shard.heartbeat_at
+        ).update(
+            status=ImportShard.PENDING, celery_task_id=None, quota_reserved=0,
+            heartbeat_at=now, resume_count=F('resume_count') + 1,
+        )
+        if not claimed:
+            continue
+
+        if not task.file_path or not os.path.exists(task.file_path) or shard.resume_count >= IMPORT_MAX_RESUMES:
+            reason = 'файл импорта не найден' if not task.file_path or not os.path.exists(task.file_path) \
+                else 'превышено число попыток возобновления'
+            ImportShard.objects.filter(id=shard.id).update(
+                status=ImportShard.FAILED,
+                error_message=f"Импорт прерван: {reason}",
+                completed_at=now,
+            )
+            logger.warning(f"Stale import shard {shard.id} of task {task.id} marked as FAILED: {reason}")
+            finalize_sharded_import(None, str(task.id), task.file_path)
+            continue
+
+        if task.id not in layouts:
+            layouts[task.id] = detect_import_layout(task.file_path, task.filename)
+        logger.info(f"Resuming stale import shard {shard.id} of task {task.id} from checkpoint {shard.checkpoint_offset}")
+        import_contact_shard.delay(str(task.id), shard.id, task.file_path, layouts[task.id], finalize=True)
+        resumed += 1
+
+    # Все части завершены давно, а импорт всё ещё PROCESSING — итоговая задача chord потеряна
+    unfinished = ImportShard.objects.filter(status__in=(ImportShard.PENDING, ImportShard.PROCESSING))
+    orphaned = ImportTask.objects.filter(status=ImportTask.PROCESSING, shard_count__gt=0).exclude(
+        id__in=unfinished.values('import_task_id')
+    ).annotate(last_completed=Max('shards__completed_at')).filter(last_completed__lt=stale_before)
+    for task in orphaned:
+        logger.info(f"Finalizing sharded import {task.id} after lost chord callback")
+        finalize_sharded_import(None, str(task.id), task.file_path)
+
+    return resumed
+
+
+@shared_task(bind=True)
+def resume_stale_imports(self):
+    """
+    Находит импорты в статусе PROCESSING без heartbeat дольше IMPORT_HEARTBEAT_TIMEOUT
+    (воркер упал или был перезапущен) и продолжает их с сохранённого чекпоинта;
+    у параллельных импортов так же перезапускаются отдельные части (см. _resume_stale_shards).
+    Уже записанные адреса повторно не создаются — вставка пропускает конфликты.
+    """
+    import logging
+    from datetime import timedelta
+    logger = logging.getLogger(__name__)
+
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=IMPORT_HEARTBEAT_TIMEOUT)
+    stale = ImportTask.objects.filter(
+        status=ImportTask.PROCESSING,
+        shard_count=0,
+    ).filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, started_at__lt=stale_before)
+    )
+
+    resumed = 0
+    for task in stale:
+        # Захватываем задачу условным UPDATE, чтобы её не возобновили дважды
+        claimed = ImportTask.objects.filter(
+            id=task.id, status=ImportTask.PROCESSING, heartbeat_at=task.heartbeat_at
+        ).update(heartbeat_at=now, resume_count=F('resume_count') + 1)
+        if not claimed:
+            continue
+
+        if not task.file_path or not os.path.exists(task.file_path) or task.resume_count >= IMPORT_MAX_RESUMES:
+            reason = 'файл импорта не найден' if not task.file_path or not os.path.exists(task.file_path) \
+                else 'превышено число попыток возобновления'
+            ImportTask.objects.filter(id=task.id).update(
+                status=ImportTask.FAILED,
+                error_message=f"Импорт прерван: {reason}",
+                completed_at=now,
+            )
+            logger.warning(f"Stale import {task.id} marked as FAILED: {reason}")
+            continue
+
+        logger.info(f"Resuming stale import {task.id} from checkpoint {task.checkpoint_offset}")
+        import_contacts_async.delay(str(task.id), task.file_path, resume=True)
+        resumed += 1
+
+    return resumed + _resume_stale_shards(now, stale_before, logger)
+
+
+# Незавершённые загрузки частями
+CHUNKED_UPLOAD_EXPIRE_HOURS = getattr(settings, 'CHUNKED_UPLOAD_EXPIRE_HOURS', 48)
+
+
+@shared_task
+def cleanup_stale_uploads():
+    """
+    Удаляет файлы загрузок частями, которые не продолжались дольше
+    CHUNKED_UPLOAD_EXPIRE_HOURS, и помечает такие загрузки как FAILED.
+    """
+    from datetime import timedelta
+
+    expire_before = timezone.now() - timedelta(hours=CHUNKED_UPLOAD_EXPIRE_HOURS)
+    stale = ChunkedUpload.objects.filter(status=ChunkedUpload.UPLOADING, updated_at__lt=expire_before)
+
+    removed = 0
+    for upload in stale:
+        claimed = ChunkedUpload.objects.filter(
+            id=upload.id, status=ChunkedUpload.UPLOADING, updated_at=upload.updated_at
+        ).update(status=ChunkedUpload.FAILED, updated_at=timezone.now())
+        if not claimed:
+            continue
+        try:
+            os.remove(upload.file_path)
+        except OSError:
+            pass
+        removed += 1
+    return removed
+
+
+@shared_task
+def reconcile_contact_counts():
+    """Периодическая сверка счётчиков контактов (списки и квота пользователей) с фактическими данными."""
+    import logging
+    from .counters import reconcile_contact_counts as reconcile_users, reconcile_list_counters
+    logger = logging.getLogger(__name__)
+
+    drifted_lists = reconcile_list_counters()
+    fixed_users = reconcile_users()
+    if drifted_lists or fixed_users:
+        logger.warning(f"Contact counters repaired: lists={len(drifted_lists)}, users={fixed_users}")
+    return {'lists': len(drifted_lists), 'users': fixed_users}
+
 @shared_task
 def validate_contact_batch(contact_ids):
     """
-    Валидация батча контактов (для перевалидации существующих)
+    Валидация батча контактов (для перевалидации существующих).
+    Домены проверяются один раз на батч, статусы пишутся через bulk_update.
     """
-    contacts = Contact.objects.filter(id__in=contact_ids)
-    
-    for contact in contacts:
+    from .revalidation import REVALIDATION_STATUSES, apply_status_changes, revalidate_contacts
+    from .utils import BATCH_VALIDATION_WORKERS
+
+    contacts = list(
+        Contact.objects.filter(id__in=contact_ids, status__in=REVALIDATION_STATUSES)
+        .only('id', 'email', 'status', 'contact_list_id')
+    )
+    changes, _ = revalidate_contacts(contacts, {}, BATCH_VALIDATION_WORKERS, smtp_check=True)
+    apply_status_changes(changes)
+    return len(contacts)
+
+
+# Перевалидация существующих контактов (см. revalidation.py)
+REVALIDATION_MAX_RUNNING_JOBS = getattr(settings, 'REVALIDATION_MAX_RUNNING_JOBS', 2)
+REVALIDATION_HEARTBEAT_TIMEOUT = getattr(settings, 'REVALIDATION_HEARTBEAT_TIMEOUT', 1800)
+REVALIDATION_WINDOW_HOURS = getattr(settings, 'REVALIDATION_WINDOW_HOURS', 5)
+REVALIDATION_NIGHTLY_PARTITIONS = getattr(settings, 'REVALIDATION_NIGHTLY_PARTITIONS', 4)
+
+
+def _running_revalidations(exclude_id):
+    from datetime import timedelta
+    alive_after = timezone.now() - timedelta(seconds=REVALIDATION_HEARTBEAT_TIMEOUT)
+    return RevalidationJob.objects.filter(
+        status=RevalidationJob.RUNNING, heartbeat_at__gte=alive_after,
+    ).exclude(id=exclude_id).count()
+
+
+@shared_task(bind=True, max_retries=None)
+def run_revalidation(self, job_id):
+    """
+    Выполняет один отрезок задания перевалидации и ставит следующий.
+    Одновременно выполняется не больше REVALIDATION_MAX_RUNNING_JOBS заданий,
+    остальные ждут в очереди через retry.
+    """
+    import logging
+    from .revalidation import run_revalidation_job
+    logger = logging.getLogger(__name__)
+
+    job = RevalidationJob.objects.filter(id=job_id).only('id', 'status').first()
+    if job is None or job.status not in (RevalidationJob.PENDING, RevalidationJob.RUNNING):
+        return
+    if job.status == RevalidationJob.PENDING and _running_revalidations(job_id) >= REVALIDATION_MAX_RUNNING_JOBS:
+        raise self.retry(countdown=60)
+
+    try:
+        finished = run_revalidation_job(job_id)
+    except Exception as e:
+        logger.exception(f"Revalidation job {job_id} failed")
+        RevalidationJob.objects.filter(id=job_id).update(
+            status=RevalidationJob.FAILED, error_message=str(e), completed_at=timezone.now(),
+        )
+        return
+
+    if not finished:
+        # Следующий отрезок — отдельной задачей, чтобы не держать воркер часами
+        next_task = run_revalidation.delay(job_id)
+        RevalidationJob.objects.filter(id=job_id).update(celery_task_id=next_task.id)
+
+
+def start_revalidation(job):
+    """Ставит задание в очередь и запоминает id задачи Celery."""
+    task = run_revalidation.delay(job.id)
+    RevalidationJob.objects.filter(id=job.id).update(celery_task_id=task.id)
+    return task
+
+
+@shared_task
+def schedule_nightly_revalidation():
+    """
+    Ночная перевалидация всей базы в окне обслуживания REVALIDATION_WINDOW_HOURS.
+    Диапазон id делится на REVALIDATION_NIGHTLY_PARTITIONS заданий; незавершённые за ночь
+    задания продолжаются со своей позиции в следующее окно, новые создаются после их завершения.
+    """
+    from datetime import timedelta
+    from django.db.models import Max
+
+    deadline = timezone.now() + timedelta(hours=REVALIDATION_WINDOW_HOURS)
+    unfinished = RevalidationJob.objects.filter(
+        scope=RevalidationJob.SCOPE_ALL,
+        status__in=(RevalidationJob.PENDING, RevalidationJob.RUNNING),
+    )
+    if unfinished.exists():
+        unfinished.update(deadline_at=deadline)
+        # Задания, брошенные упавшим воркером, возвращаются в очередь вместе с отложенными
+        _requeue_stale_revalidations(unfinished.filter(status=RevalidationJob.RUNNING))
+        pending = list(unfinished.filter(status=RevalidationJob.PENDING))
+        for job in pending:
+            start_revalidation(job)
+        return unfinished.count()
+
+    max_id = Contact.objects.aggregate(max_id=Max('id'))['max_id']
+    if not max_id:
+        return 0
+    partitions = max(1, REVALIDATION_NIGHTLY_PARTITIONS)
+    step = max_id // partitions + 1
+    created = 0
+    for start in range(0, max_id, step):
+        job = RevalidationJob.objects.create(
+            scope=RevalidationJob.SCOPE_ALL,
+            last_contact_id=start,
+            end_contact_id=min(start + step, max_id),
+            deadline_at=deadline,
+        )
+        start_revalidation(job)
+        created += 1
+    return created
+
+
+def _requeue_stale_revalidations(jobs):
+    """
+    Возвращает в PENDING задания из jobs в статусе RUNNING без heartbeat дольше
+    REVALIDATION_HEARTBEAT_TIMEOUT (воркер упал). Возвращает список возвращённых заданий.
+    """
+    from datetime import timedelta
+
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=REVALIDATION_HEARTBEAT_TIMEOUT)
+    stale = jobs.filter(status=RevalidationJob.RUNNING).filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True)
+    )
+    requeued = []
+    for job in stale:
+        # Условный UPDATE: задание возвращается в очередь один раз
+        claimed = RevalidationJob.objects.filter(
+            id=job.id, status=RevalidationJob.RUNNING, heartbeat_at=job.heartbeat_at,
+        ).update(status=RevalidationJob.PENDING, heartbeat_at=now)
+        if claimed:
+            requeued.append(job)
+    return requeued
+
+
+@shared_task
+def resume_stale_revalidations():
+    """
+    Перезапускает задания перевалидации, брошенные упавшим воркером. Задание продолжается
+    со своей позиции; ночное задание с истёкшим окном ждёт следующего окна в PENDING.
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    resumed = 0
+    for job in _requeue_stale_revalidations(RevalidationJob.objects.all()):
+        if job.deadline_at and job.deadline_at <= timezone.now():
+            continue
+        logger.info(f"Resuming stale revalidation job {job.id} from contact {job.last_contact_id}")
+        start_revalidation(job)
+        resumed += 1
+    return resumed
+
+
+@shared_task(bind=True)
+def run_contact_list_operation(self, operation_id):
+    """Фоновое выполнение операции над списками (см. list_operations.py)."""
+    import logging
+    from .list_operations import run_list_operation
+    logger = logging.getLogger(__name__)
+
+    try:
+        operation = run_list_operation(operation_id)
+    except Exception as e:
+        logger.exception(f"List operation {operation_id} failed")
+        ContactListOperation.objects.filter(id=operation_id).update(
+            status=ContactListOperation.FAILED, error_message=str(e), completed_at=timezone.now(),
+        )
+        raise
+    return {'inserted': operation.inserted, 'removed': operation.removed, 'limit_reached': operation.limit_reached}
+
+
+# Возобновление операций над списками
+LIST_OPERATION_HEARTBEAT_TIMEOUT = getattr(settings, 'LIST_OPERATION_HEARTBEAT_TIMEOUT', 15 * 60)  # секунд без heartbeat
+LIST_OPERATION_MAX_RESUMES = getattr(settings, 'LIST_OPERATION_MAX_RESUMES', 5)
+
+
+@shared_task
+def resume_stale_list_operations():
+    """
+    Перезапускает операции над списками в статусе PENDING/RUNNING без heartbeat дольше
+    LIST_OPERATION_HEARTBEAT_TIMEOUT (воркер упал или сообщение потеряно). Операция
+    продолжается с сохранённой позиции; после LIST_OPERATION_MAX_RESUMES попыток — FAILED.
+    """
+    import logging
+    from datetime import timedelta
+    logger = logging.getLogger(__name__)
+
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=LIST_OPERATION_HEARTBEAT_TIMEOUT)
+    stale = ContactListOperation.objects.filter(
+        status__in=(ContactListOperation.PENDING, ContactListOperation.RUNNING),
+    ).filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, created_at__lt=stale_before)
+    )
+
+    resumed = 0
+    for operation in stale:
+        # Захватываем операцию условным UPDATE, чтобы её не перезапустили дважды
+        claimed = ContactListOperation.objects.filter(
+            id=operation.id, status=operation.status, heartbeat_at=operation.heartbeat_at
+        ).update(heartbeat_at=now, resume_count=F('resume_count') + 1)
+        if not claimed:
+            continue
+
+        if operation.resume_count >= LIST_OPERATION_MAX_RESUMES:
+            ContactListOperation.objects.filter(id=operation.id).update(
+                status=ContactListOperation.FAILED,
+                error_message='Операция прервана: превышено число попыток возобновления',
+                completed_at=now,
+            )
+            logger.warning(f"Stale list operation {operation.id} marked as FAILED")
+            continue
+
+        logger.info(
+            f"Resuming stale list operation {operation.id} ({operation.operation}) "
+            f"from list #{operation.source_index}, contact {operation.last_contact_id}"
+        )
+        celery_task = run_contact_list_operation.delay(str(operation.id))
+        ContactListOperation.objects.filter(id=operation.id).update(celery_task_id=celery_task.id)
+        resumed += 1
+    return resumed
+
+
+@shared_task(bind=True, time_limit=3600, soft_time_limit=3540)
+def generate_contact_export(self, task_id):
+    """
+    Фоновая выгрузка списка (ContactExportTask): ZIP пишется потоком во временный файл,
+    затем сохраняется в хранилище. Прогресс пишется в processed_rows.
+    """
+    import logging
+    import tempfile
+    from django.core.files import File
+    from .export import archive_filename, export_rows_total, write_export_zip
+    logger = logging.getLogger(__name__)
+
+    task = ContactExportTask.objects.select_related('contact_list').get(id=task_id)
+    task.status = ContactExportTask.PROCESSING
+    task.started_at = timezone.now()
+    task.total_rows = export_rows_total(task.contact_list, task.types)
+    task.filename = archive_filename(task.contact_list)
+    task.save(update_fields=['status', 'started_at', 'total_rows', 'filename'])
+
+    def progress(processed):
+        ContactExportTask.objects.filter(id=task.id).update(processed_rows=processed)
+
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            processed = write_export_zip(task.contact_list, task.types, task.format, tmp, progress=progress)
+            tmp.seek(0)
+            task.file.save(f"{task.id}.zip", File(tmp), save=False)
+
+        task.processed_rows = processed
+        task.status = ContactExportTask.COMPLETED
+        task.completed_at = timezone.now()
+        task.save(update_fields=['file', 'processed_rows', 'status', 'completed_at'])
+        logger.info(f"Contact export {task.id} completed: {processed} rows")
+        return {'task_id': str(task.id), 'rows': processed}
+
+    except Exception as e:
+        logger.exception(f"Contact export {task.id} failed")
+        task.status = ContactExportTask.FAILED
+        task.error_message = str(e)
+        task.completed_at = timezone.now()
+        task.save(update_fields=['status', 'error_message', 'completed_at'])
+        raise
+
+
+# Хранение готовых выгрузок и зависшие задачи выгрузки
+CONTACT_EXPORT_RETENTION_HOURS = getattr(settings, 'CONTACT_EXPORT_RETENTION_HOURS', 72)
+CONTACT_EXPORT_STALE_MINUTES = getattr(settings, 'CONTACT_EXPORT_STALE_MINUTES', 90)  # больше time_limit выгрузки
+
+
+@shared_task
+def cleanup_contact_exports():
+    """
+    Обслуживание ContactExportTask: PENDING/PROCESSING дольше CONTACT_EXPORT_STALE_MINUTES
+    (воркер убит по time_limit или упал, сообщение потеряно) помечаются как FAILED,
+    завершённые выгрузки старше CONTACT_EXPORT_RETENTION_HOURS удаляются вместе с архивом.
+    """
+    import logging
+    from datetime import timedelta
+    logger = logging.getLogger(__name__)
+
+    now = timezone.now()
+    stale_before = now - timedelta(minutes=CONTACT_EXPORT_STALE_MINUTES)
+    failed = ContactExportTask.objects.filter(
+        status__in=(ContactExportTask.PENDING, ContactExportTask.PROCESSING), created_at__lt=stale_before
+    ).filter(
+        Q(started_at__isnull=True) | Q(started_at__lt=stale_before)
+    ).update(
+        status=ContactExportTask.FAILED,
+        error_message='Выгрузка прервана: превышено время ожидания',
+        completed_at=now,
+    )
+
+    removed = 0
+    expired = ContactExportTask.objects.filter(
+        status__in=(ContactExportTask.COMPLETED, ContactExportTask.FAILED),
+        completed_at__lt=now - timedelta(hours=CONTACT_EXPORT_RETENTION_HOURS),
+    )
+    for task in expired.iterator():
+        if task.file:
+            try:
+                task.file.delete(save=False)
+            except Exception as e:
+                logger.warning(f"Could not remove contact export file {task.file.name}: {e}")
+                continue
+        task.delete()
+        removed += 1
+
+    if failed or removed:
+        logger.info(f"Contact exports cleanup: {failed} stale marked as failed, {removed} expired removed")
+    return {'failed': failed, 'removed': removed}
+
+
+@shared_task(bind=True)
+def run_purge(self, job_id):
+    """Фоновое удаление списка или кампании порциями (см. purge.py)."""
+    import logging
+    from django.apps import apps
+    from .purge import run_purge_job
+    logger = logging.getLogger(__name__)
+
+    try:
+        job = run_purge_job(job_id)
+    except Exception as e:
+        logger.exception(f"Purge job {job_id} failed")
+        PurgeJob.objects.filter(id=job_id).update(
+            status=PurgeJob.FAILED, error_message=str(e), completed_at=timezone.now(),
+        )
+        job = PurgeJob.objects.filter(id=job_id).first()
+        if job and job.kind == PurgeJob.CAMPAIGN_SENDS:
+            # Повторная отправка не начнётся: кампания не должна остаться в статусе sending
+            Campaign = apps.get_model('campaigns.Campaign')
+            Campaign.objects.filter(id=job.target_id).update(
+                status=Campaign.STATUS_FAILED,
+                failure_reason=f"Не удалось очистить результаты прошлой отправки: {e}",
+            )
+        raise
+    return {'deleted_rows': job.deleted_rows}
+
+
+def start_purge(job, link=None):
+    """
+    Ставит задание удаления в очередь (link — задача, выполняемая после него).
+    Если брокер недоступен — удаление выполняется синхронно, link ставится отдельно;
+    если и это не удалось, ошибка только логируется: удаление уже выполнено, а
+    отправку можно продолжить повтором (retry в режиме resume).
+    Возвращает AsyncResult последней задачи цепочки (None, если удаление выполнено
+    синхронно, а link не задан или не поставлен).
+    """
+    import logging
+    logger = logging.getLogger(__name__)
+
+    signature = run_purge.si(str(job.id))
+    if link is not None:
+        signature = signature | link
+    try:
+        result = signature.apply_async()
+    except Exception as e:
+        logger.error(f"Failed to start purge task: {e}, executing synchronously", exc_info=True)
+        run_purge.apply(args=[str(job.id)], throw=True)
+        if link is None:
+            return None
         try:
-            validation_result = validate_email_production(contact.email)
-            if validation_result['is_valid']:
-                contact.status = validation_result['status']
-            else:
-                contact.status = Contact.INVALID
-            contact.save()
-        except Exception:
-            contact.status = Contact.INVALID
-            contact.save()
-    
-    return len(contacts) 
\ No newline at end of file
+            return link.apply_async()
+        except Exception as link_error:
+            logger.error(
+                f"Purge job {job.id} completed, but the next task could not be queued: {link_error}",
+                exc_info=True,
+            )
+            return None
+    PurgeJob.objects.filter(id=job.id).update(celery_task_id=result.id)
+    return result
+
+
+@shared_task
+def resume_stale_purges():
+    """
+    Перезапускает задания удаления без heartbeat дольше PURGE_HEARTBEAT_TIMEOUT
+    (воркер упал или был перезапущен). Удаление продолжается с оставшихся строк.
+    """
+    import logging
+    from datetime import timedelta
+    from django.db.models import Q
+    from .purge import PURGE_HEARTBEAT_TIMEOUT
+    logger = logging.getLogger(__name__)
+
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=PURGE_HEARTBEAT_TIMEOUT)
+    stale = PurgeJob.objects.filter(
+        status__in=(PurgeJob.PENDING, PurgeJob.RUNNING),
+    ).filter(
+        Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True, created_at__lt=stale_before)
+    )
+
+    resumed = 0
+    for job in stale:
+        claimed = PurgeJob.objects.filter(
+            id=job.id, status=job.status, heartbeat_at=job.heartbeat_at
+        ).update(heartbeat_at=now)
+        if not claimed:
+            continue
+        logger.info(f"Resuming stale purge job {job.id} ({job.kind} {job.target_id})")
+        link = None
+        if job.kind == PurgeJob.CAMPAIGN_SENDS:
+            import uuid
+            from django.apps import apps
+            from apps.campaigns.tasks import send_campaign
+            send_task_id = str(uuid.uuid4())
+            apps.get_model('campaigns.Campaign').objects.filter(id=job.target_id).update(celery_task_id=send_task_id)
+            link = send_campaign.si(job.target_id).set(task_id=send_task_id)
+        start_purge(job, link=link)
+        resumed += 1
+    return resumed
@@ -1,12 +1,1091 @@
-import requests
-
-url = "https://raw.githubusercontent.com/disposable/disposable-email-domains/master/domains.txt"
-response = requests.get(url)
-
-if response.status_code == 200:
-    DISPOSABLE_DOMAINS = set(
-        line.strip().lower() for line in response.text.splitlines() if line.strip()
-    )
-    print(f"{len(DISPOSABLE_DOMAINS)} доменов загружено.")
-else:
-    print("Не удалось загрузить список.")
+import io
+import json
+import zipfile
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+
+from core.utils import dns_resolver
+
+from .counters import (
+    get_user_contact_count, reconcile_contact_counts, reconcile_list_counters, set_contact_status,
+    suspend_contact_counters,
+)
+from .export import iter_export_text, iter_export_zip
+from .hashing import email_hash
+from .ingest import ingest_contacts
+from .list_operations import run_list_operation
+from .models import Contact, ContactList, ContactListOperation, PurgeJob, RevalidationJob, UserContactCount
+from .purge import create_purge_job, run_purge_job
+from .revalidation import run_revalidation_job
+from .suppression import is_suppressed, suppress_email, suppression_filter
+from .utils import load_disposable_domains, is_disposable_domain, disposable_domains_version, read_domain_list
+
+User = get_user_model()
+
+
+class DisposableDomainsTests(SimpleTestCase):
+    """Снимок disposable-доменов загружается из репозитория, без обращений к сети."""
+
+    def test_snapshot_is_loaded(self):
+        domains = load_disposable_domains()
+        self.assertIsInstance(domains, frozenset)
+        self.assertIn('mailinator.com', domains)
+        self.assertIsNotNone(disposable_domains_version())
+
+    def test_subdomains_are_matched(self):
+        self.assertTrue(is_disposable_domain('mailinator.com'))
+        self.assertTrue(is_disposable_domain('mx1.Mailinator.com'))
+        self.assertFalse(is_disposable_domain('notmailinator.co'))
+
+    def test_allowlist_is_never_disposable(self):
+        self.assertFalse(is_disposable_domain('gmail.com'))
+        self.assertFalse(is_disposable_domain('yandex.ru'))
+
+    def test_refresh_from_upstream(self):
+        import os
+        import tempfile
+        from django.core.management import call_command
+
+        fd, path = tempfile.mkstemp(suffix='.txt')
+        os.close(fd)
+        self.addCleanup(os.remove, path)
+        response = mock.Mock(text='# upstream\nMailinator.com\nnew-trash.example\ngmail.com\n')
+        with mock.patch('apps.mailer.management.commands.update_disposable_domains.DISPOSABLE_DOMAINS_FILE', path), \
+                mock.patch('requests.get', return_value=response) as get:
+            call_command('update_disposable_domains', snapshot_version='v1', stdout=io.StringIO())
+
+        get.assert_called_once()
+        self.assertEqual(read_domain_list(path), frozenset({'mailinator.com', 'new-trash.example'}))
+        with open(path, encoding='utf-8') as f:
+            header = f.read().split('\n', 3)[:3]
+        self.assertEqual(header[1], f'# source: {get.call_args[0][0]}')
+        self.assertEqual(header[2], '# version: v1')
+
+
+class ContactCounterTests(TestCase):
+    """Счётчик контактов пользователя совпадает с фактическим числом контактов."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='counter@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='Counter')
+
+    def assertCounterMatches(self):
+        actual = Contact.objects.filter(contact_list__owner=self.user).count()
+        self.assertEqual(get_user_contact_count(self.user), actual)
+        self.assertEqual(UserContactCount.objects.get(user=self.user).total, actual)
+        for contact_list in ContactList.objects.filter(owner=self.user):
+            self.assertEqual(contact_list.counts(), contact_list.actual_counts())
+
+    def test_counter_follows_inserts_and_deletes(self):
+        get_user_contact_count(self.user)
+        ingest_contacts(self.contact_list.id, [(f'user{i}@example.com', Contact.VALID) for i in range(10)])
+        Contact.objects.create(contact_list=self.contact_list, email='single@example.com')
+        Contact.objects.get(email='user0@example.com').delete()
+        contact = Contact.objects.get(email='user1@example.com')
+        contact.status = Contact.INVALID
+        contact.save()
+        self.assertTrue(set_contact_status(Contact.objects.get(email='user2@example.com'), Contact.BLACKLIST))
+        self.assertCounterMatches()
+
+        self.contact_list.refresh_from_db()
+        self.assertEqual(self.contact_list.counts(), {'total': 10, 'valid': 8, 'invalid': 1, 'blacklisted': 1})
+        # Сохранение списка не перезаписывает счётчики
+        stale = ContactList.objects.get(pk=self.contact_list.pk)
+        Contact.objects.create(contact_list=self.contact_list, email='late@example.com')
+        stale.name = 'Renamed'
+        stale.save()
+        self.assertCounterMatches()
+
+        other = ContactList.objects.create(owner=self.user, name='Other')
+        ingest_contacts(other.id, [('x@example.com', Contact.VALID), ('y@example.com', Contact.VALID)])
+        self.contact_list.delete()
+        self.assertCounterMatches()
+
+    def test_reconcile_fixes_drift(self):
+        get_user_contact_count(self.user)
+        with suspend_contact_counters():
+            Contact.objects.create(contact_list=self.contact_list, email='drift@example.com')
+        self.assertEqual(UserContactCount.objects.get(user=self.user).total, 0)
+        self.assertEqual(reconcile_contact_counts(), 1)
+        self.assertEqual(len(reconcile_list_counters()), 1)
+        self.assertCounterMatches()
+
+
+class SuppressionTests(TestCase):
+    """Отписка подавляет адрес во всех списках пользователя."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.first = ContactList.objects.create(owner=self.user, name='First')
+        self.second = ContactList.objects.create(owner=self.user, name='Second')
+        ingest_contacts(self.first.id, [('john@example.com', Contact.VALID), ('jane@example.com', Contact.VALID)])
+        Contact.objects.create(contact_list=self.second, email='John@Example.com ')
+
+    def test_hash_is_normalized(self):
+        self.assertEqual(email_hash(' John@Example.COM'), email_hash('john@example.com'))
+        self.assertEqual(
+            set(Contact.objects.values_list('email_hash', flat=True)),
+            {email_hash('john@example.com'), email_hash('jane@example.com')},
+        )
+
+    def test_suppressed_address_is_excluded_everywhere(self):
+        self.assertTrue(suppress_email(self.user.id, 'JOHN@example.com'))
+        self.assertFalse(suppress_email(self.user.id, 'john@example.com'))
+        self.assertTrue(is_suppressed(self.user.id, 'john@example.com'))
+        self.assertFalse(is_suppressed(self.user.id, 'jane@example.com'))
+
+        audience = Contact.objects.filter(suppression_filter(self.user.id), contact_list__owner=self.user)
+        self.assertEqual(list(audience.values_list('email', flat=True)), ['jane@example.com'])
+
+        other = User.objects.create(email='other@example.com')
+        self.assertFalse(is_suppressed(other.id, 'john@example.com'))
+
+
+@skipUnless(connection.vendor == 'postgresql', 'COPY / ON CONFLICT — только PostgreSQL')
+@mock.patch('apps.mailer.ingest._ingest_orm', side_effect=AssertionError('ожидалась запись через COPY'))
+class PostgreSQLIngestTests(TestCase):
+    """Запись контактов через COPY и INSERT … ON CONFLICT на PostgreSQL."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        get_user_contact_count(self.user)
+
+    def assert_counters(self):
+        self.contact_list.refresh_from_db()
+        self.assertEqual(self.contact_list.counts(), self.contact_list.actual_counts())
+        self.assertEqual(UserContactCount.objects.get(user=self.user).total, Contact.objects.count())
+
+    def test_insert_and_dedupe(self, _ingest_orm):
+        result = ingest_contacts(self.contact_list.id, [
+            ('anna@mail.ru', Contact.VALID),
+            ('boris@example.com', Contact.INVALID),
+            ('anna@mail.ru', Contact.INVALID),
+            ('tab\tname@example.com', Contact.VALID),
+        ])
+        self.assertEqual((result['received'], result['inserted'], result['existing']), (3, 3, 0))
+        self.assertEqual(result['by_status'], {Contact.VALID: 2, Contact.INVALID: 1})
+        self.assertEqual(Contact.objects.get(email='anna@mail.ru').status, Contact.VALID)
+        self.assertEqual(
+            Contact.objects.get(email='tab\tname@example.com').email_hash, email_hash('tab\tname@example.com'),
+        )
+
+        result = ingest_contacts(self.contact_list.id, [
+            ('anna@mail.ru', Contact.VALID), ('clara@example.com', Contact.BLACKLIST),
+        ])
+        self.assertEqual((result['inserted'], result['existing']), (1, 1))
+        self.assertEqual(self.contact_list.contacts.count(), 4)
+        self.assert_counters()
+
+    def test_limit_keeps_file_order(self, _ingest_orm):
+        ingest_contacts(self.contact_list.id, [('user0@example.com', Contact.VALID)])
+        rows = [(f'user{i}@example.com', Contact.VALID) for i in range(6)]
+        result = ingest_contacts(self.contact_list.id, rows, limit=3)
+        self.assertEqual((result['inserted'], result['existing'], result['limit_reached']), (3, 1, True))
+        self.assertEqual(
+            sorted(self.contact_list.contacts.values_list('email', flat=True)),
+            [f'user{i}@example.com' for i in range(4)],
+        )
+
+        result = ingest_contacts(self.contact_list.id, [('late@example.com', Contact.VALID)], limit=0)
+        self.assertEqual((result['inserted'], result['limit_reached']), (0, True))
+        self.assert_counters()
+
+
+class RevalidationTests(TestCase):
+    """Перевалидация меняет только окончательные вердикты и поддерживает счётчики."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        ingest_contacts(self.contact_list.id, [
+            ('john@example.invalid', Contact.VALID),
+            ('jane@mailinator.com', Contact.VALID),
+            ('left@example.invalid', Contact.BLACKLIST),
+        ])
+
+    def test_list_job_updates_statuses_and_counters(self):
+        job = RevalidationJob.objects.create(
+            scope=RevalidationJob.SCOPE_LIST, contact_list=self.contact_list, user=self.user, batch_size=1,
+        )
+        self.assertTrue(run_revalidation_job(job.id, slice_seconds=None))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, RevalidationJob.COMPLETED)
+        self.assertEqual((job.processed, job.became_invalid, job.became_blacklisted), (2, 1, 1))
+        statuses = dict(self.contact_list.contacts.values_list('email', 'status'))
+        self.assertEqual(statuses['john@example.invalid'], Contact.INVALID)
+        self.assertEqual(statuses['jane@mailinator.com'], Contact.BLACKLIST)
+        self.assertEqual(statuses['left@example.invalid'], Contact.BLACKLIST)
+
+        self.contact_list.refresh_from_db()
+        self.assertEqual(self.contact_list.counts(), self.contact_list.actual_counts())
+
+    def test_stale_running_jobs_are_requeued(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .tasks import resume_stale_revalidations, run_revalidation, schedule_nightly_revalidation
+
+        long_ago = timezone.now() - timedelta(hours=2)
+        job = RevalidationJob.objects.create(
+            scope=RevalidationJob.SCOPE_LIST, contact_list=self.contact_list, user=self.user, batch_size=1,
+            status=RevalidationJob.RUNNING, heartbeat_at=timezone.now(),
+        )
+        # Свежий heartbeat — задание выполняется, его не трогаем
+        self.assertEqual(resume_stale_revalidations(), 0)
+
+        RevalidationJob.objects.filter(id=job.id).update(heartbeat_at=long_ago)
+        run_now = lambda *args: run_revalidation.apply(args=args)
+        with mock.patch.object(run_revalidation, 'delay', side_effect=run_now):
+            self.assertEqual(resume_stale_revalidations(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.processed), (RevalidationJob.COMPLETED, 2))
+
+        # Ночное задание, брошенное воркером, перезапускается в следующее окно
+        nightly = RevalidationJob.objects.create(
+            scope=RevalidationJob.SCOPE_ALL, status=RevalidationJob.RUNNING, heartbeat_at=long_ago,
+            deadline_at=long_ago,
+        )
+        self.assertEqual(resume_stale_revalidations(), 0)
+        nightly.refresh_from_db()
+        self.assertEqual(nightly.status, RevalidationJob.PENDING)
+        RevalidationJob.objects.filter(id=nightly.id).update(status=RevalidationJob.RUNNING, heartbeat_at=long_ago)
+        with mock.patch('apps.mailer.tasks.start_revalidation') as start:
+            self.assertEqual(schedule_nightly_revalidation(), 1)
+        self.assertEqual([call.args[0].id for call in start.call_args_list], [nightly.id])
+        nightly.refresh_from_db()
+        self.assertEqual(nightly.status, RevalidationJob.PENDING)
+        self.assertGreater(nightly.deadline_at, timezone.now())
+
+
+class ListOperationTests(TestCase):
+    """Операции над списками выполняются в SQL и поддерживают счётчики."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.first = ContactList.objects.create(owner=self.user, name='First')
+        self.second = ContactList.objects.create(owner=self.user, name='Second')
+        self.target = ContactList.objects.create(owner=self.user, name='Target')
+        get_user_contact_count(self.user)
+        ingest_contacts(self.first.id, [('a@example.com', Contact.VALID), ('b@example.com', Contact.INVALID)])
+        ingest_contacts(self.second.id, [('b@example.com', Contact.INVALID), ('c@example.com', Contact.VALID)])
+
+    def run_operation(self, kind, sources, **kwargs):
+        operation = ContactListOperation.objects.create(
+            user=self.user, operation=kind, target_list=self.target,
+            source_list_ids=[source.id for source in sources], **kwargs,
+        )
+        return run_list_operation(operation.id, batch_size=1)
+
+    def assert_counters(self):
+        for contact_list in ContactList.objects.all():
+            self.assertEqual(contact_list.counts(), contact_list.actual_counts())
+        self.assertEqual(UserContactCount.objects.get(user=self.user).total, Contact.objects.count())
+
+    def test_union_and_intersection(self):
+        operation = self.run_operation(ContactListOperation.UNION, [self.first, self.second])
+        self.assertEqual((operation.status, operation.inserted, operation.processed), (ContactListOperation.COMPLETED, 3, 4))
+        self.assertEqual(
+            set(self.target.contacts.values_list('email', 'status')),
+            {('a@example.com', Contact.VALID), ('b@example.com', Contact.INVALID), ('c@example.com', Contact.VALID)},
+        )
+        self.target.contacts.all().delete()
+        self.run_operation(ContactListOperation.INTERSECTION, [self.first, self.second])
+        self.assertEqual(list(self.target.contacts.values_list('email', flat=True)), ['b@example.com'])
+        self.assert_counters()
+
+    def test_move_by_filter(self):
+        operation = self.run_operation(ContactListOperation.MOVE, [self.second], filters={'status': [Contact.VALID]})
+        self.assertEqual((operation.inserted, operation.removed), (1, 1))
+        self.assertEqual(list(self.target.contacts.values_list('email', flat=True)), ['c@example.com'])
+        self.assertEqual(list(self.second.contacts.values_list('email', flat=True)), ['b@example.com'])
+        self.assert_counters()
+
+    def test_search_filter_escapes_wildcards(self):
+        from .search import search_contacts
+
+        ingest_contacts(self.first.id, [
+            ('first_last@example.com', Contact.VALID),
+            ('firstxlast@example.com', Contact.VALID),
+            ('firstlast@example.com', Contact.VALID),
+            ('100%sure@example.com', Contact.VALID),
+        ])
+        for term, expected in (('First_Last', ['first_last@example.com']), ('0%s', ['100%sure@example.com'])):
+            with self.subTest(term=term):
+                self.target.contacts.all().delete()
+                self.run_operation(ContactListOperation.COPY, [self.first], filters={'search': term})
+                self.assertEqual(list(self.target.contacts.values_list('email', flat=True)), expected)
+                # Фильтр операции совпадает с поиском контактов
+                found = search_contacts(self.first.contacts.all(), term.lower())
+                self.assertEqual(list(found.values_list('email', flat=True)), expected)
+        self.assert_counters()
+
+    def test_stale_operation_resumes_without_duplicates(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from . import list_operations
+        from .tasks import resume_stale_list_operations, run_contact_list_operation
+
+        operation = ContactListOperation.objects.create(
+            user=self.user, operation=ContactListOperation.UNION, target_list=self.target,
+            source_list_ids=[self.first.id, self.second.id],
+        )
+        # Воркер «падает» после первой порции
+        process_batch = list_operations._process_batch
+        calls = []
+
+        def crash_after_first(*args, **kwargs):
+            if calls:
+                raise RuntimeError('worker died')
+            calls.append(1)
+            return process_batch(*args, **kwargs)
+
+        with mock.patch.object(list_operations, '_process_batch', side_effect=crash_after_first):
+            with self.assertRaises(RuntimeError):
+                run_list_operation(operation.id, batch_size=1)
+        operation.refresh_from_db()
+        self.assertEqual((operation.status, operation.processed), (ContactListOperation.RUNNING, 1))
+
+        # Свежий heartbeat — операция не трогается
+        self.assertEqual(resume_stale_list_operations(), 0)
+
+        ContactListOperation.objects.filter(id=operation.id).update(
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        run_now = lambda *args: run_contact_list_operation.apply(args=args)
+        with mock.patch.object(run_contact_list_operation, 'delay', side_effect=run_now):
+            self.assertEqual(resume_stale_list_operations(), 1)
+
+        operation.refresh_from_db()
+        self.assertEqual((operation.status, operation.resume_count), (ContactListOperation.COMPLETED, 1))
+        self.assertEqual(
+            sorted(self.target.contacts.values_list('email', flat=True)),
+            ['a@example.com', 'b@example.com', 'c@example.com'],
+        )
+        self.assert_counters()
+
+
+class ExportTests(TestCase):
+    """Потоковая выгрузка совпадает с прежним форматом файлов."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        ingest_contacts(self.contact_list.id, [(f'user{i}@example.com', Contact.VALID) for i in range(5)])
+        self.emails = sorted(self.contact_list.contacts.values_list('email', flat=True))
+
+    def test_chunked_text_matches_full_format(self):
+        expected = {
+            'txt': '\n'.join(self.emails),
+            'csv': 'email\n' + '\n'.join(self.emails),
+            'json': json.dumps(self.emails, indent=2),
+        }
+        for format_type, content in expected.items():
+            parts = list(iter_export_text(self.contact_list, Contact.VALID, format_type, chunk_size=2))
+            self.assertEqual(''.join(text for text, _ in parts), content)
+            self.assertEqual(sum(rows for _, rows in parts), 5)
+
+    def test_zip_stream(self):
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(iter_export_zip(self.contact_list, [Contact.VALID], 'txt'))))
+        [name] = archive.namelist()
+        self.assertEqual(archive.read(name).decode(), '\n'.join(self.emails))
+
+    def test_cleanup_expires_archives_and_fails_stale_exports(self):
+        import os
+        import shutil
+        import tempfile
+        from datetime import timedelta
+        from django.test import override_settings
+        from django.utils import timezone
+        from .models import ContactExportTask
+        from .tasks import cleanup_contact_exports, generate_contact_export
+
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        with override_settings(MEDIA_ROOT=media_root):
+            done = ContactExportTask.objects.create(user=self.user, contact_list=self.contact_list, types=[Contact.VALID])
+            generate_contact_export.apply(args=[done.id])
+            done.refresh_from_db()
+            path = done.file.path
+            self.assertTrue(os.path.exists(path))
+            from django.urls import resolve
+            from .views import _export_task_data
+            download_url = _export_task_data(done)['download_url']
+            self.assertEqual(resolve(download_url).url_name, 'contactlists-download-export-task')
+            self.assertEqual(resolve(download_url).kwargs, {'task_id': str(done.id)})
+            long_ago = timezone.now() - timedelta(days=30)
+            ContactExportTask.objects.filter(id=done.id).update(completed_at=long_ago)
+            stale = ContactExportTask.objects.create(
+                user=self.user, contact_list=self.contact_list, status=ContactExportTask.PROCESSING
+            )
+            ContactExportTask.objects.filter(id=stale.id).update(created_at=long_ago, started_at=long_ago)
+
+            self.assertEqual(cleanup_contact_exports(), {'failed': 1, 'removed': 1})
+
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ContactExportTask.objects.filter(id=done.id).exists())
+        self.assertEqual(ContactExportTask.objects.get(id=stale.id).status, ContactExportTask.FAILED)
+
+
+class PurgeTests(TestCase):
+    """Фоновое удаление списка порциями: зависимые строки, счётчики, прогресс."""
+
+    def setUp(self):
+        from apps.campaigns.models import Campaign, CampaignRecipient, EmailTracking
+
+        self.user = User.objects.create(email='owner@example.com')
+        get_user_contact_count(self.user)
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        self.other = ContactList.objects.create(owner=self.user, name='Other')
+        ingest_contacts(self.contact_list.id, [(f'user{i}@example.com', Contact.VALID) for i in range(7)])
+        ingest_contacts(self.other.id, [('keep@example.com', Contact.VALID)])
+        campaign = Campaign.objects.create(user=self.user, name='Campaign')
+        campaign.contact_lists.add(self.contact_list, self.other)
+        for contact in self.contact_list.contacts.all()[:3]:
+            EmailTracking.objects.create(campaign=campaign, contact=contact, tracking_id=f't{contact.id}')
+            CampaignRecipient.objects.create(campaign=campaign, contact=contact)
+        self.campaign = campaign
+
+    def test_contact_list_purge(self):
+        from apps.campaigns.models import CampaignRecipient, EmailTracking
+
+        job = create_purge_job(self.user, PurgeJob.CONTACT_LIST, self.contact_list.id)
+        job = run_purge_job(job.id, chunk_size=2)
+
+        self.assertEqual(job.status, PurgeJob.COMPLETED)
+        self.assertEqual((job.total_rows, job.processed_rows), (7, 7))
+        self.assertFalse(ContactList.objects.filter(id=self.contact_list.id).exists())
+        self.assertFalse(EmailTracking.objects.exists())
+        self.assertFalse(CampaignRecipient.objects.exists())
+        self.assertEqual(list(self.campaign.contact_lists.all()), [self.other])
+        self.assertEqual(get_user_contact_count(self.user), 1)
+
+    def test_campaign_sends_purge_keeps_campaign(self):
+        from apps.campaigns.models import Campaign, CampaignCounters
+
+        job = create_purge_job(self.user, PurgeJob.CAMPAIGN_SENDS, self.campaign.id)
+        job = run_purge_job(job.id, chunk_size=2)
+
+        self.assertEqual(job.processed_rows, 3)
+        self.assertTrue(Campaign.objects.filter(id=self.campaign.id).exists())
+        self.assertFalse(self.campaign.campaign_recipients.exists())
+        self.assertEqual(CampaignCounters.objects.get(campaign=self.campaign).sent, 0)
+        self.assertEqual(self.contact_list.contacts.count(), 7)
+
+    def test_broker_down_runs_purge_and_survives_link_failure(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from apps.campaigns.models import Campaign
+        from apps.campaigns.tasks import send_campaign
+        from .tasks import resume_stale_purges, start_purge
+
+        broker_down = OSError('broker is down')
+        with mock.patch('celery.canvas.Signature.apply_async', side_effect=broker_down), \
+                mock.patch('celery.canvas._chain.apply_async', side_effect=broker_down):
+            job = create_purge_job(self.user, PurgeJob.CAMPAIGN_SENDS, self.campaign.id)
+            self.assertIsNone(start_purge(job, link=send_campaign.si(str(self.campaign.id))))
+            job.refresh_from_db()
+            self.assertEqual(job.status, PurgeJob.COMPLETED)
+            self.assertNotEqual(Campaign.objects.get(id=self.campaign.id).status, Campaign.STATUS_FAILED)
+
+            # Sweep доходит до всех заданий, даже если ни одну отправку поставить не удалось
+            other_campaign = Campaign.objects.create(user=self.user, name='Other campaign')
+            stale = [
+                create_purge_job(self.user, PurgeJob.CAMPAIGN_SENDS, self.campaign.id),
+                create_purge_job(self.user, PurgeJob.CAMPAIGN_SENDS, other_campaign.id),
+            ]
+            PurgeJob.objects.filter(id__in=[j.id for j in stale]).update(
+                created_at=timezone.now() - timedelta(hours=1),
+            )
+            self.assertEqual(resume_stale_purges(), 2)
+        self.assertEqual(
+            set(PurgeJob.objects.filter(id__in=[j.id for j in stale]).values_list('status', flat=True)),
+            {PurgeJob.COMPLETED},
+        )
+
+
+class DNSResolverTests(SimpleTestCase):
+    """Кэширование ответов резолвера: границы TTL, отрицательный кэш, временные ошибки."""
+
+    def setUp(self):
+        dns_resolver.clear_local_cache()
+        self.addCleanup(dns_resolver.clear_local_cache)
+        patcher = mock.patch.object(dns_resolver, 'cache')
+        self.cache = patcher.start()
+        self.cache.get.return_value = None
+        self.addCleanup(patcher.stop)
+
+    def answers(self, ttl):
+        rrset = mock.Mock(ttl=ttl)
+        record = mock.Mock(preference=10, exchange='mx.example.org.')
+        answers = mock.MagicMock(rrset=rrset)
+        answers.__iter__.return_value = iter([record])
+        return answers
+
+    def cached_ttl(self):
+        return self.cache.set.call_args.kwargs['timeout']
+
+    def test_ttl_is_clamped(self):
+        resolver = mock.Mock()
+        with mock.patch.object(dns_resolver, '_get_resolver', return_value=resolver):
+            resolver.resolve.return_value = self.answers(5)
+            self.assertEqual(dns_resolver.get_mx_hosts('low.example.org'), ['mx.example.org'])
+            self.assertEqual(self.cached_ttl(), dns_resolver.DNS_MIN_TTL)
+
+            resolver.resolve.return_value = self.answers(10 ** 6)
+            dns_resolver.resolve('high.example.org', 'MX')
+            self.assertEqual(self.cached_ttl(), dns_resolver.DNS_MAX_TTL)
+
+    def test_negative_answer_cached(self):
+        import dns.resolver
+
+        resolver = mock.Mock()
+        resolver.resolve.side_effect = dns.resolver.NXDOMAIN()
+        with mock.patch.object(dns_resolver, '_get_resolver', return_value=resolver):
+            self.assertEqual(dns_resolver.get_mx_hosts('missing.example.org'), [])
+            self.assertEqual(self.cached_ttl(), dns_resolver.DNS_NEGATIVE_TTL)
+            dns_resolver.get_mx_hosts('missing.example.org')
+        self.assertEqual(resolver.resolve.call_count, 1)
+
+    def test_timeout_not_cached_and_raised(self):
+        import dns.exception
+
+        resolver = mock.Mock()
+        resolver.resolve.side_effect = dns.exception.Timeout()
+        with mock.patch.object(dns_resolver, '_get_resolver', return_value=resolver):
+            with self.assertRaises(dns_resolver.DNSUnavailable):
+                dns_resolver.get_mx_hosts('slow.example.org')
+            self.assertEqual(dns_resolver.resolve('slow.example.org', 'MX')['status'], dns_resolver.TIMEOUT)
+        self.cache.set.assert_not_called()
+        self.assertEqual(resolver.resolve.call_count, 2)
+
+
+class TransientDNSVerdictTests(TestCase):
+    """Таймаут DNS при импорте не делает адреса домена недействительными."""
+
+    def setUp(self):
+        dns_resolver.clear_local_cache()
+        self.addCleanup(dns_resolver.clear_local_cache)
+
+    def timeout(self, name, rdtype='A', use_cache=True):
+        return {'status': dns_resolver.TIMEOUT, 'records': [], 'error': 'Таймаут DNS запроса'}
+
+    @mock.patch('apps.mailer.utils.DOMAIN_VERDICT_RETRY_DELAY', 0)
+    def test_timeout_leaves_addresses_unresolved(self):
+        from .utils import import_status, validate_emails_batch
+
+        domain_verdicts = {}
+        with mock.patch.object(dns_resolver, 'resolve', side_effect=self.timeout) as resolve:
+            results = validate_emails_batch(['a@corp-mail.ru', 'b@corp-mail.ru'], domain_verdicts=domain_verdicts)
+
+        self.assertNotIn('corp-mail.ru', domain_verdicts)
+        self.assertEqual(resolve.call_count, 3)  # первая попытка и два повтора
+        for result in results.values():
+            self.assertTrue(result['temporary'])
+            self.assertEqual(import_status(result), Contact.VALID)
+
+    @mock.patch('apps.mailer.utils.DOMAIN_VERDICT_RETRY_DELAY', 0)
+    def test_import_schedules_recheck(self):
+        from .tasks import import_email_batch
+
+        user = User.objects.create(email='owner@example.com')
+        contact_list = ContactList.objects.create(owner=user, name='List')
+        with mock.patch.object(dns_resolver, 'resolve', side_effect=self.timeout), \
+                mock.patch('apps.mailer.tasks.validate_contact_batch.apply_async') as recheck:
+            stats = import_email_batch(contact_list.id, ['a@corp-mail.ru'], {})
+
+        self.assertEqual((stats['added'], stats['invalid'], stats['unresolved']), (1, 0, 1))
+        self.assertEqual(contact_list.contacts.get().status, Contact.VALID)
+        recheck.assert_called_once()
+
+
+def _valid_results(emails, domain_verdicts=None):
+    return {
+        email: {'email': email, 'is_valid': True, 'status': Contact.VALID, 'temporary': False}
+        for email in emails
+    }
+
+
+class PaginationTests(TestCase):
+    """Курсорная пагинация (core.utils.pagination) и прежний режим ?page=."""
+
+    def setUp(self):
+        from django.utils import timezone
+
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        ingest_contacts(self.contact_list.id, [(f'user{i}@example.com', Contact.VALID) for i in range(7)])
+        # Одинаковое время добавления: порядок страниц решает второе поле ключа (id)
+        self.contact_list.contacts.update(added_date=timezone.now())
+        self.emails = list(self.contact_list.contacts.order_by('-id').values_list('email', flat=True))
+
+    def paginate(self, ordering=('-added_date', '-id'), **params):
+        from rest_framework.request import Request
+        from rest_framework.test import APIRequestFactory
+        from core.utils.pagination import paginate
+
+        request = Request(APIRequestFactory().get('/', params))
+        return paginate(
+            request, self.contact_list.contacts.all(), ordering,
+            serialize=lambda rows: [row.email for row in rows], total=len(self.emails),
+        )
+
+    def test_cursor_round_trip(self):
+        from datetime import datetime
+        from core.utils.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+        moment = datetime(2024, 5, 1, 12, 30)
+        cursor = encode_cursor([moment, 42])
+        self.assertNotIn('=', cursor)
+        self.assertEqual(decode_cursor(cursor, ('-added_date', '-id'), Contact), [moment, 42])
+        for bad in ('not-base64!', encode_cursor([1]), encode_cursor({'id': 1}), encode_cursor(['x', 'y'])):
+            with self.subTest(cursor=bad), self.assertRaises(InvalidCursor):
+                decode_cursor(bad, ('-added_date', '-id'), Contact)
+
+    def test_cursor_pages_cover_all_rows(self):
+        pages = []
+        cursor = ''
+        while True:
+            data = self.paginate(cursor=cursor, page_size=3)
+            pages.append(data['results'])
+            self.assertEqual((data['count'], data['page_size']), (7, 3))
+            if not data['has_more']:
+                self.assertIsNone(data['next_cursor'])
+                break
+            cursor = data['next_cursor']
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual(sum(pages, []), self.emails)
+
+        # Ровно page_size строк — следующей страницы нет
+        self.assertFalse(self.paginate(cursor='', page_size=7)['has_more'])
+
+    def test_legacy_page_mode(self):
+        data = self.paginate(page=3, page_size=3)
+        self.assertEqual(data, {'results': self.emails[6:], 'count': 7, 'page': 3, 'num_pages': 3})
+        data = self.paginate(page='x', page_size=1000)
+        self.assertEqual((data['page'], len(data['results'])), (1, 7))
+
+    def test_contacts_endpoint(self):
+        from rest_framework.test import APIClient
+
+        client = APIClient(HTTP_HOST='localhost')
+        client.force_authenticate(self.user)
+        url = f'/lists/api/contactlists/{self.contact_list.id}/contacts/'
+        first = client.get(url, {'cursor': '', 'page_size': 4}).json()
+        second = client.get(url, {'cursor': first['next_cursor'], 'page_size': 4}).json()
+        emails = [row['email'] for row in first['results'] + second['results']]
+        self.assertEqual(emails, self.emails)
+        self.assertEqual((first['has_more'], second['has_more'], first['count']), (True, False, 7))
+        self.assertEqual(client.get(url, {'cursor': 'garbage'}).status_code, 400)
+        self.assertEqual(client.get(url, {'page': 2, 'page_size': 5}).json()['num_pages'], 2)
+
+
+class ChunkedUploadTests(TestCase):
+    """Загрузка файла импорта частями: смещения, контрольные суммы, продолжение и запуск импорта."""
+
+    def setUp(self):
+        import shutil
+        import tempfile
+        from rest_framework.test import APIClient
+
+        staging_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, staging_dir, ignore_errors=True)
+        staging = mock.patch('apps.mailer.views.IMPORT_STAGING_DIR', staging_dir)
+        staging.start()
+        self.addCleanup(staging.stop)
+
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        self.client = APIClient(HTTP_HOST='localhost')
+        self.client.force_authenticate(self.user)
+        self.url = f'/lists/api/contactlists/{self.contact_list.id}/uploads/'
+        self.content = ''.join(f'user{i}@example.com\n' for i in range(20)).encode()
+
+    def put_chunk(self, upload_id, data, offset=None, **headers):
+        import hashlib
+
+        headers.setdefault('HTTP_X_CHUNK_SHA256', hashlib.sha256(data).hexdigest())
+        url = f'{self.url}{upload_id}/' + (f'?offset={offset}' if offset is not None else '')
+        return self.client.put(url, data, content_type='application/octet-stream', **headers)
+
+    def test_upload_resume_and_complete(self):
+        from .models import ChunkedUpload, ImportTask
+
+        response = self.client.post(self.url, {'filename': '../contacts.txt', 'size': len(self.content)}, format='json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()['upload_id']
+        self.assertEqual(response.json()['offset'], 0)
+        first, second = self.content[:100], self.content[100:]
+
+        # Неверная контрольная сумма — часть отклоняется, смещение не меняется
+        response = self.put_chunk(upload_id, first, offset=0, HTTP_X_CHUNK_SHA256='0' * 64)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(f'{self.url}{upload_id}/').json()['offset'], 0)
+
+        self.assertEqual(self.put_chunk(upload_id, first, offset=0).json()['offset'], 100)
+        # Повтор уже принятой части: клиент получает подтверждённое смещение и продолжает с него
+        response = self.put_chunk(upload_id, first, offset=0)
+        self.assertEqual((response.status_code, response.json()['offset']), (409, 100))
+        self.assertEqual(self.put_chunk(upload_id, second + b'x', offset=100).status_code, 400)
+
+        response = self.client.post(f'{self.url}{upload_id}/complete/')
+        self.assertEqual(response.status_code, 409)
+
+        content_range = f'bytes 100-{len(self.content) - 1}/{len(self.content)}'
+        response = self.put_chunk(upload_id, second, HTTP_CONTENT_RANGE=content_range)
+        self.assertEqual((response.json()['offset'], response.json()['progress_percentage']), (len(self.content), 100))
+
+        upload = ChunkedUpload.objects.get(id=upload_id)
+        self.assertEqual(upload.filename, 'contacts.txt')
+        with open(upload.file_path, 'rb') as f:
+            self.assertEqual(f.read(), self.content)
+
+        with mock.patch('apps.mailer.tasks.start_contact_import', return_value=mock.Mock(id='celery-id')) as start:
+            response = self.client.post(f'{self.url}{upload_id}/complete/')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(self.client.post(f'{self.url}{upload_id}/complete/').status_code, 409)
+        start.assert_called_once()
+        import_task, file_path = start.call_args[0]
+        self.assertEqual((import_task.filename, file_path), ('contacts.txt', upload.file_path))
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.import_task_id), (ChunkedUpload.COMPLETED, str(import_task.id)))
+        self.assertEqual(ImportTask.objects.get(id=import_task.id).celery_task_id, 'celery-id')
+
+    def test_foreign_upload_is_not_found(self):
+        response = self.client.post(self.url, {'filename': 'contacts.txt', 'size': 10}, format='json')
+        other = User.objects.create(email='other@example.com')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f"{self.url}{response.json()['upload_id']}/").status_code, 404)
+
+
+class ImportParsingTests(SimpleTestCase):
+    """Потоковый разбор файлов импорта: колонка с email, кавычки, BOM, XLSX и границы шардов."""
+
+    def parse(self, content, filename):
+        from .utils import iter_emails_from_file
+        return list(iter_emails_from_file(io.BytesIO(content.encode('utf-8')), filename))
+
+    def temp_file(self, content):
+        import os
+        import tempfile
+
+        fd, path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content.encode('utf-8'))
+        self.addCleanup(os.remove, path)
+        return path
+
+    def test_csv_header_selects_email_column(self):
+        content = 'name;E-mail;city\nAnna;Anna@Mail.ru;Moscow\nBoris;boris@example.com;Kazan\n'
+        self.assertEqual(self.parse(content, 'contacts.csv'), ['anna@mail.ru', 'boris@example.com'])
+
+    def test_csv_without_header_detects_column(self):
+        content = 'Anna,anna@mail.ru\nBoris,boris@example.com\n'
+        self.assertEqual(self.parse(content, 'contacts.csv'), ['anna@mail.ru', 'boris@example.com'])
+
+    def test_quoted_fields_keep_newlines_and_separators(self):
+        content = (
+            'email,comment\r\n'
+            'anna@mail.ru,"line one\nline two, with comma"\r\n'
+            'boris@example.com,"page\x0cbreak\x85next line"\r\n'
+            'clara@example.com,plain\r\n'
+        )
+        emails = ['anna@mail.ru', 'boris@example.com', 'clara@example.com']
+        self.assertEqual(self.parse(content, 'contacts.csv'), emails)
+
+        from .utils import detect_import_layout, iter_emails_in_range
+        path = self.temp_file(content)
+        layout = detect_import_layout(path, 'contacts.csv')
+        self.assertEqual((layout['delimiter'], layout['email_column'], layout['has_header']), (',', 0, True))
+        with open(path, 'rb') as f:
+            self.assertEqual(list(iter_emails_in_range(f, 0, None, layout)), emails)
+
+    def test_bom_is_stripped(self):
+        content = '﻿email\nanna@mail.ru\n'
+        self.assertEqual(self.parse(content, 'contacts.csv'), ['anna@mail.ru'])
+        self.assertEqual(self.parse('﻿anna@mail.ru\nboris@example.com', 'contacts.txt'),
+                         ['anna@mail.ru', 'boris@example.com'])
+
+    def test_xlsx(self):
+        from openpyxl import Workbook
+        from .utils import iter_emails_from_file
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Имя', 'Почта'])
+        sheet.append(['Anna', ' Anna@Mail.ru '])
+        sheet.append(['Boris', None])
+        sheet.append(['Clara', 'clara@example.com'])
+        stream = io.BytesIO()
+        workbook.save(stream)
+        stream.seek(0)
+        self.assertEqual(list(iter_emails_from_file(stream, 'contacts.xlsx')), ['anna@mail.ru', 'clara@example.com'])
+
+    def test_shard_bounds_do_not_split_quoted_records(self):
+        from .utils import detect_import_layout, iter_emails_in_range, split_import_file
+
+        rows = [f'user{i}@example.com,"note\n{i}\n"\n' for i in range(30)]
+        path = self.temp_file('email,note\n' + ''.join(rows))
+        layout = detect_import_layout(path, 'contacts.csv')
+        ranges = split_import_file(path, 7, quoted=True)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertTrue(all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:])))
+
+        emails = []
+        with open(path, 'rb') as f:
+            for start, end in ranges:
+                emails.extend(iter_emails_in_range(f, start, end, layout))
+        self.assertEqual(emails, [f'user{i}@example.com' for i in range(30)])
+
+
+class WorkerKilled(BaseException):
+    """Падение воркера посреди порции: обработчики except Exception его не перехватывают."""
+
+
+@mock.patch('apps.mailer.tasks.validate_emails_batch', _valid_results)
+@mock.patch('apps.mailer.tasks.IMPORT_BATCH_SIZE', 5)
+@mock.patch('apps.mailer.tasks.IMPORT_SHARD_MIN_BYTES', 0)
+class ShardedImportTests(TestCase):
+    """Параллельный импорт частями: чекпоинты шардов и возобновление после падения воркера."""
+
+    def setUp(self):
+        import os
+        import tempfile
+
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        self.emails = [f'user{i}@example.com' for i in range(40)]
+        fd, self.file_path = tempfile.mkstemp(suffix='.csv')
+        with os.fdopen(fd, 'w') as f:
+            f.write('email,name\n' + ''.join(f'{email},Name {i}\n' for i, email in enumerate(self.emails)))
+        self.addCleanup(lambda: os.path.exists(self.file_path) and os.remove(self.file_path))
+
+    def start_import(self, shards):
+        import os
+        from .models import ImportTask
+        from .tasks import start_contact_import
+
+        task = ImportTask.objects.create(contact_list=self.contact_list, filename='contacts.csv')
+        with mock.patch('apps.mailer.tasks.IMPORT_SHARD_BYTES', -(-os.path.getsize(self.file_path) // shards)), \
+                mock.patch('celery.chord'):
+            start_contact_import(task, self.file_path)
+        return task
+
+    def run_shard(self, task, shard, **kwargs):
+        from .tasks import detect_import_layout, import_contact_shard
+
+        layout = detect_import_layout(self.file_path, 'contacts.csv')
+        return import_contact_shard.apply(args=[str(task.id), shard.id, self.file_path, layout], kwargs=kwargs).get()
+
+    def test_killed_shard_resumes_from_checkpoint(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ImportShard, ImportTask
+        from .tasks import import_contact_shard, import_email_batch, resume_stale_imports
+
+        task = self.start_import(shards=2)
+        first, second = task.shards.order_by('index')
+
+        calls = []
+
+        def killed_on_second_batch(*args, **kwargs):
+            calls.append(args[1])
+            if len(calls) == 2:
+                raise WorkerKilled()
+            return import_email_batch(*args, **kwargs)
+
+        with mock.patch('apps.mailer.tasks.import_email_batch', killed_on_second_batch):
+            with self.assertRaises(WorkerKilled):
+                self.run_shard(task, first)
+        self.assertEqual(self.run_shard(task, second), ImportShard.COMPLETED)
+
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.processed_emails), (ImportShard.PROCESSING, 5))
+        self.assertGreater(first.checkpoint_offset, first.start_offset)
+        task.refresh_from_db()
+        self.assertEqual(task.status, ImportTask.PROCESSING)
+
+        # Heartbeat устарел — sweep перезапускает шард, тот продолжает с чекпоинта и подводит итог
+        ImportShard.objects.filter(id=first.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+        def delay(*args, **kwargs):
+            return import_contact_shard.apply(args=args, kwargs=kwargs)
+
+        with mock.patch.object(import_contact_shard, 'delay', delay):
+            self.assertEqual(resume_stale_imports.apply().get(), 1)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, ImportTask.COMPLETED)
+        self.assertEqual((task.processed_emails, task.imported_count), (40, 40))
+        self.assertEqual(sorted(self.contact_list.contacts.values_list('email', flat=True)), sorted(self.emails))
+        self.assertEqual(ImportShard.objects.get(id=first.id).resume_count, 1)
+
+    def quota(self, limit):
+        def get_contact_quota(user):
+            total = Contact.objects.filter(contact_list__owner=user).count()
+            return {'limit': limit, 'total': total, 'remaining': max(limit - total, 0), 'plan_title': None}
+        return mock.patch('apps.mailer.tasks.get_contact_quota', get_contact_quota)
+
+    def test_quota_split_across_shards(self):
+        from .models import ImportShard, ImportTask
+        from .tasks import finalize_sharded_import
+
+        with self.quota(12):
+            task = self.start_import(shards=3)
+            self.assertEqual(task.quota_remaining, 12)
+            for shard in task.shards.order_by('index'):
+                self.assertEqual(self.run_shard(task, shard), ImportShard.COMPLETED)
+            finalize_sharded_import(None, str(task.id), self.file_path)
+
+        task.refresh_from_db()
+        self.assertEqual(task.status, ImportTask.COMPLETED)
+        self.assertEqual(task.imported_count, 12)
+        self.assertEqual(self.contact_list.contacts.count(), 12)
+        self.assertEqual(task.quota_remaining, 0)
+        self.assertTrue(task.shards.filter(limit_reached=True).exists())
+        self.assertFalse(task.shards.filter(quota_reserved__gt=0).exists())
+
+    def test_zero_grant_waits_for_other_shard_reservation(self):
+        from django.utils import timezone
+        from .models import ImportShard, ImportTask
+        from .tasks import _acquire_import_quota, _release_import_quota
+
+        with self.quota(40):
+            task = self.start_import(shards=2)
+        first, second = task.shards.order_by('index')
+        # Весь остаток в резерве работающего первого шарда
+        ImportTask.objects.filter(id=task.id).update(quota_remaining=0)
+        ImportShard.objects.filter(id=first.id).update(
+            status=ImportShard.PROCESSING, heartbeat_at=timezone.now(), quota_reserved=5
+        )
+
+        def first_shard_finishes_batch(seconds):
+            _release_import_quota(task.id, first.id, 5, 2)
+
+        with mock.patch('apps.mailer.tasks.time.sleep', side_effect=first_shard_finishes_batch) as sleep:
+            self.assertEqual(_acquire_import_quota(task.id, second.id, 5), 3)
+        sleep.assert_called_once()
+        self.assertEqual(ImportShard.objects.get(id=second.id).quota_reserved, 3)
+
+    def test_zero_grant_rechecks_actual_quota(self):
+        from .models import ImportTask
+        from .tasks import _acquire_import_quota
+
+        with self.quota(40):
+            task = self.start_import(shards=2)
+            # Остаток занижен резервом упавшего шарда — пересчёт по фактическому числу контактов
+            ImportTask.objects.filter(id=task.id).update(quota_remaining=0)
+            self.assertEqual(_acquire_import_quota(task.id, task.shards.first().id, 5), 5)
+
+    def test_shard_slot_is_a_heartbeat_lease(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ImportShard
+        from .tasks import _lease_shard_slot
+
+        task = self.start_import(shards=2)
+        first, second = task.shards.order_by('index')
+        ImportShard.objects.filter(id=first.id).update(status=ImportShard.PROCESSING, heartbeat_at=timezone.now())
+
+        with mock.patch('apps.mailer.tasks.IMPORT_MAX_RUNNING_SHARDS_PER_USER', 1):
+            self.assertEqual(_lease_shard_slot(second.id, self.user.id, 'task-2'), (False, False))
+            # Воркер первого шарда умер: аренда истекает вместе с heartbeat
+            ImportShard.objects.filter(id=first.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(_lease_shard_slot(second.id, self.user.id, 'task-2'), (True, True))
+            # Устаревшее сообщение с другим id уже захваченный шард не получает
+            self.assertEqual(_lease_shard_slot(second.id, self.user.id, 'task-old'), (True, False))
+
+
+class SMTPLimiterTests(SimpleTestCase):
+    """Лимиты на MX-хост общие для всех воркеров (через кэш), временные отказы SMTP не отклоняют адрес."""
+
+    def setUp(self):
+        from django.core.cache import cache
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_session_slots_are_shared_between_workers(self):
+        from django.core.cache import cache
+        from .smtp_verifier import _MXLimiter
+
+        # Два экземпляра — как два процесса-воркера с общим кэшем
+        first, second = _MXLimiter('mx.example.com', 1, 0), _MXLimiter('mx.example.com', 1, 0)
+        with first.session() as lease:
+            self.assertIsNotNone(lease)
+            with mock.patch('apps.mailer.smtp_verifier.time.sleep', side_effect=TimeoutError):
+                with self.assertRaises(TimeoutError):
+                    with second.session():
+                        pass
+        with second.session() as lease:
+            # Аренда упавшего воркера истекает, слот освобождается без release
+            cache.delete(lease)
+            with first.session() as other:
+                self.assertEqual(other, lease)
+
+    def test_rate_bucket_is_shared_between_workers(self):
+        from .smtp_verifier import _MXLimiter
+
+        clock = {'now': 1000.25}
+
+        def sleep(seconds):
+            clock['now'] += seconds
+
+        limiters = [_MXLimiter('mx.example.com', 1, 2) for _ in range(3)]
+        with mock.patch('apps.mailer.smtp_verifier.time.time', lambda: clock['now']), \
+                mock.patch('apps.mailer.smtp_verifier.time.sleep', side_effect=sleep) as slept:
+            for limiter in limiters:
+                limiter.throttle()
+        # Третья команда в ту же секунду ждёт следующего окна
+        slept.assert_called_once_with(0.75)
+
+    def test_temporary_smtp_result_is_unresolved(self):
+        from .utils import _apply_smtp_result, _validation_result, import_status
+
+        result = _validation_result('user@example.com')
+        _apply_smtp_result(result, {'valid': False, 'error': 'Временная ошибка SMTP сервера', 'temporary': True})
+        self.assertTrue(result['temporary'])
+        self.assertEqual(result['errors'], [])
+        self.assertEqual(import_status(result), Contact.VALID)
+
+        result = _validation_result('user@example.com')
+        _apply_smtp_result(result, {'valid': False, 'error': 'Email адрес не существует'})
+        self.assertEqual(import_status(result), Contact.INVALID)
+
+
+class ContactSearchTests(TestCase):
+    """Поиск контактов по email: режимы contains/prefix, регистр, границы списка."""
+
+    def setUp(self):
+        self.user = User.objects.create(email='owner@example.com')
+        self.contact_list = ContactList.objects.create(owner=self.user, name='List')
+        other = ContactList.objects.create(owner=self.user, name='Other')
+        ingest_contacts(self.contact_list.id, [
+            ('anna@mail.ru', Contact.VALID), ('Boris@Example.com', Contact.VALID), ('annette@yandex.ru', Contact.VALID),
+        ])
+        ingest_contacts(other.id, [('anna@other.ru', Contact.VALID)])
+
+    def search(self, term, mode=None):
+        from .search import normalize_search, search_contacts
+
+        term, mode = normalize_search(term, mode)
+        return sorted(search_contacts(self.contact_list.contacts.all(), term, mode).values_list('email', flat=True))
+
+    def test_normalize_search(self):
+        from .search import SEARCH_CONTAINS, SEARCH_PREFIX, normalize_search
+
+        self.assertEqual(normalize_search('  MAIL.ru '), ('mail.ru', SEARCH_CONTAINS))
+        self.assertEqual(normalize_search('mail', 'bogus'), ('mail', SEARCH_CONTAINS))
+        self.assertEqual(normalize_search('anna', SEARCH_PREFIX), ('anna', SEARCH_PREFIX))
+        # Строки короче триграммы ищутся только по началу адреса
+        self.assertEqual(normalize_search('an', SEARCH_CONTAINS), ('an', SEARCH_PREFIX))
+        self.assertEqual(normalize_search(None), ('', SEARCH_PREFIX))
+
+    def test_contains_and_prefix(self):
+        self.assertEqual(self.search('ANN'), ['anna@mail.ru', 'annette@yandex.ru'])
+        self.assertEqual(self.search('example'), ['Boris@Example.com'])
+        self.assertEqual(self.search('.ru', 'prefix'), [])
+        self.assertEqual(self.search('bo'), ['Boris@Example.com'])
+        self.assertEqual(len(self.search('')), 3)
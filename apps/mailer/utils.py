@@ -1,9 +1,15 @@
+import io
+import os
 import re
-import dns.resolver
-import requests
-import socket
+import itertools
+import tempfile
 from typing import Dict, Optional, Tuple
 
+from django.conf import settings
+
+from core.utils import dns_resolver
+
+from .counters import get_user_contact_count
 from .models import Contact
 
 # Более строгое регулярное выражение для email
@@ -14,12 +20,28 @@ MAX_EMAIL_LENGTH = 254  # RFC 5321
 MAX_LOCAL_LENGTH = 64   # RFC 5321
 MAX_DOMAIN_LENGTH = 253 # RFC 5321
 
-# Кэш для загруженных disposable-доменов
+# Снимок disposable-доменов (обновляется командой update_disposable_domains)
+DISPOSABLE_DOMAINS_FILE = getattr(
+    settings, 'DISPOSABLE_DOMAINS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'disposable_domains.txt'),
+)
+
+# Каталог, куда сохраняются файлы импорта до и во время обработки
+IMPORT_STAGING_DIR = getattr(
+    settings, 'IMPORT_STAGING_DIR',
+    os.path.join(tempfile.gettempdir(), 'vashsender_imports'),
+)
+
+# Базовый список известных disposable доменов на случай, если снимок недоступен
+BASIC_DISPOSABLE_DOMAINS = frozenset({
+    '10minutemail.com', 'guerrillamail.com', 'mailinator.com', 'tempmail.org',
+    'yopmail.com', 'throwaway.email', 'temp-mail.org', 'sharklasers.com',
+    'getairmail.com', 'mailnesia.com', 'maildrop.cc', 'mailcatch.com'
+})
+
+# Загруженный список disposable-доменов (frozenset, общий для форкнутых воркеров)
 DISPOSABLE_DOMAINS = None
 
-# Кэш для DNS запросов
-DNS_CACHE = {}
-
 # Список зарезервированных доменов верхнего уровня
 RESERVED_TLDS = {
     'test', 'example', 'invalid', 'localhost', 'local', 'internal', 'intranet',
@@ -78,7 +100,7 @@ def get_contact_quota(user) -> Dict[str, Optional[int]]:
 
     plan = getattr(user, 'current_plan', None)
     limit = int(getattr(plan, 'subscribers', 0) or 0)
-    total_contacts = Contact.objects.filter(contact_list__owner=user).count()
+    total_contacts = get_user_contact_count(user)
     remaining = None if limit == 0 else max(limit - total_contacts, 0)
 
     return {
@@ -114,54 +136,415 @@ def format_quota_error(quota: Dict[str, Optional[int]]) -> str:
         base_message = f'Достигнут лимит контактов ({limit}) тарифа "{plan_title}".'
     return base_message + ' Удалите лишние контакты или обновите тариф, чтобы продолжить.'
 
-def load_disposable_domains():
+def read_domain_list(path: str) -> frozenset:
     """
-    Загружает список disposable-доменов только один раз при первом вызове.
+    Читает список доменов из текстового файла (один домен на строку, # — комментарии).
+    """
+    domains = set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip().lower()
+            if line and not line.startswith('#'):
+                domains.add(line.rstrip('.'))
+    return frozenset(domains)
+
+
+def load_disposable_domains(reload: bool = False) -> frozenset:
+    """
+    Возвращает список disposable-доменов из снимка в репозитории (apps/mailer/data).
+    Загружается один раз при импорте модуля — до fork'а воркеров, без обращений к сети.
     """
     global DISPOSABLE_DOMAINS
-    if DISPOSABLE_DOMAINS is not None:
+    if DISPOSABLE_DOMAINS is not None and not reload:
         return DISPOSABLE_DOMAINS
 
-    # Базовый список известных disposable доменов на случай, если не удастся загрузить
-    basic_disposable = {
-        '10minutemail.com', 'guerrillamail.com', 'mailinator.com', 'tempmail.org',
-        'yopmail.com', 'throwaway.email', 'temp-mail.org', 'sharklasers.com',
-        'getairmail.com', 'mailnesia.com', 'maildrop.cc', 'mailcatch.com'
-    }
-    
-    url = "https://raw.githubusercontent.com/disposable/disposable-email-domains/master/domains.txt"
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            DISPOSABLE_DOMAINS = set(
-                line.strip().lower()
-                for line in response.text.splitlines()
-                if line.strip() and not line.startswith('#')
-            )
-        else:
-            DISPOSABLE_DOMAINS = basic_disposable
-    except Exception as e:
-        DISPOSABLE_DOMAINS = basic_disposable
+        DISPOSABLE_DOMAINS = read_domain_list(DISPOSABLE_DOMAINS_FILE)
+    except OSError:
+        DISPOSABLE_DOMAINS = BASIC_DISPOSABLE_DOMAINS
 
     return DISPOSABLE_DOMAINS
 
-def parse_emails(file_stream, filename=None):
-    raw = file_stream.read()
+
+def disposable_domains_version() -> Optional[str]:
+    """Версия снимка disposable-доменов (строка '# version: ...' в начале файла)."""
     try:
-        text = raw.decode('utf-8', errors='ignore')
-    except AttributeError:
-        text = raw if isinstance(raw, str) else raw.decode('utf-8', errors='ignore')
-    
-    emails = []
-    for line in text.splitlines():
+        with open(DISPOSABLE_DOMAINS_FILE, 'r', encoding='utf-8') as f:
+            for line in itertools.islice(f, 10):
+                if line.startswith('# version:'):
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+
+load_disposable_domains()
+
+# Потоковый разбор файлов импорта
+IMPORT_READ_CHUNK_SIZE = 1024 * 1024  # байт за одно чтение
+IMPORT_SNIFF_ROWS = 20                # строк для определения колонки с email
+EMAIL_COLUMN_NAMES = {'email', 'e-mail', 'e_mail', 'mail', 'emails', 'почта', 'email адрес', 'адрес', 'электронная почта'}
+EMAIL_TOKEN_REGEX = re.compile(r'[^\s,;:<>"\'()\[\]]+@[^\s,;:<>"\'()\[\]]+')
+EMAIL_STRIP_CHARS = '.,;:!?()[]{}"\'<>'
+
+
+def normalize_import_value(value) -> str:
+    """Приводит значение ячейки/строки к виду email: нижний регистр, без обрамляющих символов."""
+    if value is None:
+        return ''
+    value = str(value).strip().lower()
+    if value.startswith('mailto:'):
+        value = value[len('mailto:'):]
+    return value.strip(EMAIL_STRIP_CHARS).strip()
+
+
+def detect_import_format(filename=None, head: bytes = b'') -> str:
+    """Определяет формат файла импорта: xlsx, csv, tsv или txt."""
+    name = (filename or '').lower()
+    if name.endswith(('.xlsx', '.xlsm')) or head.startswith(b'PK\x03\x04'):
+        return 'xlsx'
+    if name.endswith('.tsv'):
+        return 'tsv'
+    if name.endswith('.csv'):
+        return 'csv'
+    sample = head.decode('utf-8', errors='ignore')
+    first_lines = [line for line in sample.split('\n')[:IMPORT_SNIFF_ROWS] if line.strip()]
+    if first_lines and all('\t' in line for line in first_lines):
+        return 'tsv'
+    if first_lines and all((',' in line or ';' in line) for line in first_lines):
+        return 'csv'
+    return 'txt'
+
+
+def iter_text_lines(file_stream, chunk_size: int = IMPORT_READ_CHUNK_SIZE):
+    """
+    Построчное чтение бинарного потока с инкрементальным декодированием UTF-8.
+    В памяти держится только текущий блок, а не весь файл. Строки делятся только по
+    \n и выдаются вместе с переводом строки: csv.reader сохраняет переносы внутри
+    полей в кавычках, а прочие разделители (\x0b, \x85, \u2028 …) остаются в строке.
+    """
+    import codecs
+
+    decoder = codecs.getincrementaldecoder('utf-8-sig')(errors='ignore')
+    tail = ''
+    while True:
+        chunk = file_stream.read(chunk_size)
+        if not chunk:
+            break
+        text = tail + (decoder.decode(chunk) if isinstance(chunk, bytes) else chunk)
+        lines = text.split('\n')
+        # Последняя строка может быть неполной — оставляем её до следующего блока
+        tail = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    tail += decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def detect_email_column(rows) -> Tuple[int, bool]:
+    """
+    По первым строкам таблицы находит колонку с email.
+    Возвращает (индекс колонки, есть ли строка заголовка).
+    """
+    if rows:
+        header = [normalize_import_value(cell) for cell in rows[0]]
+        for idx, name in enumerate(header):
+            if name in EMAIL_COLUMN_NAMES:
+                return idx, True
+    scores = {}
+    for row in rows:
+        for idx, cell in enumerate(row):
+            if cell is not None and '@' in str(cell):
+                scores[idx] = scores.get(idx, 0) + 1
+    if not scores:
+        return 0, False
+    return max(scores, key=lambda idx: (scores[idx], -idx)), False
+
+
+def _iter_table_emails(rows):
+    """Email из табличных строк (CSV/TSV/XLSX) с автоопределением колонки."""
+    head = []
+    for row in rows:
+        head.append(row)
+        if len(head) >= IMPORT_SNIFF_ROWS:
+            break
+    column, has_header = detect_email_column(head)
+
+    def emit(row):
+        if column < len(row):
+            email = normalize_import_value(row[column])
+            if email:
+                return email
+        return None
+
+    for idx, row in enumerate(head):
+        if has_header and idx == 0:
+            continue
+        email = emit(row)
+        if email:
+            yield email
+    for row in rows:
+        email = emit(row)
+        if email:
+            yield email
+
+
+def _iter_txt_emails(lines):
+    for line in lines:
         line = line.strip()
-        if line and not line.startswith('#'):
-            # Убираем лишние символы и приводим к нижнему регистру
-            email = line.lower().strip('.,;:!?()[]{}"\'').strip()
+        if not line or line.startswith('#'):
+            continue
+        match = EMAIL_TOKEN_REGEX.search(line)
+        # Строки без адреса сохраняем как есть — они будут помечены как невалидные
+        email = normalize_import_value(match.group(0) if match else line)
+        if email:
+            yield email
+
+
+def _iter_xlsx_rows(file_stream):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file_stream, read_only=True, data_only=True)
+    try:
+        for row in workbook.active.iter_rows(values_only=True):
+            yield row
+    finally:
+        workbook.close()
+
+
+def iter_emails_from_file(file_stream, filename=None, file_format=None):
+    """
+    Потоковый разбор файла импорта: генератор email-адресов.
+    Поддерживает TXT (адрес в строке), CSV/TSV (автоопределение колонки) и XLSX (openpyxl read_only).
+    """
+    import csv
+
+    if file_format is None:
+        head = file_stream.read(64 * 1024)
+        if isinstance(head, str):
+            head = head.encode('utf-8', errors='ignore')
+        file_stream.seek(0)
+        file_format = detect_import_format(filename, head)
+
+    if file_format == 'xlsx':
+        yield from _iter_table_emails(_iter_xlsx_rows(file_stream))
+        return
+
+    lines = iter_text_lines(file_stream)
+    if file_format == 'tsv':
+        yield from _iter_table_emails(csv.reader(lines, delimiter='\t'))
+    elif file_format == 'csv':
+        first = next(lines, '')
+        delimiter = ';' if first.count(';') > first.count(',') else ','
+        yield from _iter_table_emails(csv.reader(itertools.chain([first], lines), delimiter=delimiter))
+    else:
+        yield from _iter_txt_emails(lines)
+
+
+def iter_email_batches(file_stream, filename=None, batch_size: int = 1000):
+    """Email из файла импорта порциями по batch_size."""
+    batch = []
+    for email in iter_emails_from_file(file_stream, filename):
+        batch.append(email)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def detect_import_layout(file_path: str, filename=None) -> dict:
+    """
+    Раскладка файла импорта по его началу: формат, разделитель, колонка с email, есть ли заголовок.
+    Нужна, чтобы части файла (шарды) разбирались одинаково, не видя начала файла.
+    """
+    import csv
+
+    with open(file_path, 'rb') as f:
+        head = f.read(64 * 1024)
+    file_format = detect_import_format(filename, head)
+    layout = {'format': file_format, 'delimiter': None, 'email_column': 0, 'has_header': False}
+    if file_format not in ('csv', 'tsv'):
+        return layout
+
+    lines = list(itertools.islice(iter_text_lines(io.BytesIO(head)), IMPORT_SNIFF_ROWS))
+    if file_format == 'tsv':
+        delimiter = '\t'
+    else:
+        first = lines[0] if lines else ''
+        delimiter = ';' if first.count(';') > first.count(',') else ','
+    column, has_header = detect_email_column(list(csv.reader(lines, delimiter=delimiter)))
+    layout.update(delimiter=delimiter, email_column=column, has_header=has_header)
+    return layout
+
+
+def _record_bounds(file_path: str, targets, quotechar: bytes = b'"'):
+    """
+    Для каждой позиции из targets (по возрастанию) — ближайшее начало записи CSV не раньше неё:
+    позиция сразу после \n, перед которой чётное число кавычек (перевод строки не внутри поля).
+    Файл читается один раз поблочно.
+    """
+    bounds = []
+    targets = iter(targets)
+    target = next(targets, None)
+    offset = 0
+    quotes = 0
+    with open(file_path, 'rb') as f:
+        while target is not None:
+            chunk = f.read(IMPORT_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            pos = 0
+            while target is not None:
+                newline = chunk.find(b'\n', max(pos, target - 1 - offset))
+                if newline < 0:
+                    break
+                quotes += chunk.count(quotechar, pos, newline + 1)
+                pos = newline + 1
+                if quotes % 2 == 0:
+                    bounds.append(offset + pos)
+                    target = next(targets, None)
+                    while target is not None and target <= offset + pos:
+                        bounds.append(offset + pos)
+                        target = next(targets, None)
+            quotes += chunk.count(quotechar, pos)
+            offset += len(chunk)
+    return bounds
+
+
+def split_import_file(file_path: str, parts: int, quoted: bool = False):
+    """
+    Делит файл на parts диапазонов байт [start, end). Границы выравниваются
+    при чтении: строка принадлежит диапазону, в котором она начинается.
+    quoted=True (CSV/TSV) — границы сдвигаются на начало записи, чтобы поле в кавычках
+    с переводом строки не разрезалось между диапазонами.
+    """
+    size = os.path.getsize(file_path)
+    parts = max(1, min(parts, size or 1))
+    step = size // parts
+    bounds = [i * step for i in range(1, parts)]
+    if quoted:
+        bounds = _record_bounds(file_path, bounds)
+    bounds = sorted({0, size, *(bound for bound in bounds if bound < size)})
+    return list(zip(bounds, bounds[1:])) or [(0, size)]
+
+
+def iter_lines_in_range(file_stream, start: int, end: Optional[int] = None, position: Optional[dict] = None):
+    """
+    Строки, начинающиеся в диапазоне байт [start, end) бинарного потока (end=None — до конца),
+    вместе с переводом строки. position['offset'] — смещение сразу после последней выданной
+    строки (для чекпоинтов).
+    """
+    import codecs
+
+    if start > 0:
+        # Дочитываем строку, начатую в предыдущем диапазоне
+        file_stream.seek(start - 1)
+        file_stream.readline()
+    else:
+        file_stream.seek(0)
+    decoder = codecs.getincrementaldecoder('utf-8-sig' if start == 0 else 'utf-8')(errors='ignore')
+    while end is None or file_stream.tell() < end:
+        line = file_stream.readline()
+        if not line:
+            break
+        if position is not None:
+            position['offset'] = file_stream.tell()
+        yield decoder.decode(line)
+
+
+def iter_emails_in_range(file_stream, start: int, end: Optional[int], layout: dict, position: Optional[dict] = None):
+    """Email из диапазона байт текстового файла импорта (раскладка — detect_import_layout)."""
+    import csv
+
+    lines = iter_lines_in_range(file_stream, start, end, position)
+    if layout['format'] not in ('csv', 'tsv'):
+        yield from _iter_txt_emails(lines)
+        return
+
+    column = layout['email_column']
+    for idx, row in enumerate(csv.reader(lines, delimiter=layout['delimiter'])):
+        if idx == 0 and start == 0 and layout['has_header']:
+            continue
+        if column < len(row):
+            email = normalize_import_value(row[column])
             if email:
-                emails.append(email)
-    
-    return emails
+                yield email
+
+
+def iter_email_batches_in_range(file_stream, start: int, end: Optional[int], layout: dict, batch_size: int = 1000):
+    """
+    Email из диапазона байт порциями: пары (порция, смещение после её последней строки).
+    Смещение — чекпоинт: чтение с него продолжит файл со следующей порции.
+    """
+    position = {'offset': start}
+    batch = []
+    for email in iter_emails_in_range(file_stream, start, end, layout, position):
+        batch.append(email)
+        if len(batch) >= batch_size:
+            yield batch, position['offset']
+            batch = []
+    if batch:
+        yield batch, position['offset']
+
+
+def iter_import_batches(file_stream, layout: dict, checkpoint: int = 0, filename=None, batch_size: int = 1000):
+    """
+    Порции импорта с чекпоинтами: пары (порция, чекпоинт после неё).
+    Для текстовых форматов чекпоинт — байтовое смещение, для XLSX — число прочитанных адресов
+    (при возобновлении уже прочитанные адреса пропускаются без валидации).
+    """
+    if layout['format'] != 'xlsx':
+        yield from iter_email_batches_in_range(file_stream, checkpoint, None, layout, batch_size)
+        return
+
+    consumed = checkpoint
+    emails = itertools.islice(iter_emails_from_file(file_stream, filename, 'xlsx'), checkpoint, None)
+    while True:
+        batch = list(itertools.islice(emails, batch_size))
+        if not batch:
+            break
+        consumed += len(batch)
+        yield batch, consumed
+
+
+def count_import_rows(file_path: str, filename=None) -> int:
+    """
+    Быстрая оценка числа строк файла импорта (для ImportTask.total_emails).
+    Для текстовых форматов — подсчёт переводов строк поблочно, для XLSX — размеры листа.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(64 * 1024)
+        file_format = detect_import_format(filename, head)
+        if file_format == 'xlsx':
+            f.seek(0)
+            try:
+                from openpyxl import load_workbook
+                workbook = load_workbook(f, read_only=True)
+                try:
+                    return workbook.active.max_row or 0
+                finally:
+                    workbook.close()
+            except Exception:
+                return 0
+
+        count = head.count(b'\n')
+        last = head[-1:]
+        while True:
+            chunk = f.read(IMPORT_READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            count += chunk.count(b'\n')
+            last = chunk[-1:]
+        if last and last != b'\n':
+            count += 1
+        return count
+
+
+def parse_emails(file_stream, filename=None):
+    """Список email из файла импорта (для небольших файлов; большие — через iter_emails_from_file)."""
+    return list(iter_emails_from_file(file_stream, filename))
 
 def is_syntax_valid(email: str) -> bool:
     """
@@ -208,39 +591,16 @@ def is_syntax_valid(email: str) -> bool:
 
 def has_mx_record(domain: str) -> bool:
     """
-    Проверка наличия MX-записей с таймаутом и кэшированием
+    Проверка наличия MX-записей (через общий кэширующий резолвер).
+    При временной ошибке DNS выбрасывает dns_resolver.DNSUnavailable.
     """
-    # Проверяем кэш
-    if domain in DNS_CACHE:
-        return DNS_CACHE[domain]
-    
-    try:
-        # Устанавливаем таймаут для DNS-запросов
-        resolver = dns.resolver.Resolver()
-        resolver.timeout = 3  # Уменьшаем таймаут для ускорения
-        resolver.lifetime = 5
-        
-        answers = resolver.resolve(domain, 'MX')
-        result = len(answers) > 0
-        DNS_CACHE[domain] = result
-        return result
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout, Exception) as e:
-        DNS_CACHE[domain] = False
-        return False
+    return bool(dns_resolver.get_mx_hosts(domain))
 
 def has_a_record(domain: str) -> bool:
     """
     Проверка наличия A-записей (IP адресов)
     """
-    try:
-        resolver = dns.resolver.Resolver()
-        resolver.timeout = 5
-        resolver.lifetime = 10
-        
-        answers = resolver.resolve(domain, 'A')
-        return len(answers) > 0
-    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.Timeout, Exception):
-        return False
+    return bool(dns_resolver.resolve(domain, 'A')['records'])
 
 def is_reserved_domain(domain: str) -> bool:
     """
@@ -265,7 +625,7 @@ def is_reserved_domain(domain: str) -> bool:
 
 def is_disposable_domain(domain: str) -> bool:
     """
-    Проверка на disposable домены.
+    Проверка на disposable домены, включая поддомены (mx.mailinator.com).
     Если домен в allowlist — считаем НЕ disposable.
     """
     try:
@@ -274,7 +634,9 @@ def is_disposable_domain(domain: str) -> bool:
             return False
 
         disposable_domains = load_disposable_domains()
-        return domain.lower() in disposable_domains
+        labels = domain.lower().rstrip('.').split('.')
+        # Проверяем сам домен и все родительские суффиксы, кроме TLD
+        return any('.'.join(labels[i:]) in disposable_domains for i in range(len(labels) - 1))
     except Exception:
         return False
 
@@ -294,83 +656,12 @@ def is_allowlist_domain(domain: str) -> bool:
 def check_smtp_connection(email: str) -> dict:
     """
     Глубокая SMTP проверка существования email адреса
+    (одиночный вызов общего SMTP-верификатора, см. smtp_verifier.verify_emails)
     """
+    from .smtp_verifier import verify_emails
+
     try:
-        domain = email.split('@', 1)[1]
-        
-        # Получаем MX записи
-        resolver = dns.resolver.Resolver()
-        resolver.timeout = 3
-        resolver.lifetime = 5
-        mx_records = resolver.resolve(domain, 'MX')
-        mx_host = str(sorted(mx_records, key=lambda x: x.preference)[0].exchange)
-        
-        # Подключаемся к SMTP серверу
-        with socket.create_connection((mx_host, 25), timeout=5) as sock:
-            sock.settimeout(10)  # Увеличиваем таймаут для чтения
-            
-            # Читаем приветствие сервера
-            response = sock.recv(1024).decode('utf-8', errors='ignore')
-            if not response.startswith('220'):
-                return {'valid': False, 'error': 'SMTP сервер недоступен'}
-            
-            # Отправляем EHLO (более современный протокол)
-            sock.send(b'EHLO test.com\r\n')
-            response = sock.recv(1024).decode('utf-8', errors='ignore')
-            
-            if not response.startswith('250'):
-                # Пробуем HELO если EHLO не поддерживается
-                sock.send(b'HELO test.com\r\n')
-                response = sock.recv(1024).decode('utf-8', errors='ignore')
-                if not response.startswith('250'):
-                    return {'valid': False, 'error': 'SMTP сервер недоступен'}
-            
-            # Проверяем MAIL FROM
-            sock.send(b'MAIL FROM:<test@test.com>\r\n')
-            response = sock.recv(1024).decode('utf-8', errors='ignore')
-            
-            if not response.startswith('250'):
-                return {'valid': False, 'error': 'SMTP сервер отклоняет отправителей'}
-            
-            # Проверяем RCPT TO - это ключевая проверка существования email
-            sock.send(f'RCPT TO:<{email}>\r\n'.encode())
-            response = sock.recv(1024).decode('utf-8', errors='ignore')
-            
-            # Анализируем ответ сервера
-            if response.startswith('250'):
-                return {'valid': True, 'error': None}
-            elif response.startswith('550'):
-                # 550 - пользователь не существует
-                return {'valid': False, 'error': 'Email адрес не существует'}
-            elif response.startswith('553'):
-                # 553 - недопустимый адрес получателя
-                return {'valid': False, 'error': 'Email адрес недопустим'}
-            elif response.startswith('554'):
-                # 554 - транзакция не удалась
-                return {'valid': False, 'error': 'Email адрес отклонен сервером'}
-            elif response.startswith('421'):
-                # 421 - сервер недоступен
-                return {'valid': False, 'error': 'SMTP сервер временно недоступен'}
-            elif response.startswith('450'):
-                # 450 - временная ошибка
-                return {'valid': False, 'error': 'Временная ошибка SMTP сервера'}
-            elif response.startswith('452'):
-                # 452 - недостаточно места
-                return {'valid': False, 'error': 'SMTP сервер перегружен'}
-            else:
-                # Неизвестный ответ - считаем валидным для безопасности
-                return {'valid': True, 'error': None, 'warning': f'Неизвестный ответ SMTP: {response[:100]}'}
-                
-    except dns.resolver.NXDOMAIN:
-        return {'valid': False, 'error': 'Домен не существует'}
-    except dns.resolver.NoAnswer:
-        return {'valid': False, 'error': 'Домен не имеет MX записей'}
-    except dns.resolver.Timeout:
-        return {'valid': False, 'error': 'Таймаут DNS запроса'}
-    except socket.timeout:
-        return {'valid': False, 'error': 'Таймаут подключения к SMTP серверу'}
-    except ConnectionRefusedError:
-        return {'valid': False, 'error': 'SMTP сервер отказал в подключении'}
+        return verify_emails([email])[email]
     except Exception as e:
         return {'valid': False, 'error': f'Ошибка SMTP проверки: {str(e)}'}
 
@@ -442,6 +733,200 @@ def validate_email_production(email: str) -> dict:
     result['status'] = Contact.VALID
     return result
 
+# Пакетная валидация: вердикт по домену вычисляется один раз на порцию/импорт
+BATCH_VALIDATION_WORKERS = 16  # одновременных DNS/SMTP проверок
+DOMAIN_VERDICT_RETRIES = 2  # повторов для доменов с временной ошибкой DNS в пределах порции
+DOMAIN_VERDICT_RETRY_DELAY = 1.0  # секунд, умножается на номер попытки
+
+
+def get_domain_verdict(domain: str) -> dict:
+    """
+    Вердикт по домену: allowlist, зарезервирован, disposable, есть ли MX,
+    принимает ли сервер любые адреса (accepts_all — по кэшу пробы SMTP-верификатора).
+    """
+    from .smtp_verifier import get_cached_catch_all
+
+    verdict = {
+        'domain': domain,
+        'allowlist': is_allowlist_domain(domain),
+        'reserved': False,
+        'disposable': False,
+        'has_mx': False,
+        'accepts_all': False,
+        'error': None,
+        'transient': False,  # временная ошибка DNS: вердикт не кэшируется, адреса не отклоняются
+    }
+    if verdict['allowlist']:
+        return verdict
+
+    verdict['reserved'] = is_reserved_domain(domain)
+    if verdict['reserved']:
+        return verdict
+
+    verdict['disposable'] = is_disposable_domain(domain)
+    if verdict['disposable']:
+        return verdict
+
+    try:
+        verdict['has_mx'] = has_mx_record(domain)
+    except dns_resolver.DNSUnavailable as e:
+        verdict['error'] = f'Ошибка проверки DNS: {str(e)}'
+        verdict['transient'] = True
+        return verdict
+
+    if verdict['has_mx']:
+        # Если сервер принимает заведомо несуществующий адрес, поадресная проверка ничего не даст
+        verdict['accepts_all'] = get_cached_catch_all(domain) is True
+    return verdict
+
+
+def _validation_result(email: str) -> dict:
+    return {
+        'email': email,
+        'is_valid': False,
+        'status': Contact.INVALID,
+        'confidence': 'low',
+        'errors': [],
+        'warnings': [],
+        'temporary': False,  # не проверен из-за временной ошибки (DNS, 4xx, обрыв SMTP)
+    }
+
+
+def import_status(result: dict) -> str:
+    """
+    Статус нового контакта по результату пакетной валидации. Адрес, который не удалось
+    проверить из-за временной ошибки, не отклоняется: он записывается как VALID и
+    перепроверяется позже (см. tasks.IMPORT_RECHECK_DELAY).
+    """
+    if result.get('temporary'):
+        return Contact.VALID
+    return result['status'] if result['is_valid'] else Contact.INVALID
+
+
+def _apply_domain_verdict(result: dict, verdict: dict) -> bool:
+    """
+    Заполняет результат по вердикту домена (как validate_email_production).
+    Возвращает True, если нужна поадресная SMTP-проверка.
+    """
+    if verdict['allowlist']:
+        result['is_valid'] = True
+        result['status'] = Contact.VALID
+        result['confidence'] = 'very_high'
+        return False
+    if verdict['reserved']:
+        result['errors'].append('Зарезервированный домен')
+        return False
+    if verdict['disposable']:
+        result['status'] = Contact.BLACKLIST
+        result['confidence'] = 'high'
+        result['warnings'].append('Временный email домен')
+        return False
+    if verdict.get('transient'):
+        result['temporary'] = True
+        result['warnings'].append(verdict['error'])
+        return False
+    if verdict['error']:
+        result['errors'].append(verdict['error'])
+        return False
+    if not verdict['has_mx']:
+        result['errors'].append('Домен не имеет MX записей (не может принимать почту)')
+        return False
+    if verdict['accepts_all']:
+        result['is_valid'] = True
+        result['status'] = Contact.VALID
+        result['confidence'] = 'medium'
+        result['warnings'].append('Домен принимает любые адреса (catch-all)')
+        return False
+    return True
+
+
+def _apply_smtp_result(result: dict, smtp_result: dict) -> None:
+    if smtp_result.get('temporary'):
+        # 4xx, обрыв сессии, таймаут: адрес не проверен, а не отклонён (см. import_status)
+        result['temporary'] = True
+        result['warnings'].append(smtp_result['error'])
+        return
+    if smtp_result.get('catch_all'):
+        _apply_domain_verdict(result, {
+            'allowlist': False, 'reserved': False, 'disposable': False,
+            'error': None, 'has_mx': True, 'accepts_all': True,
+        })
+        return
+    if not smtp_result['valid']:
+        result['errors'].append(smtp_result['error'])
+        return
+    result['is_valid'] = True
+    result['status'] = Contact.VALID
+    result['confidence'] = 'very_high'
+
+
+def validate_emails_batch(emails, domain_verdicts: Optional[dict] = None, max_workers: int = BATCH_VALIDATION_WORKERS) -> Dict[str, dict]:
+    """
+    Пакетная продакшен-валидация: адреса группируются по домену, вердикт по каждому
+    домену (reserved / disposable / MX / catch-all) вычисляется один раз,
+    поадресно выполняется только SMTP-проверка (RCPT TO в общих сессиях по MX).
+
+    domain_verdicts — общий словарь вердиктов; передайте один и тот же объект для всех
+    порций импорта, чтобы каждый домен проверялся один раз за импорт. Вердикты с
+    временной ошибкой DNS повторяются DOMAIN_VERDICT_RETRIES раз и в словарь не
+    попадают; адреса таких доменов помечаются temporary (см. import_status).
+    Возвращает {email: результат в формате validate_email_production}.
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    if domain_verdicts is None:
+        domain_verdicts = {}
+
+    results = {}
+    by_domain = {}
+    for email in emails:
+        if email in results:
+            continue
+        result = _validation_result(email)
+        results[email] = result
+        if not is_syntax_valid(email):
+            result['errors'].append('Неверный синтаксис email адреса')
+            continue
+        domain = email.split('@', 1)[1].lower()
+        by_domain.setdefault(domain, []).append(email)
+
+    workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # Вердикты для новых доменов — параллельно; временные ошибки DNS повторяем
+        verdicts = {domain: domain_verdicts[domain] for domain in by_domain if domain in domain_verdicts}
+        pending = [domain for domain in by_domain if domain not in verdicts]
+        for attempt in range(DOMAIN_VERDICT_RETRIES + 1):
+            if not pending:
+                break
+            if attempt:
+                time.sleep(DOMAIN_VERDICT_RETRY_DELAY * attempt)
+            for domain, verdict in zip(pending, executor.map(get_domain_verdict, pending)):
+                verdicts[domain] = verdict
+            pending = [domain for domain in pending if verdicts[domain]['transient']]
+        for domain, verdict in verdicts.items():
+            if not verdict['transient']:
+                domain_verdicts[domain] = verdict
+
+        smtp_queue = []
+        for domain, domain_emails in by_domain.items():
+            verdict = verdicts[domain]
+            for email in domain_emails:
+                if _apply_domain_verdict(results[email], verdict):
+                    smtp_queue.append(email)
+
+    # Поадресные SMTP-проверки — только там, где они имеют смысл:
+    # одна сессия на MX, проба catch-all, лимиты на MX-хост
+    if smtp_queue:
+        from .smtp_verifier import verify_emails
+
+        smtp_results = verify_emails(smtp_queue, max_workers=workers)
+        for email in smtp_queue:
+            _apply_smtp_result(results[email], smtp_results[email])
+
+    return results
+
+
 def classify_email(email: str) -> str:
     """
     Глубокая классификация email адресов с проверкой существования.
@@ -470,8 +955,12 @@ def classify_email(email: str) -> str:
         return Contact.BLACKLIST
 
     # 5. Проверка MX записей (обязательны для email)
-    if not has_mx_record(domain):
-        return Contact.INVALID
+    try:
+        if not has_mx_record(domain):
+            return Contact.INVALID
+    except dns_resolver.DNSUnavailable:
+        # DNS временно недоступен — как и при сбое SMTP, адрес не отклоняем
+        return Contact.VALID
 
     # 6. SMTP проверка существования email
     try:
@@ -526,9 +1015,12 @@ def validate_email_strict(email: str) -> dict:
         return result
 
     # Проверка MX записей (обязательны для email)
-    if not has_mx_record(domain):
-        result['errors'].append('Домен не имеет MX записей (не может принимать почту)')
-        return result
+    try:
+        if not has_mx_record(domain):
+            result['errors'].append('Домен не имеет MX записей (не может принимать почту)')
+            return result
+    except dns_resolver.DNSUnavailable as e:
+        result['warnings'].append(f'MX записи не проверены: {e}')
 
     # Дополнительная проверка A записей (для информации)
     if not has_a_record(domain):
@@ -572,9 +1064,12 @@ def validate_email_fast(email: str) -> dict:
 
     # Проверяем только важные домены (основные почтовые провайдеры)
     if domain in IMPORTANT_DOMAINS:
-        # Для важных доменов делаем быструю проверку MX
-        if not has_mx_record(domain):
-            return {'is_valid': False, 'status': Contact.INVALID, 'reason': 'No MX record'}
+        # Для важных доменов делаем быструю проверку MX (временная ошибка DNS — не отказ)
+        try:
+            if not has_mx_record(domain):
+                return {'is_valid': False, 'status': Contact.INVALID, 'reason': 'No MX record'}
+        except dns_resolver.DNSUnavailable:
+            pass
     else:
         # Для остальных доменов просто проверяем базовую структуру
         # и считаем валидными (DNS проверка будет позже при отправке)
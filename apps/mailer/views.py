@@ -1,11 +1,21 @@
 # mailer/views.py
 
-from django.db import IntegrityError
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.http import HttpResponse
+from django.http import FileResponse, HttpResponse
 from django.utils import timezone
+from django.utils.text import get_valid_filename
 import json
+import re
 from datetime import datetime
 
 from rest_framework import viewsets, status
@@ -16,16 +26,160 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.parsers import MultiPartParser
 
-from .models import ContactList, Contact, ImportTask
+from .ingest import ingest_contacts, INGEST_BATCH_SIZE
+from .search import normalize_search, search_contacts, search_cache_key, get_cached_page, set_cached_page
+from .models import ContactList, Contact, ImportTask, ChunkedUpload, ContactListOperation, ContactExportTask, PurgeJob
+from .purge import create_purge_job, purge_job_data
 from .serializers import ContactListSerializer, ContactSerializer, ContactListListSerializer, ContactListDetailSerializer, MailerDomainSerializer
 from .utils import (
-    parse_emails,
+    iter_email_batches,
     classify_email,
     can_add_contacts,
     format_quota_error,
     get_contact_quota,
+    IMPORT_STAGING_DIR,
 )
 from apps.billing.models import Plan
+from core.utils.pagination import paginate, InvalidCursor
+
+logger = logging.getLogger(__name__)
+
+# Загрузка файлов импорта частями
+CHUNKED_UPLOAD_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_CHUNK_SIZE', 8 * 1024 * 1024)        # рекомендуемый размер части
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_CHUNK_SIZE', 64 * 1024 * 1024)
+CHUNKED_UPLOAD_MAX_SIZE = getattr(settings, 'CHUNKED_UPLOAD_MAX_SIZE', 10 * 1024 * 1024 * 1024)   # 10 ГБ
+UPLOAD_READ_SIZE = 1024 * 1024
+
+_CONTENT_RANGE_RE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+def _upload_data(upload):
+    return {
+        'upload_id': str(upload.id),
+        'filename': upload.filename,
+        'status': upload.status,
+        'offset': upload.received_bytes,
+        'total_size': upload.total_size,
+        'progress_percentage': upload.progress_percentage,
+        'import_task_id': str(upload.import_task_id) if upload.import_task_id else None,
+    }
+
+
+def _chunk_offset(request):
+    """Смещение части: параметр ?offset= или заголовок Content-Range: bytes start-end/total."""
+    value = request.query_params.get('offset')
+    if value is not None:
+        return int(value) if value.isdigit() else None
+    match = _CONTENT_RANGE_RE.match(request.META.get('HTTP_CONTENT_RANGE', '').strip())
+    return int(match.group(1)) if match else None
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _start_import(import_task, file_path):
+    """
+    Ставит импорт файла в очередь Celery; если брокер недоступен — выполняет его синхронно.
+    """
+    from .tasks import import_contacts_async, start_contact_import
+
+    # Запускаем задачу асинхронно (большие файлы — параллельно, частями)
+    try:
+        celery_task = start_contact_import(import_task, file_path)
+        
+        # Сохраняем ID Celery задачи для отслеживания
+        import_task.celery_task_id = celery_task.id
+        import_task.save(update_fields=['celery_task_id'])
+        
+        return Response({
+            'task_id': str(import_task.id),
+            'celery_task_id': celery_task.id,
+            'status': 'started',
+            'message': 'Импорт начат в фоновом режиме. Отслеживайте прогресс через API.'
+        }, status=status.HTTP_202_ACCEPTED)
+    except Exception as e:
+        # Если не удалось запустить задачу Celery, выполняем синхронно
+        logger.error(f"Failed to start Celery task: {e}, executing synchronously", exc_info=True)
+        
+        # Выполняем задачу синхронно через apply
+        try:
+            result = import_contacts_async.apply(args=[str(import_task.id), file_path])
+            import_task.refresh_from_db()
+            if result.successful():
+                import_task.status = ImportTask.COMPLETED
+            else:
+                import_task.status = ImportTask.FAILED
+                import_task.error_message = str(result.result) if result.result else str(e)
+            import_task.save()
+        except Exception as sync_error:
+            logger.error(f"Failed to execute task synchronously: {sync_error}", exc_info=True)
+            import_task.status = ImportTask.FAILED
+            import_task.error_message = f"Celery error: {e}, Sync error: {sync_error}"
+            import_task.save()
+        
+        return Response({
+            'task_id': str(import_task.id),
+            'status': import_task.status,
+            'error': import_task.error_message,
+            'message': 'Импорт выполнен синхронно (Celery недоступен).'
+        }, status=status.HTTP_200_OK)
+
+
+def _operation_data(operation):
+    return {
+        'id': str(operation.id),
+        'operation': operation.operation,
+        'status': operation.status,
+        'target_list_id': operation.target_list_id,
+        'source_list_ids': operation.source_list_ids,
+        'filters': operation.filters,
+        'total': operation.total,
+        'processed': operation.processed,
+        'progress_percentage': operation.progress_percentage,
+        'inserted': operation.inserted,
+        'removed': operation.removed,
+        'limit_reached': operation.limit_reached,
+        'error_message': operation.error_message,
+        'created_at': operation.created_at.isoformat(),
+        'completed_at': operation.completed_at.isoformat() if operation.completed_at else None,
+    }
+
+
+def _export_task_data(task):
+    return {
+        'id': str(task.id),
+        'contact_list_id': task.contact_list_id,
+        'format': task.format,
+        'types': task.types,
+        'status': task.status,
+        'total_rows': task.total_rows,
+        'processed_rows': task.processed_rows,
+        'progress_percentage': task.progress_percentage,
+        'filename': task.filename,
+        'error_message': task.error_message,
+        'download_url': reverse('contactlists-download-export-task', kwargs={'task_id': str(task.id)})
+        if task.status == ContactExportTask.COMPLETED and task.file else None,
+        'created_at': task.created_at.isoformat(),
+        'completed_at': task.completed_at.isoformat() if task.completed_at else None,
+    }
+
+
+def _start_list_operation(operation):
+    """Ставит операцию над списками в очередь; если брокер недоступен — выполняет синхронно."""
+    from .tasks import run_contact_list_operation
+
+    try:
+        celery_task = run_contact_list_operation.delay(str(operation.id))
+        ContactListOperation.objects.filter(id=operation.id).update(celery_task_id=celery_task.id)
+    except Exception as e:
+        logger.error(f"Failed to start Celery task: {e}, executing synchronously", exc_info=True)
+        run_contact_list_operation.apply(args=[str(operation.id)])
+    operation.refresh_from_db()
+    return Response(_operation_data(operation), status=status.HTTP_202_ACCEPTED)
 
 
 class ContactListViewSet(viewsets.ModelViewSet):
@@ -37,7 +191,7 @@ class ContactListViewSet(viewsets.ModelViewSet):
     parser_classes      = [MultiPartParser] + viewsets.ModelViewSet.parser_classes
 
     def get_queryset(self):
-        return ContactList.objects.filter(owner=self.request.user)
+        return ContactList.objects.filter(owner=self.request.user, is_deleting=False)
 
     def get_serializer_class(self):
         if self.action == 'list':
@@ -67,36 +221,69 @@ class ContactListViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
+    def destroy(self, request, *args, **kwargs):
+        """
+        Список удаляется в фоне (PurgeJob): он сразу скрывается, контакты удаляются
+        порциями. Прогресс — GET /contactlists/purge-jobs/{id}/.
+        """
+        from .tasks import start_purge
+
+        contact_list = self.get_object()
+        job = create_purge_job(request.user, PurgeJob.CONTACT_LIST, contact_list.id)
+        # Имя освобождается сразу, чтобы можно было создать новый список с тем же именем
+        ContactList.objects.filter(id=contact_list.id).update(
+            is_deleting=True, name=f"{contact_list.name[:200]} #deleting-{job.id}",
+        )
+        start_purge(job)
+        job.refresh_from_db()
+        return Response(purge_job_data(job), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path='purge-jobs/(?P<job_id>[^/.]+)')
+    def purge_job_status(self, request, job_id=None):
+        """
+        GET /contactlists/purge-jobs/{id}/ — прогресс фонового удаления
+        """
+        job = get_object_or_404(PurgeJob, id=job_id, user=request.user)
+        return Response(purge_job_data(job))
+
 
     @action(detail=True, methods=['get', 'post'], url_path='contacts')
     def contacts(self, request, pk=None):
         """
         GET  /contactlists/{pk}/contacts/?page=1&page_size=20  — список контактов с пагинацией
+             ?search=...&search_mode=contains|prefix — поиск по email (см. search.py)
+             /contactlists/{pk}/contacts/?cursor=&page_size=20 — курсорная пагинация (next_cursor, has_more)
         POST /contactlists/{pk}/contacts/  — добавить контакт { email, status }
         """
         contact_list = self.get_object()
 
         if request.method == 'GET':
-            qs = contact_list.contacts.all().order_by('-id')
+            qs = contact_list.contacts.all()
             # --- FILTERING ---
-            search_query = request.query_params.get('search', '').strip()
+            search_query, search_mode = normalize_search(
+                request.query_params.get('search'), request.query_params.get('search_mode')
+            )
+            cache_key = None
             if search_query:
-                qs = qs.filter(email__icontains=search_query)
+                cache_key = search_cache_key(contact_list, search_query, search_mode, request.query_params.dict())
+                cached = get_cached_page(cache_key)
+                if cached is not None:
+                    return Response(cached)
+                qs = search_contacts(qs, search_query, search_mode)
             # --- PAGINATION ---
-            page = int(request.query_params.get('page', 1))
-            page_size = int(request.query_params.get('page_size', 20))
-            total = qs.count()
-            num_pages = (total + page_size - 1) // page_size
-            start = (page - 1) * page_size
-            end = start + page_size
-            page_qs = qs[start:end]
-            ser = ContactSerializer(page_qs, many=True)
-            return Response({
-                'results': ser.data,
-                'count': total,
-                'page': page,
-                'num_pages': num_pages,
-            })
+            # Без фильтра общее число берём из счётчика списка, без COUNT по контактам
+            try:
+                data = paginate(
+                    request, qs, ('-id',),
+                    serialize=lambda rows: ContactSerializer(rows, many=True).data,
+                    total=None if search_query else contact_list.total_contacts,
+                    count_cache_key=f"contacts:{contact_list.id}:{search_mode}:{search_query}",
+                )
+            except InvalidCursor as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if cache_key:
+                set_cached_page(cache_key, data)
+            return Response(data)
 
         # --- ОГРАНИЧЕНИЕ ПО ТАРИФУ ---
         user = request.user
@@ -141,9 +328,6 @@ class ContactListViewSet(viewsets.ModelViewSet):
         """
         POST /contactlists/{pk}/import/ — асинхронный импорт контактов с полной валидацией
         """
-        import os
-        import tempfile
-        
         contact_list = self.get_object()
         file_obj = request.FILES.get('file')
         if not file_obj:
@@ -162,61 +346,16 @@ class ContactListViewSet(viewsets.ModelViewSet):
         )
 
         try:
-            # Сохраняем файл во временную директорию
-            temp_dir = os.path.join(tempfile.gettempdir(), 'vashsender_imports')
-            os.makedirs(temp_dir, exist_ok=True)
+            # Сохраняем файл в каталог импорта
+            os.makedirs(IMPORT_STAGING_DIR, exist_ok=True)
             
-            file_path = os.path.join(temp_dir, f"{import_task.id}_{file_obj.name}")
+            file_path = os.path.join(IMPORT_STAGING_DIR, f"{import_task.id}_{file_obj.name}")
             
             with open(file_path, 'wb+') as destination:
                 for chunk in file_obj.chunks():
                     destination.write(chunk)
             
-            # Запускаем асинхронную задачу
-            from .tasks import import_contacts_async
-            from django.conf import settings
-            
-            # Запускаем задачу асинхронно
-            try:
-                celery_task = import_contacts_async.delay(str(import_task.id), file_path)
-                
-                # Сохраняем ID Celery задачи для отслеживания
-                import_task.celery_task_id = celery_task.id
-                import_task.save()
-                
-                return Response({
-                    'task_id': str(import_task.id),
-                    'celery_task_id': celery_task.id,
-                    'status': 'started',
-                    'message': 'Импорт начат в фоновом режиме. Отслеживайте прогресс через API.'
-                }, status=status.HTTP_202_ACCEPTED)
-            except Exception as e:
-                # Если не удалось запустить задачу Celery, выполняем синхронно
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"Failed to start Celery task: {e}, executing synchronously", exc_info=True)
-                
-                # Выполняем задачу синхронно через apply
-                try:
-                    result = import_contacts_async.apply(args=[str(import_task.id), file_path])
-                    if result.successful():
-                        import_task.status = ImportTask.COMPLETED
-                    else:
-                        import_task.status = ImportTask.FAILED
-                        import_task.error_message = str(result.result) if result.result else str(e)
-                    import_task.save()
-                except Exception as sync_error:
-                    logger.error(f"Failed to execute task synchronously: {sync_error}", exc_info=True)
-                    import_task.status = ImportTask.FAILED
-                    import_task.error_message = f"Celery error: {e}, Sync error: {sync_error}"
-                    import_task.save()
-                
-                return Response({
-                    'task_id': str(import_task.id),
-                    'status': import_task.status,
-                    'error': import_task.error_message,
-                    'message': 'Импорт выполнен синхронно (Celery недоступен).'
-                }, status=status.HTTP_200_OK)
+            return _start_import(import_task, file_path)
             
         except Exception as e:
             # Обновляем задачу с ошибкой
@@ -229,6 +368,161 @@ class ContactListViewSet(viewsets.ModelViewSet):
                 'detail': f'Import failed: {str(e)}'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=True, methods=['post'], url_path='uploads')
+    def create_upload(self, request, pk=None):
+        """
+        POST /contactlists/{pk}/uploads/ — начать загрузку большого файла частями.
+        Тело: {"filename": "...", "size": <байт>}. Дальше части отправляются
+        PUT-запросами на uploads/{upload_id}/, затем POST uploads/{upload_id}/complete/.
+        """
+        contact_list = self.get_object()
+        filename = get_valid_filename(os.path.basename(str(request.data.get('filename') or '')))
+        try:
+            total_size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            total_size = 0
+        if not filename or total_size <= 0:
+            return Response({'detail': 'filename and size are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if total_size > CHUNKED_UPLOAD_MAX_SIZE:
+            return Response({'detail': f'File is too large (max {CHUNKED_UPLOAD_MAX_SIZE} bytes).'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        can_add, quota = can_add_contacts(request.user)
+        if not can_add:
+            return Response({'error': format_quota_error(quota)}, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = ChunkedUpload(
+            user=request.user,
+            contact_list=contact_list,
+            filename=filename,
+            total_size=total_size,
+        )
+        os.makedirs(IMPORT_STAGING_DIR, exist_ok=True)
+        upload.file_path = os.path.join(IMPORT_STAGING_DIR, f"upload_{upload.id}_{filename}")
+        open(upload.file_path, 'wb').close()
+        upload.save()
+
+        return Response(dict(
+            _upload_data(upload),
+            chunk_size=CHUNKED_UPLOAD_CHUNK_SIZE,
+            max_chunk_size=CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+        ), status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get', 'put', 'delete'], url_path='uploads/(?P<upload_id>[^/.]+)')
+    def upload_chunk(self, request, pk=None, upload_id=None):
+        """
+        GET    /contactlists/{pk}/uploads/{upload_id}/ — состояние загрузки (offset для продолжения)
+        PUT    /contactlists/{pk}/uploads/{upload_id}/?offset=N — часть файла (тело — байты части,
+               заголовок X-Chunk-SHA256 — контрольная сумма части; вместо offset можно Content-Range)
+        DELETE /contactlists/{pk}/uploads/{upload_id}/ — отменить загрузку
+        """
+        contact_list = self.get_object()
+        upload = get_object_or_404(ChunkedUpload, pk=upload_id, contact_list=contact_list, user=request.user)
+
+        if request.method == 'GET':
+            return Response(_upload_data(upload))
+
+        if request.method == 'DELETE':
+            if upload.status == ChunkedUpload.COMPLETED:
+                return Response({'detail': 'Upload is already completed.'}, status=status.HTTP_409_CONFLICT)
+            _remove_file(upload.file_path)
+            upload.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        if upload.status != ChunkedUpload.UPLOADING:
+            return Response(dict(_upload_data(upload), detail='Upload is not in progress.'),
+                            status=status.HTTP_409_CONFLICT)
+
+        offset = _chunk_offset(request)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if offset is None or length <= 0:
+            return Response({'detail': 'offset and a non-empty body are required.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if offset != upload.received_bytes:
+            # Клиент продолжает с подтверждённого смещения
+            return Response(dict(_upload_data(upload), detail='Unexpected offset.'),
+                            status=status.HTTP_409_CONFLICT)
+        if length > CHUNKED_UPLOAD_MAX_CHUNK_SIZE or offset + length > upload.total_size:
+            return Response({'detail': 'Chunk is too large.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Часть принимается во временный файл без блокировок: медленная сеть не держит строку в БД
+        fd, part_path = tempfile.mkstemp(dir=IMPORT_STAGING_DIR, prefix=f"upload_{upload.id}_", suffix='.part')
+        try:
+            digest = hashlib.sha256()
+            received = 0
+            with os.fdopen(fd, 'wb') as part:
+                while received < length:
+                    data = request.stream.read(min(UPLOAD_READ_SIZE, length - received))
+                    if not data:
+                        break
+                    digest.update(data)
+                    part.write(data)
+                    received += len(data)
+
+            if received != length:
+                return Response({'detail': 'Chunk body is incomplete.'}, status=status.HTTP_400_BAD_REQUEST)
+            expected = (request.META.get('HTTP_X_CHUNK_SHA256') or '').strip().lower()
+            if expected and expected != digest.hexdigest():
+                return Response({'detail': 'Chunk checksum mismatch.'}, status=status.HTTP_400_BAD_REQUEST)
+
+            # Дописываем часть в файл под блокировкой строки загрузки
+            with transaction.atomic():
+                upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+                if upload.status != ChunkedUpload.UPLOADING or upload.received_bytes != offset:
+                    return Response(dict(_upload_data(upload), detail='Unexpected offset.'),
+                                    status=status.HTTP_409_CONFLICT)
+                with open(upload.file_path, 'r+b') as target, open(part_path, 'rb') as part:
+                    # Отбрасываем хвост неподтверждённой части, если запись прервалась
+                    target.truncate(offset)
+                    target.seek(offset)
+                    shutil.copyfileobj(part, target, UPLOAD_READ_SIZE)
+                    target.flush()
+                    os.fsync(target.fileno())
+                upload.received_bytes = offset + length
+                upload.save(update_fields=['received_bytes', 'updated_at'])
+        finally:
+            _remove_file(part_path)
+
+        return Response(_upload_data(upload))
+
+    @action(detail=True, methods=['post'], url_path='uploads/(?P<upload_id>[^/.]+)/complete')
+    def complete_upload(self, request, pk=None, upload_id=None):
+        """
+        POST /contactlists/{pk}/uploads/{upload_id}/complete/ — все части получены, запустить импорт
+        """
+        contact_list = self.get_object()
+        upload = get_object_or_404(ChunkedUpload, pk=upload_id, contact_list=contact_list, user=request.user)
+
+        if upload.received_bytes != upload.total_size:
+            return Response(dict(_upload_data(upload), detail='Upload is incomplete.'),
+                            status=status.HTTP_409_CONFLICT)
+
+        can_add, quota = can_add_contacts(request.user)
+        if not can_add:
+            return Response({'error': format_quota_error(quota)}, status=status.HTTP_400_BAD_REQUEST)
+
+        with transaction.atomic():
+            # Повторный complete не запускает второй импорт
+            claimed = ChunkedUpload.objects.filter(
+                pk=upload.pk, status=ChunkedUpload.UPLOADING, received_bytes=upload.total_size
+            ).update(status=ChunkedUpload.COMPLETED, updated_at=timezone.now())
+            if not claimed:
+                upload.refresh_from_db()
+                return Response(dict(_upload_data(upload), detail='Upload is not in progress.'),
+                                status=status.HTTP_409_CONFLICT)
+            import_task = ImportTask.objects.create(
+                contact_list=contact_list,
+                filename=upload.filename,
+                status=ImportTask.PENDING
+            )
+            ChunkedUpload.objects.filter(pk=upload.pk).update(import_task=import_task)
+
+        return _start_import(import_task, upload.file_path)
+
     @action(detail=True, methods=['get'], url_path='import-status')
     def import_status(self, request, pk=None):
         """
@@ -326,6 +620,91 @@ class ContactListViewSet(viewsets.ModelViewSet):
         except ImportTask.DoesNotExist:
             return Response({'detail': 'Task not found'}, status=status.HTTP_404_NOT_FOUND)
 
+    @action(detail=False, methods=['get', 'post'], url_path='operations')
+    def list_operations(self, request):
+        """
+        GET  /contactlists/operations/ — последние операции над списками пользователя
+        POST /contactlists/operations/ — запустить операцию в фоне:
+        {"operation": "union|difference|intersection|copy|move|dedupe",
+         "source_list_ids": [...], "target_list_id": <id> или "target_name": "<новый список>",
+         "filters": {"status": [...], "search": "..."}}  — filters только для copy / move
+        """
+        if request.method == 'GET':
+            operations = ContactListOperation.objects.filter(user=request.user)[:50]
+            return Response({'operations': [_operation_data(op) for op in operations]})
+
+        kind = request.data.get('operation')
+        if kind not in dict(ContactListOperation.OPERATION_CHOICES):
+            return Response({'error': 'Неизвестная операция'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            source_ids = list(dict.fromkeys(int(value) for value in request.data.get('source_list_ids') or []))
+        except (TypeError, ValueError):
+            return Response({'error': 'source_list_ids должен быть списком id'}, status=status.HTTP_400_BAD_REQUEST)
+        min_sources = 2 if kind in (ContactListOperation.DIFFERENCE, ContactListOperation.INTERSECTION) else 1
+        if len(source_ids) < min_sources:
+            return Response({'error': f'Нужно исходных списков: не меньше {min_sources}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if kind in (ContactListOperation.COPY, ContactListOperation.MOVE) and len(source_ids) != 1:
+            return Response({'error': 'Для копирования и переноса нужен один исходный список'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if self.get_queryset().filter(id__in=source_ids).count() != len(source_ids):
+            return Response({'error': 'Исходный список не найден'}, status=status.HTTP_404_NOT_FOUND)
+
+        filters = request.data.get('filters') or {}
+        if not isinstance(filters, dict):
+            return Response({'error': 'filters должен быть объектом'}, status=status.HTTP_400_BAD_REQUEST)
+        statuses = filters.get('status') or []
+        if isinstance(statuses, str):
+            statuses = [statuses]
+        if any(value not in dict(Contact.STATUS_CHOICES) for value in statuses):
+            return Response({'error': 'Неизвестный статус в filters'}, status=status.HTTP_400_BAD_REQUEST)
+        filters = {'status': statuses, 'search': str(filters.get('search') or '').strip()}
+
+        from .list_operations import ADDING_OPERATIONS
+        if kind in ADDING_OPERATIONS:
+            can_add, quota = can_add_contacts(request.user)
+            if not can_add:
+                return Response({'error': format_quota_error(quota)}, status=status.HTTP_400_BAD_REQUEST)
+
+        target_id = request.data.get('target_list_id')
+        target_name = str(request.data.get('target_name') or '').strip()
+        with transaction.atomic():
+            if target_id:
+                target = self.get_queryset().filter(id=target_id).first()
+                if target is None:
+                    return Response({'error': 'Целевой список не найден'}, status=status.HTTP_404_NOT_FOUND)
+            elif target_name and kind != ContactListOperation.DEDUPE:
+                try:
+                    with transaction.atomic():
+                        target = ContactList.objects.create(owner=request.user, name=target_name)
+                except IntegrityError:
+                    return Response({'name': ['Список с таким именем уже существует']},
+                                    status=status.HTTP_400_BAD_REQUEST)
+            else:
+                return Response({'error': 'Укажите target_list_id или target_name'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if target.id in source_ids:
+                return Response({'error': 'Целевой список не может быть исходным'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+            operation = ContactListOperation.objects.create(
+                user=request.user,
+                operation=kind,
+                target_list=target,
+                source_list_ids=source_ids,
+                filters=filters if kind in (ContactListOperation.COPY, ContactListOperation.MOVE) else {},
+            )
+        return _start_list_operation(operation)
+
+    @action(detail=False, methods=['get'], url_path='operations/(?P<operation_id>[^/.]+)')
+    def list_operation_status(self, request, operation_id=None):
+        """
+        GET /contactlists/operations/{id}/ — прогресс операции над списками
+        """
+        operation = get_object_or_404(ContactListOperation, id=operation_id, user=request.user)
+        return Response(_operation_data(operation))
+
     @action(detail=True, methods=['post'], url_path='import-fast')
     def import_contacts_fast(self, request, pk=None):
         """
@@ -346,58 +725,36 @@ class ContactListViewSet(viewsets.ModelViewSet):
         if limit and (remaining_slots is None or remaining_slots <= 0):
             return Response({'error': format_quota_error(quota)}, status=status.HTTP_400_BAD_REQUEST)
 
-        existing_emails = set(
-            Contact.objects.filter(contact_list=contact_list).values_list('email', flat=True)
-        )
         limit_reached = False
-
-        emails = parse_emails(file_obj, file_obj.name)
-        total_emails = len(emails)
-        
-        # Быстрый импорт без валидации
-        contacts_to_create = []
+        total_emails = 0
         processed = 0
-        
-        for raw_email in emails:
+        imported = 0
+
+        # Быстрый импорт без валидации: файл читается потоково,
+        # каждая порция записывается одной вставкой с пропуском существующих адресов
+        for batch in iter_email_batches(file_obj, file_obj.name, batch_size=INGEST_BATCH_SIZE):
+            total_emails += len(batch)
+            processed += len(batch)
+            # Проверяем только базовый синтаксис
+            rows = [
+                (email, Contact.VALID)  # Предполагаем что все валидные
+                for email in batch
+                if '@' in email and '.' in email.split('@')[1]
+            ]
             try:
-                processed += 1
-                
-                # Проверяем только базовый синтаксис
-                if '@' in raw_email and '.' in raw_email.split('@')[1]:
-                    normalized_email = raw_email.lower().strip()
-                    if normalized_email in existing_emails:
-                        continue
-                    if limit and remaining_slots is not None and remaining_slots <= 0:
-                        limit_reached = True
-                        break
-
-                    new_contact = Contact(
-                        contact_list=contact_list,
-                        email=normalized_email,
-                        status=Contact.VALID  # Предполагаем что все валидные
-                    )
-                    contacts_to_create.append(new_contact)
-                    existing_emails.add(normalized_email)
-                    if remaining_slots is not None:
-                        remaining_slots -= 1
-                
-                # Батчинг: сохраняем каждые 1000 контактов
-                if len(contacts_to_create) >= 1000:
-                    try:
-                        Contact.objects.bulk_create(contacts_to_create, ignore_conflicts=True)
-                        contacts_to_create = []
-                    except Exception:
-                        contacts_to_create = []
-                        
-            except Exception:
+                ingested = ingest_contacts(contact_list.id, rows, limit=remaining_slots)
+            except Exception as e:
+                logger.error(
+                    f"Fast import into list {contact_list.id}: failed to write batch of {len(rows)} contacts: {e}",
+                    exc_info=True,
+                )
                 continue
-        
-        # Сохраняем оставшиеся контакты
-        if contacts_to_create:
-            try:
-                Contact.objects.bulk_create(contacts_to_create, ignore_conflicts=True)
-            except Exception:
-                pass
+            imported += ingested['inserted']
+            if remaining_slots is not None:
+                remaining_slots -= ingested['inserted']
+            if ingested['limit_reached']:
+                limit_reached = True
+                break
 
         elapsed_time = time.time() - start_time
 
@@ -406,7 +763,7 @@ class ContactListViewSet(viewsets.ModelViewSet):
             message = 'Fast import stopped: ' + format_quota_error(quota)
 
         response_data = {
-            'imported': processed,
+            'imported': imported,
             'total_processed': processed,
             'total_in_file': total_emails,
             'elapsed_time': round(elapsed_time, 2),
@@ -421,68 +778,67 @@ class ContactListViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'], url_path='export')
     def export_contacts(self, request, pk=None):
         """
-        POST /contactlists/{pk}/export/ — экспорт контактов в файл
+        POST /contactlists/{pk}/export/ — экспорт контактов в ZIP (по файлу на статус).
+        Архив отдаётся потоком; списки больше CONTACT_EXPORT_STREAM_LIMIT адресов
+        (или при "background": true) выгружаются в фоне — ответ 202 с задачей экспорта.
         """
+        from .export import (
+            CONTACT_EXPORT_STREAM_LIMIT, EXPORT_FORMATS, export_rows_total, export_types, stream_export_zip,
+        )
+
         contact_list = self.get_object()
         format_type = request.data.get('format', 'txt')
-        types = request.data.get('types', [])
-
-        # Создаем ZIP архив для всех файлов
-        import zipfile
-        from io import BytesIO
-        from django.core.files.base import ContentFile
-
-        # Создаем буфер для ZIP файла
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            # Экспортируем каждый тип контактов в отдельный файл
-            for contact_type in types:
-                # Получаем контакты текущего типа
-                contacts = Contact.objects.filter(
-                    contact_list=contact_list,
-                    status=contact_type
-                ).values_list('email', flat=True).order_by('email')
-
-                if contacts:
-                    # Формируем содержимое файла в зависимости от формата
-                    if format_type == 'txt':
-                        content = '\n'.join(contacts)
-                        content_type = 'text/plain'
-                    elif format_type == 'csv':
-                        content = 'email\n' + '\n'.join(contacts)
-                        content_type = 'text/csv'
-                    elif format_type == 'json':
-                        content = json.dumps(list(contacts), indent=2)
-                        content_type = 'application/json'
-                    else:
-                        return Response(
-                            {'error': 'Unsupported format'}, 
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                    # Создаем имя файла для текущего типа
-                    type_names = {
-                        'valid': 'действительные',
-                        'invalid': 'недействительные',
-                        'blacklist': 'черный_список'
-                    }
-                    filename = f'contacts_{contact_list.name}_{type_names[contact_type]}_{datetime.now().strftime("%Y-%m-%d")}.{format_type}'
-                    
-                    # Добавляем файл в ZIP архив
-                    zip_file.writestr(filename, content)
+        if format_type not in EXPORT_FORMATS:
+            return Response({'error': 'Unsupported format'}, status=status.HTTP_400_BAD_REQUEST)
 
+        types = export_types(contact_list, request.data.get('types', []))
         # Если нет контактов ни одного типа
-        if zip_file.namelist() == []:
+        if not types:
             return Response(
-                {'error': 'No contacts found for selected types'}, 
+                {'error': 'No contacts found for selected types'},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Подготавливаем ZIP файл для отправки
-        zip_buffer.seek(0)
-        response = HttpResponse(zip_buffer.getvalue(), content_type='application/zip')
-        response['Content-Disposition'] = f'attachment; filename="contacts_{contact_list.name}_{datetime.now().strftime("%Y-%m-%d")}.zip"'
-        return response
+        background = str(request.data.get('background', '')).lower() in ('1', 'true', 'yes')
+        if not background and export_rows_total(contact_list, types) <= CONTACT_EXPORT_STREAM_LIMIT:
+            return stream_export_zip(contact_list, types, format_type)
+
+        from .tasks import generate_contact_export
+        export_task = ContactExportTask.objects.create(
+            user=request.user, contact_list=contact_list, format=format_type, types=types,
+        )
+        try:
+            celery_task = generate_contact_export.delay(str(export_task.id))
+            ContactExportTask.objects.filter(id=export_task.id).update(celery_task_id=celery_task.id)
+        except Exception as e:
+            # Если брокер недоступен — выполняем синхронно
+            logger.error(f"Failed to start export task via Celery: {e}, executing synchronously")
+            generate_contact_export.apply(args=[str(export_task.id)])
+        export_task.refresh_from_db()
+        return Response(_export_task_data(export_task), status=status.HTTP_202_ACCEPTED)
+
+    @action(detail=False, methods=['get'], url_path='export-tasks/(?P<task_id>[^/.]+)')
+    def export_task_status(self, request, task_id=None):
+        """
+        GET /contactlists/export-tasks/{task_id}/ — статус фоновой выгрузки
+        """
+        export_task = get_object_or_404(ContactExportTask, id=task_id, user=request.user)
+        return Response(_export_task_data(export_task))
+
+    @action(detail=False, methods=['get'], url_path='export-tasks/(?P<task_id>[^/.]+)/download')
+    def download_export_task(self, request, task_id=None):
+        """
+        GET /contactlists/export-tasks/{task_id}/download/ — готовый архив фоновой выгрузки
+        """
+        export_task = get_object_or_404(ContactExportTask, id=task_id, user=request.user)
+        if export_task.status != ContactExportTask.COMPLETED or not export_task.file:
+            return Response({'detail': 'Файл ещё не готов'}, status=status.HTTP_409_CONFLICT)
+        return FileResponse(
+            export_task.file.open('rb'),
+            as_attachment=True,
+            filename=export_task.filename or os.path.basename(export_task.file.name),
+            content_type='application/zip',
+        )
 
     @action(detail=True, methods=['post'], url_path='import-optimized')
     def import_contacts_optimized(self, request, pk=None):
@@ -490,7 +846,6 @@ class ContactListViewSet(viewsets.ModelViewSet):
         POST /contactlists/{pk}/import-optimized/ — оптимизированный импорт для больших объемов
         """
         import time
-        from django.db import transaction
         start_time = time.time()
         
         contact_list = self.get_object()
@@ -513,93 +868,55 @@ class ContactListViewSet(viewsets.ModelViewSet):
         )
 
         try:
-            # Читаем email адреса из файла
-            emails = parse_emails(file_obj, file_obj.name)
-            total_emails = len(emails)
-            
-            # Обновляем задачу с общим количеством
-            import_task.total_emails = total_emails
-            import_task.save()
-            
+            from .utils import validate_email_fast
+
             added = 0
             invalid_count = 0
             blacklisted_count = 0
             error_count = 0
             processed = 0
-            
-            # Получаем все существующие email для быстрой проверки
-            existing_emails = set(Contact.objects.filter(
-                contact_list=contact_list
-            ).values_list('email', flat=True))
             limit_reached = False
             
-            # Обрабатываем email большими батчами
-            batch_size = 1000  # Большой размер батча
-            contacts_to_create = []
-            
-            for i, raw_email in enumerate(emails):
-                try:
-                    processed += 1
-                    
-                    # Обновляем прогресс каждые 1000 email
-                    if processed % 1000 == 0:
-                        import_task.processed_emails = processed
-                        import_task.save()
-                    
-                    # Нормализуем email и проверяем существование
-                    email = raw_email.lower().strip()
-                    if email in existing_emails:
+            # Файл читается потоково; каждая порция записывается одной вставкой,
+            # уже существующие адреса пропускаются на стороне БД
+            for batch in iter_email_batches(file_obj, file_obj.name, batch_size=INGEST_BATCH_SIZE):
+                processed += len(batch)
+                rows = []
+                for email in batch:
+                    try:
+                        # Быстрая валидация без DNS для большинства доменов
+                        validation_result = validate_email_fast(email)
+                    except Exception:
+                        error_count += 1
                         continue
-
-                    if limit and remaining_slots is not None and remaining_slots <= 0:
-                        limit_reached = True
-                        break
-                    
-                    # Быстрая валидация без DNS для большинства доменов
-                    from .utils import validate_email_fast
-                    validation_result = validate_email_fast(email)
-                    
-                    if validation_result['is_valid']:
-                        status_code = validation_result['status']
-                        
-                        new_contact = Contact(
-                            contact_list=contact_list,
-                            email=email,
-                            status=status_code
-                        )
-                        contacts_to_create.append(new_contact)
-                        added += 1
-                        existing_emails.add(email)
-                        if remaining_slots is not None:
-                            remaining_slots -= 1
-                        if status_code == Contact.BLACKLIST:
-                            blacklisted_count += 1
-                    else:
-                        new_contact = Contact(
-                            contact_list=contact_list,
-                            email=email,
-                            status=Contact.INVALID
-                        )
-                        contacts_to_create.append(new_contact)
-                        invalid_count += 1
-                        existing_emails.add(email)
-                        if remaining_slots is not None:
-                            remaining_slots -= 1
-                    
-                    # Сохраняем большими батчами
-                    if len(contacts_to_create) >= batch_size:
-                        with transaction.atomic():
-                            Contact.objects.bulk_create(contacts_to_create, ignore_conflicts=True)
-                        contacts_to_create = []
-                        
-                except Exception:
-                    error_count += 1
+                    status_code = validation_result['status'] if validation_result['is_valid'] else Contact.INVALID
+                    rows.append((email, status_code))
+                
+                try:
+                    ingested = ingest_contacts(contact_list.id, rows, limit=remaining_slots)
+                except Exception as e:
+                    logger.error(
+                        f"Import {import_task.id}: failed to write batch of {len(rows)} contacts: {e}",
+                        exc_info=True,
+                    )
+                    error_count += len(rows)
                     continue
+                invalid_count += ingested['by_status'][Contact.INVALID]
+                blacklisted_count += ingested['by_status'][Contact.BLACKLIST]
+                added += ingested['inserted'] - ingested['by_status'][Contact.INVALID]
+                if remaining_slots is not None:
+                    remaining_slots -= ingested['inserted']
+                
+                # Обновляем прогресс после каждой порции
+                import_task.processed_emails = processed
+                import_task.save(update_fields=['processed_emails'])
+                
+                if ingested['limit_reached']:
+                    limit_reached = True
+                    break
             
-            # Сохраняем оставшиеся контакты
-            if contacts_to_create:
-                with transaction.atomic():
-                    Contact.objects.bulk_create(contacts_to_create, ignore_conflicts=True)
+            total_emails = processed
+            import_task.total_emails = total_emails
 
             # Завершаем задачу
             elapsed_time = time.time() - start_time
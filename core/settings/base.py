@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 import os
 
+from celery.schedules import crontab
+
 PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 BASE_DIR = os.path.dirname(PROJECT_DIR)
 
@@ -277,6 +279,56 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'apps.campaigns.tasks.cleanup_smtp_connections',
         'schedule': 600.0,  # Каждые 10 минут
     },
+    'reconcile-campaign-counters': {
+        'task': 'apps.campaigns.tasks.reconcile_campaign_counters',
+        'schedule': 3600.0,  # Каждый час
+    },
+    'rollup-daily-engagement': {
+        'task': 'apps.campaigns.tasks.rollup_daily_engagement',
+        'schedule': 600.0,  # Каждые 10 минут (последние 2 дня)
+        'kwargs': {'days': 2},
+    },
+    'rollup-daily-engagement-full': {
+        'task': 'apps.campaigns.tasks.rollup_daily_engagement',
+        'schedule': 86400.0,  # Раз в сутки (последние 31 день)
+        'kwargs': {'days': 31},
+    },
+    'cleanup-export-tasks': {
+        'task': 'apps.campaigns.tasks.cleanup_export_tasks',
+        'schedule': 3600.0,  # Каждый час
+    },
+    'resume-stale-imports': {
+        'task': 'apps.mailer.tasks.resume_stale_imports',
+        'schedule': 300.0,  # Каждые 5 минут
+    },
+    'resume-stale-purges': {
+        'task': 'apps.mailer.tasks.resume_stale_purges',
+        'schedule': 600.0,  # Каждые 10 минут
+    },
+    'resume-stale-list-operations': {
+        'task': 'apps.mailer.tasks.resume_stale_list_operations',
+        'schedule': 300.0,  # Каждые 5 минут
+    },
+    'cleanup-contact-exports': {
+        'task': 'apps.mailer.tasks.cleanup_contact_exports',
+        'schedule': 3600.0,  # Каждый час
+    },
+    'cleanup-stale-uploads': {
+        'task': 'apps.mailer.tasks.cleanup_stale_uploads',
+        'schedule': 3600.0,  # Каждый час
+    },
+    'reconcile-contact-counts': {
+        'task': 'apps.mailer.tasks.reconcile_contact_counts',
+        'schedule': 24 * 3600.0,  # Раз в сутки
+    },
+    'nightly-contact-revalidation': {
+        'task': 'apps.mailer.tasks.schedule_nightly_revalidation',
+        'schedule': crontab(hour=1, minute=0),  # Начало окна обслуживания
+    },
+    'resume-stale-revalidations': {
+        'task': 'apps.mailer.tasks.resume_stale_revalidations',
+        'schedule': 600.0,  # Каждые 10 минут
+    },
 }
 
 # Custom error pages
@@ -0,0 +1,212 @@
+# core/utils/dns_resolver.py
+
+"""
+Общий DNS-резолвер с кэшированием.
+
+Два уровня кэша:
+- LRU в памяти процесса (ограничен по размеру, записи живут не дольше TTL);
+- кэш Django (Redis в продакшене) — общий для всех воркеров.
+
+Положительные ответы кэшируются на TTL записи (в пределах DNS_MIN_TTL..DNS_MAX_TTL),
+отрицательные (NXDOMAIN / нет записей) — на DNS_NEGATIVE_TTL.
+Временные ошибки (таймаут, недоступность NS) не кэшируются.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import dns.exception
+import dns.resolver
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+DNS_TIMEOUT = getattr(settings, 'DNS_TIMEOUT', 3)
+DNS_LIFETIME = getattr(settings, 'DNS_LIFETIME', 5)
+DNS_MIN_TTL = getattr(settings, 'DNS_MIN_TTL', 60)
+DNS_MAX_TTL = getattr(settings, 'DNS_MAX_TTL', 6 * 3600)
+DNS_NEGATIVE_TTL = getattr(settings, 'DNS_NEGATIVE_TTL', 300)
+DNS_LRU_SIZE = getattr(settings, 'DNS_LRU_SIZE', 10000)
+DNS_BULK_WORKERS = getattr(settings, 'DNS_BULK_WORKERS', 32)
+
+# Статусы ответа
+OK = 'ok'
+NXDOMAIN = 'nxdomain'
+NO_ANSWER = 'no_answer'
+TIMEOUT = 'timeout'
+ERROR = 'error'
+
+NEGATIVE_STATUSES = (NXDOMAIN, NO_ANSWER)
+
+
+class DNSUnavailable(Exception):
+    """Временная ошибка DNS (таймаут, SERVFAIL): ответа нет, это не «записей нет»."""
+
+    def __init__(self, answer):
+        super().__init__(answer['error'])
+        self.answer = answer
+
+
+class _LRUCache:
+    """Потокобезопасный LRU с истечением записей по времени."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+_local_cache = _LRUCache(DNS_LRU_SIZE)
+_thread_local = threading.local()
+
+
+def _get_resolver():
+    """Один экземпляр dns.resolver.Resolver на поток (читает resolv.conf один раз)."""
+    resolver = getattr(_thread_local, 'resolver', None)
+    if resolver is None:
+        resolver = dns.resolver.Resolver()
+        resolver.timeout = DNS_TIMEOUT
+        resolver.lifetime = DNS_LIFETIME
+        _thread_local.resolver = resolver
+    return resolver
+
+
+def _cache_key(name, rdtype):
+    return f"dns:{rdtype}:{name}"
+
+
+def _normalize_name(name):
+    return (name or '').strip().rstrip('.').lower()
+
+
+def _records_from_answer(answers, rdtype):
+    if rdtype == 'MX':
+        # Хосты MX, отсортированные по приоритету
+        return [
+            str(r.exchange).rstrip('.')
+            for r in sorted(answers, key=lambda r: r.preference)
+        ]
+    if rdtype == 'TXT':
+        return [b''.join(r.strings).decode('utf-8', errors='ignore').strip('"') for r in answers]
+    return [r.to_text() for r in answers]
+
+
+def _query(name, rdtype):
+    """Запрос к DNS без кэша. Возвращает (ответ, ttl) — ttl=None для некэшируемых ошибок."""
+    try:
+        answers = _get_resolver().resolve(name, rdtype)
+        ttl = answers.rrset.ttl if answers.rrset is not None else DNS_MIN_TTL
+        records = _records_from_answer(answers, rdtype)
+        return {'status': OK, 'records': records, 'error': None}, min(max(ttl, DNS_MIN_TTL), DNS_MAX_TTL)
+    except dns.resolver.NXDOMAIN:
+        return {'status': NXDOMAIN, 'records': [], 'error': 'Домен не существует'}, DNS_NEGATIVE_TTL
+    except dns.resolver.NoAnswer:
+        return {'status': NO_ANSWER, 'records': [], 'error': f'Нет записей {rdtype}'}, DNS_NEGATIVE_TTL
+    except dns.exception.Timeout:
+        return {'status': TIMEOUT, 'records': [], 'error': 'Таймаут DNS запроса'}, None
+    except Exception as e:
+        return {'status': ERROR, 'records': [], 'error': f'Ошибка DNS запроса: {str(e)}'}, None
+
+
+def resolve(name, rdtype='A', use_cache=True):
+    """
+    Разрешает имя с кэшированием.
+    Возвращает словарь {'status': ..., 'records': [...], 'error': ...};
+    для MX records — хосты по возрастанию приоритета, для TXT — строки записей.
+    use_cache=False — запрос мимо кэша; свежий ответ всё равно записывается в кэш.
+    """
+    name = _normalize_name(name)
+    rdtype = rdtype.upper()
+    key = _cache_key(name, rdtype)
+
+    if use_cache:
+        answer = _local_cache.get(key)
+        if answer is not None:
+            return answer
+        try:
+            cached = cache.get(key)
+        except Exception as e:
+            logger.warning(f"DNS cache read failed for {key}: {e}")
+            cached = None
+        if cached is not None:
+            answer, expires_at = cached
+            remaining = expires_at - time.time()
+            if remaining > 0:
+                _local_cache.set(key, answer, remaining)
+                return answer
+
+    answer, ttl = _query(name, rdtype)
+    if ttl is None:
+        return answer
+
+    _local_cache.set(key, answer, ttl)
+    try:
+        cache.set(key, (answer, time.time() + ttl), timeout=ttl)
+    except Exception as e:
+        logger.warning(f"DNS cache write failed for {key}: {e}")
+    return answer
+
+
+def resolve_many(names, rdtype='A', max_workers=DNS_BULK_WORKERS):
+    """
+    Разрешает набор имён параллельно (пул потоков). Возвращает {имя: ответ}.
+    Имена, уже лежащие в кэше, запросов к DNS не порождают.
+    """
+    unique = list(dict.fromkeys(_normalize_name(n) for n in names if n))
+    if not unique:
+        return {}
+    workers = max(1, min(max_workers, len(unique)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        answers = executor.map(lambda n: resolve(n, rdtype), unique)
+        return dict(zip(unique, answers))
+
+
+def _records_or_raise(answer):
+    if answer['status'] != OK and answer['status'] not in NEGATIVE_STATUSES:
+        raise DNSUnavailable(answer)
+    return answer['records']
+
+
+def get_mx_hosts(domain):
+    """
+    MX-хосты домена по приоритету; пустой список — записей нет (NXDOMAIN / пустой ответ).
+    При временной ошибке DNS выбрасывает DNSUnavailable.
+    """
+    return _records_or_raise(resolve(domain, 'MX'))
+
+
+def get_txt_records(name, use_cache=True):
+    """TXT-записи имени; пустой список — записей нет. При временной ошибке — DNSUnavailable."""
+    return _records_or_raise(resolve(name, 'TXT', use_cache=use_cache))
+
+
+def clear_local_cache():
+    _local_cache.clear()
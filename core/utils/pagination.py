@@ -0,0 +1,152 @@
+# core/utils/pagination.py
+
+"""
+Пагинация для API без OFFSET.
+
+Курсорный режим (?cursor=...) выбирает следующую страницу условием по ключу сортировки
+(WHERE (created_at, id) < (…)), поэтому время выдачи страницы не зависит от её номера.
+Курсор непрозрачен для клиента: base64 от значений ключа последней строки страницы.
+Общее число строк в этом режиме приблизительное: берётся из готового счётчика
+или из кэша на PAGINATION_COUNT_CACHE_TTL секунд.
+
+Старый режим ?page=N&page_size=M сохранён для существующих клиентов.
+"""
+
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+
+PAGINATION_COUNT_CACHE_TTL = getattr(settings, 'PAGINATION_COUNT_CACHE_TTL', 60)
+PAGINATION_MAX_PAGE_SIZE = getattr(settings, 'PAGINATION_MAX_PAGE_SIZE', 500)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _int_param(request, name, default, minimum=1, maximum=None):
+    try:
+        value = int(request.query_params.get(name, default))
+    except (TypeError, ValueError):
+        value = default
+    value = max(value, minimum)
+    return min(value, maximum) if maximum else value
+
+
+def get_page_size(request, default):
+    return _int_param(request, 'page_size', default, maximum=PAGINATION_MAX_PAGE_SIZE)
+
+
+def encode_cursor(values):
+    raw = json.dumps(values, separators=(',', ':'), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields, model):
+    """Значения ключа из курсора, приведённые к типам полей модели."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor('Invalid cursor')
+    try:
+        return [
+            model._meta.get_field(name.lstrip('-')).to_python(value)
+            for name, value in zip(fields, values)
+        ]
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+
+def _after_cursor(fields, values):
+    """
+    Условие «строго после курсора» для сортировки fields, например ('-created_at', '-id'):
+    created_at < v0 OR (created_at = v0 AND id < v1).
+    """
+    condition = Q()
+    for position, name in enumerate(fields):
+        column = name.lstrip('-')
+        lookup = 'lt' if name.startswith('-') else 'gt'
+        step = Q(**{f'{column}__{lookup}': values[position]})
+        for previous, value in zip(fields[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def approximate_count(queryset, cache_key):
+    """COUNT(*) с кэшированием — для индикатора «всего», а не для расчёта страниц."""
+    key = 'pagination_count:' + hashlib.md5(cache_key.encode()).hexdigest()
+    try:
+        total = cache.get(key)
+    except Exception:
+        total = None
+    if total is None:
+        total = queryset.count()
+        try:
+            cache.set(key, total, timeout=PAGINATION_COUNT_CACHE_TTL)
+        except Exception:
+            pass
+    return total
+
+
+def paginate(request, queryset, ordering, serialize, default_page_size=20, total=None, count_cache_key=None):
+    """
+    Возвращает тело ответа со страницей queryset.
+
+    ordering — ключ сортировки, последним полем должен идти уникальный столбец (обычно '-id');
+    serialize — функция, превращающая срез queryset в список для ответа;
+    total — готовое число строк (например, из денормализованного счётчика); если не задано,
+    используется approximate_count(queryset, count_cache_key) в курсорном режиме
+    и точный COUNT в режиме page.
+
+    Курсорный режим включается параметром cursor (пустое значение — первая страница):
+    {'results', 'next_cursor', 'has_more', 'count', 'page_size'}.
+    Иначе — прежний формат {'results', 'count', 'page', 'num_pages'}.
+    """
+    queryset = queryset.order_by(*ordering)
+    page_size = get_page_size(request, default_page_size)
+
+    if 'cursor' not in request.query_params:
+        page = _int_param(request, 'page', 1)
+        if total is None:
+            total = queryset.count()
+        start = (page - 1) * page_size
+        return {
+            'results': serialize(queryset[start:start + page_size]),
+            'count': total,
+            'page': page,
+            'num_pages': (total + page_size - 1) // page_size,
+        }
+
+    if total is None and count_cache_key:
+        total = approximate_count(queryset, count_cache_key)
+
+    cursor = request.query_params.get('cursor') or ''
+    if cursor:
+        values = decode_cursor(cursor, ordering, queryset.model)
+        queryset = queryset.filter(_after_cursor(ordering, values))
+
+    # Одна лишняя строка показывает, есть ли следующая страница
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, name.lstrip('-')) for name in ordering])
+
+    return {
+        'results': serialize(rows),
+        'next_cursor': next_cursor,
+        'has_more': has_more,
+        'count': total,
+        'page_size': page_size,
+    }